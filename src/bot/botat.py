@@ -0,0 +1,216 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# AT command engine for the Iridium SBD modem.  A reader thread takes
+# the modem's output as it arrives and completes the command in hand on
+# its final result code (OK, ERROR, READY), so a command costs what the
+# modem takes to answer rather than a polling interval.  Commands can be
+# queued ahead ("pipelined"): the next one is written the moment the one
+# before it is done.  Information lines (+CSQ:, +SBDIX:, the "0" after a
+# binary write) are kept with their command; the binary reply of
+# AT+SBDRB (length, message, checksum) is read as such; anything the
+# modem says between commands, or an SBDRING at any time, is kept as
+# unsolicited.
+#
+import struct
+import threading
+import time
+from collections import deque
+
+v_botat = "bot71-20200601"
+
+at_finals = (b"OK", b"ERROR", b"READY", b"NO CARRIER")
+# Said by the modem at any time, even in the middle of a reply.
+at_unsolicited = (b"SBDRING",)
+
+
+class ATRequest(object):
+    # One command and, once 'done' is set, its outcome: 'final' is the
+    # result code (or "TIMEOUT"), 'lines' the information lines, 'data'
+    # the binary reply.
+    def __init__(self, _cmd, _binary, _raw):
+        self.cmd = _cmd
+        self.binary = _binary
+        self.raw = _raw
+        self.lines = []
+        self.data = None
+        self.final = None
+        self.sent = None
+        self.took = None
+        self.done = threading.Event()
+
+    def text(self):
+        return "\r\n".join(line.decode("ascii", "replace") for line in self.lines)
+
+
+########################################################################
+# The AT Command Engine Class
+########################################################################
+
+
+class ATEngine(threading.Thread):
+    # ---------------------------------------------------------------
+    # Drives '_port' (an open 'serial.Serial', or anything with 'read()',
+    # 'write()' and 'in_waiting'), which it reads with a short timeout.
+    def __init__(self, _cfg, _log, _lev, _port):
+        threading.Thread.__init__(self, daemon=True)
+        self.cfg = _cfg
+        self.log = _log
+        self.port = _port
+        self.port.timeout = 0.05
+        self.lock = threading.Lock()
+        self.queue = deque()
+        self.active = None
+        self.buf = bytearray()
+        self.unsolicited = []
+        self.running = True
+        self.error = None
+
+        if self.cfg.tracking:
+            self.log.track(_lev, "Created ATEngine Class Object.", True)
+
+    def run(self):
+        try:
+            while self.running:
+                data = self.port.read(self.port.in_waiting or 1)
+                if data:
+                    with self.lock:
+                        self.buf += data
+                        self.parse()
+        except Exception as e:
+            # The port went away; fail whatever is waiting.
+            self.error = e
+            if self.cfg.tracking:
+                self.log.errtrack("AT101", "run(): AT Engine Stopped [" + str(e) + "]")
+            with self.lock:
+                for req in [self.active] + list(self.queue):
+                    if req is not None:
+                        self.finish(req, b"ERROR")
+                self.active = None
+                self.queue.clear()
+
+    def stop(self):
+        self.running = False
+        self.join()
+
+    # ---------------------------------------------------------------
+    # submit() class module.
+    # ---------------------------------------------------------------
+    # Queue '_cmd' (sent with a CR, or as is if '_raw': the payload after
+    # a READY).  AT+SBDRB replies in binary unless told otherwise.
+    def submit(self, _cmd, _binary=None, _raw=False):
+        if isinstance(_cmd, str):
+            _cmd = _cmd.encode("ascii")
+        if _binary is None:
+            _binary = _cmd.upper().startswith(b"AT+SBDRB")
+        req = ATRequest(bytes(_cmd), _binary, _raw)
+        with self.lock:
+            if self.error is not None:
+                self.finish(req, b"ERROR")
+                return req
+            self.queue.append(req)
+            if self.active is None:
+                self.next()
+        return req
+
+    # ---------------------------------------------------------------
+    # wait() class module.
+    # ---------------------------------------------------------------
+    # '_req' once done, or after '_tout' seconds as a TIMEOUT (and the
+    # engine moves on to the next command).
+    def wait(self, _req, _tout):
+        if _req.done.wait(_tout):
+            return _req
+        with self.lock:
+            if self.active is _req:
+                self.active = None
+                self.buf.clear()
+                self.finish(_req, b"TIMEOUT")
+                self.next()
+            elif _req in self.queue:
+                self.queue.remove(_req)
+                self.finish(_req, b"TIMEOUT")
+        return _req
+
+    def command(self, _cmd, _tout, _binary=None, _raw=False):
+        return self.wait(self.submit(_cmd, _binary, _raw), _tout)
+
+    # ---------------------------------------------------------------
+    # pipeline() class module.
+    # ---------------------------------------------------------------
+    # Several commands back to back; waits for all of them, '_tout'
+    # seconds in all.
+    def pipeline(self, _cmds, _tout):
+        reqs = [self.submit(cmd) for cmd in _cmds]
+        deadline = time.monotonic() + _tout
+        for req in reqs:
+            self.wait(req, max(deadline - time.monotonic(), 0))
+        return reqs
+
+    # (the lock is held from here on)
+    def next(self):
+        while self.queue and self.active is None:
+            req = self.queue.popleft()
+            try:
+                self.port.write(req.cmd if req.raw else req.cmd + b"\r")
+            except Exception:
+                self.finish(req, b"ERROR")
+                continue
+            req.sent = time.monotonic()
+            self.active = req
+
+    def finish(self, _req, _final):
+        _req.final = _final.decode("ascii")
+        if _req.sent is not None:
+            _req.took = time.monotonic() - _req.sent
+        _req.done.set()
+
+    # ---------------------------------------------------------------
+    # parse() class module.
+    # ---------------------------------------------------------------
+    # Consume what can be made sense of in 'buf'.
+    def parse(self):
+        while True:
+            req = self.active
+            if req is not None and req.binary and req.data is None:
+                echo = (req.cmd + b"\r").upper()
+                head = bytes(self.buf[:len(echo)]).upper()
+                if len(head) < len(echo) and echo.startswith(head):
+                    return  # the echo isn't all in yet
+                if head == echo:
+                    del self.buf[:len(echo)]
+                    if self.buf[:1] == b"\n":
+                        del self.buf[:1]
+                if len(self.buf) < 2:
+                    return
+                length = struct.unpack_from(">H", self.buf)[0]
+                if len(self.buf) < length + 4:
+                    return
+                req.data = bytes(self.buf[:length + 4])
+                del self.buf[:length + 4]
+                continue
+
+            ends = [i for i in (self.buf.find(b"\r"), self.buf.find(b"\n")) if i >= 0]
+            if not ends:
+                return
+            end = min(ends)
+            line = bytes(self.buf[:end]).strip()
+            del self.buf[:end + 1]
+            if not line:
+                continue
+            if req is None or line in at_unsolicited:
+                self.unsolicited.append(line)
+                continue
+            if not req.raw and line.upper() == req.cmd.upper():
+                continue  # echo
+            if line in at_finals:
+                self.active = None
+                self.finish(req, line)
+                self.next()
+                continue
+            req.lines.append(line)
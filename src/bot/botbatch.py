@@ -0,0 +1,159 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Batch envelope for the LB link (opt-in, 'lb_msg_batch'): several
+# serialized NEPIMsgs in one wire message, so that small records share a
+# packet (and its NEPI and UDP headers) instead of taking one each.
+#
+# A serialized NEPIMsg never starts with a 0x00 byte (field number 0 is
+# invalid in protobuf), so a leading 0x00 marks an envelope:
+#
+#   0x00, version, varint count, varint len(nuid), nuid,
+#   then 'count' times: varint length, NEPIMsg
+#
+# The records' 'nuid' field is carried once, in the envelope, and put
+# back on unbatching.  Works on the wire bytes only; the caller supplies
+# the 'nuid' field number (see 'botmsg.nuid_field').
+#
+
+v_botbatch = "bot71-20200601"
+
+batch_marker = 0x00
+batch_version = 1
+
+
+# ---------------------------------------------------------------
+# Varint helpers (protobuf base-128).
+# ---------------------------------------------------------------
+def putVarint(_n):
+    out = bytearray()
+    while _n > 0x7F:
+        out.append((_n & 0x7F) | 0x80)
+        _n >>= 7
+    out.append(_n)
+    return bytes(out)
+
+
+def getVarint(_buf, _pos):
+    n = 0
+    shift = 0
+    while True:
+        b = _buf[_pos]
+        _pos += 1
+        n |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return n, _pos
+        shift += 7
+
+
+# ---------------------------------------------------------------
+# splitField() module function.
+# ---------------------------------------------------------------
+# Remove the top-level length-delimited field '_field' from a serialized
+# message.  Returns (message without it, its value), or (message, None)
+# when it isn't there (or isn't length-delimited).
+def splitField(_msg, _field):
+    pos = 0
+    end = len(_msg)
+    while pos < end:
+        start = pos
+        tag, pos = getVarint(_msg, pos)
+        wire_type = tag & 0x07
+        if wire_type == 0:
+            value, pos = getVarint(_msg, pos)
+        elif wire_type == 1:
+            pos += 8
+        elif wire_type == 5:
+            pos += 4
+        elif wire_type == 2:
+            size, pos = getVarint(_msg, pos)
+            if tag >> 3 == _field:
+                return _msg[:start] + _msg[pos + size:], _msg[pos:pos + size]
+            pos += size
+        else:
+            break
+    return _msg, None
+
+
+# ---------------------------------------------------------------
+# planBatches() module function.
+# ---------------------------------------------------------------
+# Pack serialized NEPIMsgs, in order, into envelopes of at most '_budget'
+# bytes (the packet payload on 'ethernet', 'max_msg_size' on a serial
+# link).  Records only share an envelope with the same 'nuid'.  A record
+# left on its own is sent as it is, so there's never an envelope of one.
+# Returns [(wire message, number of records in it), ...].
+def planBatches(_msgs, _budget, _nuid_field):
+    def envelope(_nuid, _run):
+        if len(_run) == 1:
+            return _run[0][0], 1
+        head = bytes((batch_marker, batch_version))
+        head += putVarint(len(_run)) + putVarint(len(_nuid)) + _nuid
+        return head + b"".join(putVarint(len(s)) + s for m, s in _run), len(_run)
+
+    out = []
+    run = []  # (original, without 'nuid') for the envelope being filled
+    nuid = None
+    used = 0
+    for msg in _msgs:
+        msg = bytes(msg)
+        stripped, msg_nuid = splitField(msg, _nuid_field)
+        msg_nuid = msg_nuid or b""
+        framed = len(putVarint(len(stripped))) + len(stripped)
+        if run and (msg_nuid != nuid or used + framed > _budget):
+            out.append(envelope(nuid, run))
+            run = []
+        if not run:
+            nuid = msg_nuid
+            # Marker, version, a count of up to two bytes, the 'nuid'.
+            used = 4 + len(putVarint(len(nuid))) + len(nuid)
+        run.append((msg, stripped))
+        used += framed
+    if run:
+        out.append(envelope(nuid, run))
+    return out
+
+
+# ---------------------------------------------------------------
+# batchMsgs() module function.
+# ---------------------------------------------------------------
+# Just the wire messages of 'planBatches()'.
+def batchMsgs(_msgs, _budget, _nuid_field):
+    return [wire for wire, count in planBatches(_msgs, _budget, _nuid_field)]
+
+
+# ---------------------------------------------------------------
+# unbatchMsg() module function.
+# ---------------------------------------------------------------
+# The NEPIMsgs in one wire message: the records of an envelope (with the
+# envelope's 'nuid' put back on those that went without), or the message
+# itself.  Raises ValueError on a malformed or unknown envelope.
+def unbatchMsg(_wire, _nuid_field):
+    if not _wire or _wire[0] != batch_marker:
+        return [_wire]
+    try:
+        if _wire[1] != batch_version:
+            raise ValueError("unknown batch envelope version " + str(_wire[1]))
+        count, pos = getVarint(_wire, 2)
+        size, pos = getVarint(_wire, pos)
+        nuid = bytes(_wire[pos:pos + size])
+        pos += size
+        nuid_tag = putVarint((_nuid_field << 3) | 2) + putVarint(len(nuid)) + nuid
+        msgs = []
+        for i in range(count):
+            size, pos = getVarint(_wire, pos)
+            if pos + size > len(_wire):
+                raise ValueError("truncated batch envelope")
+            msg = bytes(_wire[pos:pos + size])
+            pos += size
+            if nuid and splitField(msg, _nuid_field)[1] is None:
+                msg = nuid_tag + msg
+            msgs.append(msg)
+    except IndexError:
+        raise ValueError("truncated batch envelope")
+    return msgs
@@ -26,6 +26,44 @@ class obj(object):
     pass
 
 
+# Named SQLite tuning profiles for the 'db_tuning' config section.  Any
+# of the individual pragmas may also be set in that section to override
+# the selected profile.  'durable' matches SQLite's own defaults (which
+# is what the Bot used before profiles existed).
+db_tuning_profiles = {
+    "durable": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -8000,
+        "mmap_size": 16777216,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "fast-ingest": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -32000,
+        "mmap_size": 67108864,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+
+db_tuning_choices = {
+    "journal_mode": ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"),
+    "synchronous": ("OFF", "NORMAL", "FULL", "EXTRA"),
+    "temp_store": ("DEFAULT", "FILE", "MEMORY"),
+}
+
+
 class BotCfg(object):
     def __init__(self):
         self.factory = False
@@ -33,6 +71,7 @@ class BotCfg(object):
         self.enum = None
         self.emsg = None
         self.lb_ip = obj()  # None
+        self.db_tuning = obj()
         self.lb_iridium = obj()  # = None
         self.lb_rs232 = obj()  # None
         self.hb_ip = obj()  # None
@@ -100,6 +139,49 @@ class BotCfg(object):
         self.db_name = str(self.bot_cfg_json.get("dbname", "nepibot.db"))
         self.db_deletes = bool(self.bot_cfg_json.get("db_deletes", 1))
         self.db_file = "/".join((nepi_home, self.db_dir, self.db_name))
+        # Number of Data Folders ingested per DB transaction (0 = commit
+        # every record individually, the original behavior).
+        self.ingest_batch_folders = int(
+            self.bot_cfg_json.get("ingest_batch_folders", 16)
+        )
+        if self.ingest_batch_folders < 0:
+            self.ingest_batch_folders = 0
+        # Data payloads larger than 'payload_inline_max' bytes are kept as
+        # files in the DB directory's 'payload_dir' rather than in the DB.
+        self.payload_dir = str(self.bot_cfg_json.get("payload_dir", "payloads"))
+        self.payload_dir_path = "/".join(
+            (nepi_home, self.db_dir, self.payload_dir)
+        )
+        self.payload_inline_max = int(
+            self.bot_cfg_json.get("payload_inline_max", 1024)
+        )
+        # SQLite pragmas applied to every DB connection; see
+        # 'db_tuning_profiles' above.
+        db_tuning_json = self.bot_cfg_json.get("db_tuning", {})
+        self.db_tuning.profile = str(db_tuning_json.get("profile", "durable"))
+        if self.db_tuning.profile not in db_tuning_profiles:
+            self.enum = "CFG004"
+            self.emsg = "Unknown db_tuning profile: " + self.db_tuning.profile
+            self.db_tuning.profile = "durable"
+        for key, val in db_tuning_profiles[self.db_tuning.profile].items():
+            val = db_tuning_json.get(key, val)
+            if key in db_tuning_choices:
+                val = str(val).upper()
+                if val not in db_tuning_choices[key]:
+                    self.enum = "CFG005"
+                    self.emsg = "Invalid db_tuning " + key + ": " + val
+                    val = db_tuning_profiles[self.db_tuning.profile][key]
+            else:
+                val = int(val)
+            setattr(self.db_tuning, key, val)
+
+        # Number of IDs reserved per 'counters' table update (1 = one
+        # UPDATE/commit per ID).
+        self.counter_block_size = int(
+            self.bot_cfg_json.get("counter_block_size", 32)
+        )
+        if self.counter_block_size < 1:
+            self.counter_block_size = 1
         self.log_dir = str(self.bot_cfg_json.get("log_dir", "log"))
         self.log_clear = bool(self.bot_cfg_json.get("log_clear", 1))
         self.botmain_log_name = str(
@@ -118,6 +200,8 @@ class BotCfg(object):
         )
         self.packet_log_file = "/".join((nepi_home, self.log_dir, self.packet_log_name))
         self.lb_encrypted = bool(self.bot_cfg_json.get("lb_encrypted", 0))
+        # Pack several NEPIMsgs into one wire message (see 'botbatch').
+        self.lb_msg_batch = bool(self.bot_cfg_json.get("lb_msg_batch", 0))
         self.wt_changed = False
 
         # TODO: AGV - temp workaround
@@ -126,6 +210,8 @@ class BotCfg(object):
         self.pipo_size_wt = float(self.bot_cfg_json.get("pipo_size_wt", 0.5))
         self.pipo_time_wt = float(self.bot_cfg_json.get("pipo_time_wt", 1.0))
         self.pipo_trig_wt = float(self.bot_cfg_json.get("pipo_trig_wt", 0.5))
+        # Archive re-rating engine: "numpy" (vectorized) or "sql" (one UPDATE).
+        self.pipo_rerate = str(self.bot_cfg_json.get("pipo_rerate", "numpy"))
         self.purge_rating = float(self.bot_cfg_json.get("purge_rating", 0.05))
 
         self.lb_iridium.enabled = bool(
@@ -174,12 +260,43 @@ class BotCfg(object):
         self.lb_iridium.purge_rating = float(
             self.bot_cfg_json.get("lb_iridium").get("purge_rating", 0.05)
         )
+        self.lb_iridium.top_k = int(
+            self.bot_cfg_json.get("lb_iridium").get("top_k", 32)
+        )
+        # Wire bytes per Session for the uplink packing (0 = no limit).
+        self.lb_iridium.session_budget = int(
+            self.bot_cfg_json.get("lb_iridium").get("session_budget", 0)
+        )
+        # Parity messages per data message (see 'botfec'; 0 = no FEC),
+        # in blocks of up to 'fec_block' messages.
+        self.lb_iridium.fec_ratio = float(
+            self.bot_cfg_json.get("lb_iridium").get("fec_ratio", 0.0)
+        )
+        self.lb_iridium.fec_block = int(
+            self.bot_cfg_json.get("lb_iridium").get("fec_block", 4)
+        )
+        # Seconds a signal quality reading is trusted (see 'botsbd').
+        self.lb_iridium.csq_ttl = float(
+            self.bot_cfg_json.get("lb_iridium").get("csq_ttl", 10.0)
+        )
+        # Lowest signal quality (0-5) worth an SBDIX.
+        self.lb_iridium.csq_min = int(
+            self.bot_cfg_json.get("lb_iridium").get("csq_min", 1)
+        )
+        # Seconds for an SBD session, SBDIX retries included.
+        self.lb_iridium.sbd_tout = float(
+            self.bot_cfg_json.get("lb_iridium").get("sbd_tout", 60.0)
+        )
+        # Seconds between SBDIX retries after a failed session.
+        self.lb_iridium.sbd_retry_wait = float(
+            self.bot_cfg_json.get("lb_iridium").get("sbd_retry_wait", 3.0)
+        )
 
         self.lb_ip.enabled = bool(self.bot_cfg_json.get("lb_ip").get("enabled", 1))
         self.lb_ip.type = str(self.bot_cfg_json.get("lb_ip").get("type", "ethernet"))
         self.lb_ip.host = str(self.bot_cfg_json.get("lb_ip").get("host", "nepi.io"))
         self.lb_ip.port = str(self.bot_cfg_json.get("lb_ip").get("port", "50000"))
-        self.lb_ip.tout = int(self.bot_cfg_json.get("lb_ip").get("tout", 3))
+        self.lb_ip.tout = float(self.bot_cfg_json.get("lb_ip").get("tout", 3))
         self.lb_ip.open_attm = int(self.bot_cfg_json.get("lb_ip").get("open_attm", 2))
         self.lb_ip.open_tout = int(self.bot_cfg_json.get("lb_ip").get("open_tout", 1))
         self.lb_ip.protocol = int(self.bot_cfg_json.get("lb_ip").get("protocol", 2))
@@ -207,6 +324,73 @@ class BotCfg(object):
         self.lb_ip.purge_rating = float(
             self.bot_cfg_json.get("lb_ip").get("purge_rating", 0.05)
         )
+        self.lb_ip.top_k = int(self.bot_cfg_json.get("lb_ip").get("top_k", 32))
+        # Wire bytes per Session for the uplink packing (0 = no limit).
+        self.lb_ip.session_budget = int(
+            self.bot_cfg_json.get("lb_ip").get("session_budget", 0)
+        )
+        # Parity packets per data packet (see 'botfec'; 0 = no FEC).
+        self.lb_ip.fec_ratio = float(
+            self.bot_cfg_json.get("lb_ip").get("fec_ratio", 0.0)
+        )
+        # UDP packet pacing: bytes/s (0 = unpaced) and burst bytes; adaptive
+        # mode raises the rate until loss, up to 'pace_max_rate' (0 = no cap).
+        self.lb_ip.pace_rate = int(
+            self.bot_cfg_json.get("lb_ip").get("pace_rate", 30000)
+        )
+        self.lb_ip.pace_burst = int(
+            self.bot_cfg_json.get("lb_ip").get("pace_burst", 3000)
+        )
+        self.lb_ip.pace_adaptive = bool(
+            self.bot_cfg_json.get("lb_ip").get("pace_adaptive", 0)
+        )
+        self.lb_ip.pace_max_rate = int(
+            self.bot_cfg_json.get("lb_ip").get("pace_max_rate", 0)
+        )
+        # UDP transmit: "auto", "sendmmsg", "sendmsg" or "sendall" (see
+        # 'botudp'), and packets per 'sendmmsg()' call.
+        self.lb_ip.tx_backend = str(
+            self.bot_cfg_json.get("lb_ip").get("tx_backend", "auto")
+        )
+        self.lb_ip.tx_batch = int(self.bot_cfg_json.get("lb_ip").get("tx_batch", 16))
+        # Reliable mode (see 'botsack'): resend rounds, and seconds to wait
+        # for each of the Server's SACKs.
+        self.lb_ip.sack = bool(self.bot_cfg_json.get("lb_ip").get("sack", 0))
+        self.lb_ip.sack_rounds = int(
+            self.bot_cfg_json.get("lb_ip").get("sack_rounds", 3)
+        )
+        self.lb_ip.sack_tout = float(
+            self.bot_cfg_json.get("lb_ip").get("sack_tout", 2.0)
+        )
+        # Keep the ssh tunnel and socat relay running across wake-ups (see
+        # 'bottunnel'), and seconds to wait for a new tunnel to come up.
+        self.lb_ip.tunnel_persist = bool(
+            self.bot_cfg_json.get("lb_ip").get("tunnel_persist", 0)
+        )
+        self.lb_ip.tunnel_ready_tout = float(
+            self.bot_cfg_json.get("lb_ip").get("tunnel_ready_tout", 10.0)
+        )
+        # UDP-over-TCP relay: "socat" (external) or "native" (see 'botrelay'),
+        # and datagrams per TCP write for the native one.
+        self.lb_ip.relay = str(self.bot_cfg_json.get("lb_ip").get("relay", "socat"))
+        self.lb_ip.relay_batch = int(
+            self.bot_cfg_json.get("lb_ip").get("relay_batch", 64)
+        )
+        # Receive: seconds of quiet after a datagram that end it (with 'tout'
+        # as the wait for the first), and whether the Server's messages
+        # come as NEPI packets (see 'botcomm.MessageReassembler').
+        self.lb_ip.rx_idle_gap = float(
+            self.bot_cfg_json.get("lb_ip").get("rx_idle_gap", 0.25)
+        )
+        self.lb_ip.rx_framed = bool(self.bot_cfg_json.get("lb_ip").get("rx_framed", 0))
+        # Bytes of partial messages kept for reassembly, and seconds one may
+        # go without a new packet before it is dropped.
+        self.lb_ip.rx_reasm_bytes = int(
+            self.bot_cfg_json.get("lb_ip").get("rx_reasm_bytes", 1048576)
+        )
+        self.lb_ip.rx_reasm_tout = float(
+            self.bot_cfg_json.get("lb_ip").get("rx_reasm_tout", 30.0)
+        )
 
         self.lb_rs232.enabled = bool(
             self.bot_cfg_json.get("lb_rs232").get("enabled", 0)
@@ -250,6 +434,21 @@ class BotCfg(object):
         self.lb_rs232.purge_rating = float(
             self.bot_cfg_json.get("lb_rs232").get("purge_rating", 0.05)
         )
+        self.lb_rs232.top_k = int(
+            self.bot_cfg_json.get("lb_rs232").get("top_k", 32)
+        )
+        # Wire bytes per Session for the uplink packing (0 = no limit).
+        self.lb_rs232.session_budget = int(
+            self.bot_cfg_json.get("lb_rs232").get("session_budget", 0)
+        )
+        # Parity messages per data message (see 'botfec'; 0 = no FEC),
+        # in blocks of up to 'fec_block' messages.
+        self.lb_rs232.fec_ratio = float(
+            self.bot_cfg_json.get("lb_rs232").get("fec_ratio", 0.0)
+        )
+        self.lb_rs232.fec_block = int(
+            self.bot_cfg_json.get("lb_rs232").get("fec_block", 4)
+        )
 
         self.hb_ip.enabled = bool(self.bot_cfg_json.get("hb_ip").get("enabled", 1))
         self.hb_ip.type = str(self.bot_cfg_json.get("hb_ip").get("type", "ethernet"))
@@ -265,8 +464,22 @@ class BotCfg(object):
         self.hb_ip.packet_size = int(
             self.bot_cfg_json.get("hb_ip").get("packet_size", 1500)
         )
+        # One shared ssh master connection per HB Session (see 'botssh'),
+        # given 'mux_tout' seconds to come up.
+        self.hb_ip.mux = bool(self.bot_cfg_json.get("hb_ip").get("mux", 1))
+        self.hb_ip.mux_tout = float(self.bot_cfg_json.get("hb_ip").get("mux_tout", 30.0))
+        # Seconds for the log transfer to the Server after the HB phase.
+        self.hb_ip.log_tout = float(self.bot_cfg_json.get("hb_ip").get("log_tout", 60.0))
 
         self.lb_conn_order = self.bot_cfg_json.get(
             "lb_conn_order", ["lb_ip", "lb_iridium", "lb_rs232"]
         )
         self.hb_conn_order = self.bot_cfg_json.get("hb_conn_order", ["hb_ip"])
+        # Run the HB phase alongside the LB phase (see 'botphase'); off
+        # where they share a link too slow for both, HB runs after LB.
+        self.hb_lb_overlap = bool(self.bot_cfg_json.get("hb_lb_overlap", 1))
+        # Pick the LB link for each Session from its history (see 'botlink');
+        # off, the first enabled link in 'lb_conn_order' is used.
+        self.lb_link_select = bool(self.bot_cfg_json.get("lb_link_select", 1))
+        # Weight of the latest Session in the smoothed link history.
+        self.lb_link_alpha = float(self.bot_cfg_json.get("lb_link_alpha", 0.3))
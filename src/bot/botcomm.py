@@ -8,6 +8,7 @@
 #
 import struct
 import socket
+import selectors
 import sys
 from pathlib import Path
 
@@ -15,15 +16,23 @@ import serial
 import time
 import os
 import subprocess
+from collections import OrderedDict
 
 from botdefs import (
     bot_devsshkeys_file,
     msgs_incoming,
-    msgs_outgoing,
     bot_devnuid_file,
+    bot_tunnel_pid_file,
 )
 
 from bothelp import getDevId
+from botudp import UdpTx
+from botsack import SackSender, isSack
+from botfec import FecSplitter, FecSession
+from bottunnel import BotTunnel, waitReady
+from botrelay import UdpTcpRelay
+from botat import ATEngine
+from botsbd import SbdPlanner, sbd_mo_max
 
 # from botmain import cfg
 
@@ -35,7 +44,6 @@ procs = []
 LOCALPORT = "8000"
 LOCALHOST = "127.0.0.1"
 retcode = None
-packet_delay_secs = 0.05  # amount of time to wait between sending packets to the server
 message_delay_secs = 0.0  # amount of time to wait between sending messages to the server
 
 # from botcfg import BotCfg
@@ -50,6 +58,19 @@ class obj(object):
     pass
 
 
+# NEPI packet header: message number, total packets, packet index and
+# payload length (network order, 12 bytes).
+nepi_pkt_header = struct.Struct("!HIIH")
+
+# The Server's end-of-batch datagram: nothing more to receive for now.
+# (A leading 0x00 never starts a NEPIMsg; see 'botbatch' and 'botsack'.)
+eob_marker = b"\x00E"
+
+
+def isEndOfBatch(_datagram):
+    return _datagram[:len(eob_marker)] == eob_marker and len(_datagram) == len(eob_marker)
+
+
 class MessageSplitter:
 
     def __init__(self, _packetsize, _trace=0, _db=None, _ipv4=True, _log=None):
@@ -62,65 +83,219 @@ class MessageSplitter:
             self.udp_overhead = 28
         else:
             self.udp_overhead = 48
-        self.nepihdrsize = 12
+        self.header = nepi_pkt_header
+        self.nepihdrsize = nepi_pkt_header.size
         self.maxpktsize = self.packetsize - self.udp_overhead - self.nepihdrsize
         if self.maxpktsize < 1:
             self.maxpktsize = 20
+        # One packet, reused for every packet 'iterpackets()' builds.
+        self.pktbuf = bytearray(self.nepihdrsize + self.maxpktsize)
 
-    def splitmsg(self, _message):
-
-        msg = _message
-        retcode = 0
-        msg_index = 0
+    def npackets(self, _msg_len):
+        return -(-_msg_len // self.maxpktsize)
 
+    def nextMsgNum(self):
         if self.db:
             msg_num = self.db.get_packet_msg_index()
         else:
             msg_num = 10000
+        if self.log is not None:
+            self.log.track(1, f"msg_num={msg_num}", True)
+        return msg_num
 
-        if self.trace:
+    # -------------------------------------------------------------------
+    # The UDP packets of a message, one at a time, without copying the
+    # message: each payload is a memoryview slice packed behind the
+    # header into 'pktbuf'.  The packet yielded is a view of that buffer,
+    # so it must be sent (or copied) before asking for the next one.
+    # '_msg_num' and '_indexes' resend some of an already numbered
+    # message's packets (untraced).
+    def iterpackets(self, _message, _msg_num=None, _indexes=None):
+        msg = memoryview(_message).cast("B")
+        msg_len = len(msg)
+        msg_total_pkts = self.npackets(msg_len)
+        msg_num = self.nextMsgNum() if _msg_num is None else _msg_num
+        trace = self.trace and _indexes is None
+        if _indexes is None:
+            _indexes = range(msg_total_pkts)
+
+        if trace:
             filename = f"sampledatafile{msg_num}_protobuf"
             with open(filename, 'wb') as f:
                 f.write(msg)
             self.log.track(1, f"WARNING: Dumped original protobuf record to {filename}.", True)
             file_pktrace = open(f"sampledatafile{msg_num}_pkthdr.txt", "w")
+            file_split = open(f"sampledatafile{msg_num}_protobuf_split", "wb")
 
-        msg_len = len(msg)
-        self.log.track(1, f"msg_num={msg_num}", True)
-
-        # msg_total_pkts = math.ceil(msg_len/self.maxpktsize)
-        msg_total_pkts = int(msg_len / self.maxpktsize + .9999)
-        indexlist = [x for x in range(0, msg_len, self.maxpktsize)]
-        packetlist = []
-
-        for i in indexlist:
-            try:
-                upper_bound = min(i + self.maxpktsize, msg_len)
-                this_msg = msg[i:upper_bound]
+        buf = self.pktbuf
+        view = memoryview(buf)
+        hdr = self.nepihdrsize
+        try:
+            for msg_index in _indexes:
+                lower = msg_index * self.maxpktsize
+                this_msg = msg[lower:lower + self.maxpktsize]
                 this_msg_len = len(this_msg)
-                udp_packet = struct.pack(
-                    f"!HIIH{upper_bound - i}s",
-                    msg_num,
-                    msg_total_pkts,
-                    msg_index,
-                    this_msg_len,
-                    this_msg,
+                nepi_pkt_header.pack_into(
+                    buf, 0, msg_num, msg_total_pkts, msg_index, this_msg_len
                 )
-                packetlist.append(udp_packet)
-                if self.trace:
+                view[hdr:hdr + this_msg_len] = this_msg
+                packet = view[:hdr + this_msg_len]
+                if trace:
                     file_pktrace.write(f"{msg_num:10d}{msg_total_pkts:10d}{msg_index:10d}{this_msg_len:10d}\n")
-                msg_index += 1
-            except Exception as e:
-                return list()
-        if self.trace:
-            filename = f"sampledatafile{msg_num}_protobuf_split"
-            with open(filename, 'wb') as f:
-                for line in packetlist:
-                    f.write(line)
-            self.log.track(1, f"WARNING: Dumped split protobuf record to {filename}.", True)
-        if self.trace:
-            file_pktrace.close()
-        return packetlist
+                    file_split.write(packet)
+                yield packet
+        finally:
+            if trace:
+                file_pktrace.close()
+                file_split.close()
+                self.log.track(1, f"WARNING: Dumped split protobuf record to sampledatafile{msg_num}_protobuf_split.", True)
+
+    # -------------------------------------------------------------------
+    # All the packets of a message at once, each its own 'bytes'.
+    def splitmsg(self, _message):
+        try:
+            return [bytes(packet) for packet in self.iterpackets(_message)]
+        except Exception as e:
+            return list()
+
+
+class MessageReassembler:
+    # -------------------------------------------------------------------
+    # The other half of 'MessageSplitter': collects NEPI packets by their
+    # header fields and gives back each message once all of its packets
+    # are in, whatever order they came in.  Partial messages hold at most
+    # '_max_bytes' between them (the stalest go first to make room, and
+    # one that could never fit is dropped), and are dropped after '_tout'
+    # seconds without a new packet.  Repeated packets, and packets of a
+    # message already given back, are ignored.
+    def __init__(self, _max_bytes=1 << 20, _tout=30.0, _done_keep=256, _clock=time.monotonic):
+        self.max_bytes = _max_bytes
+        self.tout = _tout
+        self.done_keep = _done_keep
+        self.clock = _clock
+        self.parts = OrderedDict()  # msg_num -> [total, {index: payload}, bytes, last packet time]
+        self.done = OrderedDict()  # msg_num -> total, of the latest messages given back
+        self.held = 0
+        self.dropped = 0
+        self.dups = 0
+
+    def add(self, _packet):
+        hdr = nepi_pkt_header.size
+        if len(_packet) < hdr:
+            return None
+        msg_num, total, index, length = nepi_pkt_header.unpack_from(_packet)
+        payload = bytes(_packet[hdr:hdr + length])
+        if len(payload) != length or index >= total:
+            return None
+        now = self.clock()
+        self.expire(now)
+
+        if self.done.get(msg_num) == total:
+            self.dups += 1
+            return None
+        have = self.parts.get(msg_num)
+        if have is not None and have[0] != total:
+            # The number came round again for a new message.
+            self.drop(msg_num)
+            have = None
+        if have is None:
+            have = [total, {}, 0, now]
+            self.parts[msg_num] = have
+        elif index in have[1]:
+            self.dups += 1
+            return None
+
+        if have[2] + length > self.max_bytes:
+            self.drop(msg_num)
+            return None
+        self.parts.move_to_end(msg_num)
+        while self.held + length > self.max_bytes:
+            self.drop(next(iter(self.parts)))
+        have[1][index] = payload
+        have[2] += length
+        have[3] = now
+        self.held += length
+        if len(have[1]) < total:
+            return None
+
+        del self.parts[msg_num]
+        self.held -= have[2]
+        self.done[msg_num] = total
+        if len(self.done) > self.done_keep:
+            self.done.popitem(last=False)
+        return b"".join(have[1][i] for i in range(total))
+
+    def expire(self, _now):
+        while self.parts:
+            msg_num, have = next(iter(self.parts.items()))
+            if _now - have[3] < self.tout:
+                break
+            self.drop(msg_num)
+
+    def drop(self, _msg_num):
+        have = self.parts.pop(_msg_num)
+        self.held -= have[2]
+        self.dropped += 1
+
+
+class Pacer(object):
+
+    # -------------------------------------------------------------------
+    # Token bucket for the 'ethernet' uplink: '_rate' bytes/s sustained,
+    # up to '_burst' bytes back to back (0 rate = unpaced).  In adaptive
+    # mode the rate grows by '_step' bytes/s for every '_burst' bytes sent
+    # without loss, up to '_max_rate' (0 = no cap), and halves on each
+    # loss (AIMD).  Loss is whatever the caller reports via 'on_loss()':
+    # the kernel refusing a datagram (ENOBUFS/EAGAIN) here, or a gap in
+    # the server's acknowledgements.
+    # -------------------------------------------------------------------
+    def __init__(self, _rate, _burst, _adaptive=False, _step=0, _max_rate=0,
+                 _clock=time.monotonic, _sleep=time.sleep):
+        self.rate = float(_rate)
+        self.burst = float(max(_burst, 1))
+        self.adaptive = bool(_adaptive)
+        self.step = float(_step)
+        self.max_rate = float(_max_rate)
+        self.min_rate = float(_rate) / 8.0
+        self.clock = _clock
+        self.sleep = _sleep
+        self.tokens = self.burst
+        self.stamp = _clock()
+        self.clean = 0
+        self.losses = 0
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    # Block until '_nbytes' may go out.  A packet larger than the burst
+    # waits for a full bucket and takes it into debt.
+    def wait(self, _nbytes):
+        if self.rate <= 0:
+            return
+        self.refill()
+        need = min(float(_nbytes), self.burst)
+        if self.tokens < need:
+            self.sleep((need - self.tokens) / self.rate)
+            self.refill()
+        self.tokens -= _nbytes
+
+    def on_sent(self, _nbytes):
+        if not self.adaptive or self.rate <= 0:
+            return
+        self.clean += _nbytes
+        while self.clean >= self.burst:
+            self.clean -= self.burst
+            self.rate += self.step
+            if self.max_rate > 0:
+                self.rate = min(self.rate, self.max_rate)
+
+    def on_loss(self):
+        self.losses += 1
+        self.clean = 0
+        if self.adaptive and self.rate > 0:
+            self.rate = max(self.rate / 2.0, self.min_rate)
 
 
 class BotComm(object):
@@ -136,10 +311,25 @@ class BotComm(object):
         self.db = _db
         self.con = None
         self.serialport = None
+        self.at = None
+        self.sbd = None
         self.dev_id_str, self.dev_id_bytes, self.remote_id_str = getDevId(
             self.cfg, self.log, 0, bot_devnuid_file
         )
         self.smsg = None
+        self.pacer = None
+        self.tx = None
+        self.sack = None
+        self.fec = None
+        self.sfec = None
+        self.fec_blocks = 0
+        self.tunnel = None
+        self.relay = None
+        self.reasm = MessageReassembler(
+            self.cfg.lb_ip.rx_reasm_bytes, self.cfg.lb_ip.rx_reasm_tout
+        )
+        # Datagrams that came in while 'send()' waited for a SACK.
+        self.rx_held = []
         if self.cfg.tracking:
             self.log.track(_lev, "Created BotComm Class Object.", True)
             self.log.track(_lev + 13, "^cfg: " + str(self.cfg), True)
@@ -189,6 +379,15 @@ class BotComm(object):
                     self.log.track(
                         _lev + 14, "tout: " + str(self.serialport.timeout), True
                     )
+                    self.log.track(
+                        _lev + 14, "csq_ttl: " + str(self.cfg.lb_iridium.csq_ttl), True
+                    )
+                    self.log.track(
+                        _lev + 14, "sbd_tout: " + str(self.cfg.lb_iridium.sbd_tout), True
+                    )
+                    self.log.track(
+                        _lev + 14, "fec_ratio: " + str(self.cfg.lb_iridium.fec_ratio), True
+                    )
 
                 if not self.serialport.isOpen():
                     if self.cfg.tracking:
@@ -215,7 +414,7 @@ class BotComm(object):
                         if self.serialport.isOpen():
                             break
 
-                        time.sleep(self.cfg.open_tout)
+                        time.sleep(self.cfg.lb_iridium.open_tout)
 
                     if not self.serialport.isOpen():
                         raise Exception("Can't Get Port OPEN.")
@@ -226,6 +425,20 @@ class BotComm(object):
                     if self.cfg.tracking:
                         self.log.track(_lev + 2, "Serial Port ALREADY Opened", True)
 
+                # From here on the AT engine owns the port (and reads it
+                # with its own short timeout).
+                if self.at is None or not self.at.is_alive():
+                    self.at = ATEngine(self.cfg, self.log, _lev + 2, self.serialport)
+                    self.at.start()
+                    self.sbd = SbdPlanner(self.cfg, self.log, _lev + 2, self.at)
+                if self.cfg.lb_iridium.fec_ratio > 0 and self.sfec is None:
+                    self.sfec = FecSession(
+                        self.cfg.lb_iridium.fec_ratio,
+                        self.cfg.lb_iridium.fec_block,
+                        sbd_mo_max,
+                        self.nextBlockNum,
+                    )
+
                 command = [
                     b"AT+CGMI",
                     b"AT+CGMM",
@@ -235,18 +448,16 @@ class BotComm(object):
                     b"AT+SBDMTA?",
                 ]
 
-                isu_name = self.acquire_response(command[0])
+                # The identification queries go out back to back.
+                reqs = self.at.pipeline(command[0:4] + command[5:6], 20)
+                isu_name, isu_model_number, isu_version, isu_imei, sbdring = [
+                    req.text() if req.final == "OK" else False for req in reqs
+                ]
                 if self.cfg.tracking:
                     self.log.track(_lev + 14, "ISU Name: " + str(isu_name), True)
-
-                isu_model_number = self.acquire_response(command[1])
-                if self.cfg.tracking:
                     self.log.track(
                         _lev + 14, "ISU Model Number: " + str(isu_model_number), True
                     )
-
-                isu_version = self.acquire_response(command[2])
-                if self.cfg.tracking:
                     self.log.track(_lev + 14, "ISU Version: ", False)
                     if isu_version:
                         self.log.track(_lev + 14, "", True)
@@ -255,13 +466,7 @@ class BotComm(object):
                                 self.log.track(_lev + 15, str(line), True)
                     else:
                         self.log.track(_lev + 14, "False", True)
-
-                isu_imei = self.acquire_response(command[3])
-                if self.cfg.tracking:
                     self.log.track(_lev + 14, "ISU IMEI: " + str(isu_imei), True)
-
-                sbdring = self.acquire_response(command[5])
-                if self.cfg.tracking:
                     self.log.track(
                         _lev + 14, "SBD Ring Indication: " + str(sbdring), True
                     )
@@ -292,6 +497,22 @@ class BotComm(object):
 
             # TODO: fix creating message splitter so more robust
             self.smsg = MessageSplitter(self.cfg.lb_ip.packet_size, 0, self.db, True, self.log)
+            self.pacer = Pacer(
+                self.cfg.lb_ip.pace_rate,
+                self.cfg.lb_ip.pace_burst,
+                self.cfg.lb_ip.pace_adaptive,
+                self.cfg.lb_ip.packet_size,
+                self.cfg.lb_ip.pace_max_rate,
+            )
+            if self.cfg.tracking:
+                self.log.track(_lev + 1, "pace_rate: " + str(self.cfg.lb_ip.pace_rate), True)
+                self.log.track(_lev + 1, "pace_burst: " + str(self.cfg.lb_ip.pace_burst), True)
+                self.log.track(_lev + 1, "pace_adaptive: " + str(self.cfg.lb_ip.pace_adaptive), True)
+                self.log.track(_lev + 1, "tx_backend: " + str(self.cfg.lb_ip.tx_backend), True)
+                self.log.track(_lev + 1, "sack: " + str(self.cfg.lb_ip.sack), True)
+                self.log.track(_lev + 1, "fec_ratio: " + str(self.cfg.lb_ip.fec_ratio), True)
+                self.log.track(_lev + 1, "tunnel_persist: " + str(self.cfg.lb_ip.tunnel_persist), True)
+                self.log.track(_lev + 1, "relay: " + str(self.cfg.lb_ip.relay), True)
 
             # if ssh or socat background processes are already running, terminate them and create a new tunnel
             if procs:
@@ -359,11 +580,60 @@ class BotComm(object):
                 str("UDP4-RECVFROM:" + LOCALPORT + ",fork,reuseaddr"),
                 "TCP4:" + LOCALHOST + ":" + LOCALPORT + ",nodelay"
             ]
-            proc_ssh = subprocess.Popen(args_sshcmd)
-            # Avoid runaway logs by devnull'ing the socat process (since it forks subprocesses)
-            proc_socat = subprocess.Popen(args_socatcmd, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT) 
-            procs.append(proc_ssh)
-            procs.append(proc_socat)
+            # The native relay (see 'botrelay') runs in the Bot instead.
+            native = self.cfg.lb_ip.relay == "native"
+            if self.cfg.lb_ip.tunnel_persist:
+                # Kept running across wake-ups (see 'bottunnel'); ssh must
+                # give up on a dead Server or a port it can't forward.
+                args_sshcmd[2:2] = [
+                    "-o",
+                    "ExitOnForwardFailure=yes",
+                    "-o",
+                    "ServerAliveInterval=30",
+                ]
+                self.tunnel = BotTunnel(
+                    self.cfg, self.log, _lev + 1, bot_tunnel_pid_file, LOCALHOST, LOCALPORT
+                )
+                tunnel_cmds = [("ssh", args_sshcmd)]
+                if not native:
+                    tunnel_cmds.append(("socat", args_socatcmd))
+                success = self.tunnel.open(
+                    _lev + 1, tunnel_cmds, self.cfg.lb_ip.tunnel_ready_tout
+                )
+                if not success[0]:
+                    return success
+            else:
+                proc_ssh = subprocess.Popen(args_sshcmd)
+                procs.append(proc_ssh)
+                if not native:
+                    # Avoid runaway logs by devnull'ing the socat process (since it forks subprocesses)
+                    proc_socat = subprocess.Popen(args_socatcmd, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+                    procs.append(proc_socat)
+                if not waitReady(LOCALHOST, LOCALPORT, self.cfg.lb_ip.tunnel_ready_tout, procs):
+                    enum = "BC111D"
+                    emsg = "IP getconn(): SSH Tunnel Not Ready."
+                    if self.cfg.tracking:
+                        self.log.track(_lev + 2, str(enum) + ": " + str(emsg), True)
+                    return [False, str(enum), str(emsg)]
+
+            if native and self.relay is None:
+                try:
+                    self.relay = UdpTcpRelay(
+                        self.cfg,
+                        self.log,
+                        _lev + 1,
+                        (LOCALHOST, int(LOCALPORT)),
+                        (LOCALHOST, int(LOCALPORT)),
+                        self.cfg.lb_ip.relay_batch,
+                    )
+                    self.relay.start()
+                except Exception as e:
+                    self.relay = None
+                    enum = "BC111E"
+                    emsg = "IP getconn(): UDP Relay Not Started [" + str(e) + "]."
+                    if self.cfg.tracking:
+                        self.log.track(_lev + 2, str(enum) + ": " + str(emsg), True)
+                    return [False, str(enum), str(emsg)]
 
             if self.con is None:
                 for res in socket.getaddrinfo(
@@ -382,6 +652,18 @@ class BotComm(object):
                         continue
                     try:
                         self.con.connect(sa)
+                        self.tx = UdpTx(
+                            self.con,
+                            self.pacer,
+                            self.cfg.lb_ip.tx_backend,
+                            self.cfg.lb_ip.tx_batch,
+                        )
+                        if self.cfg.lb_ip.sack:
+                            self.sack = SackSender(
+                                self.cfg, self.log, _lev + 2, self.con, self.tx, self.smsg
+                            )
+                        elif self.cfg.lb_ip.fec_ratio > 0:
+                            self.fec = FecSplitter(self.smsg, self.cfg.lb_ip.fec_ratio)
                     except socket.error as msg:
                         enum = "BC111A"
                         emsg = "IP getconn(): Host/Port Connect Problem."
@@ -402,8 +684,6 @@ class BotComm(object):
                     emsg = "IP getconn(): Host/Port Connect Successful."
                     if self.cfg.tracking:
                         self.log.track(_lev + 2, str(enum) + ": " + str(emsg), True)
-                    # TODO reexamine - need 2 sec delay before sending/receiving messages on open socket
-                    time.sleep(4)
             else:
                 if self.cfg.tracking:
                     self.log.track(_lev + 1, "IP Connection ALREADY Exists.", True)
@@ -444,168 +724,124 @@ class BotComm(object):
         # Determine Comms Active Status; Bail Gracefully if Inactive.
         # ---------------------------------------------------------------
         if not self.isactive(_lev + 1):
-            return [True, None, None], []
+            return [True, None, None]
 
         # ---------------------------------------------------------------
-        # Receive on the 'Ethernet' IP Connection.
+        # Receive on the 'Iridium' Connection.
         # ---------------------------------------------------------------
         if self.typ == "iridium":
-            try:
-                response = self.acquire_response(b"AT+SBDWT")
-                if response == True:
-                    if self.cfg.tracking:
-                        self.log.track(_lev, "SBD Modem Ready To Receive Message", True)
-
-                    response = self.acquire_response("" + "\r")
-                    mo_buffer = self.read_status(_lev, "mo buffer", int(response))
-
-                    if mo_buffer == True:
-                        success, cnc_msgs = self.initiate_sbd(_lev, "receive", num)
-                        if self.cfg.tracking:
-                            self.log.track(
-                                _lev + 1,
-                                "All messages received: " + str(cnc_msgs),
-                                True,
-                            )
-
-                        if success:
-                            return [True, None, None], cnc_msgs
-                        else:
-                            enum = "BC131"
-                            emsg = "SBD Sesion Time Out"
-                            if self.cfg.tracking:
-                                self.log.errtrack(str(enum), str(emsg))
-
-                            return [False, str(enum), str(emsg)], None
-
-                    else:
-                        enum = "BC132"
-                        emsg = "Mailbox check couldn't be sent to the mobile originated buffer."
-                        if self.cfg.tracking:
-                            self.log.errtrack(str(enum), str(emsg))
-
-                        return [False, str(enum), str(emsg)], None
-
-                else:
-                    enum = "BC133"
-                    emsg = "Connection Error. SBD modem didn't get any response from the mailbox check."
-                    if self.cfg.tracking:
-                        self.log.errtrack(str(enum), str(emsg))
-
-                    return [False, str(enum), str(emsg)], None
+            if self.sbd is None:
+                enum = "BC133"
+                emsg = "receive(): SBD Modem Not Connected."
+                if self.cfg.tracking:
+                    self.log.errtrack(str(enum), str(emsg))
+                return [False, str(enum), str(emsg)]
 
+            # A mailbox check: an SBD session with an empty MO buffer,
+            # run until the Gateway has no MT messages left for us.
+            try:
+                return self.sbd.session(
+                    _lev + 1, None, self.cfg.lb_iridium.sbd_tout, msgs_incoming
+                )
             except Exception as e:
                 enum = "BC134"
                 emsg = str(e)
                 if self.cfg.tracking:
                     self.log.errtrack(str(enum), str(emsg))
-                return [False, str(enum), str(emsg)], None
+                return [False, str(enum), str(emsg)]
 
         # ---------------------------------------------------------------
         # Receive on the 'Ethernet' IP Connection.
         # ---------------------------------------------------------------
         if self.typ == "ethernet":
-            # read from socket until there is no more data
-            while True:
-                try:
-                    socket_recv_size = 4096
-                    rec = self.con.recv(socket_recv_size)
-                    msgs_incoming.append(rec)
-                    if self.cfg.tracking:
-                        self.log.track(0, f"{'*' * 80}", True)
-                        self.log.track(0, f"SOCKET RECEIVE DATA FOR BUFFER:", True)
-                        self.log.track(0, f"recvmaxsize:    {socket_recv_size}", True)
-                        self.log.track(1, f"buf:            {str(rec)}", True)
-                        self.log.track(1, f"len:            {len(rec)}", True)
-                        self.log.track(1, f"memaddr:        {id(rec)}", True)
-                        self.log.track(1, f"memsize:        {sys.getsizeof(rec)}", True)
-                        self.log.track(
-                            0,
-                            f"INCOMING MESSAGE INFO SAVED AS LIST ITEM FOR LATER PROCESSING:",
-                            True,
-                        )
-                        self.log.track(
-                            1, f"buf:            {str(msgs_incoming[-1])}", True
-                        )
-                        self.log.track(
-                            1, f"len:            {len(msgs_incoming[-1])}", True
-                        )
-                        self.log.track(
-                            1, f"memaddr:        {id(msgs_incoming[-1])}", True
-                        )
-                        self.log.track(
-                            1,
-                            f"memsize:        {sys.getsizeof(msgs_incoming[-1])}",
-                            True,
-                        )
-                        self.log.track(0, f"{'*' * 80}", True)
-                except socket.timeout as e:  # no data available
-                    enum = "BC140"
-                    emsg = "No more data available on socket. " + str(e)
-                    if self.cfg.tracking:
-                        self.log.errtrack(str(enum), str(emsg))
-                    break
-                except Exception as e:  # something unexpected happened
-                    enum = "BC140"
-                    emsg = str(e)
-                    if self.cfg.tracking:
-                        self.log.errtrack(str(enum), str(emsg))
-                    return [False, str(enum), str(emsg)], None
-
-            return [True, None, None]
-
-    # -------------------------------------------------------------------
-    # Get a MT Message from the MT buffer
-    # -------------------------------------------------------------------
-    def get_mt_message(self, _lev):
-        try:
-            if self.cfg.tracking:
-                self.log.track(_lev + 1, "Attempting Message Read(s).", True)
-
-            # icnt = 0
-            # results = []
-            # tries = 0
-            # while True:
-            #     iline = self.serialport.readline()
-            #     if self.cfg.tracking:
-            #         self.log.track(_lev+2, "iline " + str(tries) + ":" + str(iline), True)
-            #     if iline.strip() == "":
-            #         if tries > 5:
-            #             if self.cfg.tracking:
-            #                 self.log.track(_lev+2, "DONE.", True)
-            #             break
-            #         else:
-            #             tries = tries + 1
-            #     else:
-            #         results.append(iline)
-            #         icnt = icnt + 1
-
-            response = self.acquire_response(b"AT+SBDRB")
-            if response is False:
-                enum = "BC141"
-                emsg = "Connection Error. MT Message couldn't be transferred."
+            # Read until the Server sends its end-of-batch datagram, the
+            # link has been quiet for 'rx_idle_gap' seconds since the last
+            # datagram, or nothing at all has come for 'tout' seconds.
+            held, self.rx_held = self.rx_held, []
+            for rec in held:
+                if not isEndOfBatch(rec):
+                    self.accept_datagram(_lev + 1, rec)
+            t0 = time.monotonic()
+            deadline = t0 + self.cfg.lb_ip.tout
+            count = 0
+            ended = False
+            sel = selectors.DefaultSelector()
+            try:
+                sel.register(self.con, selectors.EVENT_READ)
+                while True:
+                    wait = deadline - time.monotonic()
+                    if wait <= 0 or not sel.select(wait):
+                        break
+                    rec = self.con.recv(65536)
+                    if isEndOfBatch(rec):
+                        ended = True
+                        break
+                    if isSack(rec):
+                        # A late (repeated) SACK; see 'botsack'.
+                        continue
+                    count += 1
+                    self.accept_datagram(_lev + 1, rec)
+                    deadline = time.monotonic() + self.cfg.lb_ip.rx_idle_gap
+            except Exception as e:  # something unexpected happened
+                enum = "BC140"
+                emsg = str(e)
                 if self.cfg.tracking:
                     self.log.errtrack(str(enum), str(emsg))
-            else:
-                response = response[2:-2]
-                if self.cfg.tracking:
+                return [False, str(enum), str(emsg)]
+            finally:
+                sel.close()
+
+            if self.cfg.tracking:
+                self.log.track(
+                    _lev + 1,
+                    f"Received {count} datagrams in {time.monotonic() - t0:.3f} s"
+                    + (" (end of batch)." if ended else "."),
+                    True,
+                )
+                if self.cfg.lb_ip.rx_framed:
                     self.log.track(
                         _lev + 1,
-                        "Message: ",
-                        True,  # + str(response.).encode("hex"), True
+                        f"Reassembly: {len(self.reasm.parts)} partial ({self.reasm.held} bytes), "
+                        f"{self.reasm.dropped} dropped, {self.reasm.dups} duplicates.",
+                        True,
                     )
-            return response
+            return [True, None, None]
 
-            # return [ True, None, None ], results
+        enum = "BC141"
+        emsg = "receive(): No Receive on '" + str(self.typ) + "' Links."
+        if self.cfg.tracking:
+            self.log.errtrack(str(enum), str(emsg))
+        return [False, str(enum), str(emsg)]
 
-        except Exception as e:
-            enum = "BC142"
-            emsg = str(e)
-            if self.cfg.tracking:
-                self.log.errtrack(str(enum), str(emsg))
-            if self.serialport.isOpen():
-                self.serialport.close()
-            return [False, str(enum), str(emsg)], None
+    # -------------------------------------------------------------------
+    # Take one received datagram: a whole message, or with 'rx_framed' a
+    # NEPI packet of one (see 'MessageReassembler').
+    # -------------------------------------------------------------------
+    def accept_datagram(self, _lev, rec):
+        if self.cfg.lb_ip.rx_framed:
+            msg = self.reasm.add(rec)
+            if msg is None:
+                return
+        else:
+            msg = rec
+        msgs_incoming.append(msg)
+        if self.cfg.tracking:
+            self.log.track(0, f"{'*' * 80}", True)
+            self.log.track(0, f"SOCKET RECEIVE DATA FOR BUFFER:", True)
+            self.log.track(1, f"buf:            {str(rec)}", True)
+            self.log.track(1, f"len:            {len(rec)}", True)
+            self.log.track(
+                0,
+                f"INCOMING MESSAGE INFO SAVED AS LIST ITEM FOR LATER PROCESSING:",
+                True,
+            )
+            self.log.track(1, f"buf:            {str(msgs_incoming[-1])}", True)
+            self.log.track(1, f"len:            {len(msgs_incoming[-1])}", True)
+            self.log.track(1, f"memaddr:        {id(msgs_incoming[-1])}", True)
+            self.log.track(
+                1, f"memsize:        {sys.getsizeof(msgs_incoming[-1])}", True
+            )
+            self.log.track(0, f"{'*' * 80}", True)
 
     # -------------------------------------------------------------------
     # Send a Message.
@@ -629,102 +865,108 @@ class BotComm(object):
         # Send on the 'Iridium' Connection.
         # ---------------------------------------------------------------
         if self.typ == "iridium":
-            try:
-                msg_length = len(_msg)
-
-                checksum = 0
-                for ch in _msg:
-                    checksum += ord(ch)
-
-                new_msg = _msg + struct.pack(">H", checksum)
-
-                response = self.acquire_response(b"AT+SBDWB=" + bytes(msg_length))
-                if response == True:
-                    if self.cfg.tracking:
-                        self.log.track(_lev, "SBD Modem Ready To Receive Message", True)
-
-                    response = self.acquire_response(new_msg)
-                    mo_buffer = self.read_status(_lev, "mo buffer", int(response))
-
-                    if mo_buffer == True:
-                        success, cnc_msgs = self.initiate_sbd(_lev, "send", _num)
-                        if self.cfg.tracking:
-                            self.log.track(
-                                _lev + 1,
-                                "All messages received: " + str(cnc_msgs),
-                                True,
-                            )
-
-                        if success:
-                            return [True, None, None], cnc_msgs
-                        else:
-                            enum = "BC151"
-                            emsg = "SBD Sesion Time Out"
-                            if self.cfg.tracking:
-                                self.log.errtrack(str(enum), str(emsg))
-
-                            return [False, str(enum), str(emsg)], None
-
-                    else:
-                        enum = "BC152"
-                        emsg = "MO Message couldn't be sent to the mobile originated buffer."
-                        if self.cfg.tracking:
-                            self.log.errtrack(str(enum), str(emsg))
-
-                        return [False, str(enum), str(emsg)], None
-
-                else:
-                    enum = "BC153"
-                    emsg = "Connection Error. SBD modem didn't get any response."
-                    if self.cfg.tracking:
-                        self.log.errtrack(str(enum), str(emsg))
-
-                    return [False, str(enum), str(emsg)], None
-
-                # Condition for +SBDWB
-                # msg = self.acquire_response(b'AT+SBDWB={message size}')
-                # elif msg == '3':
-                #     print "SBD message size is not correct. It should be between 1-340 bytes"
-                ###
-
-            except Exception as e:
-                enum = "BC154"
-                emsg = str(e)
+            if self.sfec is not None:
+                # The next data packet of the open FEC block (see 'botfec').
+                _msg = self.sfec.data(_msg)
+            if len(_msg) > sbd_mo_max:
+                if self.sfec is not None:
+                    self.sfec.unsend()
+                enum = "BC155"
+                emsg = "MO Message Too Long [" + str(len(_msg)) + " bytes]"
                 if self.cfg.tracking:
                     self.log.errtrack(str(enum), str(emsg))
                 return [False, str(enum), str(emsg)], None
 
+            success = self.sendMo(_lev + 1, _msg)
+            if self.sfec is not None:
+                if not success[0]:
+                    self.sfec.unsend()
+                elif self.sfec.full():
+                    self.endFec(_lev + 1)
+            return success, None
+
         # ---------------------------------------------------------------
         # Send on the 'ethernet' Connection.
         # ---------------------------------------------------------------
 
         if self.typ == "ethernet":
-            err_detected = False
-            while len(msgs_outgoing):
-                try:
-                    msg = msgs_outgoing.pop(0)
-                    msg_len = len(msg)
-                    t1 = time.perf_counter()
-                    packets_to_send = self.smsg.splitmsg(msg)
-                    t2 = time.perf_counter()
-                    br.update_pktsent(len(packets_to_send))
-                    if self.cfg.tracking:
-                        self.log.track(_lev, f"{str(len(packets_to_send))} UDP packets to send.", True)
-                    for i in packets_to_send:
-                        retval = self.con.sendall(i)
-                        time.sleep(packet_delay_secs)
-                    t3 = time.perf_counter()
-                    if self.cfg.tracking:
-                        self.log.track(_lev, "Message Sent Stats:")
-                        self.log.track(_lev + 1,
-                                       f"msglen: {msg_len}, packets: {len(packets_to_send)}, split_time: {t2 - t1:.3f}, send_time: {t3 - t2:.3f}")
-                    time.sleep(message_delay_secs)
-                except Exception as e:
-                    enum = "BC162"
-                    emsg = "IP Data Not Sent."
-                    return [False, str(enum), str(emsg)], None
+            try:
+                msg = _msg
+                msg_len = len(msg)
+                t1 = time.perf_counter()
+                npackets = (self.fec or self.smsg).npackets(msg_len)
+                br.update_pktsent(npackets)
+                if self.cfg.tracking:
+                    self.log.track(_lev, f"{str(npackets)} UDP packets to send.", True)
+                if self.sack is not None:
+                    # Reliable mode: not sent until the Server has it all.
+                    success = self.sack.send(_lev + 1, msg, self.rx_held)
+                    if not success[0]:
+                        return success, None
+                elif self.fec is not None:
+                    # Data and parity packets (see 'botfec'), one by one.
+                    self.tx.sendPackets(self.fec, msg, None, None)
+                else:
+                    self.tx.send(self.smsg, msg)
+                t2 = time.perf_counter()
+                if self.cfg.tracking:
+                    self.log.track(_lev, "Message Sent Stats:")
+                    self.log.track(_lev + 1,
+                                   f"msglen: {msg_len}, packets: {npackets}, split+send_time: {t2 - t1:.3f}")
+                time.sleep(message_delay_secs)
+            except Exception as e:
+                enum = "BC162"
+                emsg = "IP Data Not Sent."
+                return [False, str(enum), str(emsg)], None
             return [True, None, None], None
 
+    # -------------------------------------------------------------------
+    # One SBD session for the MO message '_msg'.
+    # -------------------------------------------------------------------
+    def sendMo(self, _lev, _msg):
+        if self.sbd is None:
+            enum = "BC156"
+            emsg = "send(): SBD Modem Not Connected."
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)]
+
+        # The session drains the MT queue as well; what comes down joins
+        # 'msgs_incoming', as on a 'receive()'.
+        try:
+            return self.sbd.session(_lev, _msg, self.cfg.lb_iridium.sbd_tout, msgs_incoming)
+        except Exception as e:
+            enum = "BC157"
+            emsg = str(e)
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)]
+
+    # -------------------------------------------------------------------
+    # Close the Open FEC Block (Send Its Parity Messages).
+    # -------------------------------------------------------------------
+    # After a full block, and once the Session's uplink is done.  Parity
+    # that doesn't go out costs nothing but the protection.
+    def endFec(self, _lev):
+        if self.sfec is None:
+            return [True, None, None]
+        for frame in self.sfec.parity():
+            success = self.sendMo(_lev + 1, frame)
+            if not success[0]:
+                return success
+        if self.cfg.tracking:
+            self.log.track(_lev, "FEC Block Closed; Parity Messages: " + str(self.sfec.parity_msgs), True)
+        return [True, None, None]
+
+    # -------------------------------------------------------------------
+    # FEC block numbers, from the NEPI packet message numbers.
+    # -------------------------------------------------------------------
+    def nextBlockNum(self):
+        if self.db:
+            return self.db.get_packet_msg_index()
+        self.fec_blocks = (self.fec_blocks + 1) % 65000
+        return self.fec_blocks
+
     # -------------------------------------------------------------------
     # close() Class Method (Close the Connection).
     # -------------------------------------------------------------------
@@ -750,6 +992,9 @@ class BotComm(object):
                 self.log.track(_lev + 1, "Close 'iridium' Serial Port.", True)
 
             try:
+                if self.at is not None:
+                    self.at.stop()
+                    self.at = None
                 if self.serialport.isOpen():
                     self.serialport.close()
                     if self.cfg.tracking:
@@ -792,6 +1037,9 @@ class BotComm(object):
                         self.log.track(_lev + 1, str(enum) + ": " + str(emsg), True)
                     return [False, str(enum), str(emsg)]
 
+                if self.relay is not None:
+                    self.relay.stop()
+                    self.relay = None
                 print("LENGTH OF PROCS = ", str(len(procs)))
                 # shutdown ssh and socat processes gracefully
                 for proc in procs:
@@ -831,57 +1079,35 @@ class BotComm(object):
     # -------------------------------------------------------------------
     # Acquire the Response from a Command.
     # -------------------------------------------------------------------
-    def acquire_response(self, command, wait_time=20):
+    def acquire_response(self, command, wait_time=20, raw=False):
         # if self.cfg.tracking:
         # self.log.track(_lev, "Entering 'acquire_response()' Method .", True)
         # self.log.track(_lev+13, "_lev: " + str(_lev), True)
         # self.log.track(_lev+13, "^typ: " + str(self.typ), True)
 
+        # The reply (the text between the echo and OK, or the binary
+        # reply of AT+SBDRB), True on READY, False on ERROR or no answer
+        # within 'wait_time' seconds.  'raw' writes 'command' as is (the
+        # payload after a READY).  The AT engine hands the reply over the
+        # moment the modem finishes it.
         if self.typ == "iridium":
-            # if isinstance(command, str):
-            #     command = command.encode("utf-8")
-            try:
-                self.serialport.write(command + b"\r")
-
-            except Exception as e:
+            if self.at is None:
                 enum = "BC171"
-                emsg = str(e)
+                emsg = "acquire_response(): AT Engine Not Started"
                 if self.cfg.tracking:
                     self.log.errtrack(str(enum), str(emsg))
+                return False
 
-                # self.close(1)
-
-            message = ""
-            timeout = time.time() + wait_time
-
-            while time.time() < timeout:
-                try:
-                    if self.serialport.in_waiting == 0:
-                        time.sleep(1)
-                        continue
-
-                    message += self.serialport.readline()
-
-                    # print("Message: ", message)
-
-                    if "OK" in message:
-                        start_idx = message.index("\r") + 1
-                        end_idx = message.index("OK")
-                        message = message[start_idx:end_idx]
-                        message = message.strip()
-                        return message
-
-                    elif "READY" in message:
-                        return True
-
-                except Exception as e:
-                    enum = "BC172"
-                    emsg = str(e)
-                    if self.cfg.tracking:
-                        self.log.errtrack(str(enum), str(emsg))
-
-                    break
+            req = self.at.command(command, wait_time, None, raw)
+            if req.final == "OK":
+                return req.data if req.data is not None else req.text()
+            elif req.final == "READY":
+                return True
 
+            enum = "BC172"
+            emsg = "acquire_response(): " + str(req.final) + " [" + str(req.cmd[:16]) + "]"
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
             return False
 
         else:
@@ -891,461 +1117,6 @@ class BotComm(object):
                 self.log.errtrack(str(enum), str(emsg))
             return [False, str(enum), str(emsg)]
 
-    # -------------------------------------------------------------------
-    # Initiate SBD Session - Send MO buffer to the GSS & Receive MT queued at the GSS
-    # -------------------------------------------------------------------
-    def check_signal_quality(self, _lev):
-        if self.cfg.tracking:
-            self.log.track(
-                _lev, "Entering 'check_signal_quality()' Class Method.", True
-            )
-            self.log.track(_lev + 13, "_lev: " + str(_lev), True)
-
-        try:
-            if self.cfg.tracking:
-                self.log.track(_lev, "Checking the Signal Quality.", True)
-
-            signal_strength = self.acquire_response(b"AT+CSQ")
-            if signal_strength is not False and signal_strength.startswith(("+CSQ")):
-                signal_strength = signal_strength.split("+CSQ:")[1]
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1, "Sig Qual: [" + signal_strength + "]", True
-                    )
-
-                return signal_strength
-
-            else:
-                if self.cfg.tracking:
-                    self.log.track(_lev + 1, "Sig Qual: [0]", True)
-                return 0
-
-        except Exception as e:
-            enum = "BC181"
-            emsg = str(e)
-            if self.cfg.tracking:
-                self.log.errtrack(str(enum), str(emsg))
-            return [False, str(enum), str(emsg)], None
-
-    # -------------------------------------------------------------------
-    # Initiate SBD Session.
-    # -------------------------------------------------------------------
-
-    def initiate_sbd(self, _lev, action, num, wait_time=60):
-        # Send MO buffer to the GSS & Receive MT queued at the GSS
-        # Command:  +SBDIX
-        # Response: <MO status>,<MOMSN>,<MT status>,<MTMSN>,<MT length>,<MT queued>
-
-        if self.cfg.tracking:
-            self.log.track(_lev, "Entering 'initiate_sbd()' Class Method.", True)
-            self.log.track(_lev + 13, "_lev:  " + str(_lev), True)
-            self.log.track(_lev + 13, "_act:  " + str(action), True)
-            self.log.track(_lev + 13, "_num:  " + str(num), True)
-            self.log.track(_lev + 13, "_wait: " + str(wait_time), True)
-
-        if self.typ == "iridium":
-            mt_msg_list = []
-            mo_sent = False
-            mt_received = False
-            mt_queued = 0
-            count = 1
-            # start_time = time.time()
-            # timeout = start_time + wait_time
-            timeout = time.time() + wait_time
-
-            if self.cfg.tracking:
-                self.log.track(_lev + 1, "SBD Session Initiated.", True)
-
-            if action == "send":
-                ######################stop multiple connection attempts after success###########################
-                while mo_sent == False and num > 0 and time.time() < timeout:
-                    #                while (mo_sent == False or mt_received == False or (mt_queued > 0 and num > 0)) and time.time() < timeout:
-                    signal_strength = self.check_signal_quality(_lev + 1)
-
-                    if int(signal_strength) >= 1:
-
-                        response = self.acquire_response(b"AT+SBDIX")
-                        if response is not False:
-                            response = response.strip()
-                            response = response.split("+SBDIX:")[1]
-                            response = response.split(",")
-
-                            mo_status = int(response[0])
-                            mt_status = int(response[2])
-                            mt_queued = int(response[5])
-
-                            if self.cfg.tracking:
-                                self.log.track(
-                                    _lev + 2, "MO Status: " + str(mo_status), True
-                                )
-                                self.log.track(
-                                    _lev + 2, "MT Status: " + str(mt_status), True
-                                )
-                                self.log.track(
-                                    _lev + 2, "MT Queued: " + str(mt_queued), True
-                                )
-
-                            mo_sent = self.read_status(
-                                _lev + 2, "mo sbd", mo_status, mo_sent
-                            )
-                            mt_received = self.read_status(
-                                _lev + 2, "mt sbd", mt_status, mt_received
-                            )
-
-                            if mt_status == 1:
-                                mt_msg = self.get_mt_message(_lev + 2)
-
-                                if mt_msg:
-                                    mt_msg_list.append(mt_msg)
-                                    num -= 1
-
-                            if mt_queued > 0:
-                                if self.cfg.tracking:
-                                    self.log.track(
-                                        _lev + 1,
-                                        "MT SBD messages queued to be transferred: "
-                                        + str(mt_queued)
-                                        + " messages",
-                                        True,
-                                    )
-
-                            time.sleep(1)
-                        else:
-                            if self.cfg.tracking:
-                                self.log.track(
-                                    _lev + 1, "No SBD response received.", True
-                                )
-                            time.sleep(3)
-                            count += 1
-
-                if self.cfg.tracking:
-                    self.log.track(_lev + 1, "Number of retry: " + str(count), True)
-
-                if mo_sent or mt_received:
-                    return True, mt_msg_list
-                    # print mt_msg_list
-
-                else:
-                    if self.cfg.tracking:
-                        self.log.track(_lev + 1, "SBD Sesion Time Out.", True)
-
-                    return False, mt_msg_list
-
-            elif action == "receive":
-                while (
-                        mt_received == False or (mt_queued > 0 and num > 0)
-                ) and time.time() < timeout:
-                    signal_strength = self.check_signal_quality(_lev + 1)
-
-                    if int(signal_strength) > 2:
-
-                        response = self.acquire_response(b"AT+SBDIX")
-                        if response is not False:
-                            response = response.strip()
-                            response = response.split("+SBDIX:")[1]
-                            response = response.split(",")
-
-                            mt_status = int(response[2])
-                            mt_queued = int(response[5])
-
-                            if self.cfg.tracking:
-                                self.log.track(
-                                    _lev + 2, "MT Status: " + str(mt_status), True
-                                )
-                                self.log.track(
-                                    _lev + 2, "MT Queued: " + str(mt_queued), True
-                                )
-
-                            mt_received = self.read_status(
-                                _lev + 1, "mt sbd", mt_status, mt_received
-                            )
-
-                            if mt_status == 1:
-                                mt_msg = self.get_mt_message(2)
-
-                                if mt_msg:
-                                    mt_msg_list.append(mt_msg)
-                                    num -= 1
-
-                            if mt_queued > 0:
-                                if self.cfg.tracking:
-                                    self.log.track(
-                                        _lev + 1,
-                                        "MT SBD messages queued to be transferred: "
-                                        + str(mt_queued)
-                                        + " messages",
-                                        True,
-                                    )
-
-                            time.sleep(1)
-
-                        else:
-                            if self.cfg.tracking:
-                                self.log.track(
-                                    _lev + 1, "No SBD response received.", True
-                                )
-                            time.sleep(3)
-                            count += 1
-
-                if self.cfg.tracking:
-                    self.log.track(_lev + 1, "Number of retry: " + str(count), True)
-
-                if mt_received:
-                    return True, mt_msg_list
-
-                else:
-                    if self.cfg.tracking:
-                        self.log.track(_lev + 1, "SBD Sesion Time Out.", True)
-
-                    return False, mt_msg_list
-
-    # -------------------------------------------------------------------
-    # Read Iridium Transfer Status from the AT Command Response
-    # -------------------------------------------------------------------
-
-    def read_status(self, _lev, status_type, response, current_flag=False):
-        if status_type == "mo buffer":
-            if self.cfg.tracking:
-                self.log.track(_lev, "MO Buffer Status:", True)
-            if response == 0:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "SBD message successfully stored in mobile originated buffer.",
-                        True,
-                    )
-                return True
-            elif response == 1:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "SBD message write timeout. No terminating carriage return was sent within the transfer period of 60 seconds",
-                        True,
-                    )
-                return False
-            elif response == 2:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "SBD message checksum sent from DTE does not match the checksum calculated at the ISU",
-                        True,
-                    )
-                return False
-            elif response == 3:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "SBD message size is not correct. The maximum mobile originated SBD message length is 1960 \
-                        bytes for voice-enabled ISUs, 340 bytes for the 9602, 9602-SB, and 9603, and 205 bytes for the 9601. The minimum \
-                        mobile originated SBD message length is 1 byte.",
-                        True,
-                    )
-                return False
-            else:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "An error occurred while attempting to write a message to mobile originated buffer.",
-                        True,
-                    )
-                return False
-
-        elif status_type == "mt sbd":
-            if self.cfg.tracking:
-                self.log.track(_lev, "MT SBD Message Status:", True)
-            if response == 0:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "No MT SBD message to receive from the Iridium Gateway.",
-                        True,
-                    )
-                return True
-
-            elif response == 1:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "MT SBD message successfully received to MT buffer from the Iridium Gateway.",
-                        True,
-                    )
-                return True
-
-            else:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "An error occurred while attempting to perform a mailbox check or receive a message from the Iridium Gatewy.",
-                        True,
-                    )
-                return current_flag
-
-        elif status_type == "mo sbd":
-            if self.cfg.tracking:
-                self.log.track(_lev, "MO SBD Message Status:", True)
-
-            if response == 0:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1, "MO message, if any, transferred successfully.", True
-                    )
-                return True
-            elif response == 1:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "MO message, if any, transferred successfully, but the MT message in the queue was too big to be transferred.",
-                        True,
-                    )
-                return True
-            elif response == 2:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "MO message, if any, transferred successfully, but the requested Location Update was not accepted.",
-                        True,
-                    )
-                return True
-            elif 3 <= response <= 4:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "Reserved, but indicate MO session success if used.",
-                        True,
-                    )
-                return True
-            elif 5 <= response <= 8:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "Reserved, but indicate MO session failure if used.",
-                        True,
-                    )
-            elif response == 10:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "Iridium Gateway reported that the call did not complete in the allowed time.",
-                        True,
-                    )
-            elif response == 11:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "MO message queue at the Iridium Gateway is full.",
-                        True,
-                    )
-            elif response == 12:
-                if self.cfg.tracking:
-                    self.log.track(_lev + 1, "MO message has too many segments.", True)
-            elif response == 13:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "Iridium Gateway reported that the session did not complete.",
-                        True,
-                    )
-            elif response == 14:
-                if self.cfg.tracking:
-                    self.log.track(_lev + 1, "Invalid segment size.", True)
-            elif response == 15:
-                if self.cfg.tracking:
-                    self.log.track(_lev + 1, "Access is denied.", True)
-            elif response == 16:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "Transceiver has been locked and may not make SBD calls (see +CULK command).",
-                        True,
-                    )
-            elif response == 17:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "Iridium Gateway not responding (local session timeout).",
-                        True,
-                    )
-            elif response == 18:
-                if self.cfg.tracking:
-                    self.log.track(_lev + 1, "Connection lost (RF drop).", True)
-            elif response == 19:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "Link failure (A protocol error caused termination of the call).",
-                        True,
-                    )
-            elif 20 <= response <= 31:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1, "Reserved, but indicate failure if used.", True
-                    )
-            elif response == 32:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1, "No network service, unable to initiate call.", True
-                    )
-            elif response == 33:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1, "Antenna fault, unable to initiate call.", True
-                    )
-            elif response == 34:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "Radio is disabled, unable to initiate call (see *Rn command).",
-                        True,
-                    )
-            elif response == 35:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1, "Transceiver is busy, unable to initiate call.", True
-                    )
-            elif response == 36:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "Try later, must wait 3 minutes since last registration.",
-                        True,
-                    )
-            elif response == 37:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1, "SBD service is temporarily disabled.", True
-                    )
-            elif response == 38:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "Try later, traffic management period (see +SBDLOE command).",
-                        True,
-                    )
-            elif 39 <= response <= 63:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1, "Reserved, but indicate failure if used.", True
-                    )
-            elif response == 64:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "Band violation (attempt to transmit outside permitted frequency band).",
-                        True,
-                    )
-            elif response == 65:
-                if self.cfg.tracking:
-                    self.log.track(
-                        _lev + 1,
-                        "PLL lock failure; hardware error during attempted transmit.",
-                        True,
-                    )
-            else:
-                if self.cfg.tracking:
-                    self.log.track(_lev + 1, "Unknown response. Assume error.", True)
-
-            return current_flag
-
     # -------------------------------------------------------------------
     # isactive() Class Library Method.
     # -------------------------------------------------------------------
@@ -7,14 +7,82 @@
 # License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
 #
 import datetime
+import hashlib
 import os
+import shutil
 import sqlite3
 from dateutil.parser import parse
 from regex import regex
 import bothelp
 
 v_botdb = "bot71-20200601"
-sqlite3_db_current_ver = 15
+sqlite3_db_current_ver = 20
+
+# Schema upgrades, keyed by the version ('PRAGMA user_version') each one
+# brings the DB up to.  Databases created before the version was recorded
+# report 0 and receive every upgrade; 'getconn()' applies whatever is
+# missing, so existing Float DBs migrate in place.
+sqlite3_db_upgrades = {
+    16: [
+        # Hot paths of the uplink: the top-PIPO selection of active Data
+        # Records, the associated Status lookups and the purges/updates
+        # by 'rec_state'.  The 'data' indexes are partial so that the
+        # planner can't prefer a 'rec_state' search plus a sort over an
+        # ordered walk of 'pipo' (note that partial indexes only match
+        # integer literals, e.g. 'rec_state = 1' but not '1').
+        "CREATE INDEX IF NOT EXISTS data_active_pipo ON data (pipo) WHERE rec_state IN (0,1)",
+        "CREATE INDEX IF NOT EXISTS data_packed ON data (rec_state) WHERE rec_state = 1",
+        "CREATE INDEX IF NOT EXISTS data_sent ON data (rec_state) WHERE rec_state = 2",
+        "CREATE INDEX IF NOT EXISTS status_sys_status_id ON status (sys_status_id)",
+        "CREATE INDEX IF NOT EXISTS status_state_timestamp ON status (rec_state, timestamp)",
+    ],
+    17: [
+        # Out-of-row payloads: 'payload_ref' names a file in the payload
+        # store (see 'BotDB.store_payload()'); small payloads stay inline.
+        "ALTER TABLE data ADD COLUMN payload_ref TEXT",
+        "ALTER TABLE data ADD COLUMN payload_size INTEGER",
+        "UPDATE data SET payload_size = length(payload)",
+    ],
+    18: [
+        # Top-K uplink selection (see 'BotPIPO.selectTopK()').  PIPO is the
+        # numerator over an age term, so among Active Records with equal
+        # numerators the newest rate best at any wake-up time: walking
+        # 'numerator' down and, within it, 'timestamp' down finds the top
+        # K without rating or sorting the backlog.  The newest timestamp
+        # bounds every denominator.  Neither index changes as records age,
+        # unlike the old 'pipo' index which every re-rate rewrote.
+        "DROP INDEX IF EXISTS data_active_pipo",
+        "CREATE INDEX IF NOT EXISTS data_active_rank ON data (numerator, timestamp) WHERE rec_state IN (0,1)",
+        "CREATE INDEX IF NOT EXISTS data_active_age ON data (timestamp) WHERE rec_state IN (0,1)",
+    ],
+    19: [
+        # Persistent uplink queue (see 'botqueue.OutboundQueue'): encoded
+        # NEPIMsgs waiting for the transport and the Status or Data Record
+        # ('kind', 'rec_rowid') each one carries.
+        "CREATE TABLE IF NOT EXISTS outbound (kind TEXT, rec_rowid INTEGER, queued REAL, msg BLOB)",
+        "CREATE INDEX IF NOT EXISTS outbound_rec ON outbound (kind, rec_rowid)",
+    ],
+    20: [
+        # LB link history for the link selection (see 'botlink'): per link,
+        # the Sessions tried and failed, the bytes sent and the smoothed
+        # goodput (bytes/s), connect latency (s) and failure rate.
+        "CREATE TABLE IF NOT EXISTS link_stats (link TEXT PRIMARY KEY, sessions INTEGER,"
+        " failures INTEGER, bytes INTEGER, goodput REAL, latency REAL, fail_rate REAL, updated REAL)",
+    ],
+}
+
+# Column list for reading Data Records without their payload bytes.  The
+# positions match 'SELECT rowid, *' ([15] is the inline 'payload', here
+# always NULL) so that row consumers can index either form the same way.
+# Use 'BotDB.load_payload()' to fetch the payload of a selected row.
+data_select_cols = (
+    "rowid, rec_state, sys_status_ref_id, comm_index, timestamp, type, "
+    "instance, date_time_offset, latitude_offset, longitude_offset, "
+    "heading_offset, roll_offset, pitch_offset, payload_fname, "
+    "payload_fname_ext, NULL AS payload, numerator, trigger, pipo, quality, "
+    "quality_score, type_score, event_score, metafile, metafile_ext, "
+    "chg_eligible, payload_ref, payload_size"
+)
 
 # -------------------------------------------------------------------
 
@@ -30,12 +98,103 @@ def dict_factory(cursor, row):
     return d
 
 
+########################################################################
+# Block Allocator for the 'counters' Table.
+########################################################################
+# Every status ID, comm index and packet message number used to cost an
+# UPDATE, a SELECT and a commit.  A 'CounterBlock' instead reserves
+# 'counter_block_size' IDs at once by advancing the column's stored value
+# (the high-water mark) and committing, then hands the IDs out from
+# memory.  Because the high-water mark is on disk before any ID from the
+# block is used, IDs are never reused after a crash; a crash merely skips
+# the unused part of the block.  On a clean 'close()' the unused part is
+# handed back.  A non-zero '_wrap' keeps the 'x % _wrap + 1' sequence used
+# by 'packet_msg_index'.
+
+
+class CounterBlock(object):
+    def __init__(self, _db, _column, _wrap):
+        self.db = _db
+        self.column = _column
+        self.wrap = _wrap
+        self.value = 0
+        self.hwm = 0
+        self.left = 0
+
+    def step(self, _val, _n=1):
+        if self.wrap:
+            return (_val - 1 + _n) % self.wrap + 1
+        return _val + _n
+
+    def next(self, _lev):
+        if self.left <= 0:
+            self.reserve(_lev)
+        self.value = self.step(self.value)
+        self.left -= 1
+        return self.value
+
+    def reserve(self, _lev):
+        cfg = self.db.cfg
+        block = cfg.counter_block_size
+        if self.wrap:
+            block = min(block, self.wrap)
+            advance = "(" + self.column + " - 1 + ?) % " + str(self.wrap) + " + 1"
+        else:
+            advance = self.column + " + ?"
+
+        if cfg.tracking:
+            self.db.log.track(_lev, "Reserve " + str(block) + " IDs for " + self.column + ".", True)
+
+        cursor = self.db.dbc.cursor()
+        cursor.execute("SELECT " + self.column + " FROM counters WHERE ROWID = 1;")
+        self.value = int(cursor.fetchone()[0])
+        cursor.execute(
+            "UPDATE counters SET " + self.column + " = " + advance + " WHERE ROWID = 1;",
+            (block,),
+        )
+        self.db.commit()
+        self.hwm = self.step(self.value, block)
+        self.left = block
+
+        if cfg.tracking:
+            self.db.log.track(_lev + 1, "High-Water Mark: " + str(self.hwm), True)
+
+    def discard(self):
+        self.left = 0
+
+    def release(self, _lev):
+        # Give the unused part of the block back, but only if nobody else
+        # has moved the high-water mark since we reserved it.
+        if self.left <= 0 or self.db.batch_active:
+            return
+        try:
+            self.db.dbc.execute(
+                "UPDATE counters SET "
+                + self.column
+                + " = ? WHERE ROWID = 1 AND "
+                + self.column
+                + " = ?;",
+                (self.value, self.hwm),
+            )
+            self.db.dbc.commit()
+            self.left = 0
+        except Exception as e:
+            enum = "DB016"
+            emsg = "release(): [" + str(e) + "]"
+            if self.db.cfg.tracking:
+                self.db.log.errtrack(str(enum), str(emsg))
+
+
 ########################################################################
 # The Nepibot Database Class
 ########################################################################
 
 
 class BotDB(object):
+    data_insert_sql = """\
+            INSERT INTO data \
+            VALUES (0,?,0,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"""
+
     def __init__(self, _cfg, _log, _lev):
         self.dbc = None
         self.dbr = None
@@ -43,6 +202,13 @@ class BotDB(object):
         self.log = _log
         self.bot_comm_index = 0
         self.next_status_id = 0
+        self.batch_active = False
+        self.batch_folders = 0
+        self.counters = {
+            "bot_comm_index": CounterBlock(self, "bot_comm_index", 0),
+            "packet_msg_index": CounterBlock(self, "packet_msg_index", 65000),
+            "next_status_id": CounterBlock(self, "next_status_id", 0),
+        }
         if self.cfg.tracking:
             self.log.track(_lev, "Created DB Class Object: ", True)
             self.log.track(_lev + 13, "^dbc: " + str(self.dbc), True)
@@ -78,7 +244,6 @@ class BotDB(object):
             self.dbc = sqlite3.connect(self.cfg.db_file)
             if self.cfg.tracking:
                 self.log.track(_lev + 1, "DB Connection Established.", True)
-            return [True, None, None], self.dbc
         except Exception as e:
             enum = "DB001"
             emsg = "getconn(): [" + str(e) + "]"
@@ -86,65 +251,228 @@ class BotDB(object):
                 self.log.errtrack(str(enum), str(emsg))
             return [False, str(enum), str(emsg)], None
 
+        # A failure to tune is not fatal; SQLite's defaults still work.
+        self.tune(_lev + 1, self.dbc)
+
+        success = self.upgrade(_lev + 1)
+        if not success[0]:
+            return success, None
+
+        return [True, None, None], self.dbc
+
+    # -------------------------------------------------------------------
+    # Bring the DB Schema up to 'sqlite3_db_current_ver'.
     # -------------------------------------------------------------------
+    def upgrade(self, _lev):
+        try:
+            db_ver = int(self.dbc.execute("PRAGMA user_version").fetchone()[0])
+        except Exception as e:
+            enum = "DB018"
+            emsg = "upgrade(): [" + str(e) + "]"
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)]
 
-    def get_botcomm_index(self):
         if self.cfg.tracking:
-            self.log.track(1, "Getting value of bot_comm_index from DB.", True)
-        _sql = (
-            "UPDATE counters SET bot_comm_index = bot_comm_index + 1 WHERE ROWID = 1;"
-        )
-        _sql2 = "SELECT bot_comm_index FROM counters WHERE ROWID = 1;"
-        cursor = self.dbc.cursor()
-        cursor.execute(str(_sql))
-        cursor.execute(str(_sql2))
-        results = cursor.fetchone()
+            self.log.track(_lev, "DB Schema Version: " + str(db_ver), True)
+
+        for ver in sorted(sqlite3_db_upgrades):
+            if ver <= db_ver or ver > sqlite3_db_current_ver:
+                continue
+            if self.cfg.tracking:
+                self.log.track(_lev + 1, "Upgrade DB Schema to Version " + str(ver), True)
+            try:
+                if self.dbc.in_transaction:
+                    self.dbc.commit()
+                cursor = self.dbc.cursor()
+                cursor.execute("BEGIN")
+                for sql in sqlite3_db_upgrades[ver]:
+                    if self.cfg.tracking:
+                        self.log.track(_lev + 14, "SQL: " + str(sql), True)
+                    cursor.execute(sql)
+                # 'user_version' is written inside the same transaction so
+                # a partial upgrade is rolled back and retried next time.
+                cursor.execute("PRAGMA user_version = " + str(int(ver)))
+                self.dbc.commit()
+            except Exception as e:
+                self.dbc.rollback()
+                enum = "DB019"
+                emsg = "upgrade(): [" + str(e) + "]"
+                if self.cfg.tracking:
+                    self.log.errtrack(str(enum), str(emsg))
+                return [False, str(enum), str(emsg)]
+
+        return [True, None, None]
+
+    # -------------------------------------------------------------------
+    # Apply the 'db_tuning' Pragmas to a Connection.
+    # -------------------------------------------------------------------
+    # The values were validated by 'BotCfg.initcfg()'.  The effective
+    # settings are read back and logged since SQLite silently ignores some
+    # requests (e.g., WAL on a file system that can't support it).
+    def tune(self, _lev, _conn):
+        tuning = self.cfg.db_tuning
+        if self.cfg.tracking:
+            self.log.track(_lev, "Apply DB Tuning Profile: " + str(tuning.profile), True)
+
+        try:
+            _conn.execute("PRAGMA busy_timeout = " + str(int(tuning.busy_timeout)))
+            _conn.execute("PRAGMA journal_mode = " + str(tuning.journal_mode))
+            _conn.execute("PRAGMA synchronous = " + str(tuning.synchronous))
+            _conn.execute("PRAGMA cache_size = " + str(int(tuning.cache_size)))
+            _conn.execute("PRAGMA mmap_size = " + str(int(tuning.mmap_size)))
+            _conn.execute("PRAGMA temp_store = " + str(tuning.temp_store))
+
+            effective = []
+            for pragma in (
+                "journal_mode",
+                "synchronous",
+                "cache_size",
+                "mmap_size",
+                "temp_store",
+                "busy_timeout",
+            ):
+                row = _conn.execute("PRAGMA " + pragma).fetchone()
+                effective.append(pragma + "=" + str(row[0] if row else None))
+        except Exception as e:
+            enum = "DB017"
+            emsg = "tune(): [" + str(e) + "]"
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)]
+
+        if self.cfg.tracking:
+            self.log.track(_lev, "DB Pragmas: " + " ".join(effective), True)
+        return [True, None, None]
+
+    # -------------------------------------------------------------------
+    # Commit the Main Connection unless a Batch is Open.
+    # -------------------------------------------------------------------
+    # While an ingest batch is open (see 'begin_batch()'), every module
+    # that would normally commit on its own leaves the work pending so the
+    # whole batch reaches the SD card with a single commit (and fsync).
+
+    def commit(self):
+        if self.batch_active:
+            return
         self.dbc.commit()
+
+    # -------------------------------------------------------------------
+    # Batched Ingest of Data Product Folders.
+    # -------------------------------------------------------------------
+    # A batch is one explicit transaction spanning one or more Data Product
+    # folders.  Each folder is wrapped in its own SAVEPOINT so that a bad
+    # folder can be rolled back without losing the folders already in the
+    # batch.
+
+    def begin_batch(self, _lev):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Begin DB Ingest Batch.", True)
+
+        try:
+            if self.dbc.in_transaction:
+                self.dbc.commit()
+            self.dbc.execute("BEGIN")
+            self.batch_active = True
+            self.batch_folders = 0
+        except Exception as e:
+            self.batch_active = False
+            enum = "DB011"
+            emsg = "begin_batch(): [" + str(e) + "]"
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)]
+
+        return [True, None, None]
+
+    def begin_folder(self, _lev):
         if self.cfg.tracking:
-            self.log.track(1 + 1, "SQL Executed.", True)
-        self.bot_comm_index = int(results[0])
+            self.log.track(_lev, "Set DB Savepoint for Data Folder.", True)
+
+        try:
+            self.dbc.execute("SAVEPOINT dp_folder")
+        except Exception as e:
+            enum = "DB012"
+            emsg = "begin_folder(): [" + str(e) + "]"
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)]
+
+        return [True, None, None]
+
+    def end_folder(self, _lev, _keep):
+        # Release the folder's savepoint, first rolling it back if the
+        # folder is to be discarded.  Returns the number of folders now
+        # pending in the open batch.
+        if self.cfg.tracking:
+            self.log.track(_lev, "Release DB Savepoint for Data Folder.", True)
+            self.log.track(_lev + 1, "Keep: " + str(_keep), True)
+
+        try:
+            if not _keep:
+                self.dbc.execute("ROLLBACK TO dp_folder")
+                self.reset_counters()
+            self.dbc.execute("RELEASE dp_folder")
+            if _keep:
+                self.batch_folders += 1
+        except Exception as e:
+            enum = "DB013"
+            emsg = "end_folder(): [" + str(e) + "]"
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)], self.batch_folders
+
+        return [True, None, None], self.batch_folders
+
+    def end_batch(self, _lev):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Commit DB Ingest Batch.", True)
+            self.log.track(_lev + 1, "Folders: " + str(self.batch_folders), True)
+
+        self.batch_active = False
+        self.batch_folders = 0
+        try:
+            self.dbc.commit()
+        except Exception as e:
+            enum = "DB014"
+            emsg = "end_batch(): [" + str(e) + "]"
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            try:
+                self.dbc.rollback()
+            except Exception:
+                pass
+            self.reset_counters()
+            return [False, str(enum), str(emsg)]
+
+        return [True, None, None]
+
+    # -------------------------------------------------------------------
+
+    def get_botcomm_index(self):
+        self.bot_comm_index = self.counters["bot_comm_index"].next(1)
         if self.cfg.tracking:
             self.log.track(1, f"bot_comm_index set to {self.bot_comm_index}.", True)
         return self.bot_comm_index
 
     def get_packet_msg_index(self):
-        if self.cfg.tracking:
-            self.log.track(1, "Getting value of packet_msg_index from DB.", True)
-        _sql = (
-            "UPDATE counters SET packet_msg_index = (packet_msg_index % 65000 + 1) WHERE ROWID = 1;"
-        )
-        _sql2 = "SELECT packet_msg_index FROM counters WHERE ROWID = 1;"
-        cursor = self.dbc.cursor()
-        cursor.execute(str(_sql))
-        cursor.execute(str(_sql2))
-        results = cursor.fetchone()
-        self.dbc.commit()
-        if self.cfg.tracking:
-            self.log.track(1 + 1, "SQL Executed.", True)
-        self.packet_msg_index = int(results[0])
+        self.packet_msg_index = self.counters["packet_msg_index"].next(1)
         if self.cfg.tracking:
             self.log.track(1, f"packet_msg_index set to {self.packet_msg_index}.", True)
         return self.packet_msg_index
 
     def get_next_status_id(self):
-        if self.cfg.tracking:
-            self.log.track(1, "Getting value of next_status_id from DB.", True)
-        _sql = (
-            "UPDATE counters SET next_status_id = (next_status_id + 1) WHERE ROWID = 1;"
-        )
-        _sql2 = "SELECT next_status_id FROM counters WHERE ROWID = 1;"
-        cursor = self.dbc.cursor()
-        cursor.execute(str(_sql))
-        cursor.execute(str(_sql2))
-        results = cursor.fetchone()
-        self.dbc.commit()
-        if self.cfg.tracking:
-            self.log.track(1 + 1, "SQL Executed.", True)
-        self.next_status_id = int(results[0])
+        self.next_status_id = self.counters["next_status_id"].next(1)
         if self.cfg.tracking:
             self.log.track(1, f"next_status_id set to {self.next_status_id}.", True)
         return self.next_status_id
 
+    def reset_counters(self):
+        # Forget any reserved-but-unused IDs.  Needed whenever a rollback
+        # may have undone the reservation itself.
+        for counter in self.counters.values():
+            counter.discard()
+
     def pushstat(self, _lev, _statjson):
         # INSERT a 'status' record into the Float DB.  This Module is
         # designed to insert the exact number of columns by picking
@@ -193,7 +521,7 @@ class BotDB(object):
             emsg = "pushstat(): [" + str(e) + "]"
             if self.cfg.tracking:
                 self.log.errtrack(str(enum), str(emsg))
-            return [False, str(enum), str(emsg)], None
+            return [False, str(enum), str(emsg)], None, None
 
         # ---------------------------------------------------------------
         # Perform the actual INSERT and 'commit()' the new record to the
@@ -211,13 +539,13 @@ class BotDB(object):
             if self.cfg.tracking:
                 self.log.track(_lev + 14, "Successful.", True)
                 self.log.track(_lev + 14, "Row ID: " + str(lastrowid), True)
-            self.dbc.commit()
+            self.commit()
         except Exception as e:
             enum = "DB003"
             emsg = "pushstat(): [" + str(e) + "]"
             if self.cfg.tracking:
                 self.log.errtrack(str(enum), str(emsg))
-            return [False, str(enum), str(emsg)], None
+            return [False, str(enum), str(emsg)], None, None
 
         return [True, None, None], lastrowid, status_id
 
@@ -230,9 +558,66 @@ class BotDB(object):
     # def pushmeta(self, _lev, _datajson, _state, _status, _trigger, _numerator, _stdsize, _chgsize, _norm, _pipo, _metafile, _stdfile, _chgfile):
     def pushdata(
         self, _lev, _datajson, _info, _status_id, _trigger, _metafile
+    ):
+        success, data_tuple = self.mkdata(
+            _lev, _datajson, _info, _status_id, _trigger, _metafile
+        )
+        if not success[0]:
+            return success, None
+
+        # ---------------------------------------------------------------
+        # Perform the actual INSERT and 'commit()' the new 'meta' record
+        # to the 'float.db' database.
+        if self.cfg.tracking:
+            # self.log.track(_lev + 13, "SQL: " + str(sql), True)
+            self.log.track(_lev, "Perform the 'Data' Record INSERT.", True)
+
+        try:
+            cursor = self.dbc.cursor()
+            cursor.execute(self.data_insert_sql, data_tuple)
+            lastrowid = cursor.lastrowid
+            if self.cfg.tracking:
+                self.log.track(_lev + 1, "Data Row ID: " + str(lastrowid), True)
+            self.commit()
+        except Exception as e:
+            enum = "DB005"
+            emsg = "pushdata(): [" + str(e) + "]"
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)], None
+
+        return [True, None, None], lastrowid
+
+    # -------------------------------------------------------------------
+    # INSERT a list of 'Data' record tuples (as built by 'mkdata()') with
+    # a single 'executemany()'.  Used by the batched ingest so a whole
+    # Data Folder costs one statement instead of one per Data Product.
+    def pushdata_many(self, _lev, _tuples):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering DB 'pushdata_many()' Module.", True)
+            self.log.track(_lev + 1, "Records: " + str(len(_tuples)), True)
+
+        try:
+            cursor = self.dbc.cursor()
+            cursor.executemany(self.data_insert_sql, _tuples)
+            self.commit()
+        except Exception as e:
+            enum = "DB015"
+            emsg = "pushdata_many(): [" + str(e) + "]"
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)]
+
+        return [True, None, None]
+
+    # -------------------------------------------------------------------
+    # Build the 'Data' record tuple for 'pushdata()'/'pushdata_many()'
+    # from the Meta JSON and the Data Product file it points at.
+    def mkdata(
+        self, _lev, _datajson, _info, _status_id, _trigger, _metafile
     ):
         if self.cfg.logging:
-            self.log.track(_lev, "Entering DB 'pushdata()' Module.", True)
+            self.log.track(_lev, "Entering DB 'mkdata()' Module.", True)
             self.log.track(_lev + 1, "Log Level:    " + str(_lev), True)
             self.log.track(_lev + 13, "Data JSON:    " + str(_datajson), True)
             self.log.track(_lev + 1, "State:        " + str(_info[3]), True)
@@ -262,7 +647,7 @@ class BotDB(object):
                 chg_deltas = str(_info[9]["deltas"])
         except Exception as e:
             enum = "DB104"
-            emsg = "pushdata(): [" + str(e) + "]"
+            emsg = "mkdata(): [" + str(e) + "]"
             if self.cfg.tracking:
                 self.log.errtrack(str(enum), str(emsg))
             return [False, str(enum), str(emsg)], None
@@ -279,13 +664,16 @@ class BotDB(object):
             try:
                 filepath = regex.match(r".*/", _metafile)
                 filename = filepath.group() + _datajson.get("data_file", "")
-                with open(filename, mode="rb") as file:
-                    filecontent = file.read()
+                filecontent, payload_ref, payload_size = self.store_payload(
+                    _lev + 1, filename
+                )
                 payload_data = _datajson.get("data_file")
                 payload_fname, payload_fname_ext = os.path.splitext(payload_data)
             except Exception as e:
                 payload_fname_ext = ""
                 filecontent = b""
+                payload_ref = None
+                payload_size = 0
 
             data_tuple = (
                 _status_id,
@@ -311,50 +699,144 @@ class BotDB(object):
                 str(""),
                 str(""),
                 int(0),
+                payload_ref,
+                int(payload_size),
             )
 
-            sql_statement = """\
-            INSERT INTO data \
-            VALUES (0,?,0,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"""
-
         except Exception as e:
             enum = "DB004"
-            emsg = "pushdata(): [" + str(e) + "]"
+            emsg = "mkdata(): [" + str(e) + "]"
             if self.cfg.tracking:
                 self.log.errtrack(str(enum), str(emsg))
             return [False, str(enum), str(emsg)], None
 
-        # ---------------------------------------------------------------
-        # Perform the actual INSERT and 'commit()' the new 'meta' record
-        # to the 'float.db' database.
+        return [True, None, None], data_tuple
+
+    # -------------------------------------------------------------------
+    # The Payload Store.
+    # -------------------------------------------------------------------
+    # Payloads larger than 'payload_inline_max' bytes are not copied into
+    # the DB; they are kept as content-addressed files (named for their
+    # SHA-256) under the DB directory and the 'data' row only carries the
+    # reference and size.  Identical payloads share one file.  Returns the
+    # inline bytes (or b"" if stored out of row), the reference (or None)
+    # and the size.
+    def store_payload(self, _lev, _filename):
+        size = os.path.getsize(_filename)
+        if size <= self.cfg.payload_inline_max:
+            with open(_filename, mode="rb") as file:
+                return file.read(), None, size
+
         if self.cfg.tracking:
-            # self.log.track(_lev + 13, "SQL: " + str(sql), True)
-            self.log.track(_lev, "Perform the 'Data' Record INSERT.", True)
+            self.log.track(_lev, "Store Payload Out of Row.", True)
+            self.log.track(_lev + 1, "File: " + str(_filename), True)
+            self.log.track(_lev + 1, "Size: " + str(size), True)
+
+        if not os.path.isdir(self.cfg.payload_dir_path):
+            os.makedirs(self.cfg.payload_dir_path)
+
+        # Hash while copying into a temporary file so the payload is only
+        # read once, then move it into place under its content address.
+        tmpname = os.path.join(self.cfg.payload_dir_path, ".incoming")
+        sha = hashlib.sha256()
+        with open(_filename, mode="rb") as src, open(tmpname, mode="wb") as dst:
+            while True:
+                chunk = src.read(65536)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                dst.write(chunk)
+
+        ref = sha.hexdigest()
+        refpath = self.payload_path(ref)
+        if os.path.isfile(refpath):
+            os.remove(tmpname)
+        else:
+            if not os.path.isdir(os.path.dirname(refpath)):
+                os.makedirs(os.path.dirname(refpath))
+            os.replace(tmpname, refpath)
+
+        if self.cfg.tracking:
+            self.log.track(_lev + 1, "Ref:  " + str(ref), True)
+        return b"", ref, size
+
+    def payload_path(self, _ref):
+        return os.path.join(self.cfg.payload_dir_path, _ref[:2], _ref)
+
+    # -------------------------------------------------------------------
+    # Fetch the payload of a Data Record read with 'data_select_cols' (or
+    # 'SELECT rowid, *'), from the record itself, the payload store or,
+    # for an inline payload that wasn't selected, the DB.
+    def load_payload(self, _lev, _rec):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Load Payload for Data Record: " + str(_rec[0]), True)
 
         try:
-            cursor = self.dbc.cursor()
-            cursor.execute(sql_statement, data_tuple)
-            lastrowid = cursor.lastrowid
-            if self.cfg.tracking:
-                self.log.track(_lev + 1, "Data Row ID: " + str(lastrowid), True)
-            self.dbc.commit()
+            if _rec[15]:
+                return [True, None, None], bytes(_rec[15])
+            if len(_rec) > 26 and _rec[26]:
+                with open(self.payload_path(str(_rec[26])), mode="rb") as file:
+                    return [True, None, None], file.read()
+            row = self.dbc.execute(
+                "SELECT payload FROM data WHERE rowid = ?", (int(_rec[0]),)
+            ).fetchone()
+            return [True, None, None], bytes(row[0] or b"")
         except Exception as e:
-            enum = "DB005"
-            emsg = "pushdata(): [" + str(e) + "]"
+            enum = "DB020"
+            emsg = "load_payload(): [" + str(e) + "]"
             if self.cfg.tracking:
                 self.log.errtrack(str(enum), str(emsg))
             return [False, str(enum), str(emsg)], None
 
-        return [True, None, None], lastrowid
+    # -------------------------------------------------------------------
+    # Remove payload files no longer referenced by any 'data' row (after
+    # sent records are purged, or left over from a rolled-back ingest).
+    def purge_payloads(self, _lev):
+        if not os.path.isdir(self.cfg.payload_dir_path):
+            return [True, None, None]
+
+        if self.cfg.tracking:
+            self.log.track(_lev, "Purge Unreferenced Payload Files.", True)
+
+        removed = 0
+        try:
+            refs = set(
+                row[0]
+                for row in self.dbc.execute(
+                    "SELECT DISTINCT payload_ref FROM data WHERE payload_ref IS NOT NULL"
+                )
+            )
+            for subdir in os.listdir(self.cfg.payload_dir_path):
+                subpath = os.path.join(self.cfg.payload_dir_path, subdir)
+                if not os.path.isdir(subpath):
+                    continue
+                for ref in os.listdir(subpath):
+                    if ref not in refs:
+                        os.remove(os.path.join(subpath, ref))
+                        removed += 1
+                if not os.listdir(subpath):
+                    os.rmdir(subpath)
+        except Exception as e:
+            enum = "DB021"
+            emsg = "purge_payloads(): [" + str(e) + "]"
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)]
+
+        if self.cfg.tracking:
+            self.log.track(_lev + 1, "Removed: " + str(removed), True)
+        return [True, None, None]
 
     # -------------------------------------------------------------------
-    def getResults(self, _lev, _sql, _jflag):
+    def getResults(self, _lev, _sql, _jflag, _params=()):
         # -------------------------------------------------------------------
         if self.cfg.tracking:
             self.log.track(_lev, "Entering DB getResults() Module.", True)
             self.log.track(_lev + 1, "_lev:   " + str(_lev), True)
             self.log.track(_lev + 13, "_sql:   " + str(_sql), True)
             self.log.track(_lev + 1, "_jflag: " + str(_jflag), True)
+            if _params:
+                self.log.track(_lev + 13, "_params: " + str(_params), True)
 
         try:
             if _jflag:
@@ -366,7 +848,7 @@ class BotDB(object):
             cursor = self.dbc.cursor()
             if self.cfg.tracking:
                 self.log.track(_lev + 1, "Got Cursor.", True)
-            cursor.execute(str(_sql))
+            cursor.execute(str(_sql), _params)
             if self.cfg.tracking:
                 self.log.track(_lev + 1, "SQL Executed.", True)
             results = cursor.fetchall()
@@ -393,21 +875,23 @@ class BotDB(object):
         return [True, None, None], results
 
     # -------------------------------------------------------------------
-    def update(self, _lev, _sql):
+    def update(self, _lev, _sql, _params=()):
         # -------------------------------------------------------------------
         if self.cfg.tracking:
             self.log.track(_lev, "Entering DB update() Module.", True)
             self.log.track(_lev + 13, "_lev: " + str(_lev), True)
             self.log.track(_lev + 13, "_sql: " + str(_sql), True)
+            if _params:
+                self.log.track(_lev + 13, "_params: " + str(_params), True)
 
         try:
             cursor = self.dbc.cursor()
             if self.cfg.tracking:
                 self.log.track(_lev + 13, "Got Cursor.", True)
-            cursor.execute(str(_sql))
+            cursor.execute(str(_sql), _params)
             if self.cfg.tracking:
                 self.log.track(_lev + 13, "SQL Executed.", True)
-            self.dbc.commit()
+            self.commit()
             if self.cfg.tracking:
                 self.log.track(_lev + 13, "Update Committed.", True)
         except Exception as e:
@@ -419,6 +903,49 @@ class BotDB(object):
 
         return [True, None, None]
 
+    # -------------------------------------------------------------------
+    # Run one parameterized INSERT and commit it.  Returns the new 'rowid'.
+    def insert(self, _lev, _sql, _params=()):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering DB insert() Module.", True)
+            self.log.track(_lev + 13, "_sql: " + str(_sql), True)
+
+        try:
+            cursor = self.dbc.cursor()
+            cursor.execute(str(_sql), _params)
+            self.commit()
+        except Exception as e:
+            enum = "DB023"
+            emsg = "insert(): [" + str(e) + "]"
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)], None
+
+        return [True, None, None], cursor.lastrowid
+
+    # -------------------------------------------------------------------
+    # Run one parameterized statement for every tuple in '_seq' and commit
+    # them together (one transaction, not one per row).
+    def update_many(self, _lev, _sql, _seq):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering DB update_many() Module.", True)
+            self.log.track(_lev + 13, "_sql: " + str(_sql), True)
+
+        try:
+            cursor = self.dbc.cursor()
+            cursor.executemany(str(_sql), _seq)
+            if self.cfg.tracking:
+                self.log.track(_lev + 1, "Rows Updated: " + str(cursor.rowcount), True)
+            self.commit()
+        except Exception as e:
+            enum = "DB022"
+            emsg = "update_many(): [" + str(e) + "]"
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)]
+
+        return [True, None, None]
+
     # -------------------------------------------------------------------
     def reset(self, _lev):
         # -------------------------------------------------------------------
@@ -442,6 +969,13 @@ class BotDB(object):
                     self.log.track(_lev + 1, "DB File Exists; Remove it.", True)
                 try:
                     os.remove(self.cfg.db_file)
+                    # Leftover WAL files would otherwise be replayed into
+                    # the new, empty DB.
+                    for suffix in ("-wal", "-shm"):
+                        if os.path.isfile(self.cfg.db_file + suffix):
+                            os.remove(self.cfg.db_file + suffix)
+                    if os.path.isdir(self.cfg.payload_dir_path):
+                        shutil.rmtree(self.cfg.payload_dir_path)
                     self.log.track(_lev + 2, "Removed DB File.", True)
                 except Exception as e:
                     enum = "DB101"
@@ -899,6 +1433,8 @@ class BotDB(object):
                     self.log.track(_lev + 1, str(enum) + ": " + str(emsg), True)
 
         if self.dbc:
+            for counter in self.counters.values():
+                counter.release(_lev + 1)
             try:
                 self.dbc.close()
                 self.dbc = None
@@ -51,6 +51,7 @@ bot_db_file = nepi_home + "/db/float.db"  # Bot DB File
 bot_devnuid_file = nepi_home + "/devinfo/devnuid.txt"
 bot_devsshkeys_file = nepi_home + "/devinfo/devsshkeys.txt"
 bot_hb_dir = nepi_home + "/hb"
+bot_tunnel_pid_file = nepi_home + "/db/bottunnel.pid"  # Persistent LB Tunnel
 
 
 # This is another Python2 way of doing Enums.  We don't seem to have the
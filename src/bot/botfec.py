@@ -0,0 +1,352 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Forward error correction for the LB links (opt-in, per link
+# 'fec_ratio'), where asking for a resend costs a round trip too many.
+#
+# On 'ethernet' ('FecSplitter') a message goes out as its k data packets
+# plus m = ceil(k * fec_ratio) XOR parity packets, m <= k.  Parity packet
+# j covers the data packets j, j + m, j + 2m, ... (interleaved, so that a
+# burst of losses lands in different groups), and any one lost packet in
+# a group can be rebuilt from the rest of it.  Both kinds carry the usual
+# NEPI packet header, with 'total' = k.  Data packets are as ever, only 4
+# bytes shorter; parity packet j has index k + j and its payload is:
+#
+#   m (2 bytes), XOR over the group of (length (2 bytes), payload padded)
+#
+# so a rebuilt packet comes back with its own length.
+#
+# On the serial links ('FecSession') the messages of a Session go out
+# whole (on 'iridium', one SBD MO message each), so the code runs across
+# them instead: the messages form blocks of up to 'fec_block', each sent
+# at once as data packet i of its block (NEPI header, 'total' 0 while the
+# block is open, the message as payload), and once the block is full, or
+# the Session's uplink is done, its m parity messages follow, as above
+# with 'total' = k.  A frame costs 'fec_frame' bytes of the link's message
+# size.
+#
+# 'FecReassembler' and 'FecSessionReassembler' are the receiving ends (the
+# Server, or a stand-in for it).
+#
+import math
+import time
+import struct
+from collections import OrderedDict
+
+v_botfec = "bot71-20200601"
+
+# The NEPI packet header, as 'botcomm.nepi_pkt_header'.
+pkt_header = struct.Struct("!HIIH")
+fec_len = struct.Struct("!H")
+fec_overhead = 2 * fec_len.size
+fec_frame = pkt_header.size + fec_overhead
+
+
+# ---------------------------------------------------------------
+# nParity() module function.
+# ---------------------------------------------------------------
+# Parity packets for '_k' data packets at '_ratio'.
+def nParity(_k, _ratio):
+    if _k == 0 or _ratio <= 0:
+        return 0
+    return min(_k, max(1, math.ceil(_k * _ratio)))
+
+
+# ---------------------------------------------------------------
+# xorBlocks() module function.
+# ---------------------------------------------------------------
+# XOR of equal-length byte strings, a whole block at a time.
+def xorBlocks(_blocks, _size):
+    acc = 0
+    for block in _blocks:
+        acc ^= int.from_bytes(block, "big")
+    return acc.to_bytes(_size, "big")
+
+
+def padBlock(_payload, _size):
+    return fec_len.pack(len(_payload)) + bytes(_payload) + bytes(_size - len(_payload))
+
+
+########################################################################
+# The FEC Splitter Class
+########################################################################
+
+
+class FecSplitter(object):
+    # ---------------------------------------------------------------
+    # Wraps a 'botcomm.MessageSplitter' (its header, packet size and
+    # message numbers) and yields data and parity packets in the same way
+    # as its 'iterpackets()'.
+    def __init__(self, _splitter, _ratio):
+        self.splitter = _splitter
+        self.ratio = max(float(_ratio), 0.0)
+        self.header = _splitter.header
+        self.trace = 0
+        self.maxpktsize = _splitter.maxpktsize - fec_overhead
+
+    def nparity(self, _k):
+        return nParity(_k, self.ratio)
+
+    def npackets(self, _msg_len):
+        k = -(-_msg_len // self.maxpktsize)
+        return k + self.nparity(k)
+
+    # ---------------------------------------------------------------
+    # iterpackets() class module.
+    # ---------------------------------------------------------------
+    # The data packets, then the parity packets, of '_message' (or just
+    # the indexes '_indexes' of the already numbered '_msg_num').
+    def iterpackets(self, _message, _msg_num=None, _indexes=None):
+        msg = memoryview(_message).cast("B")
+        size = self.maxpktsize
+        k = -(-len(msg) // size)
+        m = self.nparity(k)
+        msg_num = self.splitter.nextMsgNum() if _msg_num is None else _msg_num
+        wanted = range(k + m) if _indexes is None else _indexes
+
+        payloads = [msg[i * size:(i + 1) * size] for i in range(k)]
+        parity = {}
+        for index in wanted:
+            if index < k:
+                payload = payloads[index]
+                yield self.header.pack(msg_num, k, index, len(payload)) + bytes(payload)
+                continue
+            j = index - k
+            if j not in parity:
+                group = [padBlock(payloads[i], size) for i in range(j, k, m)]
+                parity[j] = fec_len.pack(m) + xorBlocks(group, fec_len.size + size)
+            yield self.header.pack(msg_num, k, index, len(parity[j])) + parity[j]
+
+
+########################################################################
+# The Serial Link FEC Class
+########################################################################
+
+
+class FecSession(object):
+    # ---------------------------------------------------------------
+    # FEC across the whole messages of a serial link Session, at the
+    # link's '_ratio', in blocks of up to '_block' messages, each frame
+    # at most '_max_size' bytes (see the header).  '_next_num' numbers the
+    # blocks (the NEPI packet message number).
+    def __init__(self, _ratio, _block, _max_size, _next_num):
+        self.ratio = max(float(_ratio), 0.0)
+        self.block = max(int(_block), 1)
+        self.maxmsgsize = _max_size - fec_frame
+        self.next_num = _next_num
+        self.block_num = None
+        self.payloads = []
+        self.parity_msgs = 0
+
+    def full(self):
+        return len(self.payloads) >= self.block
+
+    # ---------------------------------------------------------------
+    # data() class module.
+    # ---------------------------------------------------------------
+    # The frame of '_msg', the next data packet of the open block.
+    def data(self, _msg):
+        if self.block_num is None:
+            self.block_num = self.next_num()
+        index = len(self.payloads)
+        self.payloads.append(bytes(_msg))
+        return pkt_header.pack(self.block_num, 0, index, len(_msg)) + bytes(_msg)
+
+    # ---------------------------------------------------------------
+    # unsend() class module.
+    # ---------------------------------------------------------------
+    # The frame from the last 'data()' didn't go out; it stays queued,
+    # for a later block.
+    def unsend(self):
+        if self.payloads:
+            self.payloads.pop()
+
+    # ---------------------------------------------------------------
+    # parity() class module.
+    # ---------------------------------------------------------------
+    # Close the open block: its parity frames (none for an empty block).
+    def parity(self):
+        k = len(self.payloads)
+        m = nParity(k, self.ratio)
+        size = max(len(p) for p in self.payloads) if k else 0
+        frames = []
+        for j in range(m):
+            group = [padBlock(self.payloads[i], size) for i in range(j, k, m)]
+            block = fec_len.pack(m) + xorBlocks(group, fec_len.size + size)
+            frames.append(pkt_header.pack(self.block_num, k, k + j, len(block)) + block)
+        self.block_num = None
+        self.payloads = []
+        self.parity_msgs += m
+        return frames
+
+
+########################################################################
+# The FEC Reassembler Class
+########################################################################
+
+
+class FecReassembler(object):
+    # ---------------------------------------------------------------
+    # Collects the packets of FEC-coded messages and hands back each
+    # message as soon as it is whole, rebuilding lost data packets from
+    # parity where it can.  Bounded as 'botcomm.MessageReassembler':
+    # partial messages hold at most '_max_bytes' between them (the
+    # stalest go first to make room, and one that could never fit is
+    # dropped), and are dropped after '_tout' seconds without a new
+    # packet.  Only the latest '_done_keep' messages given back are
+    # remembered, so a message number that comes round again (the
+    # counter wraps) is taken as a new message.
+    def __init__(self, _max_bytes=1 << 20, _tout=30.0, _done_keep=256, _clock=time.monotonic):
+        self.max_bytes = _max_bytes
+        self.tout = _tout
+        self.done_keep = _done_keep
+        self.clock = _clock
+        # msg_num -> [k, {index: payload}, {j: (m, block)}, bytes, last time]
+        self.parts = OrderedDict()
+        self.done = OrderedDict()  # msg_num -> k, of the latest messages given back
+        self.held = 0
+        self.rebuilt = 0
+        self.dropped = 0
+        self.dups = 0
+
+    # ---------------------------------------------------------------
+    # add() class module.
+    # ---------------------------------------------------------------
+    # Take one packet.  Returns (msg_num, message) once that message is
+    # complete, else None.
+    def add(self, _packet):
+        found = self.take(_packet)
+        if found is None:
+            return None
+        msg_num, k, index, payload, state = found
+        data = state[1]
+        if index < k:
+            data[index] = payload
+        else:
+            state[2][index - k] = (fec_len.unpack_from(payload)[0], payload[fec_len.size:])
+        if state[2] and len(data) < k:
+            self.recover(state)
+        if len(data) < k:
+            return None
+        self.finish(msg_num)
+        return msg_num, b"".join(data[i] for i in range(k))
+
+    # ---------------------------------------------------------------
+    # take() class module.
+    # ---------------------------------------------------------------
+    # Check '_packet' and make room for it: its header fields (msg_num,
+    # k, index), payload and message state, or None for a packet to
+    # ignore.
+    def take(self, _packet):
+        hsize = pkt_header.size
+        if len(_packet) < hsize:
+            return None
+        msg_num, k, index, length = pkt_header.unpack_from(_packet)
+        payload = bytes(_packet[hsize:hsize + length])
+        if len(payload) != length:
+            return None
+        now = self.clock()
+        self.expire(now)
+
+        if self.isDone(msg_num, k):
+            self.dups += 1
+            return None
+        state = self.parts.get(msg_num)
+        if state is not None and k and state[0] and state[0] != k:
+            # The number came round again for a new message.
+            self.drop(msg_num)
+            state = None
+        if state is None:
+            state = [k, {}, {}, 0, now]
+            self.parts[msg_num] = state
+        elif index in state[1] or (state[0] and index - state[0] in state[2]):
+            self.dups += 1
+            return None
+
+        if state[3] + length > self.max_bytes:
+            self.drop(msg_num)
+            return None
+        self.parts.move_to_end(msg_num)
+        while self.held + length > self.max_bytes:
+            self.drop(next(iter(self.parts)))
+        state[3] += length
+        state[4] = now
+        self.held += length
+        return msg_num, k, index, payload, state
+
+    def isDone(self, _msg_num, _k):
+        return self.done.get(_msg_num) == _k
+
+    def finish(self, _msg_num):
+        state = self.parts.pop(_msg_num)
+        self.held -= state[3]
+        self.done[_msg_num] = state[0]
+        if len(self.done) > self.done_keep:
+            self.done.popitem(last=False)
+
+    def expire(self, _now):
+        while self.parts:
+            msg_num, state = next(iter(self.parts.items()))
+            if _now - state[4] < self.tout:
+                break
+            self.drop(msg_num)
+
+    def drop(self, _msg_num):
+        state = self.parts.pop(_msg_num)
+        self.held -= state[3]
+        self.dropped += 1
+
+    # ---------------------------------------------------------------
+    # recover() class module.
+    # ---------------------------------------------------------------
+    # Rebuild what the parity in '_state' can; returns the indexes.
+    def recover(self, _state):
+        k, data, parity = _state[0], _state[1], _state[2]
+        found = []
+        for j, (m, block) in parity.items():
+            group = range(j, k, m)
+            lost = [i for i in group if i not in data]
+            if len(lost) != 1:
+                continue
+            size = len(block)
+            rest = [padBlock(data[i], size - fec_len.size) for i in group if i in data]
+            rebuilt = xorBlocks(rest + [block], size)
+            length = fec_len.unpack_from(rebuilt)[0]
+            data[lost[0]] = rebuilt[fec_len.size:fec_len.size + length]
+            found.append(lost[0])
+            self.rebuilt += 1
+        return found
+
+
+class FecSessionReassembler(FecReassembler):
+    # ---------------------------------------------------------------
+    # The receiving end of 'FecSession'.  Every data message is handed
+    # back as it comes in; a block is kept only to rebuild its lost
+    # messages once its parity is in, and is done when all of its k
+    # messages have been handed back.
+    def add(self, _packet):
+        found = self.take(_packet)
+        if found is None:
+            return []
+        block_num, k, index, payload, state = found
+        msgs = []
+        if k == 0:
+            state[1][index] = payload
+            msgs.append(payload)
+        else:
+            state[0] = k
+            state[2][index - k] = (fec_len.unpack_from(payload)[0], payload[fec_len.size:])
+        if state[0] and len(state[1]) < state[0]:
+            msgs.extend(state[1][i] for i in self.recover(state))
+        if state[0] and len(state[1]) >= state[0]:
+            self.finish(block_num)
+        return msgs
+
+    # Data packets carry no k, so a block is done whatever the packet.
+    def isDone(self, _msg_num, _k):
+        return _msg_num in self.done
@@ -6,16 +6,16 @@
 #
 # License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
 #
-from threading import Timer
-
 import botdefs
 import bothelp
+from botphase import runChild
+from botssh import SshMux
 from nepi_edge_sw_mgr import NepiEdgeSwMgr
 
 from datetime import datetime
 from pathlib import Path
 import os
-import subprocess
+import threading
 
 
 class HbProc(object):
@@ -44,6 +44,18 @@ class HbProc(object):
 
         self.sw_mgr = NepiEdgeSwMgr()
 
+        # one ssh connection for the Session's server commands and rsyncs
+        # (see 'botssh'); opened by 'run_hb_proc()', closed by Bot-Main
+        # after the log transfer ('transfer_logs()')
+        self.ssh = SshMux(
+            self.cfg,
+            self.log,
+            self.lev,
+            f"{self.dev_id_str}@{self.cfg.hb_ip.host}",
+            self.ssh_key_file,
+            bothelp.exit_event_hb,
+        )
+
         if self.cfg.tracking:
             self.log.track(self.lev, "Created HbProc Class Object.", True)
 
@@ -60,28 +72,10 @@ class HbProc(object):
 
     # build a command line for the server
     def run_server_cmd(self, cmd_line, msg_success, msg_failed):
-        cmd = [
-            "ssh",
-            "-p",
-            f"{self.cfg.hb_ip.port}",
-            "-o",
-            "StrictHostKeyChecking=no",
-            "-o",
-            "GlobalKnownHostsFile=/dev/null",
-            "-o",
-            "UserKnownHostsFile=/dev/null",
-            "-i",
-            f"{self.ssh_key_file}",
-            f"{self.dev_id_str}@{self.cfg.hb_ip.host}",
-            cmd_line,
-        ]
+        cmd = self.ssh.command(cmd_line)
+        ssh_cmd = None
         try:
-            ssh_cmd = subprocess.run(
-                cmd,
-                universal_newlines=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
+            ssh_cmd = self.ssh.run(cmd)
             if ssh_cmd.returncode != 0:
                 if self.cfg.tracking:
                     self.log.track(
@@ -103,22 +97,17 @@ class HbProc(object):
             if self.cfg.tracking:
                 self.log.track(
                     self.lev,
-                    f"{msg_failed} (rc={ssh_cmd.returncode})",
+                    f"{msg_failed} [{e}]",
                     True,
                 )
             return False
 
-    # run a command line on the bot
-    def run_local_cmd(self, cmd_line, msg_success, msg_failed):
+    # run a command line on the bot, in 'work_dir' if given
+    def run_local_cmd(self, cmd_line, msg_success, msg_failed, work_dir=None):
         # cmd = f"sh -c '{cmd_line}'"
+        ssh_cmd = None
         try:
-            ssh_cmd = subprocess.run(
-                cmd_line,
-                shell=True,
-                universal_newlines=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
+            ssh_cmd = runChild(cmd_line, bothelp.exit_event_hb, work_dir, True)
             if ssh_cmd.returncode != 0:
                 if self.cfg.tracking:
                     self.log.track(
@@ -140,7 +129,7 @@ class HbProc(object):
             if self.cfg.tracking:
                 self.log.track(
                     self.lev,
-                    f"{msg_failed} (rc={ssh_cmd.returncode})",
+                    f"{msg_failed} [{e}]",
                     True,
                 )
             return False
@@ -149,24 +138,18 @@ class HbProc(object):
     def run_rsync_cmd1(self, work_dir, src_dir, dst_dir, logfile, msg_success, msg_failed):
         rsync_cmd = None
         try:
-            os.chdir(work_dir)
             args_rsync = [
                 "rsync",
                 f"--log-file={logfile}",
                 # f"--modify-window={self.time_skew}",
                 "--stats",
                 "-rvatiRLzte",
-                f"ssh -p {self.cfg.hb_ip.port} -o StrictHostKeyChecking=no -o GlobalKnownHostsFile=/dev/null -o UserKnownHostsFile=/dev/null -i {self.ssh_key_file}",
+                self.ssh.rshell(),
                 f"{src_dir}",
                 f"{self.dev_id_str}@{self.cfg.hb_ip.host}:{dst_dir}",
             ]
             print(f"{' '.join(args_rsync)}")
-            rsync_cmd = subprocess.run(
-                args_rsync,
-                universal_newlines=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
+            rsync_cmd = self.ssh.run(args_rsync, work_dir)
             if rsync_cmd.returncode != 0:
                 self.gen_msg_contents += f"{msg_failed} [{rsync_cmd.returncode}]"
                 if self.cfg.tracking:
@@ -188,7 +171,7 @@ class HbProc(object):
             if self.cfg.tracking:
                 self.log.track(
                     self.lev,
-                    f"{msg_failed} (rc={rsync_cmd.returncode})",
+                    f"{msg_failed} [{e}]",
                     True,
                 )
             return False
@@ -197,25 +180,19 @@ class HbProc(object):
     def run_rsync_cmd2(self, work_dir, src_dir, dst_dir, logfile, msg_success, msg_failed):
         rsync_cmd = None
         try:
-            os.chdir(work_dir)
             args_rsync = [
                 "rsync",
                 f"--log-file={logfile}",
                 # f"--modify-window={self.time_skew}",
                 "--stats",
                 "-rvatiRLzte",
-                f"ssh -p {self.cfg.hb_ip.port} -o StrictHostKeyChecking=no -o GlobalKnownHostsFile=/dev/null -o UserKnownHostsFile=/dev/null -i {self.ssh_key_file}",
+                self.ssh.rshell(),
                 f"{src_dir}",
                 f"{dst_dir}",
 
             ]
             print(f"{' '.join(args_rsync)}")
-            rsync_cmd = subprocess.run(
-                args_rsync,
-                universal_newlines=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
+            rsync_cmd = self.ssh.run(args_rsync, work_dir)
             if rsync_cmd.returncode != 0:
                 self.gen_msg_contents += f"{msg_failed} [{rsync_cmd.returncode}]"
                 if self.cfg.tracking:
@@ -237,7 +214,7 @@ class HbProc(object):
             if self.cfg.tracking:
                 self.log.track(
                     self.lev,
-                    f"{msg_failed} (rc={rsync_cmd.returncode})",
+                    f"{msg_failed} [{e}]",
                     True,
                 )
             return False
@@ -258,19 +235,17 @@ class HbProc(object):
                 self.lev, f"Current working directory is: {self.original_dir}.", True
             )
         self.gen_msg_contents += "Entering check_hb_dirs() method.\n"
-        os.chdir(self.hb_dir)
-        if self.cfg.tracking:
-            self.log.track(self.lev, f"Changed directory to: {self.hb_dir}.", True)
-        # self.gen_msg_contents += f"Changed directory to: {self.hb_dir}.\n"
+        # No chdir: the LB phase may be running alongside, on the same
+        # working directory.
         try:
             # self.gen_msg_contents += f"Created do dt dt/Software directories.\n"
-            Path(f"{self.cfg.hb_dir_outgoing}").mkdir(
+            Path(f"{self.cfg.hb_dir_outgoing_path}").mkdir(
                 mode=0o755, parents=True, exist_ok=True
             )
-            Path(f"{self.cfg.hb_dir_incoming}").mkdir(
+            Path(f"{self.cfg.hb_dir_incoming_path}").mkdir(
                 mode=0o755, parents=True, exist_ok=True
             )
-            Path(f"{self.cfg.hb_dir_incoming}/{self.sw_dir}").mkdir(
+            Path(f"{self.cfg.hb_dir_incoming_path}/{self.sw_dir}").mkdir(
                 mode=0o755, parents=True, exist_ok=True
             )
 
@@ -352,23 +327,42 @@ class HbProc(object):
         self.run_server_cmd(f'rm -f .botlog', 'Deleted bot lock file on server.',
                             'Unable to delete bot lock file on server.')
 
-    def transfer_logs(self):
-        # transfer logs from bot to server for current run
-        self.run_rsync_cmd1(f"{self.hb_dir}/..", f"log/", self.server_log_dir,
-                             f"{self.bot_log_dir}/bot_log_transfer.log",
-                             'Bot LOG file transfer successful.', 'Bot LOG file transfer failed.')
+    # transfer logs from bot to server for current run, once the HB phase
+    # has stopped: on an event of its own ('exit_event_hb' stays set after
+    # an HB timeout), set after '_tout' seconds.  Returns whether the logs
+    # went.
+    def transfer_logs(self, _tout):
+        event = threading.Event()
+        timer = threading.Timer(_tout, event.set)
+        timer.daemon = True
+        timer.start()
+        self.ssh.event = event
+        try:
+            sent = self.run_rsync_cmd1(f"{self.hb_dir}/..", f"log/", self.server_log_dir,
+                                       f"{self.bot_log_dir}/bot_log_transfer.log",
+                                       'Bot LOG file transfer successful.', 'Bot LOG file transfer failed.')
 
-        # move log directory up 1 level on server and cleanup
-        self.run_server_cmd(f"cd {self.server_log_dir}; mv log/* .; rm -fr log",
-                            'Bot moved log dir to proper place on server',
-                            'Bot could not move log data to proper place on server')
+            # move log directory up 1 level on server and cleanup
+            if sent:
+                self.run_server_cmd(f"cd {self.server_log_dir}; mv log/* .; rm -fr log",
+                                    'Bot moved log dir to proper place on server',
+                                    'Bot could not move log data to proper place on server')
+        finally:
+            timer.cancel()
+            self.ssh.event = bothelp.exit_event_hb
+        return sent
 
 
     def run_sw_mgr(self):
-        os.chdir(f"{self.hb_dir}/dt")
+        if bothelp.exit_event_hb.is_set():
+            if self.cfg.tracking:
+                self.log.track(self.lev, "HB813: Received STOP command. Terminating early.", True)
+            return True
+
+        dt_dir = f"{self.hb_dir}/dt"
         # Check whether any "Software" was transferred from server
-        local_sw_dir = f"./{self.sw_dir}"
-        if (os.path.isdir(local_sw_dir)) is False or (len(os.listdir(f"./{self.sw_dir}")) == 0):
+        local_sw_dir = f"{dt_dir}/{self.sw_dir}"
+        if (os.path.isdir(local_sw_dir)) is False or (len(os.listdir(local_sw_dir)) == 0):
             if self.cfg.tracking:
                 self.log.track(
                     self.lev,
@@ -383,7 +377,7 @@ class HbProc(object):
                     True,
                 )
         try:
-            self.sw_mgr.process_sw_folder(f"{self.sw_dir}", results_path='../../log')
+            self.sw_mgr.process_sw_folder(local_sw_dir, results_path=self.bot_log_dir)
         except Exception as e:
             self.log.track(
                 self.lev + 2,
@@ -394,18 +388,16 @@ class HbProc(object):
         # Clear the local software folder
         self.run_local_cmd(f"rm -rf ./{self.sw_dir}/*",
                            f"Removed empty directories in {self.hb_dir}/do",
-                           f"Unable to remove empty directories in {self.hb_dir}/do")
+                           f"Unable to remove empty directories in {self.hb_dir}/do",
+                           dt_dir)
 
 
 
+    # the HB phase; its 'hbto' deadline is kept by 'botphase.BotPhases', which
+    # sets 'exit_event_hb' (checked between steps; running children are
+    # terminated by 'runChild()')
     def run_hb_proc(self):
-        # set timer when process starts
-        # if self.nepi_args.hbto > 0:
-        #     thr=Timer(self.nepi_args.hbto, self.hb_early_terminate)
-        #     thr.start()
-        #     if self.cfg.tracking:
-        #         self.log.track(self.lev, "HB815: Received STOP command. Terminating early.", True)
-        #         self.log.track(self.lev, f"Current working directory is: {self.original_dir}.", True)
+        self.ssh.open(self.lev)
         self.check_hb_dirs()
         self.transfer_files()
         self.run_sw_mgr()
@@ -10,10 +10,17 @@ import json
 import operator
 import os
 import pathlib
+import time
 from pathlib import Path
 
 import botdefs
 from botcomm import BotComm
+from botdb import data_select_cols
+from botpack import BotPack
+from botqueue import OutboundQueue
+from botsbd import sbd_mo_max
+from botlink import LinkScheduler, linkWeights
+from botmsg import nuid_field
 from bothelp import (
     resetCfgValue,
     getAllFolderNames,
@@ -22,6 +29,7 @@ from bothelp import (
     triggerScoreLookup,
     getAllFileNames,
     deleteDataProduct,
+    exit_event_lb,
 )
 import botreports
 
@@ -65,6 +73,359 @@ class LbProc(object):
         self.rpt_items = []
         self.log.track(self.lev, "Created LbProc Class Object.", True)
 
+    # -------------------------------------------------------------------
+    # Ingest One Data Product Folder.
+    # -------------------------------------------------------------------
+    # Loads the folder's Status Record and all of its Data Products into
+    # the DB.  Returns whether the folder's DB work should be kept along
+    # with the new Status Record's 'rowid' and 'sys_status_id'.  When
+    # '_batching' is set the caller owns the transaction/savepoint and
+    # the Data Records are INSERTed together at the end of the folder.
+    def lb_ingest_folder(self, _data_prod_folder, _batching):
+        # -------------------------------------------------------------------
+        # Deal With Status Record First.
+        # -------------------------------------------------------------------
+        # Get the ONLY sys_status.json file that should be in THIS Data
+        # Product folder. Deconstruct it into a JSON object and load into
+        # the 'status' table of the embedded DB.  If any failure detected,
+        # DESTROY the entire DP Folder since, without this Status Record,
+        # all the Data Products in this DP Folder are useless.
+
+        status_file_path = _data_prod_folder + "/" + self.cfg.sys_status_file
+        if self.cfg.tracking:
+            self.log.track(0, "", True)
+            self.log.track(0, "Processing Status File.", True)
+            self.log.track(1, "Data Folder: " + str(_data_prod_folder), True)
+            self.log.track(1, "Status File: " + str(self.cfg.sys_status_file), True)
+            self.log.track(1, "Consume File from DP Directory.", True)
+
+        success, status_json = readFloatFile(
+            self.cfg, self.log, 2, status_file_path, False, True
+        )
+
+        if success[0]:
+            # Insert Status Record and capture the DB 'rowid' (which will be
+            # the DB foreign key - or, pointer - back to this record in the
+            # DB, that is, embedded in all subsequent Data Product records
+            # associated with this Status record).
+
+            if self.cfg.tracking:
+                self.log.track(
+                    1, "INSERT Status Record into DB 'status' Table.", True
+                )
+
+            success, status_rowid, status_id = self.db.pushstat(2, status_json)
+            if not success[0]:
+                if self.cfg.tracking:
+                    self.log.track(2, "Status Record Insertion Failed.", True)
+                    self.log.track(2, "Entire DP Folder Unusable; Delete it.", True)
+
+                deleteFolder(self.cfg, self.log, 3, _data_prod_folder)
+                if self.cfg.tracking:
+                    self.log.track(2, "Continue.", True)
+                return False, None, None
+
+        else:
+            if self.cfg.tracking:
+                self.log.track(2, "Status File NOT Acquired.", True)
+                self.log.track(
+                    2, "Consider Entire DP Folder Corrupt; Delete it.", True
+                )
+
+            deleteFolder(self.cfg, self.log, 3, _data_prod_folder)
+            if self.cfg.tracking:
+                self.log.track(2, "Continue.", True)
+            return False, None, None
+
+        # -------------------------------------------------------------------
+        # Calculate Trigger Score
+        # -------------------------------------------------------------------
+        if self.cfg.tracking:
+            self.log.track(1, "Calculate Trigger Score.", True)
+
+        trigger, wet, wei = triggerScoreLookup(self.cfg, self.log, 2, status_json)
+        if self.cfg.tracking:
+            self.log.track(2, "Trigger Score:   " + str(trigger), True)
+            self.log.track(2, "Wake Event Type: " + str(wet), True)
+            self.log.track(2, "Wake Event ID: " + str(wei), True)
+
+        # -------------------------------------------------------------------
+        # Find All META Data Files
+        # -------------------------------------------------------------------
+        # The 'sys_status.json' file for this Data Folder is now in the DB;
+        # we need to find ALL Meta Data files (*_meta.json) in this same
+        # Folder (the Status File we're processing right now applies to all
+        # Meta Files in this same Data Folder).
+        if self.cfg.tracking:
+            self.log.track(1, "Get ALL DP Files in This Data Folder.", True)
+            self.log.track(2, "Folder:" + _data_prod_folder, True)
+
+        success, allfiles = getAllFileNames(
+            self.cfg, self.log, 2, _data_prod_folder, False, False
+        )
+        if not success[0] or not allfiles:
+            if self.cfg.tracking:
+                self.log.track(2, "Data Folder File NOT ACCESSIBLE.", True)
+                self.log.track(2, "Remove Entire DP Folder.", True)
+
+            deleteFolder(self.cfg, self.log, 3, _data_prod_folder)
+            if self.cfg.tracking:
+                self.log.track(2, "Continue.", True)
+            return True, status_rowid, status_id
+
+        # Retrieve all "meta" files out of the list.
+        allmetafiles = []
+        for f in allfiles:
+            if "sys_status.json" in f:
+                continue
+            if ".json" in f:
+                allmetafiles.append(f)
+
+        if not allmetafiles:
+            if self.cfg.tracking:
+                self.log.track(2, "NO 'Meta' DP Files in this Data Folder.", True)
+                self.log.track(2, "Done Processing; Remove Entire DP Folder.", True)
+
+            deleteFolder(self.cfg, self.log, 3, _data_prod_folder)
+            if self.cfg.tracking:
+                self.log.track(2, "Continue.", True)
+            return True, status_rowid, status_id
+            # log.track(2, "Update Status File with 'meta_state' of 1.", True)
+
+            # sql = "UPDATE status SET meta_state=1 WHERE rowid=" + str(status_rowid)
+            # success = db.update(3, sql)
+            # if cfg.tracking:
+            # log.track(2, "Continue.", True)
+            # continue
+
+        if self.cfg.tracking:
+            self.log.track(2, "Got All 'Meta' DP Files.", True)
+            self.log.track(3, "Files: " + str(allmetafiles), True)
+
+        folder_records = []
+
+        # -------------------------------------------------------------------
+        # Process Each META File
+        # -------------------------------------------------------------------
+        for mf in allmetafiles:
+            # First, compose the full path to the Meta File.
+            meta_file_path = _data_prod_folder + "/" + mf
+            if self.cfg.tracking:
+                self.log.track(1, "Processing META File: " + str(mf), True)
+                self.log.track(2, "Path: " + str(_data_prod_folder), True)
+                self.log.track(2, "Consume File from DP Directory.", True)
+
+            # Now process each Meta File by calculating its PIPO Rating,
+            # which evaluates the mandatory 'Standard' Data File and any
+            # optional 'Change' Data File.
+            success, meta_json = readFloatFile(
+                self.cfg, self.log, 3, meta_file_path, False, True
+            )
+            if not success[0]:
+                if self.cfg.tracking:
+                    self.log.track(
+                        2, "Can't Access the Data Product's 'Meta' File.", True
+                    )
+                    self.log.track(
+                        2, "These DP Files are Useless; Remove Them.", True
+                    )
+
+                deleteDataProduct(self.cfg, self.log, 3, meta_file_path)
+                if self.cfg.tracking:
+                    self.log.track(2, "Move on to next DP; Continue.", True)
+                continue
+
+            # ---------------------------------------------------------------
+            # Compute the PIPO Rating
+            # ---------------------------------------------------------------
+            # For each Meta File, get the PIPO rating (which also verifies
+            # and returns the mandatory "Standard" and optional "Change"
+            # Data Files that are identified in the Meta File).
+
+            if self.cfg.tracking:
+                self.log.track(2, "Get the PIPO Rating.", True)
+
+            # TODO: Fix PIPO Rating
+            #  success, info = pipo.getPIPO(3, meta_file_path, meta_json, trigger)
+            # if not success[0]:
+            #     if cfg.tracking:
+            #         log.track(2, "Can't Compute PIPO rating.", True)
+            #         log.track(2, "This DP is of No value; Remove.", True)
+            #
+            #     deleteDataProduct(cfg, log, 3, meta_file_path)
+            #     if cfg.tracking:
+            #         log.track(2, "Move on to next DP; Continue.", True)
+            #     continue
+            # numerator,
+            # std_msg_size,
+            # chg_msg_size,
+            # chg_eligible,
+            # norm,
+            # pipo_rating,
+            # std_file_path,
+            # chg_file_path,
+            # stdjson,
+            # chgjson,
+            # node_code,
+            info = [1.0, 1500, 1500, 1, 1.0, 1.0, "DEF", "DEF", "", "", 0]
+            # ---------------------------------------------------------------
+            # INSERT the META Data Record into the Float's Database.
+            # ---------------------------------------------------------------
+            if self.cfg.tracking:
+                self.log.track(2, "INSERT Meta Data Record into DB.", True)
+
+            # success = db.pushmeta(3, meta_json, info[3], status_rowid, trigger, info[0], info[1], info[2], info[4], info[5], meta_file_path, stdfile, chgfile)
+            # When batching, only build the record here; the whole folder is
+            # INSERTed with one 'executemany()' below.
+            if _batching:
+                success, data_tuple = self.db.mkdata(
+                    3,
+                    meta_json,
+                    info,
+                    status_id,
+                    trigger,
+                    meta_file_path,
+                )
+                if success[0]:
+                    folder_records.append((meta_file_path, data_tuple))
+            else:
+                success, data_rowid = self.db.pushdata(
+                    3,
+                    meta_json,
+                    info,
+                    status_id,
+                    trigger,
+                    meta_file_path,
+                )
+
+            if not success[0]:
+                if self.cfg.tracking:
+                    self.log.track(
+                        2, "Can't Insert Meta Record into DB." + str(mf), True
+                    )
+                    self.log.track(
+                        2, "This DP is of No value; Remove." + str(mf), True
+                    )
+
+                deleteDataProduct(self.cfg, self.log, 3, meta_file_path)
+                if self.cfg.tracking:
+                    self.log.track(2, "Move on to next DP; Continue.", True)
+                continue
+
+            # ---------------------------------------------------------------
+            # DONE LOOP-PROCESSING NEW SDK DATA PRODUCTS.
+            # ---------------------------------------------------------------
+
+        # -------------------------------------------------------------------
+        # INSERT the Folder's Batched META Data Records.
+        # -------------------------------------------------------------------
+        # Should the single 'executemany()' fail, fall back to one INSERT per
+        # record so that only the offending Data Products are discarded.
+        if folder_records:
+            if self.cfg.tracking:
+                self.log.track(1, "INSERT Folder's Meta Data Records into DB.", True)
+
+            success = self.db.pushdata_many(
+                2, [rec[1] for rec in folder_records]
+            )
+            if not success[0]:
+                if self.cfg.tracking:
+                    self.log.track(2, "Batch INSERT Failed; Retry Per Record.", True)
+
+                for meta_file_path, data_tuple in folder_records:
+                    success = self.db.pushdata_many(3, [data_tuple])
+                    if not success[0]:
+                        if self.cfg.tracking:
+                            self.log.track(
+                                3, "This DP is of No value; Remove.", True
+                            )
+                        deleteDataProduct(self.cfg, self.log, 3, meta_file_path)
+
+        return True, status_rowid, status_id
+
+    # -------------------------------------------------------------------
+    # Batch Envelope Budget.
+    # -------------------------------------------------------------------
+    # Largest wire message worth batching into: one packet's payload on
+    # 'ethernet' (a fuller envelope would only split), a full MO buffer on
+    # 'iridium' (less its FEC frame, see 'botfec'), the link's
+    # 'max_msg_size' on other serial links.
+    def batchBudget(self, _bc, _link):
+        if _bc.smsg is not None:
+            return _bc.smsg.maxpktsize
+        if _bc.typ == "iridium":
+            if _bc.sfec is not None:
+                return min(self.cfg.lb_iridium.max_msg_size, _bc.sfec.maxmsgsize)
+            return min(self.cfg.lb_iridium.max_msg_size, sbd_mo_max)
+        return getattr(self.cfg, _link).max_msg_size
+
+    # -------------------------------------------------------------------
+    # Open the Next LB Link.
+    # -------------------------------------------------------------------
+    # Open the links of '_links' (taking them off it) until one connects.
+    # Returns its BotComm, its name and the 'getconn()' result; if none
+    # connects, no BotComm (None) with the name and result of the last one
+    # tried.  Each failure goes into the link's history.
+    def openLink(self, _links):
+        while True:
+            lb_link = _links.pop(0)
+            bc = BotComm(self.cfg, self.log, getattr(self.cfg, lb_link).type, 1, self.db)
+            t0 = time.monotonic()
+            success = bc.getconn(0)
+            secs = time.monotonic() - t0
+            if success[0]:
+                self.link_latency = secs
+                self.link_sent = 0
+                self.link_secs = 0.0
+                return bc, lb_link, success
+            self.log.track(0, "getconn on " + str(lb_link) + " returned Not Success", True)
+            self.links.record(1, lb_link, False, secs)
+            bc.close(1)
+            if not _links:
+                return None, lb_link, success
+
+    # -------------------------------------------------------------------
+    # Flush the Uplink Queue on a Link.
+    # -------------------------------------------------------------------
+    # 'OutboundQueue.flush()' through '_bc', counting the bytes and time
+    # for the link's history.  A link without NEPI packet splitting only
+    # gets the queued messages it can take whole (see 'batchBudget()');
+    # the queue may have been packed for another link.  The last FEC
+    # block of a serial link is closed once the queue is through.
+    def flushLink(self, _bc, _link, _br):
+        def send(_wire):
+            if exit_event_lb.is_set():
+                return [False, "LB101", "LB Deadline Passed; Left Queued."]
+            success = _bc.send(1, _wire, 5, _br)[0]
+            if success[0]:
+                self.link_sent += len(_wire)
+            return success
+
+        budget = self.batchBudget(_bc, _link) if self.cfg.lb_msg_batch else None
+        max_size = None if _bc.smsg is not None else self.batchBudget(_bc, _link)
+        t0 = time.monotonic()
+        success = self.outq.flush(1, send, budget, nuid_field, max_size)
+        if _bc.sfec is not None and not exit_event_lb.is_set():
+            _bc.endFec(1)
+        self.link_secs += time.monotonic() - t0
+        return success
+
+    # -------------------------------------------------------------------
+    # Read the Downlink.
+    # -------------------------------------------------------------------
+    # 'BotComm.receive()', unless the LB deadline has passed.
+    def receiveLink(self, _bc):
+        if exit_event_lb.is_set():
+            if self.cfg.tracking:
+                self.log.track(0, "LB Deadline Passed; Skip Receive.", True)
+            return [False, "LB101", "LB Deadline Passed."]
+        return _bc.receive(1, 1)
+
+    # -------------------------------------------------------------------
+    # The LB Phase.
+    # -------------------------------------------------------------------
+    # Every exit returns (0, this Session's 'LbConnItem' reports), an empty
+    # list when no link was opened, for Bot-Main's 'LbRpt'.
     def lb_process_data(self):
 
         if self.cfg.db_deletes:
@@ -76,6 +437,9 @@ class LbProc(object):
             else:
                 self.log.track(0, "Unable to delete SENT metadata records from database.", True)
 
+            # remove payload files of the deleted records
+            self.db.purge_payloads(1)
+
             # remove sent status records from database
             sql = "DELETE FROM status WHERE rec_state = 2"
             success = self.db.update(2, sql)
@@ -84,88 +448,29 @@ class LbProc(object):
             else:
                 self.log.track(0, "Unable to delete SENT status records from database.", True)
 
-        if self.cfg.tracking:
-            self.log.track(0, "Recalculate Archived PIPO Ratings.", True)
-            self.log.track(1, "Select 'Active' Data Records from Database.", True)
-
-        sql = "SELECT rowid, numerator, trigger, quality, event_score, timestamp, type_score FROM data WHERE rec_state in (0,1)"
-        success, rows = self.db.getResults(2, sql, False)
+        # The uplink selection rates records as of this wake-up on its own
+        # ('selectTopK()'), so Archived PIPOs only need recalculating when
+        # the weights, and with them the stored numerators, have changed.
+        # They are then re-rated in one pass (vectorized, or one set-based
+        # UPDATE; see 'pipo_rerate') rather than row by row.
+        if self.cfg.wt_changed:
+            if self.cfg.tracking:
+                self.log.track(0, "Recalculate Archived PIPO Ratings.", True)
+                self.log.track(1, "Weight Factors Have Changed.", True)
 
-        if success[0]:
-            if not rows:
-                self.log.track(1, "No Active Data Records in Database; Continue.", True)
+            success = self.pipo.rerate(1, True)
+            if not success[0]:
+                if self.cfg.tracking:
+                    self.log.track(1, "Unable to Recalculate Archived PIPO Ratings.", True)
             else:
-                self.log.track(1, "Active Data Records in Database.", True)
-
-                if self.cfg.wt_changed:
-                    if self.cfg.tracking:
-                        self.log.track(1, "Weight Factors Have Changed.", True)
-                else:
-                    if self.cfg.tracking:
-                        self.log.track(1, "Weight Factors Are Unchanged.", True)
-
-                for row in rows:
-                    rwid = int(row[0])
-                    numr = float(row[1])
-                    trig = float(row[2])
-                    qual = float(row[3])
-                    scor = float(row[4])
-                    stmp = float(row[5])
-                    norm = float(row[6])
-                    if self.cfg.tracking:
-                        self.log.track(
-                            1, "Reevaluating Data Record ID: " + str(rwid), True
-                        )
-                        self.log.track(2, "Numr: " + str(numr), True)
-                        self.log.track(2, "Trig: " + str(trig), True)
-                        self.log.track(2, "Qual: " + str(qual), True)
-                        self.log.track(2, "Scor: " + str(scor), True)
-                        self.log.track(2, "Stmp: " + str(stmp), True)
-                        self.log.track(2, "Norm: " + str(norm), True)
-
-                    if self.cfg.wt_changed:
-                        if self.cfg.tracking:
-                            self.log.track(2, "Recalculate Numerator.", True)
-                        success, numerator = self.pipo.computeNumerator(
-                            3, scor, qual, norm, trig
-                        )
-                    else:
-                        if self.cfg.tracking:
-                            self.log.track(
-                                2, "Use existing Numerator." + str(numr), True
-                            )
-                        numerator = numr
-
-                    if self.cfg.tracking:
-                        self.log.track(2, "Recalculate Denominator.", True)
-                    success, denominator = self.pipo.computeDenominator(3, stmp)
-
-                    if self.cfg.tracking:
-                        self.log.track(2, "Recalculcate PIPO Rating: ", False)
-                    pipo_rating = numerator / denominator
-                    if self.cfg.tracking:
-                        self.log.track(2, str(pipo_rating), True)
-
-                    sql = (
-                            "UPDATE data SET numerator="
-                            + str(numerator)
-                            + ", pipo="
-                            + str(pipo_rating)
-                            + " WHERE rowid="
-                            + str(rwid)
+                if self.cfg.tracking:
+                    self.log.track(
+                        1,
+                        "All Archive PIPOs Recalculated; Reset Config JSON.",
+                        True,
                     )
 
-                    success = self.db.update(2, sql)
-
-                if self.cfg.wt_changed:
-                    if self.cfg.tracking:
-                        self.log.track(
-                            1,
-                            "All Archive PIPOs Recalculated; Reset Config JSON.",
-                            True,
-                        )
-
-                    resetCfgValue(self.cfg, self.log, 2, "wt_changed", 0)
+                resetCfgValue(self.cfg, self.log, 2, "wt_changed", 0)
 
         ########################################################################
         # Retrieve a list of the Float's Data Folders; Sort and Reverse.
@@ -190,62 +495,51 @@ class LbProc(object):
         ########################################################################
 
         haveNewStatus = 0
-
-        for dir in allfolders:
-            # -------------------------------------------------------------------
-            # Deal With Status Record First.
-            # -------------------------------------------------------------------
-            # Get the ONLY sys_status.json file that should be in THIS Data
-            # Product folder. Deconstruct it into a JSON object and load into
-            # the 'status' table of the embedded DB.  If any failure detected,
-            # DESTROY the entire DP Folder since, without this Status Record,
-            # all the Data Products in this DP Folder are useless.
-
-            data_prod_folder = self.cfg.lb_data_dir_path + "/" + str(dir)
-            status_file_path = data_prod_folder + "/" + self.cfg.sys_status_file
-            if self.cfg.tracking:
-                self.log.track(0, "", True)
-                self.log.track(0, "Processing Status File.", True)
-                self.log.track(1, "Data Folder: " + str(data_prod_folder), True)
-                self.log.track(1, "Status File: " + str(self.cfg.sys_status_file), True)
-                self.log.track(1, "Consume File from DP Directory.", True)
-
-            success, status_json = readFloatFile(
-                self.cfg, self.log, 2, status_file_path, False, True
-            )
-
-            if success[0]:
-                # Insert Status Record and capture the DB 'rowid' (which will be
-                # the DB foreign key - or, pointer - back to this record in the
-                # DB, that is, embedded in all subsequent Data Product records
-                # associated with this Status record).
-
+        haveNewStatus = 0
+        ingest_ok = True
+        # Folders ingested before the LB deadline (see 'botphase'); past
+        # it, only those are cleaned up and the rest wait for the next
+        # wake-up.
+        ingested = []
+        stopped = False
+
+        # Data Folders are ingested in batches of 'ingest_batch_folders' per
+        # DB transaction; each folder gets its own savepoint so a folder that
+        # can't be stored is rolled back without disturbing the others.
+        batching = self.cfg.ingest_batch_folders > 0
+        if batching:
+            success = self.db.begin_batch(1)
+            if not success[0]:
                 if self.cfg.tracking:
-                    self.log.track(
-                        1, "INSERT Status Record into DB 'status' Table.", True
-                    )
+                    self.log.track(1, "Can't Begin Ingest Batch; Commit Per Record.", True)
+                batching = False
 
-                success, status_rowid, status_id = self.db.pushstat(2, status_json)
-                if not success[0]:
-                    if self.cfg.tracking:
-                        self.log.track(2, "Status Record Insertion Failed.", True)
-                        self.log.track(2, "Entire DP Folder Unusable; Delete it.", True)
-
-                    deleteFolder(self.cfg, self.log, 3, data_prod_folder)
-                    if self.cfg.tracking:
-                        self.log.track(2, "Continue.", True)
-                    continue
-
-            else:
+        for dir in allfolders:
+            if exit_event_lb.is_set():
                 if self.cfg.tracking:
-                    self.log.track(2, "Status File NOT Acquired.", True)
-                    self.log.track(
-                        2, "Consider Entire DP Folder Corrupt; Delete it.", True
-                    )
+                    self.log.track(1, "LB Deadline Passed; Leave Remaining Data Folders.", True)
+                stopped = True
+                break
+            data_prod_folder = self.cfg.lb_data_dir_path + "/" + str(dir)
+            if batching:
+                self.db.begin_folder(1)
 
-                deleteFolder(self.cfg, self.log, 3, data_prod_folder)
-                if self.cfg.tracking:
-                    self.log.track(2, "Continue.", True)
+            keep, status_rowid, status_id = self.lb_ingest_folder(
+                data_prod_folder, batching
+            )
+            ingested.append(dir)
+
+            if batching:
+                success, pending = self.db.end_folder(1, keep)
+                if success[0] and pending >= self.cfg.ingest_batch_folders:
+                    success = self.db.end_batch(1)
+                    if not success[0]:
+                        ingest_ok = False
+                    success = self.db.begin_batch(1)
+                    if not success[0]:
+                        batching = False
+
+            if not keep:
                 continue
 
             # Retain this 'latest' Status Record; these will be retrieved later
@@ -258,168 +552,10 @@ class LbProc(object):
                     )
                     self.log.track(3, "Row ID: " + str(status_rowid) + " Status ID: " + str(status_id), True)
 
-            # -------------------------------------------------------------------
-            # Calculate Trigger Score
-            # -------------------------------------------------------------------
-            if self.cfg.tracking:
-                self.log.track(1, "Calculate Trigger Score.", True)
-
-            trigger, wet, wei = triggerScoreLookup(self.cfg, self.log, 2, status_json)
-            if self.cfg.tracking:
-                self.log.track(2, "Trigger Score:   " + str(trigger), True)
-                self.log.track(2, "Wake Event Type: " + str(wet), True)
-                self.log.track(2, "Wake Event ID: " + str(wei), True)
-
-            # -------------------------------------------------------------------
-            # Find All META Data Files
-            # -------------------------------------------------------------------
-            # The 'sys_status.json' file for this Data Folder is now in the DB;
-            # we need to find ALL Meta Data files (*_meta.json) in this same
-            # Folder (the Status File we're processing right now applies to all
-            # Meta Files in this same Data Folder).
-            if self.cfg.tracking:
-                self.log.track(1, "Get ALL DP Files in This Data Folder.", True)
-                self.log.track(2, "Folder:" + data_prod_folder, True)
-
-            success, allfiles = getAllFileNames(
-                self.cfg, self.log, 2, data_prod_folder, False, False
-            )
-            if not success[0] or not allfiles:
-                if self.cfg.tracking:
-                    self.log.track(2, "Data Folder File NOT ACCESSIBLE.", True)
-                    self.log.track(2, "Remove Entire DP Folder.", True)
-
-                deleteFolder(self.cfg, self.log, 3, data_prod_folder)
-                if self.cfg.tracking:
-                    self.log.track(2, "Continue.", True)
-                continue
-
-            # Retrieve all "meta" files out of the list.
-            allmetafiles = []
-            for f in allfiles:
-                if "sys_status.json" in f:
-                    continue
-                if ".json" in f:
-                    allmetafiles.append(f)
-
-            if not allmetafiles:
-                if self.cfg.tracking:
-                    self.log.track(2, "NO 'Meta' DP Files in this Data Folder.", True)
-                    self.log.track(2, "Done Processing; Remove Entire DP Folder.", True)
-
-                deleteFolder(self.cfg, self.log, 3, data_prod_folder)
-                if self.cfg.tracking:
-                    self.log.track(2, "Continue.", True)
-                continue
-                # log.track(2, "Update Status File with 'meta_state' of 1.", True)
-
-                # sql = "UPDATE status SET meta_state=1 WHERE rowid=" + str(status_rowid)
-                # success = db.update(3, sql)
-                # if cfg.tracking:
-                # log.track(2, "Continue.", True)
-                # continue
-
-            if self.cfg.tracking:
-                self.log.track(2, "Got All 'Meta' DP Files.", True)
-                self.log.track(3, "Files: " + str(allmetafiles), True)
-
-            # -------------------------------------------------------------------
-            # Process Each META File
-            # -------------------------------------------------------------------
-            for mf in allmetafiles:
-                # First, compose the full path to the Meta File.
-                meta_file_path = data_prod_folder + "/" + mf
-                if self.cfg.tracking:
-                    self.log.track(1, "Processing META File: " + str(mf), True)
-                    self.log.track(2, "Path: " + str(data_prod_folder), True)
-                    self.log.track(2, "Consume File from DP Directory.", True)
-
-                # Now process each Meta File by calculating its PIPO Rating,
-                # which evaluates the mandatory 'Standard' Data File and any
-                # optional 'Change' Data File.
-                success, meta_json = readFloatFile(
-                    self.cfg, self.log, 3, meta_file_path, False, True
-                )
-                if not success[0]:
-                    if self.cfg.tracking:
-                        self.log.track(
-                            2, "Can't Access the Data Product's 'Meta' File.", True
-                        )
-                        self.log.track(
-                            2, "These DP Files are Useless; Remove Them.", True
-                        )
-
-                    deleteDataProduct(self.cfg, self.log, 3, meta_file_path)
-                    if self.cfg.tracking:
-                        self.log.track(2, "Move on to next DP; Continue.", True)
-                    continue
-
-                # ---------------------------------------------------------------
-                # Compute the PIPO Rating
-                # ---------------------------------------------------------------
-                # For each Meta File, get the PIPO rating (which also verifies
-                # and returns the mandatory "Standard" and optional "Change"
-                # Data Files that are identified in the Meta File).
-
-                if self.cfg.tracking:
-                    self.log.track(2, "Get the PIPO Rating.", True)
-
-                # TODO: Fix PIPO Rating
-                #  success, info = pipo.getPIPO(3, meta_file_path, meta_json, trigger)
-                # if not success[0]:
-                #     if cfg.tracking:
-                #         log.track(2, "Can't Compute PIPO rating.", True)
-                #         log.track(2, "This DP is of No value; Remove.", True)
-                #
-                #     deleteDataProduct(cfg, log, 3, meta_file_path)
-                #     if cfg.tracking:
-                #         log.track(2, "Move on to next DP; Continue.", True)
-                #     continue
-                # numerator,
-                # std_msg_size,
-                # chg_msg_size,
-                # chg_eligible,
-                # norm,
-                # pipo_rating,
-                # std_file_path,
-                # chg_file_path,
-                # stdjson,
-                # chgjson,
-                # node_code,
-                info = [1.0, 1500, 1500, 1, 1.0, 1.0, "DEF", "DEF", "", "", 0]
-                # ---------------------------------------------------------------
-                # INSERT the META Data Record into the Float's Database.
-                # ---------------------------------------------------------------
-                if self.cfg.tracking:
-                    self.log.track(2, "INSERT Meta Data Record into DB.", True)
-
-                # success = db.pushmeta(3, meta_json, info[3], status_rowid, trigger, info[0], info[1], info[2], info[4], info[5], meta_file_path, stdfile, chgfile)
-                success = self.db.pushdata(
-                    3,
-                    meta_json,
-                    info,
-                    status_id,
-                    trigger,
-                    meta_file_path,
-                )
-
-                if not success[0]:
-                    if self.cfg.tracking:
-                        self.log.track(
-                            2, "Can't Insert Meta Record into DB." + str(mf), True
-                        )
-                        self.log.track(
-                            2, "This DP is of No value; Remove." + str(mf), True
-                        )
-
-                    deleteDataProduct(self.cfg, self.log, 3, meta_file_path)
-                    if self.cfg.tracking:
-                        self.log.track(2, "Move on to next DP; Continue.", True)
-                    continue
-
-                # ---------------------------------------------------------------
-                # DONE LOOP-PROCESSING NEW SDK DATA PRODUCTS.
-                # ---------------------------------------------------------------
+        if batching:
+            success = self.db.end_batch(1)
+            if not success[0]:
+                ingest_ok = False
 
         ########################################################################
         # Housekeeping of Data Directory.
@@ -433,9 +569,17 @@ class LbProc(object):
             self.log.track(0, "Clean Up the Entire Data Directory.", True)
             self.log.track(1, "Get Remaining Data Folders in Data Dir.", True)
 
-        success, allfolders = getAllFolderNames(
-            self.cfg, self.log, 2, self.cfg.lb_data_dir_path, True, True
-        )
+        # If an ingest batch could not be committed its folders are still on
+        # disk and must stay there to be ingested again on the next wake-up.
+        if ingest_ok:
+            success, allfolders = getAllFolderNames(
+                self.cfg, self.log, 2, self.cfg.lb_data_dir_path, True, True
+            )
+            if stopped:
+                allfolders = [f for f in allfolders if f in ingested]
+        else:
+            success = [False, None, None]
+            allfolders = []
 
         if not success[0]:
             if self.cfg.tracking:
@@ -455,28 +599,38 @@ class LbProc(object):
         if not self.nepi_args.lb:
             if self.cfg.tracking:
                 self.log.track(1, "LB Data not requested to be sent to server. LB terminating early after storing status/data records.", True)
-            return True
+            return 0, self.rpt_items
+
+        if exit_event_lb.is_set():
+            if self.cfg.tracking:
+                self.log.track(1, "LB Deadline Passed; No LB Session This Wake-Up.", True)
+            return 0, self.rpt_items
 
         ########################################################################
         # Open The Comm Channel
         ########################################################################
         #
 
-        # def get_enabled_link(_cfg):
-        #     for link in _cfg.lb_conn_order:
-        #         enabled = _cfg[link]["enabled"]
-        #         if enabled:
-        #             yield link
-        #     return None
-
-        # for link in self.cfg.lb_conn_order:
+        # The links worth trying this Session, best first (see 'botlink');
+        # the ones after the link opened here are kept for a failover.
 
-        bc = BotComm(self.cfg, self.log, "ethernet", 1, self.db)
-        success = bc.getconn(0)
+        self.links = LinkScheduler(self.cfg, self.log, 1, self.db)
+        lb_links = self.links.rank(1)
+        bc, lb_link, success = self.openLink(lb_links)
 
-        br = botreports.LbConnItem('lb_ip', 'success')
+        br = botreports.LbConnItem(lb_link, 'success')
         self.rpt_items.append(br)
         br.update_timestart()
+        conn_success = success
+
+        # Everything encoded from here on goes on the persistent uplink
+        # queue, behind whatever earlier Sessions couldn't send.
+        self.outq = OutboundQueue(self.cfg, self.log, 1, self.db)
+        success = self.outq.load(1)
+        if not success[0]:
+            if self.cfg.tracking:
+                self.log.track(1, "Can't Load Earlier Uplink Queue; Continue.", True)
+        self.sm.outq = self.outq
 
         ########################################################################
         # Create the Float Message.
@@ -493,6 +647,9 @@ class LbProc(object):
         if self.cfg.tracking:
             self.log.track(0, "Create the Float Message.", True)
 
+        # Serialized sizes of the messages queued ahead of the packing.
+        queued_sizes = []
+
         if not haveNewStatus:
             if self.cfg.tracking:
                 self.log.track(
@@ -537,43 +694,18 @@ class LbProc(object):
                         3, new_stat_results[0], self.dev_id_bytes, self.db
                     )
                     if success[0]:
+                        queued_sizes.append(self.sm.len)
                         br.update_msgsent(1)
                         br.update_statsent(1)
                         if self.cfg.tracking:
+                            # Queued and set 'packed' together by
+                            # 'OutboundQueue.put()'.
                             self.log.track(
                                 1, "Latest Active SR Successfully Packed.", True
                             )
                             self.log.track(
-                                1, "Update Status Record 'rec_state' to 'packed.'", True
+                                2, "Continue now with Data Products.", True
                             )
-
-                        sql = (
-                                "UPDATE status SET rec_state = '1' WHERE rowid = '"
-                                + str(new_stat_rowid)
-                                + "'"
-                        )
-                        success = self.db.update(2, sql)
-                        if success[0]:
-                            if self.cfg.tracking:
-                                self.log.track(
-                                    2,
-                                    "Latest Active SR 'status Updated (Packed).",
-                                    True,
-                                )
-                                self.log.track(
-                                    2, "Continue now with Data Products.", True
-                                )
-                        else:
-                            if self.cfg.tracking:
-                                self.log.track(2, "Well ... This is Awkward.", True)
-                                self.log.track(
-                                    2,
-                                    "We May Eventually Repack This Same Status Record.",
-                                    True,
-                                )
-                                self.log.track(
-                                    2, "Ignore; Continue with Data Products.", True
-                                )
                     else:
                         if self.cfg.tracking:
                             self.log.track(
@@ -600,8 +732,11 @@ class LbProc(object):
 
         have_active_dp = False
 
-        sql = "SELECT rowid, * FROM data WHERE rec_state in (0,1) ORDER BY pipo DESC LIMIT 32"
-        success, meta_rows = self.db.getResults(1, sql, False)
+        # Rated with the link's own weights, packed to its own sizes.
+        top_k = getattr(self.cfg, lb_link).top_k
+        success, meta_rows = self.pipo.selectTopK(
+            1, top_k, data_select_cols, linkWeights(self.cfg, lb_link)
+        )
 
         if success[0]:
             if not meta_rows:
@@ -633,6 +768,29 @@ class LbProc(object):
                     1, "ERROR Finding Active Data Products in DB; Continue.", True
                 )
 
+        ########################################################################
+        # Pack the Uplink into the Link's Session Budget.
+        ########################################################################
+        # Of the selected Data Products (and the Status Records they need),
+        # keep the set worth the most PIPO that fits the link's byte budget
+        # for this Session; see 'BotPack'.  On failure, try them all.
+
+        if meta_rows:
+            if self.cfg.tracking:
+                self.log.track(0, "Pack Data Products into Session Budget.", True)
+
+            packer = BotPack(self.cfg, self.log, 1, lb_link)
+            success, packed_rows, pack_rpt = packer.plan(
+                1, meta_rows, self.sm, self.db, self.dev_id_bytes, queued_sizes
+            )
+            br.update_packstats(
+                pack_rpt["budget"], pack_rpt["used"], pack_rpt["wasted"]
+            )
+            if success[0]:
+                meta_rows = packed_rows
+            elif self.cfg.tracking:
+                self.log.track(1, "Can't Pack Data Products; Send All.", True)
+
         ########################################################################
         # Fill Balance of Uplink Message with Top Active Data Products.
         ########################################################################
@@ -710,44 +868,12 @@ class LbProc(object):
                             br.update_msgsent(1)
                             br.update_statsent(1)
                             if success[0]:
+                                # Queued and set 'packed' together by
+                                # 'OutboundQueue.put()'.
                                 if self.cfg.tracking:
                                     self.log.track(
                                         3, "PACKED Assoc SR into This Message.", True
                                     )
-
-                                sql = (
-                                        "UPDATE status SET rec_state = '1' WHERE ROWID = '"
-                                        + str(assoc_statrec[0][0])
-                                        + "'"
-                                )
-
-                                if self.cfg.tracking:
-                                    self.log.track(
-                                        3, "Update Assoc SR 'state' to 'packed.'", True
-                                    )
-
-                                success = self.db.update(4, sql)
-                                if success[0]:
-                                    if self.cfg.tracking:
-                                        self.log.track(
-                                            3, "Assoc SR Status Updated (Packed).", True
-                                        )
-                                else:
-                                    if self.cfg.tracking:
-                                        self.log.track(
-                                            3, "Well ... This is Awkward.", True
-                                        )
-                                        self.log.track(
-                                            3,
-                                            "We May Eventually Repack This Same SR.",
-                                            True,
-                                        )
-                                        self.log.track(
-                                            3,
-                                            "Ignore; Continue with Next Data Product.",
-                                            True,
-                                        )
-                                    continue
                 else:
                     if self.cfg.tracking:
                         self.log.track(3, "Assoc SR NOT Available from DB.", True)
@@ -770,60 +896,17 @@ class LbProc(object):
                 br.update_msgsent(1)
                 br.update_datasent(1)
                 if success[0]:
+                    # Queued and set 'packed' together by
+                    # 'OutboundQueue.put()'.
                     if self.cfg.tracking:
                         self.log.track(
                             3, "PACKED Data Product Record into Message.", True
                         )
-                        self.log.track(
-                            3, "Update Meta Record 'state' to 'packed.'", True
-                        )
-
-                        sql = (
-                                "UPDATE data SET rec_state = '1' WHERE rowid = '"
-                                + str(row[0])
-                                + "'"
-                        )
-                        success = self.db.update(4, sql)
-                        if not success[0]:
-                            if self.cfg.tracking:
-                                self.log.track(4, "Well ... This is Awkward.", True)
-                                self.log.track(
-                                    4,
-                                    "Probably Come Back to Bite Us in the Ass.'",
-                                    True,
-                                )
-                                self.log.track(
-                                    4,
-                                    "We May Eventually Repack This Same Meta Record.",
-                                    True,
-                                )
                 else:
                     if self.cfg.tracking:
                         self.log.track(3, "Can't PACK Data Product Record.", True)
                         continue
 
-                # send messages from msg_outgoing
-                if self.msgs_outgoing:  # TODO: CHECK original not
-                    if success[0]:
-                        self.log.track(0, "Sending: ", True)
-                        for item in self.msgs_outgoing:
-                            send_success, cnc_msg = bc.send(1, item, 5, br)
-                            if send_success[0]:
-                                self.log.track(0, "send returned Success", True)
-                                bcsuccess = 1  # Added as gap fix for no scuttle
-                            else:
-                                self.log.track(0, "send returned Not Success", True)
-                                bcsuccess = 0  # Added as gap fix for no scuttle
-
-                    else:
-                        send_success = [False, None, None]
-                        self.msgs_outgoing = None
-                        self.log.track(0, "getconn returned Not Success", True)
-                        bcsuccess = 0  # Added as gap fix for no scuttle
-                else:
-                    if self.cfg.tracking:
-                        self.log.track(0, "NO Uplink Message to Send.", True)
-
         if self.cfg.tracking:
             self.log.track(1, "Final Message Complete.", True)
             #self.log.track(2, "Buf Len: " + str(len(str(self.sm.buf))), True)
@@ -876,21 +959,16 @@ class LbProc(object):
         # Open Communications Port and Send the Messages.
         ########################################################################
 
-        # def get_enabled_link(_cfg):
-        #     for link in _cfg.lb_conn_order:
-        #         enabled = _cfg[link]["enabled"]
-        #         if enabled:
-        #             yield link
-        #     return None
-        #
-        # bc = BotComm(self.cfg, self.log, "ethernet", 1)
-        # success = bc.getconn(0)
-
         # Receive messages from server
-        recv_success = bc.receive(1, 1)
+        if conn_success[0]:
+            recv_success = self.receiveLink(bc)
+        else:
+            recv_success = [False, None, None]
         if recv_success[0]:
             self.log.track(0, "receive returned Success", True)
             bcsuccess = 1
+            if self.cfg.lb_msg_batch:
+                self.sm.unbatch_incoming(1)
         else:
             recv_success = [False, None, None]
 
@@ -1051,32 +1129,56 @@ class LbProc(object):
                     self.log.track(0, f"Unknown message routing '{msg_routing}'", True)
                     self.log.track(0, "Continuing to next message...", True)
 
-        if len(self.msgs_outgoing) > 0:
-            if success[0]:
-                self.log.track(0, "Sending: ", True)
-                for item in self.msgs_outgoing:
-                    send_success, cnc_msg = bc.send(1, item, 5, br)
-                    if send_success[0]:
-                        self.log.track(0, "send returned Success", True)
-                        bcsuccess = 1  # Added as gap fix for no scuttle
-                    else:
-                        self.log.track(0, "send returned Not Success", True)
-                        bcsuccess = 0  # Added as gap fix for no scuttle
-
-            else:
-                send_success = [False, None, None]
-                self.msgs_outgoing = None
-                self.log.track(0, "getconn returned Not Success", True)
-                bcsuccess = 0  # Added as gap fix for no scuttle
-        else:
+        ########################################################################
+        # Flush the Uplink Queue.
+        ########################################################################
+        # The one send stage of the Session: the queue goes out in order
+        # (in batch envelopes with 'lb_msg_batch') and each message is
+        # dequeued, its record set 'sent', once the link has taken it.
+        # Replies to the second downlink read below wait in the queue for
+        # the next Session.  Should the link fail, what it didn't take is
+        # still queued, encoded, and goes out on the next link in line.
+
+        if not conn_success[0]:
+            send_success = [False, None, None]
+            self.log.track(0, "getconn returned Not Success", True)
+            bcsuccess = 0  # Added as gap fix for no scuttle
+        elif not len(self.outq):
+            send_success = [True, None, None]
             if self.cfg.tracking:
                 self.log.track(0, "NO Uplink Message to Send.", True)
+        else:
+            self.log.track(0, "Sending: " + str(len(self.outq)), True)
+            send_success = self.flushLink(bc, lb_link, br)
+            while not send_success[0] and lb_links and not exit_event_lb.is_set():
+                self.log.track(0, "send on " + str(lb_link) + " returned Not Success; Fail Over", True)
+                self.links.record(1, lb_link, False, self.link_latency, self.link_sent, self.link_secs)
+                bc.close(1)
+                br.update_timestop()
+                bc, lb_link, conn_success = self.openLink(lb_links)
+                br = botreports.LbConnItem(lb_link, 'failover')
+                self.rpt_items.append(br)
+                br.update_timestart()
+                if not conn_success[0]:
+                    break
+                send_success = self.flushLink(bc, lb_link, br)
+            if send_success[0]:
+                self.log.track(0, "send returned Success", True)
+                bcsuccess = 1  # Added as gap fix for no scuttle
+            else:
+                self.log.track(0, "send returned Not Success", True)
+                bcsuccess = 0  # Added as gap fix for no scuttle
 
         # Receive messages from server ... again
-        recv_success = bc.receive(1, 1)
+        if conn_success[0]:
+            recv_success = self.receiveLink(bc)
+        else:
+            recv_success = [False, None, None]
         if recv_success[0]:
             self.log.track(0, "receive returned Success", True)
             bcsuccess = 1
+            if self.cfg.lb_msg_batch:
+                self.sm.unbatch_incoming(1)
         else:
             recv_success = [False, None, None]
 
@@ -1224,28 +1326,12 @@ class LbProc(object):
                     self.log.track(0, f"Unknown message routing '{msg_routing}'", True)
                     self.log.track(0, "Continuing to next message...", True)
 
-        if not self.msgs_outgoing:
-            if success[0]:
-                self.log.track(0, "Sending: ", True)
-                for item in self.msgs_outgoing:
-                    send_success, cnc_msg = bc.send(1, item, 5, br)
-                    if send_success[0]:
-                        self.log.track(0, "send returned Success", True)
-                        bcsuccess = 1  # Added as gap fix for no scuttle
-                    else:
-                        self.log.track(0, "send returned Not Success", True)
-                        bcsuccess = 0  # Added as gap fix for no scuttle
-
-            else:
-                send_success = [False, None, None]
-                self.msgs_outgoing = None
-                self.log.track(0, "getconn returned Not Success", True)
-                bcsuccess = 0  # Added as gap fix for no scuttle
-        else:
-            if self.cfg.tracking:
-                self.log.track(0, "NO Uplink Message to Send.", True)
-
-        success = bc.close(1)
+        if conn_success[0]:
+            self.links.record(
+                1, lb_link, send_success[0], self.link_latency, self.link_sent, self.link_secs
+            )
+        if bc is not None:
+            success = bc.close(1)
 
         ########################################################################
         # Make sure any downlinked commands get processed.
@@ -1337,97 +1423,32 @@ class LbProc(object):
         if self.cfg.tracking:
             self.log.track(0, "Perform DB Housekeeping.", True)
 
-        if self.sm.len > 0:
-            if send_success[0]:
-                if self.cfg.tracking:
-                    self.log.track(
-                        1, "Update Bit-Packed Status Record(s) to 'sent' Status.", True
-                    )
-
-                sql = "UPDATE status SET rec_state = '2' WHERE rec_state = '1'"
-                success = self.db.update(2, sql)
-                if not success[0]:
-                    if self.cfg.tracking:
-                        self.log.track(2, "Well ... This is Awkward.", True)
-                else:
-                    if self.cfg.tracking:
-                        self.log.track(2, "Done.", True)
-
-                if self.cfg.tracking:
-                    self.log.track(
-                        1, "Update Bit-Packed Meta Record(s) to 'sent' Status.", True
-                    )
-
-                sql = "UPDATE data SET rec_state = '2' WHERE rec_state = '1'"
-                success = self.db.update(2, sql)
-                if not success[0]:
-                    if self.cfg.tracking:
-                        self.log.track(2, "Well ... This is Awkward.", True)
-                else:
-                    if self.cfg.tracking:
-                        self.log.track(2, "Done.", True)
-
-                if self.cfg.tracking:
-                    self.log.track(1, "Update 'node' Table.", True)
+        # The sent records were set 'sent' by the queue as they went out;
+        # the others keep their place in it (and stay 'packed').
+        if self.outq.sent or len(self.outq):
+            if self.cfg.tracking:
+                self.log.track(1, "Records Sent:   " + str(self.outq.sent), True)
+                self.log.track(1, "Records Queued: " + str(len(self.outq)), True)
+                self.log.track(1, "Update 'node' Table.", True)
 
+            if send_success[0]:
                 sql = "UPDATE node SET node_index = node_stage"
-                success = self.db.update(2, sql)
-
-                if not success[0]:
-                    if self.cfg.tracking:
-                        self.log.track(2, "Well ... This is Awkward.", True)
-                else:
-                    if self.cfg.tracking:
-                        self.log.track(2, "Done.", True)
             else:
-                if self.cfg.tracking:
-                    self.log.track(
-                        1,
-                        "Reset Bit-Packed Status Record(s) to 'new/active' Status.",
-                        True,
-                    )
-
-                sql = "UPDATE status SET rec_state = '0' WHERE rec_state = '1'"
-                success = self.db.update(2, sql)
-                if not success[0]:
-                    if self.cfg.tracking:
-                        self.log.track(2, "Well ... This is Awkward.", True)
-                else:
-                    if self.cfg.tracking:
-                        self.log.track(2, "Done.", True)
+                sql = "UPDATE node SET node_stage = node_index"
+            success = self.db.update(2, sql)
 
+            if not success[0]:
                 if self.cfg.tracking:
-                    self.log.track(
-                        1,
-                        "Reset Bit-Packed Meta Record(s) to 'new/active' Status.",
-                        True,
-                    )
-
-                sql = "UPDATE data SET rec_state = '0' WHERE rec_state = '1'"
-                success = self.db.update(2, sql)
-                if not success[0]:
-                    if self.cfg.tracking:
-                        self.log.track(2, "Well ... This is Awkward.", True)
-                else:
-                    if self.cfg.tracking:
-                        self.log.track(2, "Done.", True)
-
+                    self.log.track(2, "Well ... This is Awkward.", True)
+            else:
                 if self.cfg.tracking:
-                    self.log.track(1, "Update 'node' Table.", True)
-
-                sql = "UPDATE node SET node_stage = node_index"
-                success = self.db.update(2, sql)
-
-                if not success[0]:
-                    if self.cfg.tracking:
-                        self.log.track(2, "Well ... This is Awkward.", True)
-                else:
-                    if self.cfg.tracking:
-                        self.log.track(2, "Done.", True)
+                    self.log.track(2, "Done.", True)
         else:
             if self.cfg.tracking:
                 self.log.track(1, "NO Message = NO Housekeeping to be Done.", True)
 
+        self.sm.outq = None
+
         br.update_timestop()
         return 0, self.rpt_items
         # save botcomm_index to db and close db
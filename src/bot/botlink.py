@@ -0,0 +1,237 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# LB link selection.  The enabled links of 'lb_conn_order' that BotComm
+# can open are probed cheaply (a route to the 'ethernet' host, the
+# 'iridium' serial device being there) and ranked by the time each would
+# take to carry this wake-up's backlog, from its history in the DB
+# ('link_stats'): connect latency, goodput and failure rate, smoothed
+# over the Sessions with weight 'lb_link_alpha'.  A link without history
+# starts from its type's prior.  A link that takes its messages whole
+# (no NEPI packet splitting) can only carry the backlog items within its
+# own 'max_msg_size'; the rest count against it.  The ranking is also the
+# failover order: the uplink stays encoded in the OutboundQueue, so a
+# link that fails mid-Session is simply followed by the next.
+#
+import os
+import time
+import socket
+
+v_botlink = "bot71-20200601"
+
+# BotComm types the LB can open, with their (goodput bytes/s, connect
+# latency s) priors: an 'ethernet' tunnel, an SBD MO message per session.
+link_priors = {
+    "ethernet": (20000.0, 5.0),
+    "iridium": (17.0, 15.0),
+}
+
+
+# ---------------------------------------------------------------
+# linkWeights() module function.
+# ---------------------------------------------------------------
+# The link's PIPO weight factors as the (scor, qual, size, trig, time)
+# tuple of 'BotPIPO.getWeights()'.
+def linkWeights(_cfg, _link):
+    lcfg = getattr(_cfg, _link)
+    return (
+        lcfg.pipo_scor_wt,
+        lcfg.pipo_qual_wt,
+        lcfg.pipo_size_wt,
+        lcfg.pipo_trig_wt,
+        lcfg.pipo_time_wt,
+    )
+
+
+########################################################################
+# The LB Link Scheduler Class
+########################################################################
+
+
+class LinkScheduler(object):
+    def __init__(self, _cfg, _log, _lev, _db, _clock=time.time):
+        self.cfg = _cfg
+        self.log = _log
+        self.db = _db
+        self.clock = _clock
+        self.alpha = self.cfg.lb_link_alpha
+        self.stats = {}
+        self.loaded = False
+
+        if self.cfg.tracking:
+            self.log.track(_lev, "Created LinkScheduler Class Object.", True)
+
+    # ---------------------------------------------------------------
+    # candidates() class module.
+    # ---------------------------------------------------------------
+    # The enabled links BotComm can open, in 'lb_conn_order'.
+    def candidates(self):
+        out = []
+        for link in self.cfg.lb_conn_order:
+            lcfg = getattr(self.cfg, link, None)
+            if lcfg is not None and lcfg.enabled and lcfg.type in link_priors:
+                out.append(link)
+        return out
+
+    # ---------------------------------------------------------------
+    # probe() class module.
+    # ---------------------------------------------------------------
+    # Whether the link looks usable, without opening it: the 'ethernet'
+    # host resolves and has a route (a UDP connect() sends nothing), the
+    # 'iridium' serial device exists and can be opened read/write.
+    def probe(self, _lev, _link):
+        lcfg = getattr(self.cfg, _link)
+        try:
+            if lcfg.type == "ethernet":
+                family, kind, proto, name, addr = socket.getaddrinfo(
+                    lcfg.host, None, 0, socket.SOCK_DGRAM
+                )[0]
+                with socket.socket(family, kind) as sock:
+                    sock.connect((addr[0], 9) + tuple(addr[2:]))
+                return True
+            return os.access(lcfg.port, os.R_OK | os.W_OK)
+        except (OSError, IndexError) as e:
+            if self.cfg.tracking:
+                self.log.track(_lev, str(_link) + " Probe Failed [" + str(e) + "]", True)
+            return False
+
+    # ---------------------------------------------------------------
+    # load() class module.
+    # ---------------------------------------------------------------
+    def load(self, _lev):
+        sql = "SELECT link, sessions, failures, bytes, goodput, latency, fail_rate FROM link_stats"
+        success, rows = self.db.getResults(_lev, sql, False)
+        if success[0]:
+            self.loaded = True
+            self.stats = dict(
+                (row[0], {
+                    "sessions": row[1], "failures": row[2], "bytes": row[3],
+                    "goodput": row[4], "latency": row[5], "fail_rate": row[6],
+                })
+                for row in rows
+            )
+        return success
+
+    # ---------------------------------------------------------------
+    # backlog() class module.
+    # ---------------------------------------------------------------
+    # Sizes of what this Session has to send: the queued messages and the
+    # Active Data Records the selection may take (the largest 'top_k' of
+    # the candidates, newest first).
+    def backlog(self, _lev, _links):
+        sizes = []
+        success, rows = self.db.getResults(_lev, "SELECT length(msg) FROM outbound", False)
+        if success[0]:
+            sizes += [r[0] or 0 for r in rows]
+        top_k = max([getattr(self.cfg, link).top_k for link in _links] or [0])
+        sql = (
+            "SELECT payload_size FROM data WHERE rec_state IN (0,1)"
+            " ORDER BY timestamp DESC LIMIT ?"
+        )
+        success, rows = self.db.getResults(_lev, sql, False, (top_k,))
+        if success[0]:
+            sizes += [r[0] or 0 for r in rows]
+        return sizes
+
+    # ---------------------------------------------------------------
+    # estimate() class module.
+    # ---------------------------------------------------------------
+    # Expected seconds for '_link' to carry the backlog '_sizes': connect
+    # latency plus the bytes it can take at its goodput, over its success
+    # rate, scaled up by the share of the backlog it can't take at all.
+    def estimate(self, _link, _sizes):
+        lcfg = getattr(self.cfg, _link)
+        goodput, latency = link_priors[lcfg.type]
+        fail_rate = 0.0
+        hist = self.stats.get(_link)
+        if hist is not None:
+            goodput = hist["goodput"] or goodput
+            latency = hist["latency"] if hist["latency"] is not None else latency
+            fail_rate = hist["fail_rate"] or 0.0
+
+        total = sum(_sizes)
+        if lcfg.type == "ethernet":
+            carried = total
+        else:
+            carried = sum(s for s in _sizes if s <= lcfg.max_msg_size)
+        secs = (latency + carried / max(goodput, 1e-3)) / max(1.0 - fail_rate, 0.05)
+        share = carried / total if total else 1.0
+        return secs / max(share, 0.01)
+
+    # ---------------------------------------------------------------
+    # rank() class module.
+    # ---------------------------------------------------------------
+    # The links to try this Session, best first.  Links failing the probe
+    # are left out, unless they all do.  With 'lb_link_select' off it is
+    # 'lb_conn_order' as is, and with no link to open, the 'lb_ip' link.
+    def rank(self, _lev):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering 'rank()' Class Method.", True)
+
+        links = self.candidates()
+        if not links:
+            if self.cfg.tracking:
+                self.log.track(_lev + 1, "No Enabled LB Link; Use 'lb_ip'.", True)
+            return ["lb_ip"]
+        if not self.cfg.lb_link_select:
+            return links
+
+        self.load(_lev + 1)
+        sizes = self.backlog(_lev + 1, links)
+        up = [link for link in links if self.probe(_lev + 1, link)]
+        order = dict((link, i) for i, link in enumerate(links))
+        ranked = sorted(up or links, key=lambda link: (self.estimate(link, sizes), order[link]))
+
+        if self.cfg.tracking:
+            self.log.track(_lev + 1, "Backlog: %d items, %d bytes" % (len(sizes), sum(sizes)), True)
+            for link in links:
+                self.log.track(
+                    _lev + 1,
+                    "%s: probe %s, estimate %.1f s, history %s"
+                    % (link, link in up, self.estimate(link, sizes), self.stats.get(link)),
+                    True,
+                )
+            self.log.track(_lev + 1, "Order: " + str(ranked), True)
+        return ranked
+
+    # ---------------------------------------------------------------
+    # record() class module.
+    # ---------------------------------------------------------------
+    # Fold one Session on '_link' into its history: whether it went
+    # through, the connect latency and the bytes sent in '_secs'.
+    def record(self, _lev, _link, _ok, _latency=None, _bytes=0, _secs=0.0):
+        if not self.loaded:
+            self.load(_lev + 1)
+        a = self.alpha
+        hist = self.stats.get(_link)
+        if hist is None:
+            goodput, latency = link_priors.get(getattr(self.cfg, _link).type, (None, None))
+            hist = {
+                "sessions": 0, "failures": 0, "bytes": 0,
+                "goodput": goodput, "latency": latency, "fail_rate": 0.0,
+            }
+        hist["sessions"] += 1
+        hist["failures"] += 0 if _ok else 1
+        hist["bytes"] += _bytes
+        hist["fail_rate"] = (1 - a) * hist["fail_rate"] + a * (0.0 if _ok else 1.0)
+        if _latency is not None:
+            hist["latency"] = (1 - a) * hist["latency"] + a * _latency
+        if _bytes > 0 and _secs > 0:
+            hist["goodput"] = (1 - a) * hist["goodput"] + a * (_bytes / _secs)
+        self.stats[_link] = hist
+
+        if self.cfg.tracking:
+            self.log.track(_lev, "Link History: " + str(_link) + " " + str(hist), True)
+        return self.db.update(
+            _lev + 1,
+            "INSERT OR REPLACE INTO link_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                _link, hist["sessions"], hist["failures"], hist["bytes"],
+                hist["goodput"], hist["latency"], hist["fail_rate"], self.clock(),
+            ),
+        )
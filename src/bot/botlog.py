@@ -11,6 +11,7 @@ import os
 import sys
 import time
 import errno
+import threading
 
 # from botcfg import v_botcfg
 # from botcomm import v_botcomm
@@ -37,6 +38,8 @@ class BotLog(object):
         self.file = None
         self.app = None
         self.indent = "                          "
+        # The HB phase can track from its own thread (see 'botphase').
+        self.lock = threading.Lock()
 
         if str(_which) == "BOT-RECV":
             self.file = self.cfg.bs_log_file
@@ -177,6 +180,27 @@ class BotLog(object):
             self.track(_lev + 1, "db_file: " + str(self.cfg.db_file), True)
             self.track(_lev + 1, "db_name: " + str(self.cfg.db_name), True)
             self.track(_lev + 1, "db_deletes: " + str(self.cfg.db_deletes), True)
+            self.track(
+                _lev + 1,
+                "ingest_batch_folders: " + str(self.cfg.ingest_batch_folders),
+                True,
+            )
+            self.track(
+                _lev + 1,
+                "counter_block_size: " + str(self.cfg.counter_block_size),
+                True,
+            )
+            self.track(
+                _lev + 1, "db_tuning: " + str(self.cfg.db_tuning.profile), True
+            )
+            self.track(
+                _lev + 1, "payload_dir_path: " + str(self.cfg.payload_dir_path), True
+            )
+            self.track(
+                _lev + 1,
+                "payload_inline_max: " + str(self.cfg.payload_inline_max),
+                True,
+            )
             self.track(_lev + 1, "log_dir: " + str(self.cfg.log_dir), True)
             self.track(_lev + 1, "log_clear: " + str(self.cfg.log_clear), True)
             # self.track(_lev+1, "br_log_name: " +
@@ -196,7 +220,9 @@ class BotLog(object):
             self.track(_lev + 1, "pipo_trig_wt: " + str(self.cfg.pipo_trig_wt), True)
             self.track(_lev + 1, "pipo_size_wt: " + str(self.cfg.pipo_size_wt), True)
             self.track(_lev + 1, "pipo_time_wt: " + str(self.cfg.pipo_time_wt), True)
+            self.track(_lev + 1, "pipo_rerate: " + str(self.cfg.pipo_rerate), True)
             self.track(_lev + 1, "purge_rating: " + str(self.cfg.purge_rating), True)
+            self.track(_lev + 1, "lb_msg_batch: " + str(self.cfg.lb_msg_batch), True)
             # self.track(_lev+1, "max_msg_size: " +
             #            str(self.cfg.max_msg_size), True)
 
@@ -214,40 +240,41 @@ class BotLog(object):
             yeslog = False
 
         if yesdbg or yeslog:
-            inum = lev
-            if lev > 11:
-                inum = lev - 12
+            with self.lock:
+                inum = lev
+                if lev > 11:
+                    inum = lev - 12
+
+                # AGV
+                # if self.cfg.timing:
+                #     self.ti = str(time.ctime()) + ": "
+                # else:
+                #     self.ti = ""
+                self.ti = str(time.ctime()) + ": "
+
+                if new:
+                    self.nl = "\n"
+                else:
+                    self.nl = ""
+
+                self.ind = self.indent[0: 2 * inum]
+                self.msg = str(self.ti) + str(self.ind) + str(msg) + str(self.nl)
+
+                if yesdbg:
+                    try:
+                        sys.stdout.write(self.msg)
+                        sys.stdout.flush()
+                    except:
+                        self.cfg.debugging = False  # On error, turn off debugging
 
-            # AGV
-            # if self.cfg.timing:
-            #     self.ti = str(time.ctime()) + ": "
-            # else:
-            #     self.ti = ""
-            self.ti = str(time.ctime()) + ": "
-
-            if new:
-                self.nl = "\n"
-            else:
-                self.nl = ""
-
-            self.ind = self.indent[0: 2 * inum]
-            self.msg = str(self.ti) + str(self.ind) + str(msg) + str(self.nl)
-
-            if yesdbg:
-                try:
-                    sys.stdout.write(self.msg)
-                    sys.stdout.flush()
-                except:
-                    self.cfg.debugging = False  # On error, turn off debugging
-
-            if yeslog:
-                try:
-                    self.log = open(self.file, "a")
-                    self.log.write(self.msg)
-                    self.log.flush()
-                    self.log.close()
-                except:
-                    self.cfg.logging = False  # On error, turn off logging
+                if yeslog:
+                    try:
+                        self.log = open(self.file, "a")
+                        self.log.write(self.msg)
+                        self.log.flush()
+                        self.log.close()
+                    except:
+                        self.cfg.logging = False  # On error, turn off logging
 
     def errtrack(self, _enum, _emsg):
         msg = "ERROR: " + str(_enum) + ": " + str(_emsg)
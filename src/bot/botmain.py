@@ -38,6 +38,8 @@ from bothelp import (
 )
 
 from botlog import BotLog
+import bothelp
+from botphase import BotPhases, phaseTout
 
 # import botlog
 # import botcomm
@@ -164,25 +166,38 @@ try:
 except Exception as e:
     log.track(1, "ERROR: Cannot create the LbProc class. NEPI-BOT terminating.", True)
     sys.exit(1)
-try:
-    success = lbproc.lb_process_data()
-    lb_conn_list = success[1]
-except Exception as e:
-    log.track(1, "ERROR: Problem processing LB Data. NEPI-BOT continuing.", True)
 
 ########################################################################
-# Instantiate a HB transfer process if requested
+# Run the LB and HB phases, each against its deadline (see 'botphase').
 ########################################################################
+# The LB phase runs on this thread, which owns the DB connection.  A
+# requested HB transfer runs in the background alongside it, or after
+# it with 'hb_lb_overlap' off.
+
+phases = BotPhases(cfg, log, 0)
+phases.add("lb", bothelp.exit_event_lb, phaseTout(nepi_args.lbto))
 
 hbproc = None
 if nepi_args.hb is True:
     hbproc = bothbproc.HbProc(cfg, log, 0, dev_id_str, nepi_args)
-    rc = hbproc.run_hb_proc()
+    phases.add("hb", bothelp.exit_event_hb, phaseTout(nepi_args.hbto))
+    if cfg.hb_lb_overlap:
+        log.track(1, "Starting HB thread worker process.", True)
+        phases.run("hb", hbproc.run_hb_proc, True)
 
-# #     log.track(1, "Starting HB thread worker process.", True)
-# #     hb_thread = threading.Thread(target=hbproc.run_hb_proc)
-# #     hb_thread.start()
-#     success = hbproc.run_hb_proc()
+try:
+    success = phases.run("lb", lbproc.lb_process_data)
+    lb_conn_list = success[1]
+except Exception as e:
+    log.track(1, "ERROR: Problem processing LB Data. NEPI-BOT continuing.", True)
+
+# 'hb_stopped' is False when the HB phase was left behind still running
+# (see 'BotPhases.wait()'); it may be using the ssh connection yet.
+hb_stopped = True
+if hbproc:
+    if not cfg.hb_lb_overlap:
+        phases.run("hb", hbproc.run_hb_proc, True)
+    hb_stopped = phases.wait("hb")
 
 # if cfg.tracking:
 #     log.track(0, "Recalculate Archived PIPO Ratings.", True)
@@ -1267,11 +1282,11 @@ except Exception as e:
 
 # TODO: remove hardcoded names
 
-lbrpt=LbRpt('lb_execution_status.json', lb_conn_list)
+lbrpt=LbRpt('lb_execution_status.json', lb_conn_list, phases.report("lb"))
 lbrpt.create_lb_report()
 
 if hbproc:
-    hbrpt = HbRpt('hb_execution_status.json')
+    hbrpt = HbRpt('hb_execution_status.json', phases.report("hb"), hbproc.ssh.stats())
     hbrpt.create_hb_report()
 
 
@@ -1280,14 +1295,21 @@ if hbproc:
 ########################################################################
 
 try:
-    if hbproc:
-        hbproc.transfer_logs()
+    if not hbproc:
+        log.track(0, "Unable to copy log files to Server. HB connection inactive.", True)
+    elif not hb_stopped:
+        log.track(0, "Unable to copy log files to Server. HB phase did not stop.", True)
+    elif hbproc.transfer_logs(cfg.hb_ip.log_tout):
         log.track(0, "Log files copied to Server.", True)
     else:
-        log.track(0, "Unable to copy log files to Server. HB connection inactive.", True)
+        log.track(0, "Unable to copy log files to Server.", True)
 except Exception as e:
     log.track(0, f"Unable to copy log files to Server.", True)
 
+# After any command of an HB phase left behind (see 'SshMux.close()').
+if hbproc:
+    hbproc.ssh.close(0)
+
 ########################################################################
 # Close the Bot-Main Subsystem.
 ########################################################################
@@ -17,11 +17,19 @@ from google.protobuf import message
 
 import nepi_messaging_all_pb2
 from botdefs import msgs_outgoing, msgs_incoming, msg_gen_trace
+from botbatch import unbatchMsg
 
 # from numpy.core import double, int32, uint32, int64, uint64 as np
 
 v_botmsg = "bot71-20200601"
 
+# Largest 'comm_index' (as a varint), for sizing a message before its
+# index is assigned.
+sizing_comm_index = 0xFFFFFFFF
+
+# Field number of the NEPIMsg 'nuid' (shared by a batch envelope).
+nuid_field = nepi_messaging_all_pb2.NEPIMsg.DESCRIPTOR.fields_by_name["nuid"].number
+
 ########################################################################
 # The Bot Message Class Library For Both Server and Device
 ########################################################################
@@ -44,6 +52,7 @@ class BotMsg(object):
         self.len = 0
         self.type = None
         self.msg_gen_trace = msg_gen_trace
+        self.outq = None
 
     class MsgType(Enum):
         STATUS = 1
@@ -92,6 +101,156 @@ class BotMsg(object):
             return True
         return False
 
+    # -------------------------------------------------------------------
+    # The 'build_status_msg()' Class Library Method.
+    # -------------------------------------------------------------------
+    # Build (but don't serialize or queue) the NEPIMsg for a Status Record.
+    # Raises on a malformed record.
+    def build_status_msg(self, _rec, _dev_id_bytes, _comm_index):
+        ## Set NEPI Message
+        nepi_msg = nepi_messaging_all_pb2.NEPIMsg()
+        nepi_msg.comm_index = _comm_index
+        nepi_msg.nuid = _dev_id_bytes
+
+        # Set system status
+        system_status = nepi_msg.sys_status
+
+        # Set Sys status components added by NEPI-BOT
+        system_status_nepi_bot = system_status.nepi_bot_status
+        system_status_nepi_bot.sys_status_id = _rec[2]
+        system_status_nepi_bot.nepi_bot_status_flags = 2 # TODO: Should not be hard-coded
+
+        # Set Sys status components provided by device
+        system_status_device = system_status.device_status
+        dt = datetime.datetime.fromtimestamp(_rec[5], None)
+        system_status_device.timestamp.FromDatetime(dt)
+        system_status_device.navsat_fix_time_offset = np.int32(_rec[6])
+        system_status_device.defined_latitude = float(_rec[7])
+        system_status_device.defined_longitude = float(_rec[8])
+        system_status_device.defined_heading = np.uint32(_rec[9])
+        system_status_device.heading_true_north = int(_rec[10])
+        system_status_device.roll = np.int32(_rec[11])
+        system_status_device.pitch = np.int32(_rec[12])
+        system_status_device.temperature = np.int32(_rec[13])
+        system_status_device.power_state = np.uint32(_rec[14])
+        system_status_device.device_status = bytes(_rec[15])
+
+        return nepi_msg
+
+    # -------------------------------------------------------------------
+    # The 'build_data_msg()' Class Library Method.
+    # -------------------------------------------------------------------
+    # Build (but don't serialize or queue) the NEPIMsg for a Data Record
+    # around '_payload'.  Raises on a malformed record.
+    def build_data_msg(self, _rec, _dev_id_bytes, _comm_index, _payload):
+        ## Set NEPI Message
+        nepi_msg = nepi_messaging_all_pb2.NEPIMsg()
+        nepi_msg.comm_index = _comm_index
+        nepi_msg.nuid = _dev_id_bytes
+
+        # Set data message
+        data_message = nepi_msg.data_msg
+
+        # Set nepi-bot metadata
+        data_message_nepi_bot = data_message.nepi_bot_metadata
+        data_message_nepi_bot.sys_status_id = int(_rec[2])
+        data_message_nepi_bot.file_extension = str(_rec[14])
+
+        # Set nepi device data
+        data_message_device_data = data_message.device_data
+        data_message_device_data.type = str(_rec[5])
+        data_message_device_data.instance = int(_rec[6])
+        data_message_device_data.data_time_offset = int(_rec[7])
+        data_message_device_data.latitude_offset = int(_rec[8])
+        data_message_device_data.longitude_offset = int(_rec[9])
+        data_message_device_data.heading_offset = int(_rec[10])
+        data_message_device_data.roll_offset = int(_rec[11])
+        data_message_device_data.pitch_offset = int(_rec[12])
+        data_message_device_data.payload = _payload
+
+        return nepi_msg
+
+    # -------------------------------------------------------------------
+    # The 'size_status_msg()' Class Library Method.
+    # -------------------------------------------------------------------
+    # Serialized size of a Status Record's NEPIMsg, without consuming a
+    # 'comm_index' (the largest one is assumed, so the size is an upper
+    # bound by at most a few bytes).
+    def size_status_msg(self, _lev, _rec, _dev_id_bytes):
+        try:
+            nepi_msg = self.build_status_msg(_rec, _dev_id_bytes, sizing_comm_index)
+            size = nepi_msg.ByteSize()
+        except Exception as e:
+            enum = "MSG103"
+            emsg = f"size_status_msg(): Problem sizing status record [{e}]."
+            if self.cfg.tracking:
+                self.log.track(_lev, str(enum) + ": " + str(emsg), True)
+            return [False, str(enum), str(emsg)], None
+
+        return [True, None, None], size
+
+    # -------------------------------------------------------------------
+    # The 'size_data_msg()' Class Library Method.
+    # -------------------------------------------------------------------
+    # Serialized size of a Data Record's NEPIMsg, as 'size_status_msg()'.
+    # The payload isn't read when the record knows its size.
+    def size_data_msg(self, _lev, _rec, _dev_id_bytes, db):
+        try:
+            if _rec[27] is None:
+                success, payload = db.load_payload(_lev + 1, _rec)
+                if not success[0]:
+                    return success, None
+            else:
+                payload = bytes(int(_rec[27]))
+            nepi_msg = self.build_data_msg(
+                _rec, _dev_id_bytes, sizing_comm_index, payload
+            )
+            size = nepi_msg.ByteSize()
+        except Exception as e:
+            enum = "MSG103"
+            emsg = f"size_data_msg(): Problem sizing data record [{e}]."
+            if self.cfg.tracking:
+                self.log.track(_lev, str(enum) + ": " + str(emsg), True)
+            return [False, str(enum), str(emsg)], None
+
+        return [True, None, None], size
+
+    # -------------------------------------------------------------------
+    # The 'enqueue()' Class Library Method.
+    # -------------------------------------------------------------------
+    # Queue the message just encoded ('self.buf1') for the uplink: on the
+    # LB link's OutboundQueue when one is attached ('self.outq'), else on
+    # the plain 'msgs_outgoing' list.
+    def enqueue(self, _lev, _kind, _rec_rowid=None):
+        if self.outq is None:
+            msgs_outgoing.append(self.buf1)
+            return [True, None, None]
+        return self.outq.put(_lev, self.buf1, _kind, _rec_rowid)
+
+    # -------------------------------------------------------------------
+    # The 'unbatch_incoming()' Class Library Method.
+    # -------------------------------------------------------------------
+    # Expand any batch envelopes among the received messages
+    # ('msgs_incoming', in place).  A malformed envelope is dropped.
+    def unbatch_incoming(self, _lev):
+        expanded = []
+        for wire in msgs_incoming:
+            try:
+                expanded.extend(unbatchMsg(wire, nuid_field))
+            except ValueError as e:
+                enum = "MSG104"
+                emsg = f"unbatch_incoming(): Dropped batch envelope [{e}]."
+                if self.cfg.tracking:
+                    self.log.track(_lev, str(enum) + ": " + str(emsg), True)
+        if self.cfg.tracking and len(expanded) != len(msgs_incoming):
+            self.log.track(
+                _lev,
+                f"Unbatched {len(msgs_incoming)} messages into {len(expanded)}.",
+                True,
+            )
+        msgs_incoming[:] = expanded
+        return [True, None, None]
+
     # -------------------------------------------------------------------
     # The 'encode_status_msg()' Class Library Method. Protobuf implementation
     # -------------------------------------------------------------------
@@ -103,33 +262,9 @@ class BotMsg(object):
             self.log.track(_lev + 13, "_rec: " + str(_rec), True)
 
         try:
-            ## Set NEPI Message
-            nepi_msg = nepi_messaging_all_pb2.NEPIMsg()
-            nepi_msg.comm_index = db.get_botcomm_index()
-            nepi_msg.nuid = dev_id_bytes
-
-            # Set system status
-            system_status = nepi_msg.sys_status
-
-            # Set Sys status components added by NEPI-BOT
-            system_status_nepi_bot = system_status.nepi_bot_status
-            system_status_nepi_bot.sys_status_id = _rec[2]
-            system_status_nepi_bot.nepi_bot_status_flags = 2 # TODO: Should not be hard-coded
-
-            # Set Sys status components provided by device
-            system_status_device = system_status.device_status
-            dt = datetime.datetime.fromtimestamp(_rec[5], None)
-            system_status_device.timestamp.FromDatetime(dt)
-            system_status_device.navsat_fix_time_offset = np.int32(_rec[6])
-            system_status_device.defined_latitude = float(_rec[7])
-            system_status_device.defined_longitude = float(_rec[8])
-            system_status_device.defined_heading = np.uint32(_rec[9])
-            system_status_device.heading_true_north = int(_rec[10])
-            system_status_device.roll = np.int32(_rec[11])
-            system_status_device.pitch = np.int32(_rec[12])
-            system_status_device.temperature = np.int32(_rec[13])
-            system_status_device.power_state = np.uint32(_rec[14])
-            system_status_device.device_status = bytes(_rec[15])
+            nepi_msg = self.build_status_msg(
+                _rec, dev_id_bytes, db.get_botcomm_index()
+            )
         except Exception as e:
             enum = "MSG102"
             emsg = (
@@ -148,11 +283,13 @@ class BotMsg(object):
         )
         self.len = len(self.buf1)
 
-        msgs_outgoing.append(self.buf1)
+        success = self.enqueue(_lev + 1, "status", _rec[0])
+        if not success[0]:
+            return success
 
         if msg_gen_trace:
             nepi_msg2 = nepi_messaging_all_pb2.NEPIMsg()
-            nepi_msg2.ParseFromString(msgs_outgoing[-1])
+            nepi_msg2.ParseFromString(self.buf1)
             buf_str2 = json_format.MessageToJson(
                 nepi_msg2,
                 including_default_value_fields=False,
@@ -183,30 +320,14 @@ class BotMsg(object):
             del partial_results
 
         try:
-            ## Set NEPI Message
-            nepi_msg = nepi_messaging_all_pb2.NEPIMsg()
-            nepi_msg.comm_index = db.get_botcomm_index()
-            nepi_msg.nuid = dev_id_bytes
-
-            # Set data message
-            data_message = nepi_msg.data_msg
-
-            # Set nepi-bot metadata
-            data_message_nepi_bot = data_message.nepi_bot_metadata
-            data_message_nepi_bot.sys_status_id = int(_rec[2])
-            data_message_nepi_bot.file_extension = str(_rec[14])
-
-            # Set nepi device data
-            data_message_device_data = data_message.device_data
-            data_message_device_data.type = str(_rec[5])
-            data_message_device_data.instance = int(_rec[6])
-            data_message_device_data.data_time_offset = int(_rec[7])
-            data_message_device_data.latitude_offset = int(_rec[8])
-            data_message_device_data.longitude_offset = int(_rec[9])
-            data_message_device_data.heading_offset = int(_rec[10])
-            data_message_device_data.roll_offset = int(_rec[11])
-            data_message_device_data.pitch_offset = int(_rec[12])
-            data_message_device_data.payload = bytes(_rec[15])
+            # Only now is the payload read (from the record, the payload
+            # store or the DB).
+            success, payload = db.load_payload(_lev + 1, _rec)
+            if not success[0]:
+                return success
+            nepi_msg = self.build_data_msg(
+                _rec, dev_id_bytes, db.get_botcomm_index(), payload
+            )
         except Exception as e:
             enum = "MSG102"
             emsg = f"encode_data_msg(): Problem building data record for Server [{e}]."
@@ -223,11 +344,13 @@ class BotMsg(object):
         )
         self.len = len(self.buf1)
 
-        msgs_outgoing.append(self.buf1)
+        success = self.enqueue(_lev + 1, "data", _rec[0])
+        if not success[0]:
+            return success
 
         if msg_gen_trace:
             nepi_msg2 = nepi_messaging_all_pb2.NEPIMsg()
-            nepi_msg2.ParseFromString(msgs_outgoing[-1])
+            nepi_msg2.ParseFromString(self.buf1)
             buf_str2 = json_format.MessageToJson(
                 nepi_msg2,
                 including_default_value_fields=False,
@@ -290,11 +413,13 @@ class BotMsg(object):
 
         self.len = len(self.buf1)
 
-        msgs_outgoing.append(self.buf1)
+        success = self.enqueue(_lev + 1, "gen")
+        if not success[0]:
+            return success
 
         if msg_gen_trace:
             nepi_msg2 = nepi_messaging_all_pb2.NEPIMsg()
-            nepi_msg2.ParseFromString(msgs_outgoing[-1])
+            nepi_msg2.ParseFromString(self.buf1)
             buf_str2 = json_format.MessageToJson(
                 nepi_msg2,
                 including_default_value_fields=False,
@@ -0,0 +1,218 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+
+from botcomm import MessageSplitter
+from botfec import fec_frame, pkt_header
+
+v_botpack = "bot71-20200601"
+
+
+# ---------------------------------------------------------------
+# packGreedy() module function.
+# ---------------------------------------------------------------
+# Choose items for a byte budget, greedy by value density.  An item may
+# depend on shared records (its Status Record) that cost bytes once, for
+# all the items that need them.  '_items' is a list of (value, cost, deps)
+# and '_dep_costs' maps each dep to its cost; deps in '_have' are already
+# paid for.  The best single item is taken instead when it is worth more
+# than the greedy fill (the usual guard that keeps greedy within half of
+# the optimum).  Returns (chosen item indexes in input order, bytes used).
+def packGreedy(_budget, _items, _dep_costs, _have=()):
+    def extra(_i, _paid):
+        value, cost, deps = _items[_i]
+        return cost + sum(_dep_costs[d] for d in set(deps) if d not in _paid)
+
+    paid = set(_have)
+    left = set(range(len(_items)))
+    chosen = []
+    used = 0
+    total = 0.0
+    while left:
+        best = None
+        for i in left:
+            cost = extra(i, paid)
+            if used + cost > _budget:
+                continue
+            value = max(_items[i][0] or 0.0, 0.0)
+            key = (value / cost if cost > 0 else float("inf"), value, -i)
+            if best is None or key > best[0]:
+                best = (key, i, cost, value)
+        if best is None:
+            break
+        key, i, cost, value = best
+        chosen.append(i)
+        left.discard(i)
+        paid.update(_items[i][2])
+        used += cost
+        total += value
+
+    single = None
+    for i in range(len(_items)):
+        cost = extra(i, set(_have))
+        value = max(_items[i][0] or 0.0, 0.0)
+        if cost <= _budget and (single is None or value > single[2]):
+            single = (i, cost, value)
+    if single is not None and single[2] > total:
+        return [single[0]], single[1]
+
+    return sorted(chosen), used
+
+
+########################################################################
+# The Uplink Packing Class
+########################################################################
+
+
+class BotPack(object):
+    # ---------------------------------------------------------------
+    # Packs a Session's uplink for one LB link: which of the selected
+    # Data Records (and the Status Records they need) go out, within the
+    # link's 'session_budget' of wire bytes (0 = no limit).  Sizes are
+    # real serialized NEPIMsg sizes plus the link's framing: the UDP and
+    # NEPI packet headers for every 'packet_size' split on 'ethernet',
+    # the SBD checksum on 'iridium', the FEC frame on a serial link with
+    # a 'fec_ratio'.  A serial link (Iridium, RS-232) sends every message
+    # whole, so a message over 'max_msg_size' (less any FEC frame) is
+    # never eligible there.
+    def __init__(self, _cfg, _log, _lev, _link):
+        self.cfg = _cfg
+        self.log = _log
+        self.link = getattr(_cfg, _link)
+        self.budget = int(getattr(self.link, "session_budget", 0))
+        self.pkt_payload = None
+        self.pkt_overhead = 0
+        self.msg_overhead = 0
+        self.msg_limit = None
+        if self.link.type == "ethernet":
+            splitter = MessageSplitter(self.link.packet_size)
+            self.pkt_payload = splitter.maxpktsize
+            self.pkt_overhead = splitter.udp_overhead + splitter.nepihdrsize
+        else:
+            self.msg_limit = self.link.max_msg_size
+            if self.link.type == "iridium":
+                self.msg_overhead = 2
+            if self.link.fec_ratio > 0:
+                # The FEC frame of a data message (see 'botfec').
+                self.msg_limit -= fec_frame
+                self.msg_overhead += pkt_header.size
+
+        if self.cfg.tracking:
+            self.log.track(_lev, "Created BotPack Class Object.", True)
+            self.log.track(_lev + 1, "Link:           " + str(_link), True)
+            self.log.track(_lev + 1, "Session Budget: " + str(self.budget), True)
+            self.log.track(_lev + 1, "Msg Limit:      " + str(self.msg_limit), True)
+
+    # ---------------------------------------------------------------
+    # wireSize() class module.
+    # ---------------------------------------------------------------
+    # Bytes on the link for a serialized message of '_size' bytes.
+    def wireSize(self, _size):
+        if self.pkt_payload:
+            packets = -(-_size // self.pkt_payload)
+            return _size + packets * self.pkt_overhead
+        return _size + self.msg_overhead
+
+    # ---------------------------------------------------------------
+    # fits() class module.
+    # ---------------------------------------------------------------
+    def fits(self, _size):
+        return self.msg_limit is None or _size <= self.msg_limit
+
+    # ---------------------------------------------------------------
+    # plan() class module.
+    # ---------------------------------------------------------------
+    # '_rows' are the selected Data Records (data columns, best first)
+    # and '_fixed' the serialized sizes of messages already queued for
+    # this Session (the 'latest' Status Record).  Returns the Data Records
+    # to send, in their original order, and a report: the budget, the
+    # wire bytes used and the bytes wasted, i.e. packet framing plus any
+    # budget left unused while eligible records had to stay behind.
+    def plan(self, _lev, _rows, _sm, _db, _dev_id_bytes, _fixed=()):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering 'plan()' Module.", True)
+            self.log.track(_lev + 1, "Candidates: " + str(len(_rows)), True)
+
+        used = sum(self.wireSize(s) for s in _fixed)
+        framing = used - sum(_fixed)
+        report = {"budget": self.budget, "used": used, "wasted": framing, "dropped": 0}
+        if not _rows:
+            return [True, None, None], [], report
+
+        # The Status Records the candidates point at: a Status Record that
+        # is still Active (rec_state 0) has to go out with them; one that
+        # was packed or sent already costs nothing; a missing one makes
+        # its Data Records unsendable.
+        status_ids = sorted(set(row[2] for row in _rows))
+        sql = (
+            "SELECT rowid,* FROM status WHERE sys_status_id IN ("
+            + ",".join("?" * len(status_ids)) + ")"
+        )
+        success, stat_rows = _db.getResults(_lev + 1, sql, False, tuple(status_ids))
+        if not success[0]:
+            return success, _rows, report
+
+        statuses = {}
+        dep_costs = {}
+        dep_sizes = {}
+        for stat in stat_rows:
+            statuses[stat[2]] = stat
+            if int(stat[1]) == 0:
+                success, size = _sm.size_status_msg(_lev + 1, stat, _dev_id_bytes)
+                if success[0] and self.fits(size):
+                    dep_costs[stat[2]] = self.wireSize(size)
+                    dep_sizes[stat[2]] = size
+
+        eligible = []
+        items = []
+        sizes = []
+        for row in _rows:
+            stat = statuses.get(row[2])
+            if stat is None:
+                continue
+            if int(stat[1]) == 0 and row[2] not in dep_costs:
+                continue
+            success, size = _sm.size_data_msg(_lev + 1, row, _dev_id_bytes, _db)
+            if not success[0] or not self.fits(size):
+                if self.cfg.tracking:
+                    self.log.track(
+                        _lev + 1, "Not Eligible: rowid=[" + str(row[0]) + "]", True
+                    )
+                continue
+            deps = (row[2],) if row[2] in dep_costs else ()
+            eligible.append(row)
+            items.append((row[18], self.wireSize(size), deps))
+            sizes.append(size)
+
+        if self.budget > 0:
+            chosen, cost = packGreedy(self.budget - used, items, dep_costs)
+        else:
+            chosen = list(range(len(items)))
+
+        paid = set()
+        for i in chosen:
+            used += items[i][1]
+            framing += items[i][1] - sizes[i]
+            for d in set(items[i][2]) - paid:
+                paid.add(d)
+                used += dep_costs[d]
+                framing += dep_costs[d] - dep_sizes[d]
+
+        report["used"] = used
+        report["dropped"] = len(_rows) - len(chosen)
+        report["wasted"] = framing
+        if self.budget > 0 and len(chosen) < len(items):
+            report["wasted"] += max(self.budget - used, 0)
+
+        if self.cfg.tracking:
+            self.log.track(_lev + 1, "Packed:  " + str(len(chosen)), True)
+            self.log.track(_lev + 1, "Dropped: " + str(report["dropped"]), True)
+            self.log.track(_lev + 1, "Used:    " + str(used), True)
+            self.log.track(_lev + 1, "Wasted:  " + str(report["wasted"]), True)
+
+        return [True, None, None], [eligible[i] for i in chosen], report
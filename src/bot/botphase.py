@@ -0,0 +1,245 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Bot-Main phase supervisor.  The LB and HB phases of a wake-up each get
+# a deadline ('--lbto'/'--hbto', or LB_PROC_TIMEOUT/HB_PROC_TIMEOUT) that
+# sets the phase's exit event ('bothelp.exit_event_lb'/'_hb'); the phase
+# checks its event between steps and the child processes it runs through
+# 'runChild()' are terminated when it is set.  The HB phase can run in the
+# background while the LB phase runs on the main thread (which owns the
+# DB connection).  When each phase started and stopped, whether it hit its
+# deadline and how long it overlapped the others go into the execution
+# reports.
+#
+import os
+import time
+import signal
+import datetime
+import threading
+import subprocess
+from collections import OrderedDict
+
+v_botphase = "bot71-20200601"
+
+
+# ---------------------------------------------------------------
+# phaseTout() module function.
+# ---------------------------------------------------------------
+# A phase timeout from the command line ('nargs=1' gives a list) or the
+# environment (a string), in seconds; None for no deadline.
+def phaseTout(_arg):
+    if isinstance(_arg, (list, tuple)):
+        _arg = _arg[0] if _arg else 0
+    try:
+        tout = float(_arg)
+    except (TypeError, ValueError):
+        tout = 0.0
+    return tout if tout > 0 else None
+
+
+# ---------------------------------------------------------------
+# runChild() module function.
+# ---------------------------------------------------------------
+# 'subprocess.run()' (text output captured) that gives up when '_event'
+# is set: the child runs in its own process group, so an 'rsync' and the
+# 'ssh' under it, or a shell and its commands, are terminated together,
+# and killed if still there after '_grace' seconds.  A child never
+# started, because the event was already set, returns -SIGTERM.
+def runChild(_args, _event, _cwd=None, _shell=False, _poll=0.2, _grace=2.0):
+    if _event is not None and _event.is_set():
+        return subprocess.CompletedProcess(_args, -signal.SIGTERM, "", "Cancelled.")
+    proc = subprocess.Popen(
+        _args,
+        cwd=_cwd,
+        shell=_shell,
+        universal_newlines=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    while True:
+        try:
+            out, err = proc.communicate(timeout=_poll)
+            return subprocess.CompletedProcess(_args, proc.returncode, out, err)
+        except subprocess.TimeoutExpired:
+            if _event is not None and _event.is_set():
+                break
+
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(proc.pid, sig)
+        except OSError:
+            pass
+        try:
+            out, err = proc.communicate(timeout=_grace)
+            break
+        except subprocess.TimeoutExpired:
+            out, err = "", ""
+    return subprocess.CompletedProcess(_args, proc.returncode, out, err)
+
+
+class Phase(object):
+    def __init__(self, _name, _event, _tout):
+        self.name = _name
+        self.event = _event
+        self.tout = _tout
+        self.thread = None
+        self.timer = None
+        self.t0 = None
+        self.t1 = None
+        self.timestart = None
+        self.timestop = None
+        self.timed_out = False
+        self.result = None
+        self.error = None
+
+
+########################################################################
+# The Bot-Main Phase Supervisor Class
+########################################################################
+
+
+class BotPhases(object):
+    def __init__(self, _cfg, _log, _lev, _clock=time.monotonic):
+        self.cfg = _cfg
+        self.log = _log
+        self.lev = _lev
+        self.clock = _clock
+        self.phases = OrderedDict()
+
+        if self.cfg.tracking:
+            self.log.track(_lev, "Created BotPhases Class Object.", True)
+
+    # ---------------------------------------------------------------
+    # add() class module.
+    # ---------------------------------------------------------------
+    def add(self, _name, _event, _tout):
+        _event.clear()
+        self.phases[_name] = Phase(_name, _event, _tout)
+        if self.cfg.tracking:
+            self.log.track(self.lev, "Phase '%s': Timeout %s s." % (_name, _tout), True)
+
+    # ---------------------------------------------------------------
+    # run() class module.
+    # ---------------------------------------------------------------
+    # Start phase '_name' with its deadline: on this thread, returning
+    # what '_target' returns (or raising what it raises), or with
+    # '_background' on a thread of its own, to be 'wait()'ed for.
+    def run(self, _name, _target, _background=False):
+        ph = self.phases[_name]
+        ph.t0 = self.clock()
+        ph.timestart = datetime.datetime.utcnow().isoformat()
+        if ph.tout is not None:
+            ph.timer = threading.Timer(ph.tout, self.expire, (_name,))
+            ph.timer.daemon = True
+            ph.timer.start()
+        if self.cfg.tracking:
+            self.log.track(
+                self.lev, "Phase '%s' Started%s." % (_name, " in Background" if _background else ""), True
+            )
+
+        if _background:
+            ph.thread = threading.Thread(target=self.body, args=(ph, _target), daemon=True)
+            ph.thread.start()
+            return None
+        self.body(ph, _target)
+        if ph.error is not None:
+            raise ph.error
+        return ph.result
+
+    def body(self, _ph, _target):
+        try:
+            _ph.result = _target()
+        except Exception as e:
+            _ph.error = e
+            if self.cfg.tracking:
+                self.log.track(self.lev, "Phase '%s' Failed [%s]." % (_ph.name, e), True)
+        finally:
+            if _ph.timer is not None:
+                _ph.timer.cancel()
+            _ph.t1 = self.clock()
+            _ph.timestop = datetime.datetime.utcnow().isoformat()
+            if self.cfg.tracking:
+                self.log.track(
+                    self.lev, "Phase '%s' Stopped after %.1f s." % (_ph.name, _ph.t1 - _ph.t0), True
+                )
+
+    # ---------------------------------------------------------------
+    # expire() class module.
+    # ---------------------------------------------------------------
+    # Deadline timer: tell the phase to stop.
+    def expire(self, _name):
+        ph = self.phases[_name]
+        if ph.t1 is not None:
+            return
+        ph.timed_out = True
+        ph.event.set()
+        if self.cfg.tracking:
+            self.log.track(self.lev, "Phase '%s' Timed Out after %s s; Stopping It." % (_name, ph.tout), True)
+
+    # ---------------------------------------------------------------
+    # wait() class module.
+    # ---------------------------------------------------------------
+    # Wait for a background phase: until its deadline plus '_grace'
+    # seconds for it to wind down, or for good without a deadline.  A
+    # phase still running then is left behind (its thread is a daemon).
+    # Returns whether it stopped.
+    def wait(self, _name, _grace=10.0):
+        ph = self.phases.get(_name)
+        if ph is None or ph.thread is None:
+            return True
+        if ph.tout is None:
+            ph.thread.join()
+        else:
+            ph.thread.join(max(ph.t0 + ph.tout + _grace - self.clock(), 0.0))
+        if ph.thread.is_alive():
+            ph.event.set()
+            if self.cfg.tracking:
+                self.log.track(self.lev, "Phase '%s' Did Not Stop; Left Behind." % _name, True)
+            return False
+        return True
+
+    # ---------------------------------------------------------------
+    # report() class module.
+    # ---------------------------------------------------------------
+    # Phase '_name' for its execution report, with the seconds it ran
+    # alongside each other phase.
+    def report(self, _name):
+        ph = self.phases.get(_name)
+        if ph is None or ph.t0 is None:
+            return None
+        now = self.clock()
+        t1 = ph.t1 if ph.t1 is not None else now
+        if ph.t1 is None:
+            status = "running"
+        elif ph.error is not None:
+            status = "error"
+        elif ph.timed_out:
+            status = "timeout"
+        else:
+            status = "done"
+
+        overlap = OrderedDict()
+        for other in self.phases.values():
+            if other is ph or other.t0 is None:
+                continue
+            o1 = other.t1 if other.t1 is not None else now
+            overlap[other.name] = round(max(min(t1, o1) - max(ph.t0, other.t0), 0.0), 3)
+
+        d = OrderedDict()
+        d["name"] = ph.name
+        d["status"] = status
+        d["timestart"] = ph.timestart
+        d["timestop"] = ph.timestop
+        d["secs"] = round(t1 - ph.t0, 3)
+        d["timeout"] = ph.tout
+        d["timed_out"] = ph.timed_out
+        d["background"] = ph.thread is not None
+        d["overlap_secs"] = overlap
+        d["error"] = str(ph.error) if ph.error is not None else None
+        return d
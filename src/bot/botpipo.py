@@ -11,12 +11,46 @@ import os
 
 # import sys
 import ast
+import heapq
 import math
 import time
+import numpy as np
 from bothelp import readFloatFile
+from botdb import data_select_cols
+from botqueue import data_unqueued
 
 v_botpipo = "bot71-20200601"
 
+
+# ---------------------------------------------------------------
+# rateColumns() module function.
+# ---------------------------------------------------------------
+# The array form of the PIPO formulas behind 'computeRatings()'; kept
+# free of the Class (no Config, no Log) so offline tools can use it.
+# '_wts' is a (scor, qual, size, trig, time) tuple and '_exec_age' the
+# wake-up time in minutes.  Returns (numerator, denominator, pipo).
+def rateColumns(_sco, _qua, _nrm, _trg, _ts, _wts, _exec_age):
+    scor_wt, qual_wt, size_wt, trig_wt, time_wt = [float(w) for w in _wts]
+    sco = np.asarray(_sco, dtype=np.float64)
+    qua = np.asarray(_qua, dtype=np.float64)
+    nrm = np.asarray(_nrm, dtype=np.float64)
+    trg = np.asarray(_trg, dtype=np.float64)
+    ts = np.asarray(_ts, dtype=np.float64)
+
+    numerator = (sco * sco) * scor_wt
+    numerator += (qua * qua) * qual_wt
+    numerator += (nrm * nrm) * size_wt
+    numerator += (trg * trg) * trig_wt
+
+    denominator = (float(_exec_age) - np.floor(ts / 60.0)) * time_wt + 1.0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pipo = numerator / denominator
+    pipo[denominator == 0.0] = np.nan
+
+    return numerator, denominator, pipo
+
+
 ########################################################################
 # The Float PIPO Class
 ########################################################################
@@ -499,10 +533,13 @@ class BotPIPO(object):
             self.log.track(_lev + 1, "_trg: " + str(_trg), True)
 
         try:
-            scor = (_sco ** 2) * self.cfg.pipo_scor_wt
-            qual = (_qua ** 2) * self.cfg.pipo_qual_wt
-            size = (_siz ** 2) * self.cfg.pipo_size_wt
-            trig = (_trg ** 2) * self.cfg.pipo_trig_wt
+            # x * x rather than x ** 2: the product is correctly rounded
+            # (libm pow() is not always), so the scalar, numpy and SQL
+            # ratings agree to the last bit.
+            scor = (_sco * _sco) * self.cfg.pipo_scor_wt
+            qual = (_qua * _qua) * self.cfg.pipo_qual_wt
+            size = (_siz * _siz) * self.cfg.pipo_size_wt
+            trig = (_trg * _trg) * self.cfg.pipo_trig_wt
             numerator = (scor + qual + size + trig) * 1.0
         except Exception as e:
             return [False, "P110", "PIPO Numerator Calculation Error: " + str(e)], 0.0
@@ -545,3 +582,344 @@ class BotPIPO(object):
             self.log.track(_lev + 1, "PIPO Denominator: " + str(denominator), True)
 
         return [True, None, None], denominator
+
+    # ---------------------------------------------------------------
+    # getWeights() class module.
+    # ---------------------------------------------------------------
+    # The configured weight factors as the (scor, qual, size, trig, time)
+    # tuple that 'computeRatings()' takes.
+    def getWeights(self):
+        return (
+            self.cfg.pipo_scor_wt,
+            self.cfg.pipo_qual_wt,
+            self.cfg.pipo_size_wt,
+            self.cfg.pipo_trig_wt,
+            self.cfg.pipo_time_wt,
+        )
+
+    # ---------------------------------------------------------------
+    # computeRatings() class module.
+    # ---------------------------------------------------------------
+    # Vectorized 'computeNumerator()' and 'computeDenominator()': takes
+    # one array per column (event score, quality, norm, trigger and
+    # timestamp) and rates every record in one call.  The operand order
+    # follows the scalar methods, so the results are the same floats.
+    # '_wts' overrides the configured weights (see 'getWeights()') and
+    # '_exec_age' the wake-up time in minutes.  A zero denominator gives
+    # a NaN rating.
+    def computeRatings(
+        self, _lev, _sco, _qua, _nrm, _trg, _ts, _wts=None, _exec_age=None
+    ):
+        if _wts is None:
+            _wts = self.getWeights()
+        if _exec_age is None:
+            _exec_age = self.exec_age
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering 'computeRatings() Module.", True)
+            self.log.track(_lev + 1, "_wts:      " + str(_wts), True)
+            self.log.track(_lev + 1, "_exec_age: " + str(_exec_age), True)
+
+        try:
+            numerator, denominator, pipo = rateColumns(
+                _sco, _qua, _nrm, _trg, _ts, _wts, _exec_age
+            )
+        except Exception as e:
+            enum = "P130"
+            emsg = "computeRatings(): [" + str(e) + "]"
+            if self.cfg.tracking:
+                self.log.track(_lev + 1, "ERROR: " + str(enum) + ": " + str(emsg), True)
+            return [False, str(enum), str(emsg)], None, None, None
+
+        if self.cfg.tracking:
+            self.log.track(_lev + 1, "Records Rated: " + str(pipo.size), True)
+
+        return [True, None, None], numerator, denominator, pipo
+
+    # ---------------------------------------------------------------
+    # selectTopK() class module.
+    # ---------------------------------------------------------------
+    # Select the '_k' Active Data Records with the best PIPO rating at
+    # this wake-up time, best first, as '_cols' rows with their current
+    # rating in the 'pipo' column ([18]).  Walks the 'data_active_rank'
+    # index: numerators high to low and, for each, the newest records
+    # first, whose ratings fall with age.  No numerator can beat the
+    # current K-th best once numerator / (smallest denominator) is at or
+    # below it, so the walk stops there.  Negative weights or numerators,
+    # or records time-stamped after this wake-up, break that bound; then
+    # every Active Record is rated instead ('selectTopKRated()'), as it
+    # is for weights '_wts' other than the configured ones (a link's own,
+    # see 'botlink.linkWeights()'), which the stored numerators don't
+    # reflect.  Records whose message is still waiting in the
+    # OutboundQueue aren't eligible.
+    def selectTopK(self, _lev, _k, _cols=data_select_cols, _wts=None):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering 'selectTopK()' Module.", True)
+            self.log.track(_lev + 1, "_k: " + str(_k), True)
+
+        if _wts is not None and tuple(_wts) != tuple(self.getWeights()):
+            return self.selectTopKRated(_lev + 1, _k, _cols, _wts)
+
+        time_wt = self.cfg.pipo_time_wt
+        sql = (
+            "SELECT max(timestamp) FROM data WHERE rec_state IN (0,1)"
+            " AND " + data_unqueued
+        )
+        success, rows = self.db.getResults(_lev + 1, sql, False)
+        if not success[0]:
+            return success, None
+        if _k < 1 or not rows or rows[0][0] is None:
+            return success, []
+
+        min_den = (self.exec_age - math.floor(float(rows[0][0]) / 60)) * time_wt + 1.0
+        if min_den <= 0 or min(self.getWeights()) < 0:
+            return self.selectTopKRated(_lev + 1, _k, _cols)
+
+        # Page through the index in (numerator, timestamp, rowid) order,
+        # best first.  Once a numerator's records fall to the K-th best,
+        # the rest of them (older still) are skipped; a page that ends
+        # inside such a run is followed by one that starts past it.
+        sql = (
+            "SELECT numerator, timestamp, rowid FROM data WHERE rec_state IN (0,1)"
+            " AND " + data_unqueued + " AND %s"
+            " ORDER BY numerator DESC, timestamp DESC, rowid DESC LIMIT ?"
+        )
+        page = max(_k, 64)
+        where, params = "numerator IS NOT NULL", ()
+        best = []  # min-heap of (pipo, rowid); best[0] is the K-th best
+        skip = None
+        visited = 0
+        done = False
+        while not done:
+            success, rows = self.db.getResults(
+                _lev + 1, sql % where, False, params + (page,)
+            )
+            if not success[0]:
+                return success, None
+
+            for numerator, timestamp, rowid in rows:
+                if numerator == skip:
+                    continue
+                visited += 1
+                if numerator < 0:
+                    return self.selectTopKRated(_lev + 1, _k, _cols)
+                if len(best) >= _k and numerator / min_den <= best[0][0]:
+                    done = True
+                    break
+                meta_age = int(math.floor(float(timestamp) / 60)) * 1.0
+                pipo = numerator / ((self.exec_age - meta_age) * time_wt + 1.0)
+                if len(best) < _k:
+                    heapq.heappush(best, (pipo, rowid))
+                elif pipo > best[0][0]:
+                    heapq.heapreplace(best, (pipo, rowid))
+                else:
+                    skip = numerator
+            else:
+                if len(rows) < page:
+                    done = True
+                elif numerator == skip:
+                    where, params = "numerator < ?", (skip,)
+                else:
+                    where = "(numerator, timestamp, rowid) < (?, ?, ?)"
+                    params = (numerator, timestamp, rowid)
+
+        if self.cfg.tracking:
+            self.log.track(_lev + 1, "Records Visited: " + str(visited), True)
+
+        # Records with no numerator at all rank last, as in an 'ORDER BY
+        # pipo DESC'.
+        ranked = sorted(best, key=lambda x: -x[0])
+        if len(ranked) < _k:
+            sql = (
+                "SELECT rowid, NULL FROM data WHERE rec_state IN (0,1)"
+                " AND numerator IS NULL AND " + data_unqueued + " LIMIT ?"
+            )
+            success, rows = self.db.getResults(
+                _lev + 1, sql, False, (_k - len(ranked),)
+            )
+            if not success[0]:
+                return success, None
+            ranked += [(None, rowid) for rowid, _ in rows]
+
+        return self.fetchRanked(_lev + 1, ranked, _cols)
+
+    # ---------------------------------------------------------------
+    # selectTopKRated() class module.
+    # ---------------------------------------------------------------
+    # 'selectTopK()' the slow way: rate every Active Record (stored
+    # numerator over the current denominator) and keep the top '_k'.  A
+    # zero denominator keeps the stored rating, like 'rerate()'.  With
+    # '_wts' the records are rated afresh with those weights instead.
+    def selectTopKRated(self, _lev, _k, _cols, _wts=None):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering 'selectTopKRated()' Module.", True)
+
+        sql = (
+            "SELECT rowid, numerator, timestamp, pipo, event_score, quality,"
+            " type_score, trigger FROM data"
+            " WHERE rec_state IN (0,1) AND " + data_unqueued
+        )
+        success, rows = self.db.getResults(_lev + 1, sql, False)
+        if not success[0] or not rows:
+            return success, [] if success[0] else None
+
+        cols = np.array(rows, dtype=np.float64).T
+        if _wts is None:
+            denominator = (
+                self.exec_age - np.floor(cols[2] / 60.0)
+            ) * self.cfg.pipo_time_wt + 1.0
+            with np.errstate(divide="ignore", invalid="ignore"):
+                pipo = np.where(denominator == 0.0, cols[3], cols[1] / denominator)
+        else:
+            success, numerator, denominator, pipo = self.computeRatings(
+                _lev + 1, cols[4], cols[5], cols[6], cols[7], cols[2], _wts
+            )
+            if not success[0]:
+                return success, None
+            pipo = np.where(denominator == 0.0, cols[3], pipo)
+
+        order = np.argsort(np.nan_to_num(-pipo, nan=np.inf), kind="stable")[:_k]
+        ranked = [
+            (None if np.isnan(pipo[i]) else float(pipo[i]), int(cols[0][i]))
+            for i in order
+        ]
+        return self.fetchRanked(_lev + 1, ranked, _cols)
+
+    # ---------------------------------------------------------------
+    # fetchRanked() class module.
+    # ---------------------------------------------------------------
+    # Read the '_cols' rows of a ranked [(pipo, rowid), ...] list, in that
+    # order, with the ranking's 'pipo' in place of the stored one.
+    def fetchRanked(self, _lev, _ranked, _cols):
+        if not _ranked:
+            return [True, None, None], []
+
+        sql = (
+            "SELECT " + _cols + " FROM data WHERE rowid IN ("
+            + ",".join("?" * len(_ranked)) + ")"
+        )
+        success, rows = self.db.getResults(
+            _lev, sql, False, tuple(rowid for _, rowid in _ranked)
+        )
+        if not success[0]:
+            return success, None
+
+        by_rowid = dict((row[0], row) for row in rows)
+        results = []
+        for pipo, rowid in _ranked:
+            row = by_rowid.get(rowid)
+            if row is not None:
+                results.append(row[:18] + (pipo,) + row[19:])
+        return [True, None, None], results
+
+    # ---------------------------------------------------------------
+    # rerate() class module.
+    # ---------------------------------------------------------------
+    # Re-rate every active Data Record.  'pipo_rerate' picks the engine:
+    # "numpy" (the default) rates the columns with 'computeRatings()' and
+    # writes the changed rows back in one transaction; "sql" does it all
+    # in a single UPDATE.  Either way the numerator is only recomputed
+    # when the weights have changed, and a zero denominator leaves the
+    # record's old rating alone.
+    def rerate(self, _lev, _wt_changed):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering 'rerate()' Module.", True)
+            self.log.track(_lev + 1, "_wt_changed: " + str(_wt_changed), True)
+            self.log.track(_lev + 1, "Engine: " + str(self.cfg.pipo_rerate), True)
+
+        if self.cfg.pipo_rerate == "sql":
+            return self.rerateSQL(_lev + 1, _wt_changed)
+        return self.rerateVector(_lev + 1, _wt_changed)
+
+    # ---------------------------------------------------------------
+    # rerateVector() class module.
+    # ---------------------------------------------------------------
+    def rerateVector(self, _lev, _wt_changed):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering 'rerateVector()' Module.", True)
+
+        sql = (
+            "SELECT rowid, numerator, pipo, event_score, quality, type_score,"
+            " trigger, timestamp FROM data WHERE rec_state IN (0,1)"
+        )
+        success, rows = self.db.getResults(_lev + 1, sql, False)
+        if not success[0] or not rows:
+            return success
+
+        cols = np.array(rows, dtype=np.float64).T
+        old_numerator, old_pipo = cols[1], cols[2]
+        success, numerator, denominator, pipo = self.computeRatings(
+            _lev + 1, cols[3], cols[4], cols[5], cols[6], cols[7]
+        )
+        if not success[0]:
+            return success
+
+        if not _wt_changed:
+            numerator = old_numerator
+            with np.errstate(divide="ignore", invalid="ignore"):
+                pipo = numerator / denominator
+        pipo = np.where(denominator == 0.0, old_pipo, pipo)
+
+        # Only write back the records whose rating actually moved (NaN
+        # compares unequal to itself, so NULLs are matched explicitly).
+        same_numerator = (numerator == old_numerator) | (
+            np.isnan(numerator) & np.isnan(old_numerator)
+        )
+        same_pipo = (pipo == old_pipo) | (np.isnan(pipo) & np.isnan(old_pipo))
+        changed = ~(same_numerator & same_pipo)
+        if self.cfg.tracking:
+            self.log.track(_lev + 1, "Records Re-rated: " + str(int(changed.sum())), True)
+        if not changed.any():
+            return [True, None, None]
+
+        return self.db.update_many(
+            _lev + 1,
+            "UPDATE data SET numerator = ?, pipo = ? WHERE rowid = ?",
+            zip(
+                numerator[changed].tolist(),
+                pipo[changed].tolist(),
+                cols[0][changed].astype(np.int64).tolist(),
+            ),
+        )
+
+    # ---------------------------------------------------------------
+    # rerateSQL() class module.
+    # ---------------------------------------------------------------
+    # The same re-rating as one set-based UPDATE.  The SQL mirrors
+    # 'computeNumerator()' and 'computeDenominator()' term for term (same
+    # operand order, so the floating point results match); floor() is
+    # written out since SQLite builds without the math functions.
+    def rerateSQL(self, _lev, _wt_changed):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering 'rerateSQL()' Module.", True)
+
+        minutes = "(timestamp / 60.0)"
+        meta_age = (
+            "(CAST(" + minutes + " AS INTEGER) - ("
+            + minutes + " < CAST(" + minutes + " AS INTEGER)))"
+        )
+        denominator = "((? - " + meta_age + ") * ? + 1.0)"
+        if _wt_changed:
+            numerator = (
+                "((event_score * event_score) * ? + (quality * quality) * ?"
+                " + (type_score * type_score) * ? + (trigger * trigger) * ?)"
+            )
+            params = (
+                self.cfg.pipo_scor_wt,
+                self.cfg.pipo_qual_wt,
+                self.cfg.pipo_size_wt,
+                self.cfg.pipo_trig_wt,
+            )
+        else:
+            numerator = "numerator"
+            params = ()
+
+        sql = (
+            "UPDATE data SET numerator = " + numerator + ", pipo = CASE WHEN "
+            + denominator + " = 0 THEN pipo ELSE " + numerator + " / "
+            + denominator + " END WHERE rec_state IN (0,1)"
+        )
+        timing = (self.exec_age, self.cfg.pipo_time_wt)
+        params = params + timing + params + timing
+
+        return self.db.update(_lev + 1, sql, params)
+
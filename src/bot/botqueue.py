@@ -0,0 +1,192 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+import time
+from collections import deque
+
+from botbatch import planBatches
+
+v_botqueue = "bot71-20200601"
+
+# Active Data Records whose message isn't already waiting in the
+# 'outbound' table; the uplink selection leaves the others alone.
+data_unqueued = "rowid NOT IN (SELECT rec_rowid FROM outbound WHERE kind = 'data')"
+
+########################################################################
+# The Outbound (Uplink) Queue Class
+########################################################################
+
+
+class OutboundQueue(object):
+    # ---------------------------------------------------------------
+    # The encoded uplink messages of the LB link, in order, kept both in
+    # memory (a deque) and in the DB's 'outbound' table.  The encoders
+    # 'put()' each message as it is built, which also sets its Status or
+    # Data Record 'packed' (rec_state 1); one 'flush()' per Session hands
+    # them to the transport.  A message leaves the queue, and its record
+    # becomes 'sent' (rec_state 2), only once the transport has taken it
+    # (in reliable mode, 'lb_ip.sack', once the Server has acknowledged
+    # every packet of it).  Whatever isn't sent (the link dropped, the Bot
+    # was killed) is still in the table at the next wake-up, where 'load()'
+    # picks it up ahead of anything new instead of the records being
+    # selected and encoded all over again.
+    def __init__(self, _cfg, _log, _lev, _db):
+        self.cfg = _cfg
+        self.log = _log
+        self.db = _db
+        self.queue = deque()  # (outbound rowid, kind, rec_rowid, msg)
+        self.sent = 0
+
+        if self.cfg.tracking:
+            self.log.track(_lev, "Created OutboundQueue Class Object.", True)
+
+    def __len__(self):
+        return len(self.queue)
+
+    # ---------------------------------------------------------------
+    # load() class module.
+    # ---------------------------------------------------------------
+    # Pick up the messages left over from earlier Sessions.
+    def load(self, _lev):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering 'load()' Module.", True)
+
+        sql = "SELECT rowid, kind, rec_rowid, msg FROM outbound ORDER BY rowid"
+        success, rows = self.db.getResults(_lev + 1, sql, False)
+        if not success[0]:
+            return success
+
+        self.queue.clear()
+        self.queue.extend((rowid, kind, rec, bytes(msg)) for rowid, kind, rec, msg in rows)
+
+        if self.cfg.tracking:
+            self.log.track(_lev + 1, "Queued From Earlier Sessions: " + str(len(rows)), True)
+        return [True, None, None]
+
+    # ---------------------------------------------------------------
+    # put() class module.
+    # ---------------------------------------------------------------
+    # Queue a serialized NEPIMsg carrying the '_kind' ("status", "data"
+    # or "gen") record '_rec_rowid' (None for a general message).  The
+    # record is set 'packed' (rec_state 1) in the same transaction, so a
+    # Bot killed in between can't leave it queued and still selectable.
+    def put(self, _lev, _msg, _kind, _rec_rowid=None):
+        try:
+            cursor = self.db.dbc.cursor()
+            cursor.execute(
+                "INSERT INTO outbound (kind, rec_rowid, queued, msg) VALUES (?,?,?,?)",
+                (_kind, _rec_rowid, time.time(), bytes(_msg)),
+            )
+            rowid = cursor.lastrowid
+            if _kind in ("status", "data") and _rec_rowid is not None:
+                cursor.execute(
+                    "UPDATE " + _kind + " SET rec_state = 1 WHERE rowid = ?", (_rec_rowid,)
+                )
+            self.db.commit()
+        except Exception as e:
+            try:
+                self.db.dbc.rollback()
+            except Exception:
+                pass
+            enum = "OQ102"
+            emsg = "put(): [" + str(e) + "]"
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)]
+
+        self.queue.append((rowid, _kind, _rec_rowid, bytes(_msg)))
+        if self.cfg.tracking:
+            self.log.track(_lev, "Queued " + str(_kind) + " msg #" + str(rowid), True)
+        return [True, None, None]
+
+    # ---------------------------------------------------------------
+    # flush() class module.
+    # ---------------------------------------------------------------
+    # Hand the queue to '_send(wire message)', which returns the usual
+    # success list, front to back; with a '_budget' the messages go out
+    # in batch envelopes (see 'botbatch').  Messages over '_max_size', the
+    # largest the link takes whole (a failover from 'ethernet' to
+    # 'iridium' meets those packed for 'ethernet'), are passed over and
+    # stay queued, in place, for a link that can take them.  Stops at the
+    # first message the transport refuses and leaves it, and the rest,
+    # queued.
+    def flush(self, _lev, _send, _budget=None, _nuid_field=None, _max_size=None):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering 'flush()' Module.", True)
+            self.log.track(_lev + 1, "Queued: " + str(len(self.queue)), True)
+
+        if _max_size:
+            entries = [entry for entry in self.queue if len(entry[3]) <= _max_size]
+        else:
+            entries = list(self.queue)
+        passed = len(self.queue) - len(entries)
+        msgs = [entry[3] for entry in entries]
+        if _budget:
+            plan = planBatches(msgs, _budget, _nuid_field)
+        else:
+            plan = [(msg, 1) for msg in msgs]
+
+        done = 0
+        success = [True, None, None]
+        for wire, count in plan:
+            success = _send(wire)
+            if not success[0]:
+                break
+            success = self.markSent(_lev + 1, entries[done:done + count])
+            if not success[0]:
+                break
+            done += count
+            self.sent += count
+
+        if done:
+            if passed:
+                sent = set(entry[0] for entry in entries[:done])
+                self.queue = deque(entry for entry in self.queue if entry[0] not in sent)
+            else:
+                for i in range(done):
+                    self.queue.popleft()
+
+        if self.cfg.tracking:
+            if passed:
+                self.log.track(
+                    _lev + 1, "Over " + str(_max_size) + " Bytes; Left Queued: " + str(passed), True
+                )
+            if not success[0]:
+                self.log.track(_lev + 1, "Not Sent; Left Queued: " + str(len(self.queue)), True)
+            else:
+                self.log.track(_lev + 1, "Sent: " + str(self.sent), True)
+        return success
+
+    # ---------------------------------------------------------------
+    # markSent() class module.
+    # ---------------------------------------------------------------
+    # Dequeue sent messages and set their records 'sent', together.
+    def markSent(self, _lev, _entries):
+        try:
+            cursor = self.db.dbc.cursor()
+            for kind in ("status", "data"):
+                cursor.executemany(
+                    "UPDATE " + kind + " SET rec_state = 2 WHERE rowid = ?",
+                    [(e[2],) for e in _entries if e[1] == kind and e[2] is not None],
+                )
+            cursor.executemany(
+                "DELETE FROM outbound WHERE rowid = ?", [(e[0],) for e in _entries]
+            )
+            self.db.commit()
+        except Exception as e:
+            try:
+                self.db.dbc.rollback()
+            except Exception:
+                pass
+            enum = "OQ101"
+            emsg = "markSent(): [" + str(e) + "]"
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)]
+
+        return [True, None, None]
@@ -0,0 +1,172 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# In-process UDP-over-TCP relay for the 'ethernet' LB link ('lb_ip.relay'
+# "native"), in place of the external 'socat UDP4-RECVFROM ... fork',
+# which forks a child, and opens a TCP connection through the tunnel, for
+# every datagram.  One relay thread carries all the datagrams over one
+# TCP connection, each framed as:
+#
+#   length (2 bytes, network order), datagram
+#
+# in both directions, so the Server end must frame them the same way.
+# The datagrams waiting on the UDP socket go out together in a single
+# TCP write; since the relay does its own batching, Nagle's algorithm
+# would only hold back the last write of a burst, so TCP_NODELAY is set.
+#
+import errno
+import socket
+import struct
+import selectors
+import threading
+
+v_botrelay = "bot71-20200601"
+
+relay_frame = struct.Struct("!H")
+
+
+# ---------------------------------------------------------------
+# frameDatagrams() / unframeStream() module functions.
+# ---------------------------------------------------------------
+def frameDatagrams(_datagrams):
+    return b"".join(relay_frame.pack(len(d)) + d for d in _datagrams)
+
+
+# The datagrams in '_buf' (a bytearray), which loses them; a partial frame
+# stays behind for the next read.
+def unframeStream(_buf):
+    out = []
+    pos = 0
+    hsize = relay_frame.size
+    while len(_buf) - pos >= hsize:
+        length = relay_frame.unpack_from(_buf, pos)[0]
+        if len(_buf) - pos - hsize < length:
+            break
+        out.append(bytes(_buf[pos + hsize:pos + hsize + length]))
+        pos += hsize + length
+    del _buf[:pos]
+    return out
+
+
+########################################################################
+# The UDP-over-TCP Relay Class
+########################################################################
+
+
+class UdpTcpRelay(threading.Thread):
+    # ---------------------------------------------------------------
+    # Relays datagrams sent to '_udp_addr' to the TCP endpoint '_tcp_addr'
+    # (the tunnel), and datagrams coming back to whoever sent last.  Up
+    # to '_batch' waiting datagrams share a TCP write.  The TCP connection
+    # is made on the first datagram and again after it drops.
+    def __init__(self, _cfg, _log, _lev, _udp_addr, _tcp_addr, _batch=64):
+        threading.Thread.__init__(self, daemon=True)
+        self.cfg = _cfg
+        self.log = _log
+        self.tcp_addr = _tcp_addr
+        self.batch = max(int(_batch), 1)
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.udp.bind(_udp_addr)
+        self.udp.setblocking(False)
+        self.addr = self.udp.getsockname()
+        self.tcp = None
+        self.peer = None
+        self.inbuf = bytearray()
+        self.sel = selectors.DefaultSelector()
+        self.sel.register(self.udp, selectors.EVENT_READ)
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.sel.register(self.wake_r, selectors.EVENT_READ)
+        self.running = True
+        self.error = None
+        self.up = 0
+        self.down = 0
+        self.writes = 0
+
+        if self.cfg.tracking:
+            self.log.track(_lev, "Created UdpTcpRelay Class Object.", True)
+            self.log.track(_lev + 1, "udp: " + str(self.addr), True)
+            self.log.track(_lev + 1, "tcp: " + str(self.tcp_addr), True)
+
+    def run(self):
+        try:
+            while self.running:
+                for key, events in self.sel.select():
+                    if key.fileobj is self.udp:
+                        self.uplink()
+                    elif key.fileobj is self.tcp:
+                        self.downlink()
+        except Exception as e:
+            self.error = e
+            if self.cfg.tracking:
+                self.log.errtrack("RL101", "run(): Relay Stopped [" + str(e) + "]")
+        finally:
+            self.disconnect()
+            self.sel.close()
+            self.udp.close()
+            self.wake_r.close()
+            self.wake_w.close()
+
+    # ---------------------------------------------------------------
+    # uplink() class module.
+    # ---------------------------------------------------------------
+    # Everything waiting on the UDP socket (up to 'batch' datagrams) in
+    # one TCP write.
+    def uplink(self):
+        datagrams = []
+        while len(datagrams) < self.batch:
+            try:
+                data, self.peer = self.udp.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                break
+            datagrams.append(data)
+        if not datagrams:
+            return
+        if self.tcp is None:
+            self.connect()
+        self.tcp.sendall(frameDatagrams(datagrams))
+        self.up += len(datagrams)
+        self.writes += 1
+
+    def downlink(self):
+        try:
+            data = self.tcp.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        if not data:
+            self.disconnect()
+            return
+        self.inbuf += data
+        for datagram in unframeStream(self.inbuf):
+            if self.peer is not None:
+                self.udp.sendto(datagram, self.peer)
+                self.down += 1
+
+    def connect(self):
+        self.tcp = socket.create_connection(self.tcp_addr, 10)
+        self.tcp.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sel.register(self.tcp, selectors.EVENT_READ)
+        self.inbuf = bytearray()
+
+    def disconnect(self):
+        if self.tcp is not None:
+            self.sel.unregister(self.tcp)
+            self.tcp.close()
+            self.tcp = None
+
+    # ---------------------------------------------------------------
+    # stop() class module.
+    # ---------------------------------------------------------------
+    def stop(self):
+        self.running = False
+        try:
+            self.wake_w.send(b"\0")
+        except OSError as e:
+            if e.errno != errno.EBADF:
+                raise
+        self.join()
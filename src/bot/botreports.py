@@ -31,6 +31,9 @@ class LbConnItem:
         self.msgrecv = 0
         self.cfgrecv = 0
         self.genrecv = 0
+        self.bytesbudget = 0
+        self.bytesused = 0
+        self.byteswasted = 0
         self.errorlist = []
 
     def update_timestart(self):
@@ -75,6 +78,12 @@ class LbConnItem:
         self.genrecv += amt
         return
 
+    def update_packstats(self, budget, used, wasted):
+        self.bytesbudget = budget
+        self.bytesused += used
+        self.byteswasted += wasted
+        return
+
     def generate_stats(self):
 
         try:
@@ -91,6 +100,9 @@ class LbConnItem:
             d["msgrecv"] = self.msgrecv
             d["cfgrecv"] = self.cfgrecv
             d["genrecv"] = self.genrecv
+            d["bytesbudget"] = self.bytesbudget
+            d["bytesused"] = self.bytesused
+            d["byteswasted"] = self.byteswasted
             d["errors"] = self.errorlist
 
             return d
@@ -99,9 +111,12 @@ class LbConnItem:
 
 
 class LbRpt:
-    def __init__(self, _outfname, _lb_conn_list):
+    # '_phase' is the LB phase from 'BotPhases.report()': its timing,
+    # deadline and overlap with the HB phase.
+    def __init__(self, _outfname, _lb_conn_list, _phase=None):
         self.outfname = os.path.abspath(nepi_home + '/log/' + _outfname)
         self.lb_conn_list = _lb_conn_list
+        self.phase = _phase
 
     def create_lb_report(self):
 
@@ -111,13 +126,15 @@ class LbRpt:
         #     pass
 
         d = OrderedDict()
+        if self.phase:
+            d["phase"] = self.phase
         d["connections"] = []
         for i in self.lb_conn_list:
             if i:
                 info = i.generate_stats()
                 d["connections"].append(info)
 
-        if not len(d["connections"]):
+        if not len(d["connections"]) and not self.phase:
             return
 
         try:
@@ -245,8 +262,12 @@ class HbConnItem:
 
 
 class HbRpt:
-    def __init__(self, _outfile):
+    # '_phase' as for 'LbRpt', for the HB phase; '_ssh' the Session's
+    # 'SshMux.stats()': handshakes made and saved.
+    def __init__(self, _outfile, _phase=None, _ssh=None):
         self.filename = os.path.abspath(nepi_home + '/log/' + _outfile)
+        self.phase = _phase
+        self.ssh = _ssh
 
     def create_hb_report(self):
 
@@ -259,6 +280,10 @@ class HbRpt:
         sw_stats = sw_data.parse_rsync_file(sw_infile)
 
         d = OrderedDict()
+        if self.phase:
+            d["phase"] = self.phase
+        if self.ssh:
+            d["ssh"] = self.ssh
         d["connections"] = []
         # d["connections"]= [do_stats, sw_stats]
         if do_data:
@@ -0,0 +1,158 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Selective acknowledgement (SACK) for the 'ethernet' LB link (opt-in,
+# 'lb_ip.sack').  Once a message's packets are out, the Server answers,
+# after a short quiet spell, with which of them it has:
+#
+#   0x00, 0x53 ('S'), msg_num (2 bytes), total packets (4 bytes),
+#   bitmap: bit i (LSB first in each byte) set = packet i received
+#
+# and the Bot resends only the missing packets, for at most 'sack_rounds'
+# rounds, before giving the message up as not sent.  The leading 0x00
+# keeps a SACK apart from NEPIMsgs and the 'S' from batch envelopes (see
+# 'botbatch').
+#
+import socket
+import struct
+import time
+
+v_botsack = "bot71-20200601"
+
+sack_marker = 0x53
+sack_header = struct.Struct("!BBHI")
+
+
+# ---------------------------------------------------------------
+# packSack() module function.
+# ---------------------------------------------------------------
+# The SACK of message '_msg_num' with the packet indexes '_received' (the
+# Server side, or a stand-in for it).
+def packSack(_msg_num, _total, _received):
+    bitmap = bytearray((_total + 7) // 8)
+    for index in _received:
+        bitmap[index >> 3] |= 1 << (index & 7)
+    return sack_header.pack(0x00, sack_marker, _msg_num, _total) + bytes(bitmap)
+
+
+def isSack(_datagram):
+    return len(_datagram) >= sack_header.size and _datagram[0] == 0x00 and _datagram[1] == sack_marker
+
+
+# ---------------------------------------------------------------
+# parseSack() module function.
+# ---------------------------------------------------------------
+# (msg_num, total, bitmap) of a SACK datagram, or None if it isn't one.
+def parseSack(_datagram):
+    if not isSack(_datagram):
+        return None
+    zero, marker, msg_num, total = sack_header.unpack_from(_datagram)
+    bitmap = bytes(_datagram[sack_header.size:])
+    if len(bitmap) != (total + 7) // 8:
+        return None
+    return msg_num, total, bitmap
+
+
+def missingPackets(_total, _bitmap):
+    return [i for i in range(_total) if not _bitmap[i >> 3] & (1 << (i & 7))]
+
+
+########################################################################
+# The SACK Sender Class
+########################################################################
+
+
+class SackSender(object):
+    # ---------------------------------------------------------------
+    # Sends a message with '_tx' ('botudp.UdpTx') and sees it through to
+    # the Server's SACK.  A round is: wait up to 'sack_tout' seconds for
+    # the SACK, then resend what it says is missing (a loss, to the
+    # pacer).  No SACK at all means the tail of the message, or the SACK
+    # itself, was lost; resending the last packet (or the ones still
+    # missing) draws another.  Anything else that turns up while waiting
+    # is a downlink message and is kept for 'receive()'.
+    def __init__(self, _cfg, _log, _lev, _sock, _tx, _splitter):
+        self.cfg = _cfg
+        self.log = _log
+        self.sock = _sock
+        self.tx = _tx
+        self.splitter = _splitter
+        self.rounds = max(int(self.cfg.lb_ip.sack_rounds), 0)
+        self.tout = float(self.cfg.lb_ip.sack_tout)
+        self.acked = 0
+        self.resent = 0
+
+        if self.cfg.tracking:
+            self.log.track(_lev, "Created SackSender Class Object.", True)
+            self.log.track(_lev + 1, "sack_rounds: " + str(self.rounds), True)
+            self.log.track(_lev + 1, "sack_tout: " + str(self.tout), True)
+
+    # ---------------------------------------------------------------
+    # send() class module.
+    # ---------------------------------------------------------------
+    # Send '_message' until every packet is acknowledged; datagrams that
+    # aren't SACKs go to '_incoming'.  Returns the usual success list.
+    def send(self, _lev, _message, _incoming):
+        total = self.splitter.npackets(len(_message))
+        msg_num = self.tx.send(self.splitter, _message)
+        if total == 0:
+            return [True, None, None]
+
+        missing = None
+        for rnd in range(self.rounds + 1):
+            bitmap = self.awaitSack(msg_num, total, _incoming)
+            if bitmap is not None:
+                missing = missingPackets(total, bitmap)
+                if not missing:
+                    self.acked += 1
+                    if self.cfg.tracking:
+                        self.log.track(_lev, "Msg " + str(msg_num) + " Acked After Round " + str(rnd) + ".", True)
+                    return [True, None, None]
+                self.tx.pacer.on_loss()
+            if rnd == self.rounds:
+                break
+            resend = missing if missing else [total - 1]
+            if self.cfg.tracking:
+                self.log.track(_lev + 1, "Msg " + str(msg_num) + ": Resending " + str(len(resend)) + " of " + str(total) + ".", True)
+            self.tx.send(self.splitter, _message, msg_num, resend)
+            self.resent += len(resend)
+
+        enum = "SK101"
+        emsg = "send(): Msg " + str(msg_num) + " Not Acknowledged [" + str(len(missing) if missing else total) + " of " + str(total) + " Packets Unconfirmed]."
+        if self.cfg.tracking:
+            self.log.errtrack(str(enum), str(emsg))
+        return [False, str(enum), str(emsg)]
+
+    # ---------------------------------------------------------------
+    # awaitSack() class module.
+    # ---------------------------------------------------------------
+    # The bitmap of message '_msg_num' from the next SACK for it, or None
+    # after 'sack_tout' seconds.  Stale SACKs (earlier messages) are
+    # dropped.
+    def awaitSack(self, _msg_num, _total, _incoming):
+        saved = self.sock.gettimeout()
+        deadline = time.monotonic() + self.tout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.sock.settimeout(remaining)
+                try:
+                    datagram = self.sock.recv(65536)
+                except socket.timeout:
+                    return None
+                sack = parseSack(datagram)
+                if sack is None:
+                    if not isSack(datagram):
+                        _incoming.append(datagram)
+                    continue
+                if sack[0] == _msg_num and sack[1] == _total:
+                    return sack[2]
+        finally:
+            self.sock.settimeout(saved)
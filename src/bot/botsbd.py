@@ -0,0 +1,192 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# SBD session planning for the 'iridium' LB link, over the AT engine
+# ('botat').  The modem holds one MO message (up to 340 bytes) at a time
+# and each SBDIX session carries it up and brings one MT message down,
+# so a session is planned as: write the MO buffer, then run SBDIX cycles
+# until the MO message is through and the Gateway has no MT messages
+# left queued, reading each MT message as it comes.  Signal quality
+# (AT+CSQ, which costs the modem a few seconds of its own on real
+# hardware) is asked only when the last answer is older than 'csq_ttl',
+# or after a failed session.  The queue is packed into full MO payloads
+# before it gets here: 'BotLbProc.batchBudget()' caps batch envelopes at
+# 'sbd_mo_max'.
+#
+import time
+import struct
+
+v_botsbd = "bot71-20200601"
+
+sbd_mo_max = 340
+
+
+# ---------------------------------------------------------------
+# parseSbdix() module function.
+# ---------------------------------------------------------------
+# "+SBDIX: <MO status>, <MOMSN>, <MT status>, <MTMSN>, <MT length>,
+# <MT queued>" as a tuple of ints.  MO status 0-4 is success; MT status
+# 1 means an MT message is in the MT buffer.
+def parseSbdix(_text):
+    fields = _text.split("+SBDIX:")[1].split("\r")[0].split(",")
+    return tuple(int(f) for f in fields[:6])
+
+
+########################################################################
+# The SBD Session Planner Class
+########################################################################
+
+
+class SbdPlanner(object):
+    # ---------------------------------------------------------------
+    # '_at' is the started 'ATEngine' on the modem's port.
+    def __init__(self, _cfg, _log, _lev, _at, _clock=time.monotonic):
+        self.cfg = _cfg
+        self.log = _log
+        self.at = _at
+        self.clock = _clock
+        self.csq_ttl = self.cfg.lb_iridium.csq_ttl
+        self.csq_min = self.cfg.lb_iridium.csq_min
+        self.retry_wait = self.cfg.lb_iridium.sbd_retry_wait
+        self.csq = None
+        self.csq_at = None
+        self.sessions = 0
+        self.sbdix = 0
+        self.mo = 0
+        self.mt = 0
+        self.csq_asked = 0
+        self.airtime = 0.0
+
+        if self.cfg.tracking:
+            self.log.track(_lev, "Created SbdPlanner Class Object.", True)
+
+    # ---------------------------------------------------------------
+    # signal() class module.
+    # ---------------------------------------------------------------
+    # Signal quality (0-5), from the cache while it is fresh.
+    def signal(self, _lev):
+        now = self.clock()
+        if self.csq is not None and now - self.csq_at < self.csq_ttl:
+            return self.csq
+        req = self.at.command(b"AT+CSQ", 20)
+        self.csq_asked += 1
+        text = req.text()
+        if req.final != "OK" or not text.startswith("+CSQ"):
+            self.csq = None
+            return 0
+        self.csq = int(text.split(":")[1])
+        self.csq_at = now
+        if self.cfg.tracking:
+            self.log.track(_lev, "Sig Qual: [" + str(self.csq) + "]", True)
+        return self.csq
+
+    # ---------------------------------------------------------------
+    # writeMo() class module.
+    # ---------------------------------------------------------------
+    # Load '_msg' into the MO buffer (AT+SBDWB, binary with checksum).
+    def writeMo(self, _lev, _msg):
+        req = self.at.command(b"AT+SBDWB=" + str(len(_msg)).encode(), 20)
+        if req.final != "READY":
+            return [False, "SB101", "writeMo(): No READY [" + str(req.final) + "]"]
+        checksum = struct.pack(">H", sum(_msg) & 0xFFFF)
+        req = self.at.command(bytes(_msg) + checksum, 20, False, True)
+        if req.final != "OK" or req.text() != "0":
+            return [False, "SB104", "writeMo(): MO Buffer Not Loaded [" + req.text() + "]"]
+        if self.cfg.tracking:
+            self.log.track(_lev, "MO Buffer Loaded: " + str(len(_msg)) + " bytes.", True)
+        return [True, None, None]
+
+    # ---------------------------------------------------------------
+    # session() class module.
+    # ---------------------------------------------------------------
+    # Send '_mo' (None for a mailbox check) and collect every queued MT
+    # message into '_incoming', within '_tout' seconds.
+    def session(self, _lev, _mo, _tout, _incoming):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering 'session()' Class Method.", True)
+
+        t0 = self.clock()
+        deadline = t0 + _tout
+        sbdix, airtime, mo, mt = self.sbdix, self.airtime, self.mo, self.mt
+        self.sessions += 1
+
+        if _mo is None:
+            # An empty MO buffer, or SBDIX would send the last one again.
+            self.at.command(b"AT+SBDD0", 20)
+        else:
+            success = self.writeMo(_lev + 1, _mo)
+            if not success[0]:
+                if self.cfg.tracking:
+                    self.log.errtrack(success[1], success[2])
+                return success
+
+        mo_pending = _mo is not None
+        checked = False
+        while self.clock() < deadline:
+            if self.signal(_lev + 1) < self.csq_min:
+                self.csq = None
+                time.sleep(min(self.retry_wait, max(deadline - self.clock(), 0)))
+                continue
+
+            req = self.at.command(b"AT+SBDIX", max(deadline - self.clock(), 1))
+            self.sbdix += 1
+            self.airtime += req.took or 0.0
+            try:
+                status = parseSbdix(req.text()) if req.final == "OK" else None
+            except (IndexError, ValueError):
+                status = None
+            if status is None or status[0] > 4:
+                # No session; the signal is worth asking again.
+                if self.cfg.tracking:
+                    self.log.track(_lev + 1, "SBDIX Failed: " + str(status or req.final), True)
+                self.csq = None
+                time.sleep(min(self.retry_wait, max(deadline - self.clock(), 0)))
+                continue
+
+            checked = True
+            if mo_pending:
+                mo_pending = False
+                self.mo += 1
+                self.at.command(b"AT+SBDD0", 20)
+            if status[2] == 1:
+                req = self.at.command(b"AT+SBDRB", 20)
+                data = req.data if req.final == "OK" else None
+                if data and struct.unpack(">H", data[-2:])[0] == sum(data[2:-2]) & 0xFFFF:
+                    _incoming.append(data[2:-2])
+                    self.mt += 1
+                elif self.cfg.tracking:
+                    self.log.errtrack("SB103", "session(): MT Message Not Read [" + str(req.final) + "]")
+            if self.cfg.tracking:
+                self.log.track(_lev + 1, "SBDIX: " + str(status), True)
+            if status[5] == 0:
+                break
+
+        sbdix = self.sbdix - sbdix
+        if self.cfg.tracking:
+            self.log.track(_lev, "SBD Session Stats:", True)
+            self.log.track(
+                _lev + 1,
+                "sbdix: %d, mo: %d, mt: %d, msgs/sbdix: %.2f, airtime: %.1f s, session: %.1f s"
+                % (
+                    sbdix,
+                    self.mo - mo,
+                    self.mt - mt,
+                    (self.mo - mo + self.mt - mt) / sbdix if sbdix else 0.0,
+                    self.airtime - airtime,
+                    self.clock() - t0,
+                ),
+                True,
+            )
+
+        if not checked or mo_pending:
+            enum = "SB102"
+            emsg = "session(): SBD Session Time Out"
+            if self.cfg.tracking:
+                self.log.errtrack(enum, emsg)
+            return [False, enum, emsg]
+        return [True, None, None]
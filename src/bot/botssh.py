@@ -0,0 +1,218 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# HB ssh connection sharing.  Every server command and every 'rsync' of
+# an HB Session used to make its own ssh connection, a full key exchange
+# each over what can be a high-latency link.  With 'hb_ip.mux' on, one
+# master connection (OpenSSH ControlMaster) is opened per Session and the
+# commands, and the 'ssh' under 'rsync -e', ride on it through its control
+# socket.  Should the master not come up, or die, ssh simply connects on
+# its own again.  The handshakes made and the ones saved go into the HB
+# execution report.
+#
+import os
+import time
+import shutil
+import signal
+import tempfile
+import threading
+import subprocess
+from collections import OrderedDict
+
+from botphase import runChild
+
+v_botssh = "bot71-20200601"
+
+
+########################################################################
+# The HB ssh Connection Sharing Class
+########################################################################
+
+
+class SshMux(object):
+    def __init__(self, _cfg, _log, _lev, _dest, _key_file, _event=None, _clock=time.monotonic):
+        self.cfg = _cfg
+        self.log = _log
+        self.lev = _lev
+        self.dest = _dest
+        self.event = _event
+        self.clock = _clock
+        # Held while a command runs, so 'close()' waits for it.
+        self.lock = threading.Lock()
+        self.base = [
+            "-p",
+            f"{self.cfg.hb_ip.port}",
+            "-o",
+            "StrictHostKeyChecking=no",
+            "-o",
+            "GlobalKnownHostsFile=/dev/null",
+            "-o",
+            "UserKnownHostsFile=/dev/null",
+            "-i",
+            f"{_key_file}",
+        ]
+        self.ctl_dir = None
+        self.ctl_path = None
+        self.master = None
+        self.master_secs = None
+        self.handshakes = 0  # ssh connections made, the master's included
+        self.muxed = 0  # commands run over the master
+        self.cmd_secs = 0.0
+
+        if self.cfg.tracking:
+            self.log.track(_lev, "Created SshMux Class Object.", True)
+
+    # ---------------------------------------------------------------
+    # up() class module.
+    # ---------------------------------------------------------------
+    def up(self):
+        return (
+            self.master is not None
+            and self.master.poll() is None
+            and os.path.exists(self.ctl_path)
+        )
+
+    # ---------------------------------------------------------------
+    # opts() class module.
+    # ---------------------------------------------------------------
+    # The ssh options for a command: through the master's control socket
+    # while there is one.
+    def opts(self):
+        if self.ctl_path is None:
+            return list(self.base)
+        return self.base + ["-o", f"ControlPath={self.ctl_path}"]
+
+    # ---------------------------------------------------------------
+    # command() class module.
+    # ---------------------------------------------------------------
+    # The ssh command line running '_line' on the server.
+    def command(self, _line):
+        return ["ssh"] + self.opts() + [self.dest, _line]
+
+    # ---------------------------------------------------------------
+    # rshell() class module.
+    # ---------------------------------------------------------------
+    # The remote shell for 'rsync -e'.
+    def rshell(self):
+        return " ".join(["ssh"] + self.opts())
+
+    # ---------------------------------------------------------------
+    # open() class module.
+    # ---------------------------------------------------------------
+    # Start the master and wait, up to 'hb_ip.mux_tout' seconds, for its
+    # control socket (it is there once the key exchange and login are
+    # done).  On failure commands connect on their own.
+    def open(self, _lev):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering 'open()' Class Method.", True)
+        if not self.cfg.hb_ip.mux:
+            return [True, None, None]
+        if self.event is not None and self.event.is_set():
+            return [False, "SH101", "open(): HB Stopped."]
+
+        self.ctl_dir = tempfile.mkdtemp(prefix="nepibot-ssh-")
+        self.ctl_path = os.path.join(self.ctl_dir, "ctl")
+        args = ["ssh"] + self.base + [
+            "-o",
+            "ControlMaster=yes",
+            "-o",
+            f"ControlPath={self.ctl_path}",
+            "-N",
+            self.dest,
+        ]
+        t0 = self.clock()
+        try:
+            self.master = subprocess.Popen(
+                args,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+        except OSError as e:
+            self.close(_lev + 1)
+            return [False, "SH102", "open(): Can't Start ssh Master [" + str(e) + "]"]
+        self.handshakes += 1
+
+        tout = t0 + self.cfg.hb_ip.mux_tout
+        while self.clock() < tout and self.master.poll() is None:
+            if self.event is not None and self.event.is_set():
+                break
+            if os.path.exists(self.ctl_path):
+                self.master_secs = self.clock() - t0
+                if self.cfg.tracking:
+                    self.log.track(
+                        _lev + 1, "ssh Master Up in %.2f s: %s" % (self.master_secs, self.ctl_path), True
+                    )
+                return [True, None, None]
+            time.sleep(0.05)
+
+        emsg = "open(): ssh Master Not Up (rc=%s); Connect Per Command." % self.master.poll()
+        if self.cfg.tracking:
+            self.log.track(_lev + 1, "SH103: " + emsg, True)
+        self.close(_lev + 1)
+        return [False, "SH103", emsg]
+
+    # ---------------------------------------------------------------
+    # run() class module.
+    # ---------------------------------------------------------------
+    # Run an ssh or 'rsync' command line from 'command()'/'rshell()'
+    # ('runChild()', so the HB deadline stops it), counting it as a
+    # handshake or as one saved.
+    def run(self, _args, _cwd=None):
+        with self.lock:
+            if self.event is None or not self.event.is_set():
+                if self.up():
+                    self.muxed += 1
+                else:
+                    self.handshakes += 1
+            t0 = self.clock()
+            proc = runChild(_args, self.event, _cwd)
+            self.cmd_secs += self.clock() - t0
+        return proc
+
+    # ---------------------------------------------------------------
+    # close() class module.
+    # ---------------------------------------------------------------
+    # After the command running, if any (one left behind by a stopped HB
+    # phase is being terminated).
+    def close(self, _lev):
+        with self.lock:
+            self.stop()
+        if self.cfg.tracking:
+            self.log.track(_lev, "ssh Connections: " + str(dict(self.stats())), True)
+        return [True, None, None]
+
+    def stop(self):
+        if self.master is not None and self.master.poll() is None:
+            for sig in (signal.SIGTERM, signal.SIGKILL):
+                try:
+                    os.killpg(self.master.pid, sig)
+                    self.master.wait(2.0)
+                    break
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+        if self.ctl_dir is not None:
+            shutil.rmtree(self.ctl_dir, ignore_errors=True)
+        self.ctl_dir = None
+        self.ctl_path = None
+
+    # ---------------------------------------------------------------
+    # stats() class module.
+    # ---------------------------------------------------------------
+    # For the HB execution report.  A command over the master saves one
+    # handshake, taken to cost what the master's did.
+    def stats(self):
+        d = OrderedDict()
+        d["mux"] = self.master_secs is not None
+        d["handshakes"] = self.handshakes
+        d["handshakes_saved"] = self.muxed
+        d["handshake_secs"] = round(self.master_secs, 3) if self.master_secs is not None else None
+        d["secs_saved"] = round(self.muxed * (self.master_secs or 0.0), 3)
+        d["cmd_secs"] = round(self.cmd_secs, 3)
+        return d
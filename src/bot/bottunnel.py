@@ -0,0 +1,221 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# The 'ethernet' LB link reaches the Server through an 'ssh -L' tunnel
+# and a local 'socat' UDP-to-TCP relay.  With 'lb_ip.tunnel_persist' the
+# two are left running when the Bot exits, their pids and command lines
+# kept in a pid file, and the next wake-up reuses them after a quick
+# health check (both processes alive, with the same command lines, and
+# the tunnel's local port accepting connections) instead of starting
+# over.  Either way, the tunnel is waited on with an active readiness
+# probe ('waitReady()') rather than a fixed sleep.
+#
+import os
+import json
+import time
+import signal
+import socket
+import subprocess
+
+v_bottunnel = "bot71-20200601"
+
+
+# ---------------------------------------------------------------
+# pidAlive() module function.
+# ---------------------------------------------------------------
+# Is process '_pid' still running '_args'?  The command line check
+# guards against a recycled pid (and a dead child that is only a
+# zombie); without '/proc' the pid alone has to do.
+def pidAlive(_pid, _args):
+    if _pid <= 0:
+        return False
+    try:
+        os.kill(_pid, 0)
+    except OSError:
+        return False
+    try:
+        with open("/proc/" + str(_pid) + "/cmdline", "rb") as f:
+            cmdline = f.read()
+    except OSError:
+        return True
+    return cmdline.split(b"\0")[:-1] == [os.fsencode(a) for a in _args]
+
+
+def reap(_pid):
+    # Collect a child of ours that has exited; others aren't ours to wait on.
+    try:
+        os.waitpid(_pid, os.WNOHANG)
+    except OSError:
+        pass
+
+
+def tcpReady(_host, _port, _tout=0.25):
+    try:
+        socket.create_connection((_host, int(_port)), _tout).close()
+        return True
+    except OSError:
+        return False
+
+
+# ---------------------------------------------------------------
+# waitReady() module function.
+# ---------------------------------------------------------------
+# Wait up to '_tout' seconds for the tunnel's local port to accept a
+# connection (ssh opens it once the session is up).  Gives up early if
+# one of '_procs' exits.
+def waitReady(_host, _port, _tout, _procs=()):
+    deadline = time.monotonic() + _tout
+    while True:
+        if tcpReady(_host, _port):
+            return True
+        if any(p.poll() is not None for p in _procs):
+            return False
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+
+
+########################################################################
+# The Persistent Tunnel Class
+########################################################################
+
+
+class BotTunnel(object):
+    # ---------------------------------------------------------------
+    # The tunnel processes ('_cmds', a list of (name, args)) and their
+    # pid file.  The processes run in their own session so that they
+    # outlive the Bot.
+    def __init__(self, _cfg, _log, _lev, _pidfile, _host, _port):
+        self.cfg = _cfg
+        self.log = _log
+        self.pidfile = _pidfile
+        self.host = _host
+        self.port = _port
+        self.reused = False
+
+        if self.cfg.tracking:
+            self.log.track(_lev, "Created BotTunnel Class Object.", True)
+            self.log.track(_lev + 1, "pidfile: " + str(self.pidfile), True)
+
+    def load(self):
+        try:
+            with open(self.pidfile) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, _state):
+        tmp = self.pidfile + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(_state, f)
+        os.replace(tmp, self.pidfile)
+
+    # ---------------------------------------------------------------
+    # healthy() class module.
+    # ---------------------------------------------------------------
+    # Are the processes in the pid file the ones '_cmds' asks for, alive,
+    # and is the tunnel taking connections?
+    def healthy(self, _cmds):
+        state = self.load()
+        for name, args in _cmds:
+            entry = state.get(name)
+            if not entry or entry.get("args") != list(args) or not pidAlive(entry.get("pid", 0), args):
+                return False
+        return tcpReady(self.host, self.port)
+
+    # ---------------------------------------------------------------
+    # open() class module.
+    # ---------------------------------------------------------------
+    # Reuse a healthy tunnel, or stop what is left of an old one and
+    # start '_cmds' afresh, waiting up to '_tout' seconds for it.
+    def open(self, _lev, _cmds, _tout):
+        if self.cfg.tracking:
+            self.log.track(_lev, "Entering 'open()' Module.", True)
+
+        t0 = time.monotonic()
+        if self.healthy(_cmds):
+            self.reused = True
+            if self.cfg.tracking:
+                self.log.track(_lev + 1, f"Reusing Tunnel [check {time.monotonic() - t0:.3f} s].", True)
+            return [True, None, None]
+
+        self.reused = False
+        self.stop(_lev + 1)
+        state = {}
+        procs = []
+        try:
+            for name, args in _cmds:
+                proc = subprocess.Popen(
+                    args,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    start_new_session=True,
+                )
+                procs.append(proc)
+                state[name] = {"pid": proc.pid, "args": list(args)}
+            self.save(state)
+        except Exception as e:
+            for proc in procs:
+                proc.kill()
+            enum = "TN101"
+            emsg = "open(): Tunnel Not Started [" + str(e) + "]"
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)]
+
+        if not waitReady(self.host, self.port, _tout, procs):
+            exited = [name for (name, args), p in zip(_cmds, procs) if p.poll() is not None]
+            self.stop(_lev + 1)
+            enum = "TN102"
+            if exited:
+                emsg = "open(): Tunnel Process Exited " + str(exited) + "."
+            else:
+                emsg = "open(): Tunnel Not Ready After " + str(_tout) + " s."
+            if self.cfg.tracking:
+                self.log.errtrack(str(enum), str(emsg))
+            return [False, str(enum), str(emsg)]
+
+        if self.cfg.tracking:
+            self.log.track(_lev + 1, f"Tunnel Started [ready {time.monotonic() - t0:.3f} s].", True)
+        return [True, None, None]
+
+    # ---------------------------------------------------------------
+    # stop() class module.
+    # ---------------------------------------------------------------
+    # Terminate the processes in the pid file (the ones that are still
+    # what it says they are) and remove it.
+    def stop(self, _lev):
+        state = self.load()
+        live = {}
+        for entry in state.values():
+            if pidAlive(entry.get("pid", 0), entry.get("args", [])):
+                live[entry["pid"]] = entry["args"]
+        for pid in live:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        deadline = time.monotonic() + 2.0
+        for pid, args in live.items():
+            reap(pid)
+            while pidAlive(pid, args) and time.monotonic() < deadline:
+                time.sleep(0.02)
+                reap(pid)
+            if pidAlive(pid, args):
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except OSError:
+                    pass
+            reap(pid)
+        try:
+            os.remove(self.pidfile)
+        except OSError:
+            pass
+        if live and self.cfg.tracking:
+            self.log.track(_lev, "Stopped Tunnel Processes: " + str(list(live)), True)
@@ -0,0 +1,217 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# UDP transmit backends for the 'ethernet' LB link.  A message goes out
+# as NEPI packets (see 'botcomm.MessageSplitter') in one of three ways
+# ('tx_backend'):
+#
+#   sendmmsg  batches of 'tx_batch' packets per system call, each packet
+#             gathered from its header and a slice of the message (Linux
+#             glibc, through a small ctypes shim)
+#   sendmsg   one gathered packet per call ('socket.sendmsg()')
+#   sendall   one packet per call, built in the splitter's buffer
+#
+# "auto" takes the first one this platform has.  Pacing ('botcomm.Pacer')
+# is applied per batch.
+#
+import ctypes
+import ctypes.util
+import errno
+import platform
+import select
+import socket
+import struct
+import sys
+
+v_botudp = "bot71-20200601"
+
+
+class iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(iovec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", msghdr), ("msg_len", ctypes.c_uint)]
+
+
+# One packet's pair of iovecs (header, payload), written with 'pack_into()'
+# rather than field by field through ctypes, which is several times slower.
+iovec_pair = struct.Struct("@PNPN")
+
+
+# ---------------------------------------------------------------
+# loadSendmmsg() module function.
+# ---------------------------------------------------------------
+# libc's 'sendmmsg()', or None.  The structures above follow the glibc
+# layout, so other C libraries (and other systems) use 'sendmsg'.
+def loadSendmmsg():
+    if not sys.platform.startswith("linux") or platform.libc_ver()[0] != "glibc":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fn = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    fn.restype = ctypes.c_int
+    return fn
+
+
+libc_sendmmsg = loadSendmmsg()
+
+
+def backends():
+    have = []
+    if libc_sendmmsg is not None:
+        have.append("sendmmsg")
+    if hasattr(socket.socket, "sendmsg"):
+        have.append("sendmsg")
+    have.append("sendall")
+    return have
+
+
+# ---------------------------------------------------------------
+# bufAddress() module function.
+# ---------------------------------------------------------------
+# Address of a 'bytes' or writable buffer's data, without copying it.
+# Only good while '_buf' is alive and unchanged.
+def bufAddress(_buf):
+    if isinstance(_buf, bytes):
+        return ctypes.cast(ctypes.c_char_p(_buf), ctypes.c_void_p).value
+    return ctypes.addressof((ctypes.c_char * len(_buf)).from_buffer(_buf))
+
+
+########################################################################
+# The UDP Transmit Class
+########################################################################
+
+
+class UdpTx(object):
+    # ---------------------------------------------------------------
+    # Sends messages as NEPI packets on a connected UDP socket.  ENOBUFS
+    # (and, for 'sendall', EAGAIN) is a loss to the pacer and is retried
+    # a few times; the socket's timeout bounds any wait for buffer room.
+    def __init__(self, _sock, _pacer, _backend="auto", _batch=16):
+        have = backends()
+        self.sock = _sock
+        self.pacer = _pacer
+        self.backend = have[0] if _backend == "auto" or _backend not in have else _backend
+        self.batch = max(int(_batch), 1) if self.backend == "sendmmsg" else 1
+        self.syscalls = 0
+        if self.backend == "sendmmsg":
+            self.hdrbuf = bytearray(16 * self.batch)  # 12 byte NEPI headers
+            self.hdraddr = bufAddress(self.hdrbuf)
+            self.iovbuf = bytearray(iovec_pair.size * self.batch)
+            self.iov = (iovec * (2 * self.batch)).from_buffer(self.iovbuf)
+            self.mmsg = (mmsghdr * self.batch)()
+            for i in range(self.batch):
+                hdr = self.mmsg[i].msg_hdr
+                hdr.msg_iov = ctypes.cast(ctypes.byref(self.iov, 2 * i * ctypes.sizeof(iovec)), ctypes.POINTER(iovec))
+                hdr.msg_iovlen = 2
+
+    # ---------------------------------------------------------------
+    # send() class module.
+    # ---------------------------------------------------------------
+    # Send '_message' split by '_splitter'; or, with '_msg_num', resend
+    # the packets '_indexes' of that message.  Returns the message number.
+    def send(self, _splitter, _message, _msg_num=None, _indexes=None):
+        msg_num = _splitter.nextMsgNum() if _msg_num is None else _msg_num
+        if self.backend == "sendall" or (_splitter.trace and _indexes is None):
+            self.sendPackets(_splitter, _message, msg_num, _indexes)
+            return msg_num
+
+        msg = _message if isinstance(_message, (bytes, bytearray)) else bytes(_message)
+        view = memoryview(msg)
+        size = _splitter.maxpktsize
+        total = _splitter.npackets(len(msg))
+        indexes = list(range(total)) if _indexes is None else list(_indexes)
+        header = _splitter.header
+        if self.backend == "sendmsg":
+            for index in indexes:
+                payload = view[index * size:(index + 1) * size]
+                hdr = header.pack(msg_num, total, index, len(payload))
+                self.pacer.wait(len(hdr) + len(payload))
+                self.retry(lambda: self.sock.sendmsg((hdr, payload)))
+                self.pacer.on_sent(len(hdr) + len(payload))
+            return msg_num
+
+        base = bufAddress(msg)
+        hsize = header.size
+        for first in range(0, len(indexes), self.batch):
+            count = min(self.batch, len(indexes) - first)
+            nbytes = 0
+            for i in range(count):
+                index = indexes[first + i]
+                plen = min(size, len(msg) - index * size)
+                header.pack_into(self.hdrbuf, i * hsize, msg_num, total, index, plen)
+                iovec_pair.pack_into(
+                    self.iovbuf, i * iovec_pair.size,
+                    self.hdraddr + i * hsize, hsize, base + index * size, plen,
+                )
+                nbytes += hsize + plen
+            self.pacer.wait(nbytes)
+            self.sendBatch(count)
+            self.pacer.on_sent(nbytes)
+        return msg_num
+
+    def sendPackets(self, _splitter, _message, _msg_num, _indexes):
+        for packet in _splitter.iterpackets(_message, _msg_num, _indexes):
+            self.pacer.wait(len(packet))
+            self.retry(lambda: self.sock.sendall(packet))
+            self.pacer.on_sent(len(packet))
+
+    # ---------------------------------------------------------------
+    # sendBatch() class module.
+    # ---------------------------------------------------------------
+    # Hand the first '_count' prepared packets to 'sendmmsg()', which may
+    # take fewer than asked; loop until all of them are gone.
+    def sendBatch(self, _count):
+        fd = self.sock.fileno()
+        done = 0
+        losses = 0
+        while done < _count:
+            self.syscalls += 1
+            sent = libc_sendmmsg(fd, ctypes.byref(self.mmsg, done * ctypes.sizeof(mmsghdr)), _count - done, 0)
+            if sent >= 0:
+                done += sent
+                continue
+            err = ctypes.get_errno()
+            if err == errno.EINTR:
+                continue
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                # A socket with a timeout is non-blocking underneath.
+                if not select.select([], [fd], [], self.sock.gettimeout())[1]:
+                    raise socket.timeout("sendmmsg(): timed out")
+                continue
+            if err == errno.ENOBUFS and losses < 2:
+                losses += 1
+                self.pacer.on_loss()
+                continue
+            raise OSError(err, "sendmmsg(): " + str(errno.errorcode.get(err, err)))
+
+    def retry(self, _send):
+        for attempt in range(3):
+            self.syscalls += 1
+            try:
+                return _send()
+            except OSError as e:
+                if e.errno not in (errno.ENOBUFS, errno.EAGAIN) or attempt == 2:
+                    raise
+                self.pacer.on_loss()
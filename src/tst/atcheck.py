@@ -0,0 +1,140 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Iridium AT engine check ('botat') against the pty fake modem
+# ('fakemodem.py'): brings the 'iridium' link up through
+# 'BotComm.getconn()', times single AT commands against the old
+# 'acquire_response()' polling loop (sleep 1 s until the port has data),
+# times a pipelined batch against the same commands one by one, runs a
+# full SBD session through 'BotComm.send()' (with an MT message waiting),
+# and checks ERROR, a modem that never answers, echo off, an unsolicited
+# SBDRING and 'send()'/'receive()' failing cleanly with no modem.  Exits non-zero on failure.
+#
+#   python atcheck.py [commands]
+#
+import sys
+import time
+
+import serial
+
+from tstenv import mkenv
+from fakemodem import FakeModem
+
+import botdefs
+from botcomm import BotComm
+
+
+def old_acquire_response(_port, _command, _wait_time=20):
+    # 'BotComm.acquire_response()' before the AT engine, on bytes.
+    _port.write(_command + b"\r")
+    message = b""
+    timeout = time.time() + _wait_time
+    while time.time() < timeout:
+        if _port.in_waiting == 0:
+            time.sleep(1)
+            continue
+        message += _port.readline()
+        if b"OK" in message:
+            return message[message.index(b"\r") + 1:message.index(b"OK")].strip()
+        elif b"READY" in message:
+            return True
+    return False
+
+
+def timed(_fn, *_args):
+    t0 = time.perf_counter()
+    out = _fn(*_args)
+    return time.perf_counter() - t0, out
+
+
+if __name__ == "__main__":
+    ncmds = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    failures = []
+    cfg, log, scratch = mkenv()
+
+    old_modem = FakeModem(0.005)
+    old_modem.start()
+    port = serial.Serial(old_modem.name, 19200, timeout=3)
+    secs, out = timed(lambda: [old_acquire_response(port, b"AT+CSQ") for i in range(3)])
+    port.close()
+    print("%-28s %8.1f ms/command  %s" % ("old polling loop", secs / 3 * 1e3, out[-1]))
+
+    modem = FakeModem(0.005, 0.2)
+    modem.mt.append(b"downlink for the bot")
+    modem.start()
+    cfg.lb_iridium.port = modem.name
+    bc = BotComm(cfg, log, "iridium", 1, None)
+    secs, success = timed(bc.getconn, 1)
+    print("%-28s %8.1f ms  %s" % ("getconn (6 commands)", secs * 1e3, success[0]))
+    if not success[0]:
+        failures.append("getconn: " + str(success))
+
+    secs, out = timed(lambda: [bc.acquire_response(b"AT+CSQ") for i in range(ncmds)])
+    print("%-28s %8.1f ms/command  %s" % ("AT engine", secs / ncmds * 1e3, out[-1]))
+    if out != ["+CSQ:4"] * ncmds:
+        failures.append("AT+CSQ: " + str(out[-1]))
+
+    secs, reqs = timed(bc.at.pipeline, [b"AT+CSQ", b"AT+CGSN"] * (ncmds // 2), 10)
+    print("%-28s %8.1f ms/command" % ("AT engine, pipelined", secs / len(reqs) * 1e3))
+    if [r.text() for r in reqs] != ["+CSQ:4", "300234010753370"] * (ncmds // 2):
+        failures.append("pipeline: " + str([(r.final, r.lines) for r in reqs]))
+
+    msg = bytes(range(200))
+    del botdefs.msgs_incoming[:]
+    secs, (success, unused) = timed(bc.send, 1, msg, 1, None)
+    got = list(botdefs.msgs_incoming)
+    print("%-28s %8.1f ms  %s, MT %s" % ("SBD session (send)", secs * 1e3, success[0], got))
+    if not success[0] or modem.mo != [msg] or got != [b"downlink for the bot"]:
+        failures.append("session: %s, mo %s, mt %s" % (success, modem.mo, got))
+
+    # A wrong checksum is the modem's "2", not a READY or OK.
+    bc.acquire_response(b"AT+SBDWB=3")
+    out = bc.acquire_response(b"abc\x00\x00", 5, True)
+    print("%-28s %s" % ("bad checksum", out))
+    if out != "2":
+        failures.append("bad checksum: " + str(out))
+
+    secs, out = timed(bc.acquire_response, b"AT+BOGUS")
+    print("%-28s %8.1f ms  %s" % ("ERROR", secs * 1e3, out))
+    if out is not False or secs > 1.0:
+        failures.append("ERROR: %s in %.3f s" % (out, secs))
+
+    modem.silent.add(b"AT+HANG")
+    secs, out = timed(bc.acquire_response, b"AT+HANG", 0.5)
+    after = bc.acquire_response(b"AT+CSQ")
+    print("%-28s %8.1f ms  %s, then %s" % ("no answer (0.5 s)", secs * 1e3, out, after))
+    if out is not False or secs > 1.0 or after != "+CSQ:4":
+        failures.append("no answer: %s, then %s" % (out, after))
+
+    bc.acquire_response(b"ATE0")
+    out = bc.acquire_response(b"AT+CGMI")
+    modem.mt.append(b"x" * 100)
+    modem.ring()
+    bc.acquire_response(b"AT+SBDIX")
+    data = bc.acquire_response(b"AT+SBDRB")
+    print("%-28s %s, %d-byte MT, unsolicited %s" % ("echo off", out, len(data[2:-2]), bc.at.unsolicited))
+    if out != "Iridium" or data[2:-2] != b"x" * 100 or bc.at.unsolicited != [b"SBDRING"]:
+        failures.append("echo off: %s, %s, %s" % (out, data, bc.at.unsolicited))
+
+    bc.close(1)
+
+    # No modem: 'getconn()' fails and the SBD calls say so, not raise.
+    cfg.lb_iridium.port = scratch + "/no-such-tty"
+    cfg.lb_iridium.open_tout = 0
+    bc = BotComm(cfg, log, "iridium", 1, None)
+    conn = bc.getconn(1)
+    recv = bc.receive(1, 1)
+    sent = bc.send(1, b"x", 1, None)[0]
+    print("%-28s %s, receive %s, send %s" % ("no modem", conn[0], recv[0], sent[0]))
+    if conn[0] or recv[0] is not False or sent[0] is not False:
+        failures.append("no modem: %s, %s, %s" % (conn, recv, sent))
+    bc.close(1)
+    for f in failures:
+        print("FAIL " + f)
+    print("PASSED" if not failures else "FAILED (%d)" % len(failures))
+    sys.exit(1 if failures else 0)
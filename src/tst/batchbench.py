@@ -0,0 +1,84 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Batch envelope benchmark: a Session of synthetic NEPIMsg-shaped records
+# (varint 'comm_index', a 'nuid', a body) sent one per message as today
+# and batched by 'botbatch.batchMsgs()', both through the 'ethernet'
+# MessageSplitter.  Reports packets and wire bytes (UDP + NEPI headers
+# included) per record, and checks that 'unbatchMsg()' gives back every
+# record.  Exits non-zero if the round trip fails.
+#
+#   python batchbench.py [records] [packet_size]
+#
+import sys
+import random
+
+from tstenv import mkenv
+
+from botbatch import batchMsgs, unbatchMsg, putVarint, splitField
+from botcomm import MessageSplitter
+
+# Synthetic layout; the real numbers come from 'botmsg.nuid_field'.
+nuid_field = 2
+
+
+def record(_rnd, _index, _nuid, _body_size):
+    msg = putVarint((1 << 3) | 0) + putVarint(_index)
+    msg += putVarint((nuid_field << 3) | 2) + putVarint(len(_nuid)) + _nuid
+    body = bytes(_rnd.getrandbits(8) for i in range(_body_size))
+    msg += putVarint((3 << 3) | 2) + putVarint(len(body)) + body
+    return msg
+
+
+def wire_stats(_splitter, _msgs):
+    packets = 0
+    wire = 0
+    for msg in _msgs:
+        pkts = _splitter.splitmsg(msg)
+        packets += len(pkts)
+        wire += sum(len(p) for p in pkts) + len(pkts) * _splitter.udp_overhead
+    return packets, wire
+
+
+def same(_a, _b):
+    # 'nuid' goes back in front of the record; compare field by field.
+    return splitField(_a, nuid_field) == splitField(_b, nuid_field)
+
+
+if __name__ == "__main__":
+    nrecs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    packet_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1500
+    cfg, log, scratch = mkenv()
+    cfg.tracking = False
+    splitter = MessageSplitter(packet_size, 0, None, True, log)
+    log.track = lambda *args, **kwargs: None  # 'splitmsg()' always logs
+    rnd = random.Random(1500)
+    nuid = bytes(rnd.getrandbits(8) for i in range(16))
+
+    failures = 0
+    print("%d records, %d byte packets (%d byte payload)" % (nrecs, packet_size, splitter.maxpktsize))
+    for name, lo, hi in (("status-sized", 40, 120), ("mixed", 40, 900), ("large", 1000, 4000)):
+        msgs = [record(rnd, i, nuid, rnd.randint(lo, hi)) for i in range(nrecs)]
+        batched = batchMsgs(msgs, splitter.maxpktsize, nuid_field)
+        back = [m for w in batched for m in unbatchMsg(w, nuid_field)]
+        ok = len(back) == len(msgs) and all(same(a, b) for a, b in zip(msgs, back))
+        failures += not ok
+        before = wire_stats(splitter, msgs)
+        after = wire_stats(splitter, batched)
+        print("  %-12s %s" % (name, "ok" if ok else "ROUND TRIP FAILED"))
+        print(
+            "    one per message: %5d messages %6.3f packets/record %8.1f bytes/record"
+            % (len(msgs), float(before[0]) / nrecs, float(before[1]) / nrecs)
+        )
+        print(
+            "    batched:         %5d messages %6.3f packets/record %8.1f bytes/record"
+            % (len(batched), float(after[0]) / nrecs, float(after[1]) / nrecs)
+        )
+
+    print("PASSED" if not failures else "FAILED (%d)" % failures)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,173 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Stand-in for the Iridium SBD modem (9602/9603) on a pseudo-terminal, so
+# the Bot's Iridium link can be run without hardware: open 'name' as the
+# 'lb_iridium.port'.  Answers the AT commands the Bot uses (identity,
+# ATE0/1, +CSQ, +SBDWB with its binary transfer and checksum, +SBDIX,
+# +SBDRB, +SBDD, +SBDMTA) in verbose form, with echo on by default, each
+# after 'delay' seconds; an SBD session (+SBDIX) takes 'session' seconds
+# and a signal quality reading (+CSQ) 'csq_delay' more.
+# Messages written with +SBDWB land in 'mo' when a session "sends" them;
+# messages put in 'mt' are handed out one per session.  Commands in
+# 'silent' get no answer at all.  Used by 'atcheck.py'; can also be run on
+# its own to point a Bot at:
+#
+#   python fakemodem.py [delay] [session]
+#
+import os
+import sys
+import time
+import struct
+import threading
+
+import tstenv  # noqa: F401 (puts the bot modules on the path)
+
+
+class FakeModem(threading.Thread):
+    def __init__(self, _delay=0.01, _session=0.2, _csq=4, _csq_delay=0.0):
+        threading.Thread.__init__(self, daemon=True)
+        self.master, self.slave = os.openpty()
+        self.name = os.ttyname(self.slave)
+        self.delay = _delay
+        self.session = _session
+        self.csq = _csq
+        self.csq_delay = _csq_delay
+        self.echo = True
+        self.silent = set()
+        self.mo_buf = None
+        self.mt_buf = b""
+        self.mo = []
+        self.mt = []
+        self.momsn = 0
+        self.mtmsn = 0
+        self.commands = []
+        self.lock = threading.Lock()
+
+    def write(self, _data):
+        with self.lock:
+            os.write(self.master, _data)
+
+    def reply(self, _lines, _final=b"OK"):
+        time.sleep(self.delay)
+        self.write(b"".join(b"\r\n" + line + b"\r\n" for line in _lines + [_final]))
+
+    def ring(self):
+        self.write(b"\r\nSBDRING\r\n")
+
+    def run(self):
+        buf = bytearray()
+        need = 0  # bytes of an +SBDWB binary transfer still to come
+        while True:
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                return
+            buf += data
+            while buf:
+                if need:
+                    if len(buf) < need:
+                        break
+                    self.binary(bytes(buf[:need]))
+                    del buf[:need]
+                    need = 0
+                    continue
+                end = buf.find(b"\r")
+                if end < 0:
+                    break
+                cmd = bytes(buf[:end]).strip()
+                del buf[:end + 1]
+                if self.echo:
+                    self.write(cmd + b"\r")
+                if cmd:
+                    need = self.command(cmd)
+
+    def binary(self, _data):
+        msg, checksum = _data[:-2], struct.unpack(">H", _data[-2:])[0]
+        if sum(msg) & 0xFFFF != checksum:
+            self.reply([b"2"])
+        else:
+            self.mo_buf = msg
+            self.reply([b"0"])
+
+    # The number of binary bytes the command is followed by.
+    def command(self, _cmd):
+        cmd = _cmd.upper()
+        self.commands.append(cmd)
+        if cmd in self.silent:
+            return 0
+        if cmd in (b"AT", b"AT&K0", b"AT+SBDMTA=0", b"AT+SBDMTA=1"):
+            self.reply([])
+        elif cmd in (b"ATE0", b"ATE1"):
+            self.echo = cmd == b"ATE1"
+            self.reply([])
+        elif cmd == b"AT+CGMI":
+            self.reply([b"Iridium"])
+        elif cmd == b"AT+CGMM":
+            self.reply([b"IRIDIUM 9600 Family SBD Transceiver"])
+        elif cmd == b"AT+CGMR":
+            self.reply([b"Call Processor Version: TA16005", b"Modem DSP Version: 1.7 svn: 2358"])
+        elif cmd == b"AT+CGSN":
+            self.reply([b"300234010753370"])
+        elif cmd == b"AT+SBDMTA?":
+            self.reply([b"+SBDMTA:0"])
+        elif cmd == b"AT+CSQ":
+            time.sleep(self.csq_delay)
+            self.reply([b"+CSQ:%d" % self.csq])
+        elif cmd.startswith(b"AT+SBDWB="):
+            length = int(cmd[9:])
+            if not 1 <= length <= 340:
+                self.reply([b"3"])
+                return 0
+            time.sleep(self.delay)
+            self.write(b"\r\nREADY\r\n")
+            return length + 2
+        elif cmd == b"AT+SBDIX":
+            time.sleep(self.session)
+            mo_status = 0
+            if self.mo_buf is not None:
+                self.mo.append(self.mo_buf)
+                self.momsn += 1
+            mt_status, mt_len = 0, 0
+            if self.mt:
+                self.mt_buf = self.mt.pop(0)
+                self.mtmsn += 1
+                mt_status, mt_len = 1, len(self.mt_buf)
+            self.reply([b"+SBDIX: %d, %d, %d, %d, %d, %d"
+                        % (mo_status, self.momsn, mt_status, self.mtmsn, mt_len, len(self.mt))])
+        elif cmd == b"AT+SBDRB":
+            time.sleep(self.delay)
+            self.write(struct.pack(">H", len(self.mt_buf)) + self.mt_buf
+                       + struct.pack(">H", sum(self.mt_buf) & 0xFFFF) + b"\r\nOK\r\n")
+        elif cmd.startswith(b"AT+SBDD"):
+            if cmd in (b"AT+SBDD0", b"AT+SBDD2"):
+                self.mo_buf = None
+            if cmd in (b"AT+SBDD1", b"AT+SBDD2"):
+                self.mt_buf = b""
+            self.reply([b"0"])
+        else:
+            self.reply([], b"ERROR")
+        return 0
+
+    def close(self):
+        os.close(self.slave)
+        os.close(self.master)
+
+
+if __name__ == "__main__":
+    modem = FakeModem(
+        float(sys.argv[1]) if len(sys.argv) > 1 else 0.01,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.2,
+    )
+    modem.start()
+    print("fake modem on " + modem.name + " (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,85 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Stand-in for the 'ssh' client and an HB server behind a slow link, so
+# HB connection sharing ('botssh') can be run without a server: 'install()'
+# puts an 'ssh' running this script first on the PATH.  A connection of
+# its own takes FAKESSH_DELAY seconds (the key exchange and login) before
+# the command runs, locally, with 'sh -c'.  With '-o ControlMaster=yes' it
+# is a master: after the handshake it listens on its '-o ControlPath'
+# socket until killed.  A client given a ControlPath with a master behind
+# it runs its command at once.  FAKESSH_FAIL makes masters fail their
+# handshake.  Each connection appends "master", "handshake" or "mux" to
+# FAKESSH_LOG.  Used by 'sshcheck.py'.
+#
+import os
+import sys
+import time
+import socket
+import subprocess
+
+
+def install(_dir, _delay, _log):
+    # Returns the environment for the stand-in, from '_dir'/bin.
+    bindir = os.path.join(_dir, "bin")
+    os.makedirs(bindir, exist_ok=True)
+    path = os.path.join(bindir, "ssh")
+    with open(path, "w") as f:
+        f.write("#!/bin/sh\nexec %s %s \"$@\"\n" % (sys.executable, os.path.abspath(__file__)))
+    os.chmod(path, 0o755)
+    os.environ["PATH"] = bindir + os.pathsep + os.environ["PATH"]
+    os.environ["FAKESSH_DELAY"] = str(_delay)
+    os.environ["FAKESSH_LOG"] = _log
+
+
+def note(_what):
+    with open(os.environ["FAKESSH_LOG"], "a") as f:
+        f.write(_what + "\n")
+
+
+def main(_args):
+    opts = {}
+    i = 0
+    while i < len(_args) and _args[i].startswith("-"):
+        if _args[i] in ("-p", "-i"):
+            i += 1
+        elif _args[i] == "-o":
+            key, val = _args[i + 1].split("=", 1)
+            opts[key] = val
+            i += 1
+        i += 1
+    master = opts.get("ControlMaster") == "yes"
+    ctl = opts.get("ControlPath")
+    cmd = " ".join(_args[i + 1:])
+    delay = float(os.environ.get("FAKESSH_DELAY", "0.3"))
+
+    if master:
+        time.sleep(delay)
+        note("master")
+        if os.environ.get("FAKESSH_FAIL"):
+            return 255
+        srv = socket.socket(socket.AF_UNIX)
+        srv.bind(ctl)
+        srv.listen(8)
+        while True:
+            conn, addr = srv.accept()
+            conn.close()
+
+    try:
+        cli = socket.socket(socket.AF_UNIX)
+        cli.connect(ctl)
+        cli.close()
+        note("mux")
+    except (OSError, TypeError):
+        time.sleep(delay)
+        note("handshake")
+    return subprocess.call(["sh", "-c", cmd])
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
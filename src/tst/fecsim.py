@@ -0,0 +1,206 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# FEC simulation ('botfec'): pushes the packets of a message through a
+# lossy channel, many times over, at a few loss rates and 'fec_ratio's,
+# into 'FecReassembler', and reports the share of messages delivered and
+# the bytes on air per delivered message.  The channel drops packets
+# independently, or in bursts (a two-state Gilbert-Elliott channel with
+# the same average loss).  The same for the whole messages of a serial
+# link Session ('FecSession', blocks of 'fec_block' SBD MO messages) into
+# 'FecSessionReassembler'.  Checks that every delivered message is intact,
+# that FEC never delivers less than sending without it, that message
+# numbers coming round again after the counter wraps are delivered, and
+# that partial messages are dropped on the timeout and the byte cap.
+# Exits non-zero on failure.
+#
+#   python fecsim.py [trials] [packet_size] [message_size]
+#
+import sys
+import random
+
+import tstenv  # noqa: F401 (puts the bot modules on the path)
+
+from botcomm import MessageSplitter
+from botfec import FecSplitter, FecReassembler, FecSession, FecSessionReassembler
+
+
+def bernoulli(_rand, _loss):
+    while True:
+        yield _rand.random() < _loss
+
+
+def bursty(_rand, _loss, _burst=4.0):
+    # Bad state drops everything and lasts '_burst' packets on average.
+    leave = 1.0 / _burst
+    enter = leave * _loss / (1.0 - _loss)
+    bad = False
+    while True:
+        bad = _rand.random() >= leave if bad else _rand.random() < enter
+        yield bad
+
+
+def simulate(_fec, _msg, _channel, _trials):
+    delivered = 0
+    corrupt = 0
+    on_air = 0
+    for trial in range(_trials):
+        rx = FecReassembler()
+        got = None
+        for packet in _fec.iterpackets(_msg, trial & 0xFFFF):
+            on_air += len(packet)
+            if next(_channel):
+                continue
+            out = rx.add(packet)
+            if out is not None:
+                got = out[1]
+        if got is not None:
+            delivered += 1
+            corrupt += got != _msg
+    return delivered, corrupt, on_air
+
+
+def simulate_session(_ratio, _msgs, _channel, _trials):
+    # Messages delivered, corrupt and bytes on air.
+    delivered = 0
+    corrupt = 0
+    on_air = 0
+    nums = iter(range(1 << 30))
+    for trial in range(_trials):
+        fec = FecSession(_ratio, block, 340, lambda: next(nums) % 65000)
+        rx = FecSessionReassembler()
+        frames = []
+        for msg in _msgs:
+            frames.append(fec.data(msg))
+            if fec.full():
+                frames.extend(fec.parity())
+        frames.extend(fec.parity())
+        got = []
+        for frame in frames:
+            on_air += len(frame)
+            if not next(_channel):
+                got.extend(rx.add(frame))
+        delivered += len(got)
+        corrupt += len([msg for msg in got if msg not in _msgs])
+    return delivered, corrupt, on_air
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def check(_name, _got, _want):
+    global failures
+    print("%-34s %s" % (_name, _got))
+    if _got != _want:
+        failures += 1
+
+
+if __name__ == "__main__":
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    packet_size = int(sys.argv[2]) if len(sys.argv) > 2 else 340
+    msg_size = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    rand = random.Random(1)
+    msg = bytes(rand.getrandbits(8) for i in range(msg_size))
+    splitter = MessageSplitter(packet_size)
+    failures = 0
+
+    print("%d byte message, %d byte packets, %d trials" % (msg_size, packet_size, trials))
+    print("%-8s %6s %6s %8s %10s %14s" % ("channel", "loss", "ratio", "packets", "delivered", "bytes/message"))
+    for name, channel in (("random", bernoulli), ("bursty", bursty)):
+        for loss in (0.01, 0.05, 0.1, 0.2, 0.3):
+            baseline = None
+            for ratio in (0.0, 0.25, 0.5, 1.0):
+                fec = FecSplitter(splitter, ratio)
+                delivered, corrupt, on_air = simulate(fec, msg, channel(rand, loss), trials)
+                share = float(delivered) / trials
+                if baseline is None:
+                    baseline = share
+                bad = corrupt or share < baseline - 0.03
+                failures += bool(bad)
+                print(
+                    "%-8s %6.2f %6.2f %8d %9.1f%% %14s%s"
+                    % (
+                        name, loss, ratio, fec.npackets(msg_size), 100.0 * share,
+                        "%.0f" % (float(on_air) / delivered) if delivered else "-",
+                        "  FAIL (%d corrupt)" % corrupt if bad else "",
+                    )
+                )
+
+    block = 4
+    msgs = [bytes(rand.getrandbits(8) for i in range(rand.randint(100, 320))) for j in range(8)]
+    print()
+    print("%d SBD messages a Session, FEC blocks of %d, %d trials" % (len(msgs), block, trials))
+    print("%-8s %6s %6s %10s %14s" % ("channel", "loss", "ratio", "delivered", "bytes/message"))
+    for name, channel in (("random", bernoulli), ("bursty", bursty)):
+        for loss in (0.05, 0.1, 0.2):
+            baseline = None
+            for ratio in (0.0, 0.25, 0.5):
+                delivered, corrupt, on_air = simulate_session(ratio, msgs, channel(rand, loss), trials)
+                share = float(delivered) / (trials * len(msgs))
+                if baseline is None:
+                    baseline = share
+                bad = corrupt or share < baseline - 0.03
+                failures += bool(bad)
+                print(
+                    "%-8s %6.2f %6.2f %9.1f%% %14s%s"
+                    % (
+                        name, loss, ratio, 100.0 * share,
+                        "%.0f" % (float(on_air) / delivered) if delivered else "-",
+                        "  FAIL (%d corrupt)" % corrupt if bad else "",
+                    )
+                )
+
+    print()
+    # The message number counter wraps at 65000: a number comes round
+    # again, for a new message, long after the reassembler gave it back.
+    fec = FecSplitter(splitter, 0.25)
+    rx = FecReassembler()
+    wrapped = 65000 + 300
+    got = 0
+    for n in range(wrapped):
+        for packet in fec.iterpackets(b"%d" % n, (64900 + n) % 65000):
+            got += rx.add(packet) is not None
+    check("wrap: messages delivered", got, wrapped)
+    check("wrap: numbers remembered", len(rx.done), rx.done_keep)
+
+    sfec = FecSession(0.25, 2, 340, iter(n % 65000 for n in range(64990, 1 << 30)).__next__)
+    srx = FecSessionReassembler()
+    got = 0
+    for n in range(65100):
+        got += len(srx.add(sfec.data(b"%d" % n)))
+        if sfec.full():
+            for frame in sfec.parity():
+                got += len(srx.add(frame))
+    check("wrap: session messages delivered", got, 65100)
+
+    # A message missing a packet is dropped after the timeout, and the
+    # partial messages never hold more than the byte cap.
+    clock = Clock()
+    rx = FecReassembler(1000, 30.0, 256, clock)
+    packets = [bytes(p) for p in FecSplitter(splitter, 0.0).iterpackets(msg[:600], 1)]
+    rx.add(packets[0])
+    clock.now = 31.0
+    rx.add(bytes(next(FecSplitter(splitter, 0.0).iterpackets(msg[:600], 2))))
+    check("timeout: partial messages", (list(rx.parts), rx.dropped), ([2], 1))
+    for n in range(3, 10):
+        rx.add(bytes(next(FecSplitter(splitter, 0.0).iterpackets(msg[:600], n))))
+    check("byte cap: held", rx.held <= 1000 and rx.held == sum(p[3] for p in rx.parts.values()), True)
+    srx = FecSessionReassembler(1000, 30.0, 256, clock)
+    sfec = FecSession(0.5, 4, 340, iter(range(1, 100)).__next__)
+    srx.add(sfec.data(msg[:300]))
+    clock.now = 62.0
+    late = srx.add(sfec.data(msg[:300]))
+    check("timeout: session block", (len(late), list(srx.parts), srx.dropped), (1, [1], 1))
+
+    print("PASSED" if not failures else "FAILED (%d)" % failures)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,102 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Ingest benchmark: builds a synthetic 'lb/data' tree and times how fast
+# 'LbProc.lb_process_data()' loads it into a fresh DB, once committing
+# every record (ingest_batch_folders = 0) and once per batch of folders.
+#
+#   python ingestbench.py [folders] [products] [batch_folders] [db_profile]
+#
+import os
+import sys
+import json
+import time
+import shutil
+
+from tstenv import mkenv, nepi_args
+
+from botcfg import db_tuning_profiles
+from botdb import BotDB
+from botpipo import BotPIPO
+from botlbproc import LbProc
+
+
+def mktree(_data_dir, _folders, _products):
+    for f in range(_folders):
+        folder = os.path.join(_data_dir, "2021-02-05T10%02d%02d" % (f // 60, f % 60))
+        os.makedirs(folder)
+        with open(os.path.join(folder, "sys_status.json"), "w") as fd:
+            json.dump(
+                {
+                    "timestamp": "2021-02-05T10:00:%02d" % (f % 60),
+                    "latitude": 47.6,
+                    "longitude": -122.3,
+                    "heading": 90,
+                    "temperature": 20,
+                    "power_state": 80,
+                    "wake_event_type": f % 2,
+                },
+                fd,
+            )
+        for p in range(_products):
+            data_file = "img%03d.bin" % p
+            with open(os.path.join(folder, data_file), "wb") as fd:
+                fd.write(os.urandom(512))
+            with open(os.path.join(folder, "img%03d_meta.json" % p), "w") as fd:
+                json.dump(
+                    {
+                        "timestamp": 1612519200.0 + f * 60 + p,
+                        "type": "img",
+                        "instance": p,
+                        "data_file": data_file,
+                        "quality_score": 0.5,
+                        "type_score": 0.5,
+                        "event_score": 0.5,
+                    },
+                    fd,
+                )
+
+
+def run(_folders, _products, _batch, _profile):
+    cfg, log, scratch = mkenv()
+    cfg.ingest_batch_folders = _batch
+    cfg.db_tuning.profile = _profile
+    for key, val in db_tuning_profiles[_profile].items():
+        setattr(cfg.db_tuning, key, val)
+    mktree(cfg.lb_data_dir_path, _folders, _products)
+
+    db = BotDB(cfg, log, 1)
+    db.getconn(1)
+    pipo = BotPIPO(cfg, log, 1, db)
+    lbproc = LbProc(cfg, log, 1, "", b"", nepi_args(), db, pipo, None, "tst")
+
+    t0 = time.time()
+    lbproc.lb_process_data()
+    elapsed = time.time() - t0
+
+    success, rows = db.getResults(1, "SELECT COUNT(*) FROM data", False)
+    db.close(1)
+    shutil.rmtree(scratch)
+    return elapsed, rows[0][0]
+
+
+if __name__ == "__main__":
+    folders = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    products = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    batch = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    profile = sys.argv[4] if len(sys.argv) > 4 else "durable"
+    nfiles = folders * (products * 2 + 1)
+
+    print("Synthetic tree: %d folders x %d products (%d files)" % (folders, products, nfiles))
+    print("DB tuning profile: %s" % profile)
+    for label, b in (("per-record commit", 0), ("batched (%d folders)" % batch, batch)):
+        elapsed, nrows = run(folders, products, b, profile)
+        print(
+            "%-24s %8.3f s  %9.1f files/s  (%d data rows)"
+            % (label, elapsed, nfiles / elapsed, nrows)
+        )
@@ -0,0 +1,103 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# LB link selection check ('botlink'): with the 'ethernet' link pointed
+# at loopback and the 'iridium' link at the pty fake modem, checks the
+# ranking with no history, after a run of failed 'ethernet' Sessions for
+# a small and for a large backlog (and that the history survives in the
+# DB), the probe and 'enabled' filters, 'lb_link_select' off, and that a
+# link's own PIPO weights change the uplink selection.  Exits non-zero on
+# failure.
+#
+#   python linkcheck.py
+#
+import sys
+
+from tstenv import mkenv
+from fakemodem import FakeModem
+
+from botdb import BotDB
+from botpipo import BotPIPO
+from botlink import LinkScheduler, linkWeights
+
+
+def check(_name, _got, _want):
+    print("%-34s %s" % (_name, _got))
+    if _got != _want:
+        failures.append("%s: %s, expected %s" % (_name, _got, _want))
+
+
+if __name__ == "__main__":
+    failures = []
+    cfg, log, scratch = mkenv()
+    db = BotDB(cfg, log, 1)
+    db.getconn(1)
+    modem = FakeModem()
+    cfg.lb_ip.host = "127.0.0.1"
+    cfg.lb_iridium.enabled = True
+    cfg.lb_iridium.port = modem.name
+    cfg.lb_rs232.enabled = True
+    cfg.lb_link_select = True
+
+    # A small backlog: one short queued message.
+    db.dbc.execute("INSERT INTO outbound (kind, queued, msg) VALUES ('gen', 0, ?)", (bytes(100),))
+    db.dbc.commit()
+    check("no history", LinkScheduler(cfg, log, 1, db).rank(1), ["lb_ip", "lb_iridium"])
+
+    links = LinkScheduler(cfg, log, 1, db)
+    for i in range(5):
+        links.record(1, "lb_ip", False, 8.0)
+    links.record(1, "lb_iridium", True, 12.0, 300, 20.0)
+    links = LinkScheduler(cfg, log, 1, db)
+    check("ethernet failing, small backlog", links.rank(1), ["lb_iridium", "lb_ip"])
+    check("history kept", links.stats["lb_ip"]["failures"], 5)
+
+    # A large backlog: Data Records well over an SBD MO message.
+    db.dbc.executemany(
+        "INSERT INTO data (rec_state, timestamp, payload_size) VALUES (0, ?, 2000)",
+        [(float(i),) for i in range(20)],
+    )
+    db.dbc.commit()
+    check("ethernet failing, large backlog", LinkScheduler(cfg, log, 1, db).rank(1), ["lb_ip", "lb_iridium"])
+
+    cfg.lb_iridium.port = scratch + "/no-such-tty"
+    check("iridium probe fails", LinkScheduler(cfg, log, 1, db).rank(1), ["lb_ip"])
+    cfg.lb_ip.host = "no-such-host.invalid"
+    check("every probe fails", LinkScheduler(cfg, log, 1, db).rank(1), ["lb_ip", "lb_iridium"])
+    cfg.lb_iridium.enabled = False
+    check("iridium disabled", LinkScheduler(cfg, log, 1, db).rank(1), ["lb_ip"])
+    cfg.lb_iridium.enabled = True
+    cfg.lb_link_select = False
+    check("lb_link_select off", LinkScheduler(cfg, log, 1, db).rank(1), ["lb_ip", "lb_iridium"])
+
+    # Per-link PIPO weights: 'lb_ip' only cares for the event score,
+    # 'lb_iridium' only for quality.
+    db.dbc.execute("DELETE FROM data")
+    db.dbc.executemany(
+        "INSERT INTO data (rec_state, timestamp, event_score, quality, type_score, trigger)"
+        " VALUES (0, ?, ?, ?, 0.5, 0.5)",
+        [(0.0, 1.0, 0.1), (0.0, 0.1, 1.0)],
+    )
+    db.dbc.commit()
+    pipo = BotPIPO(cfg, log, 1, db)
+    pipo.initPIPO(1)
+    pipo.rerate(1, True)
+    cfg.lb_ip.pipo_scor_wt = 1.0
+    cfg.lb_ip.pipo_qual_wt = 0.0
+    cfg.lb_iridium.pipo_scor_wt = 0.0
+    cfg.lb_iridium.pipo_qual_wt = 1.0
+    success, ip = pipo.selectTopK(1, 1, "rowid, quality", linkWeights(cfg, "lb_ip"))
+    success, sbd = pipo.selectTopK(1, 1, "rowid, quality", linkWeights(cfg, "lb_iridium"))
+    check("top record, lb_ip weights", [row[0] for row in ip], [1])
+    check("top record, lb_iridium weights", [row[0] for row in sbd], [2])
+
+    modem.close()
+    for f in failures:
+        print("FAIL " + f)
+    print("PASSED" if not failures else "FAILED (%d)" % len(failures))
+    sys.exit(1 if failures else 0)
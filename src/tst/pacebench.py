@@ -0,0 +1,130 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# UDP pacing benchmark over loopback: sends full-size packets through the
+# 'botcomm.Pacer' at a few configured rates (and with the old fixed 50 ms
+# sleep per packet) to a receiver thread, and reports the goodput the
+# receiver saw against the configured rate.  The adaptive run puts an
+# emulated bottleneck in the receiver (a token bucket that drops what it
+# can't carry and reports the drop back) and shows where the rate
+# settles.  Exits non-zero if a fixed-rate run misses its rate by >10%.
+#
+#   python pacebench.py [seconds per run]
+#
+import sys
+import time
+import socket
+import threading
+
+import tstenv  # noqa: F401 (puts the bot modules on the path)
+
+from botcomm import Pacer
+
+packet_size = 1472
+
+
+class Receiver(threading.Thread):
+    def __init__(self, _capacity=0):
+        threading.Thread.__init__(self, daemon=True)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 << 20)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.5)
+        self.addr = self.sock.getsockname()
+        self.capacity = float(_capacity)
+        self.bucket = Pacer(_capacity, 4 * packet_size) if _capacity else None
+        self.bytes = 0
+        self.drops = 0
+        self.first = None
+        self.last = None
+        self.running = True
+
+    def run(self):
+        while self.running:
+            try:
+                data = self.sock.recv(65536)
+            except socket.timeout:
+                continue
+            now = time.perf_counter()
+            if self.bucket is not None:
+                self.bucket.refill()
+                if self.bucket.tokens < len(data):
+                    self.drops += 1
+                    continue
+                self.bucket.tokens -= len(data)
+            if self.first is None:
+                self.first = now
+            self.last = now
+            self.bytes += len(data)
+
+    def goodput(self):
+        if self.first is None or self.last == self.first:
+            return 0.0
+        return self.bytes / (self.last - self.first)
+
+    def stop(self):
+        self.running = False
+        self.join()
+        self.sock.close()
+
+
+def run(_seconds, _pacer=None, _fixed_sleep=None, _capacity=0):
+    rx = Receiver(_capacity)
+    rx.start()
+    tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    tx.connect(rx.addr)
+    packet = bytes(packet_size)
+    seen_drops = 0
+    rates = []
+    end = time.perf_counter() + _seconds
+    while time.perf_counter() < end:
+        if _pacer is not None:
+            _pacer.wait(len(packet))
+        tx.send(packet)
+        if _pacer is not None:
+            _pacer.on_sent(len(packet))
+            if rx.drops > seen_drops:
+                seen_drops = rx.drops
+                _pacer.on_loss()
+            rates.append(_pacer.rate)
+        if _fixed_sleep:
+            time.sleep(_fixed_sleep)
+    time.sleep(0.1)
+    tx.close()
+    rx.stop()
+    return rx.goodput(), rx.drops, rates
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    failures = 0
+
+    goodput, drops, rates = run(seconds, _fixed_sleep=0.05)
+    print("fixed 50 ms sleep:       goodput %10.0f B/s" % goodput)
+
+    for rate in (30000, 100000, 1000000, 10000000):
+        goodput, drops, rates = run(seconds, Pacer(rate, 2 * packet_size))
+        bad = abs(goodput - rate) > 0.1 * rate
+        failures += bad
+        print(
+            "%-4s paced %9d B/s:  goodput %10.0f B/s (%5.1f%%)"
+            % ("FAIL" if bad else "ok", rate, goodput, 100.0 * goodput / rate)
+        )
+
+    capacity = 2000000
+    pacer = Pacer(30000, 2 * packet_size, True, 4 * packet_size)
+    goodput, drops, rates = run(seconds * 2, pacer, _capacity=capacity)
+    tail = rates[len(rates) // 2:] or [0.0]
+    print(
+        "adaptive, %d B/s bottleneck: goodput %10.0f B/s, %d drops, "
+        "rate in 2nd half %0.f..%0.f B/s"
+        % (capacity, goodput, drops, min(tail), max(tail))
+    )
+
+    print("PASSED" if not failures else "FAILED (%d)" % failures)
+    sys.exit(1 if failures else 0)
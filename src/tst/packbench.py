@@ -0,0 +1,93 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Uplink packing benchmark: random Sessions of Data Records (PIPO value,
+# wire size, Status Record dependency) packed into a byte budget by
+# 'packGreedy()', by the old "rank order until it no longer fits" rule,
+# and exhaustively (small Sessions only).  Reports the PIPO value sent
+# and the budget wasted by each.  Exits non-zero if greedy ever falls
+# below half of the optimum.
+#
+#   python packbench.py [sessions] [budget]
+#
+import sys
+import random
+import itertools
+
+import tstenv  # noqa: F401 (puts the bot modules on the path)
+
+from botpack import packGreedy
+
+
+def session(_rnd, _n):
+    nstat = _rnd.randint(1, 4)
+    dep_costs = dict(("s%d" % i, _rnd.randint(60, 90)) for i in range(nstat))
+    items = []
+    for i in range(_n):
+        value = _rnd.paretovariate(1.5) / (1 + i)
+        items.append((value, _rnd.randint(40, 330), ("s%d" % _rnd.randrange(nstat),)))
+    items.sort(key=lambda x: -x[0])
+    return items, dep_costs
+
+
+def cost_of(_items, _dep_costs, _chosen):
+    deps = set(d for i in _chosen for d in _items[i][2])
+    return sum(_items[i][1] for i in _chosen) + sum(_dep_costs[d] for d in deps)
+
+
+def rank_order(_budget, _items, _dep_costs):
+    chosen = []
+    for i in range(len(_items)):
+        if cost_of(_items, _dep_costs, chosen + [i]) > _budget:
+            break
+        chosen.append(i)
+    return chosen
+
+
+def exhaustive(_budget, _items, _dep_costs):
+    best, best_value = [], 0.0
+    for r in range(1, len(_items) + 1):
+        for chosen in itertools.combinations(range(len(_items)), r):
+            if cost_of(_items, _dep_costs, chosen) <= _budget:
+                value = sum(_items[i][0] for i in chosen)
+                if value > best_value:
+                    best, best_value = list(chosen), value
+    return best
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    budget = int(sys.argv[2]) if len(sys.argv) > 2 else 1360
+    rnd = random.Random(340)
+    totals = {"greedy": [0.0, 0], "rank order": [0.0, 0], "exhaustive": [0.0, 0]}
+    worst = 1.0
+    for s in range(sessions):
+        items, dep_costs = session(rnd, rnd.randint(4, 12))
+        results = {
+            "greedy": packGreedy(budget, items, dep_costs)[0],
+            "rank order": rank_order(budget, items, dep_costs),
+            "exhaustive": exhaustive(budget, items, dep_costs),
+        }
+        for name, chosen in results.items():
+            totals[name][0] += sum(items[i][0] for i in chosen)
+            if len(chosen) < len(items):
+                totals[name][1] += budget - cost_of(items, dep_costs, chosen)
+        opt = sum(items[i][0] for i in results["exhaustive"])
+        if opt > 0:
+            worst = min(worst, sum(items[i][0] for i in results["greedy"]) / opt)
+
+    opt = totals["exhaustive"][0]
+    print("%d sessions, %d byte budget" % (sessions, budget))
+    for name, (value, wasted) in totals.items():
+        print(
+            "  %-11s value %6.1f%% of optimum, %7.1f bytes unused per session"
+            % (name, 100.0 * value / opt, float(wasted) / sessions)
+        )
+    print("  greedy worst session: %.1f%% of optimum" % (100.0 * worst))
+    print("PASSED" if worst >= 0.5 else "FAILED")
+    sys.exit(0 if worst >= 0.5 else 1)
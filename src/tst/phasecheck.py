@@ -0,0 +1,145 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Bot-Main phase supervisor check ('botphase'): stand-in LB and HB phases
+# (the HB one running a child shell that sleeps, under its own child, as
+# 'rsync' does 'ssh') are run one after the other, as 'botmain' did, and
+# alongside each other, without deadlines and with an HB deadline shorter
+# than its child.  Checks the wall time saved, that a deadline stops the
+# phase through its exit event and leaves no child behind, that a child
+# asked to run past the deadline is never started, that an LB deadline
+# exit returns what Bot-Main expects of the LB phase, the phase reports
+# (status, deadline, overlap) and that they land in the execution
+# reports.  Exits non-zero on failure.
+#
+#   python phasecheck.py [secs]
+#
+import os
+import sys
+import json
+import time
+import threading
+
+from tstenv import mkenv
+
+import botreports
+from botphase import BotPhases, phaseTout, runChild
+
+
+def check(_name, _got, _want):
+    print("%-34s %s" % (_name, _got))
+    if _got != _want:
+        failures.append("%s: %s, expected %s" % (_name, _got, _want))
+
+
+def alive(_pid):
+    try:
+        os.kill(_pid, 0)
+    except OSError:
+        return False
+    with open("/proc/%d/stat" % _pid) as f:
+        return f.read().split()[2] != "Z"
+
+
+def lb_phase():
+    # Ingest, then a Session that checks its exit event between sends;
+    # every exit returns as 'LbProc.lb_process_data()' does.
+    for i in range(int(secs * 10)):
+        if lb_event.is_set():
+            return 0, []
+        time.sleep(0.1)
+    return 0, ["session"]
+
+
+def hb_phase():
+    # An rsync: a shell whose own child writes its pid and sleeps.
+    pidfile = os.path.join(scratch, "child.pid")
+    done = runChild(
+        "sh -c 'echo $$ > %s; exec sleep %s' & wait" % (pidfile, secs), hb_event, scratch, True
+    )
+    after = runChild(["true"], hb_event)
+    with open(pidfile) as f:
+        hb_out.update(rc=done.returncode, pid=int(f.read()), after=after.returncode)
+    return True
+
+
+def wake_up(_overlap, _hbto, _lbto=None):
+    hb_out.clear()
+    phases = BotPhases(cfg, log, 0)
+    phases.add("lb", lb_event, _lbto)
+    phases.add("hb", hb_event, _hbto)
+    t0 = time.monotonic()
+    if _overlap:
+        phases.run("hb", hb_phase, True)
+    # As Bot-Main takes the LB phase's 'LbConnItem' list.
+    lb_out[:] = phases.run("lb", lb_phase)[1]
+    if not _overlap:
+        phases.run("hb", hb_phase, True)
+    phases.wait("hb", 2.0)
+    return time.monotonic() - t0, phases
+
+
+if __name__ == "__main__":
+    secs = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    failures = []
+    cfg, log, scratch = mkenv()
+    lb_event = threading.Event()
+    hb_event = threading.Event()
+    hb_out = {}
+    lb_out = []
+
+    check("timeout from the command line", phaseTout([30]), 30.0)
+    check("timeout from the environment", phaseTout("45"), 45.0)
+    check("no timeout", phaseTout(0), None)
+
+    serial, phases = wake_up(False, None)
+    print("%-34s %.2f s" % ("one after the other", serial))
+    check("serial overlap", phases.report("lb")["overlap_secs"]["hb"], 0.0)
+
+    both, phases = wake_up(True, None)
+    lb, hb = phases.report("lb"), phases.report("hb")
+    print("%-34s %.2f s (%.0f%% of serial)" % ("alongside", both, both / serial * 100))
+    if both > serial * 0.75:
+        failures.append("alongside: %.2f s, serial %.2f s" % (both, serial))
+    check("overlap (lb, hb agree)", lb["overlap_secs"]["hb"] == hb["overlap_secs"]["lb"], True)
+    if lb["overlap_secs"]["hb"] < secs * 0.8:
+        failures.append("overlap %.2f s" % lb["overlap_secs"]["hb"])
+    check("hb child finished", (hb_out["rc"], hb["status"]), (0, "done"))
+
+    total, phases = wake_up(True, secs / 4)
+    hb = phases.report("hb")
+    print("%-34s %.2f s after %.2f s" % ("hb deadline", hb["secs"], secs / 4))
+    check("hb status", (hb["status"], hb["timed_out"], hb["timeout"]), ("timeout", True, secs / 4))
+    check("hb child terminated", hb_out["rc"] < 0 and not alive(hb_out["pid"]), True)
+    check("later child not started", hb_out["after"] < 0, True)
+    if hb["secs"] > secs / 4 + 0.5:
+        failures.append("hb took %.2f s past a %.2f s deadline" % (hb["secs"], secs / 4))
+    check("lb unaffected", (phases.report("lb")["status"], lb_out), ("done", ["session"]))
+
+    total, lbphases = wake_up(True, None, secs / 4)
+    lb = lbphases.report("lb")
+    print("%-34s %.2f s after %.2f s" % ("lb deadline", lb["secs"], secs / 4))
+    check("lb status", (lb["status"], lb["timed_out"], lb_out), ("timeout", True, []))
+    if lb["secs"] > secs / 4 + 0.5:
+        failures.append("lb took %.2f s past a %.2f s deadline" % (lb["secs"], secs / 4))
+
+    botreports.nepi_home = scratch
+    os.makedirs(os.path.join(scratch, "log"), exist_ok=True)
+    botreports.LbRpt("lb_execution_status.json", [], phases.report("lb")).create_lb_report()
+    botreports.HbRpt("hb_execution_status.json", hb).create_hb_report()
+    with open(os.path.join(scratch, "log", "lb_execution_status.json")) as f:
+        lbrpt = json.load(f)
+    with open(os.path.join(scratch, "log", "hb_execution_status.json")) as f:
+        hbrpt = json.load(f)
+    check("lb report phase", (lbrpt["phase"]["name"], lbrpt["phase"]["status"]), ("lb", "done"))
+    check("hb report phase", (hbrpt["phase"]["name"], hbrpt["phase"]["timed_out"]), ("hb", True))
+
+    for f in failures:
+        print("FAIL " + f)
+    print("PASSED" if not failures else "FAILED (%d)" % len(failures))
+    sys.exit(1 if failures else 0)
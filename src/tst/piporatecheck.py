@@ -0,0 +1,111 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# PIPO re-rating equivalence check: fills the 'data' table with random
+# Active Data Records, rates them with the per-record Python formulas
+# ('computeNumerator()'/'computeDenominator()', exactly as the old row by
+# row loop in 'lb_process_data()' did) and compares the results with both
+# 'BotPIPO.rerate()' engines: the numpy one ('computeRatings()') and the
+# set-based SQL one.  Exits non-zero on any mismatch.
+#
+import sys
+import random
+
+from tstenv import mkenv
+
+from botdb import BotDB
+from botpipo import BotPIPO
+
+
+def fill(_db, _nrows):
+    rnd = random.Random(1612519200)
+    now = _db.cfg.pipo_now
+    rows = []
+    for i in range(_nrows):
+        rows.append(
+            (
+                rnd.choice((0, 1)),
+                now - rnd.uniform(-120.0, 86400.0 * 30),
+                rnd.uniform(0.0, 4.0),
+                rnd.choice((1, 0.5, 1.0)),
+                rnd.uniform(0.0, 1.0),
+                rnd.uniform(0.0, 1.0),
+                rnd.choice((0.25, 0.5, 1, 1.0)),
+            )
+        )
+    _db.dbc.executemany(
+        "INSERT INTO data (rec_state, timestamp, numerator, trigger, quality, "
+        "event_score, type_score, pipo) VALUES (?,?,?,?,?,?,?,0.0)",
+        rows,
+    )
+    _db.dbc.commit()
+
+
+def expected(_db, _pipo, _wt_changed):
+    # The original per-row loop, less the UPDATEs.
+    sql = "SELECT rowid, numerator, trigger, quality, event_score, timestamp, type_score, pipo FROM data WHERE rec_state in (0,1)"
+    success, rows = _db.getResults(1, sql, False)
+    result = {}
+    for row in rows:
+        numr, trig, qual, scor, stmp, norm, old = [float(v) for v in row[1:]]
+        if _wt_changed:
+            success, numerator = _pipo.computeNumerator(3, scor, qual, norm, trig)
+        else:
+            numerator = numr
+        success, denominator = _pipo.computeDenominator(3, stmp)
+        if denominator == 0:
+            result[row[0]] = (numerator, old)
+        else:
+            result[row[0]] = (numerator, numerator / denominator)
+    return result
+
+
+def compare(_db, _want):
+    success, rows = _db.getResults(
+        1, "SELECT rowid, numerator, pipo FROM data WHERE rec_state in (0,1)", False
+    )
+    bad = 0
+    for rowid, numerator, pipo in rows:
+        if (numerator, pipo) != _want[rowid]:
+            bad += 1
+            if bad <= 5:
+                print("  rowid %d: rerate=%r python=%r" % (rowid, (numerator, pipo), _want[rowid]))
+    return bad, len(rows)
+
+
+if __name__ == "__main__":
+    nrows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    failures = 0
+    for engine in ("numpy", "sql"):
+        cfg, log, scratch = mkenv()
+        cfg.pipo_rerate = engine
+        db = BotDB(cfg, log, 1)
+        db.getconn(1)
+        pipo = BotPIPO(cfg, log, 1, db)
+        pipo.initPIPO(1)
+        cfg.pipo_now = pipo.exec_age * 60.0
+        fill(db, nrows)
+
+        for wt_changed in (False, True):
+            if wt_changed:
+                cfg.pipo_scor_wt, cfg.pipo_qual_wt = 0.7, 0.3
+                cfg.pipo_size_wt, cfg.pipo_trig_wt = 0.2, 0.9
+                cfg.pipo_time_wt = 0.25
+            want = expected(db, pipo, wt_changed)
+            pipo.rerate(1, wt_changed)
+            bad, total = compare(db, want)
+            print(
+                "engine=%-5s wt_changed=%-5s %d of %d rows differ"
+                % (engine, wt_changed, bad, total)
+            )
+            failures += bad
+
+        db.close(1)
+
+    print("PASSED" if not failures else "FAILED")
+    sys.exit(1 if failures else 0)
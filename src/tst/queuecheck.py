@@ -0,0 +1,177 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Outbound queue check: queues Status and Data Record messages, lets the
+# "transport" fail part way through the flush, drops the queue object (as
+# a killed Bot would) and loads it again from the DB.  Verifies that only
+# the sent messages' records are 'sent', that the rest go out, in order,
+# on the next flush, that queued Data Records are left out of the uplink
+# selection, that a record is queued and set 'packed' together, that a
+# failover to a link taking smaller messages sends the rest around a
+# message too big for it, and times the flush of a large queue.  Exits
+# non-zero on failure.
+#
+#   python queuecheck.py [messages]
+#
+import sys
+import time
+
+from tstenv import mkenv
+
+from botdb import BotDB
+from botpipo import BotPIPO
+from botqueue import OutboundQueue
+from botbatch import unbatchMsg
+
+
+def states(_db, _table):
+    rows = _db.dbc.execute("SELECT rowid, rec_state FROM " + _table).fetchall()
+    return dict(rows)
+
+
+if __name__ == "__main__":
+    nmsgs = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    failures = []
+    cfg, log, scratch = mkenv()
+    db = BotDB(cfg, log, 1)
+    db.getconn(1)
+    pipo = BotPIPO(cfg, log, 1, db)
+    pipo.initPIPO(1)
+
+    now = pipo.exec_age * 60.0
+    db.dbc.execute("INSERT INTO status (rec_state, sys_status_id, timestamp) VALUES (1, 7, ?)", (now,))
+    db.dbc.executemany(
+        "INSERT INTO data (rec_state, sys_status_ref_id, timestamp, numerator, pipo) VALUES (1, 7, ?, ?, 0.0)",
+        [(now - i, 1.0 + i) for i in range(6)],
+    )
+    db.dbc.commit()
+
+    outq = OutboundQueue(cfg, log, 1, db)
+    outq.put(1, b"\x08\x01status", "status", 1)
+    for rowid in range(1, 7):
+        outq.put(1, b"\x08\x02data%d" % rowid, "data", rowid)
+    outq.put(1, b"\x08\x03gen", "gen")
+
+    # The link takes three messages and then goes away.
+    wire = []
+
+    def flaky(_msg):
+        if len(wire) >= 3:
+            return [False, "TST", "link down"]
+        wire.append(_msg)
+        return [True, None, None]
+
+    success = outq.flush(1, flaky)
+    if success[0] or outq.sent != 3 or len(outq) != 5:
+        failures.append("partial flush: sent %d, left %d" % (outq.sent, len(outq)))
+    if states(db, "status") != {1: 2}:
+        failures.append("status not sent: " + str(states(db, "status")))
+    if states(db, "data") != {1: 2, 2: 2, 3: 1, 4: 1, 5: 1, 6: 1}:
+        failures.append("data states: " + str(states(db, "data")))
+
+    # Queued Data Records (3..6) are not selected again.
+    success, rows = pipo.selectTopK(1, 10)
+    if rows:
+        failures.append("queued records selected: " + str([r[0] for r in rows]))
+
+    # "Crash": a new queue object picks the rest up from the DB.
+    outq = OutboundQueue(cfg, log, 1, db)
+    outq.load(1)
+    success = outq.flush(1, lambda m: (wire.append(m), [True, None, None])[1])
+    expect = [b"\x08\x01status"] + [b"\x08\x02data%d" % i for i in range(1, 7)] + [b"\x08\x03gen"]
+    if not success[0] or wire != expect:
+        failures.append("resumed flush order: " + str(wire))
+    if set(states(db, "data").values()) != {2}:
+        failures.append("data not all sent: " + str(states(db, "data")))
+    if db.dbc.execute("SELECT count(*) FROM outbound").fetchone()[0]:
+        failures.append("outbound table not empty")
+
+    # Batched flush: envelopes unbatch to the queued messages.
+    outq = OutboundQueue(cfg, log, 1, db)
+    for i in range(30):
+        outq.put(1, b"\x08\x04\x12\x02id\x1a\x20" + bytes(32), "gen")
+    wire = []
+    success = outq.flush(1, lambda m: (wire.append(m), [True, None, None])[1], 1460, 2)
+    back = [m for w in wire for m in unbatchMsg(w, 2)]
+    if len(wire) != 1 or len(back) != 30:
+        failures.append("batched flush: %d wire msgs, %d records" % (len(wire), len(back)))
+
+    # Queuing a record sets it 'packed' in the same transaction: a new
+    # Status Record is queued and packed together, and one whose update
+    # fails is not queued either.
+    db.dbc.executemany(
+        "INSERT INTO status (rowid, rec_state, sys_status_id, timestamp) VALUES (?, 0, 8, ?)",
+        [(10, now), (11, now)],
+    )
+    db.dbc.execute(
+        "CREATE TEMP TRIGGER status_fail BEFORE UPDATE ON status WHEN old.rowid = 11"
+        " BEGIN SELECT RAISE(ABORT, 'killed'); END"
+    )
+    db.dbc.commit()
+    outq = OutboundQueue(cfg, log, 1, db)
+    ok = outq.put(1, b"\x08\x01status10", "status", 10)
+    bad = outq.put(1, b"\x08\x01status11", "status", 11)
+    queued = [r[0] for r in db.dbc.execute("SELECT rec_rowid FROM outbound WHERE kind = 'status'")]
+    st = states(db, "status")
+    if not ok[0] or bad[0] or queued != [10] or (st[10], st[11]) != (1, 0) or len(outq) != 1:
+        failures.append("put: %s, %s, queued %s, states %s" % (ok, bad, queued, st))
+    db.dbc.execute("DROP TRIGGER status_fail")
+    db.dbc.execute("DELETE FROM outbound")
+    db.dbc.commit()
+
+    # Failover from 'ethernet' to 'iridium' with a message packed for
+    # 'ethernet' (over an SBD MO buffer) in the middle of the queue: the
+    # rest go out around it and it waits, first in line, for 'ethernet'.
+    outq = OutboundQueue(cfg, log, 1, db)
+    small = [b"\x08\x05small%d" % i + bytes(40) for i in range(4)]
+    outq.put(1, small[0], "gen")
+    outq.put(1, small[1], "gen")
+    outq.put(1, bytes(1000), "gen")
+    outq.put(1, small[2], "gen")
+    outq.put(1, small[3], "gen")
+    success = outq.flush(1, lambda m: [False, "TST", "ethernet down"])
+
+    def sbd(_msg):
+        if len(_msg) > 340:
+            return [False, "BC155", "MO Message Too Long"]
+        wire.append(_msg)
+        return [True, None, None]
+
+    wire = []
+    success = outq.flush(1, sbd, 340, 2, 340)
+    back = [m for w in wire for m in unbatchMsg(w, 2)]
+    if not success[0] or back != small or len(outq) != 1:
+        failures.append("failover: %s, %d of 4 sent, %d left" % (success, len(back), len(outq)))
+    outq = OutboundQueue(cfg, log, 1, db)
+    outq.load(1)
+    wire = []
+    success = outq.flush(1, lambda m: (wire.append(m), [True, None, None])[1])
+    if not success[0] or wire != [bytes(1000)] or len(outq):
+        failures.append("back on ethernet: %s, %s" % (success, [len(w) for w in wire]))
+
+    # A large queue: one pass, no per-message rescans.
+    outq = OutboundQueue(cfg, log, 1, db)
+    t0 = time.perf_counter()
+    for i in range(nmsgs):
+        outq.put(1, bytes(200), "gen")
+    t1 = time.perf_counter()
+    sent = []
+    outq.flush(1, lambda m: (sent.append(len(m)), [True, None, None])[1])
+    t2 = time.perf_counter()
+    print(
+        "%d messages: queue %.1f us/msg, flush %.1f us/msg"
+        % (nmsgs, (t1 - t0) * 1e6 / nmsgs, (t2 - t1) * 1e6 / nmsgs)
+    )
+    if len(sent) != nmsgs:
+        failures.append("large flush sent %d" % len(sent))
+
+    db.close(1)
+    for f in failures:
+        print("FAIL " + f)
+    print("PASSED" if not failures else "FAILED (%d)" % len(failures))
+    sys.exit(1 if failures else 0)
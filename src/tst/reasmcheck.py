@@ -0,0 +1,118 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Downlink reassembly check ('botcomm.MessageReassembler'): rebuilds
+# shuffled, duplicated and interleaved packets of messages from one byte
+# to a 2 MB config bundle, and checks that each comes back exactly once,
+# that partial messages never hold more than the memory bound (the
+# stalest go first, and one too big to fit is dropped), that a stalled
+# message times out, and that a reused message number starts afresh.
+# Also times a 2 MB bundle.  Exits non-zero on failure.
+#
+#   python reasmcheck.py
+#
+import sys
+import time
+import random
+
+import tstenv  # noqa: F401 (puts the bot modules on the path)
+
+from botcomm import MessageSplitter, MessageReassembler
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def packets(_splitter, _msg, _msg_num):
+    return [bytes(p) for p in _splitter.iterpackets(_msg, _msg_num)]
+
+
+if __name__ == "__main__":
+    failures = []
+    rand = random.Random(1)
+    splitter = MessageSplitter(1500)
+
+    # Interleaved, shuffled and duplicated: every message exactly once.
+    sizes = [1, 1400, 1500, 10000, 100000]
+    msgs = dict((n, bytes(rand.getrandbits(8) for i in range(size))) for n, size in enumerate(sizes, 1))
+    stream = []
+    for n, msg in msgs.items():
+        stream += packets(splitter, msg, n)
+    stream += rand.sample(stream, len(stream) // 3)
+    rand.shuffle(stream)
+    stream += packets(splitter, msgs[3], 3)  # sent again after the fact
+    reasm = MessageReassembler()
+    got = {}
+    for p in stream:
+        out = reasm.add(p)
+        if out is not None:
+            got.setdefault(out, 0)
+            got[out] += 1
+    if sorted(got) != sorted(msgs.values()) or set(got.values()) != {1}:
+        failures.append("interleaved: %d distinct, counts %s" % (len(got), sorted(set(got.values()))))
+    if reasm.parts or reasm.held:
+        failures.append("left over: %d partial, %d bytes" % (len(reasm.parts), reasm.held))
+    print("interleaved: %d messages from %d packets, %d duplicates ignored" % (len(got), len(stream), reasm.dups))
+
+    # Memory bound: partial messages never hold more than 'max_bytes'.
+    bound = 64 << 10
+    reasm = MessageReassembler(bound)
+    peak = 0
+    for n in range(1, 40):
+        for p in packets(splitter, bytes(20000), n)[:-1]:
+            reasm.add(p)
+            peak = max(peak, reasm.held)
+    big = packets(splitter, bytes(bound + 1), 99)
+    for p in big:
+        if reasm.add(p) is not None:
+            failures.append("over-size message given back")
+    print("bounded: peak %d of %d bytes, %d partial dropped" % (peak, bound, reasm.dropped))
+    if peak > bound or reasm.held > bound:
+        failures.append("memory bound: peak %d" % peak)
+
+    # Timeout: a stalled message is dropped, and its late tail alone can't finish it.
+    clock = Clock()
+    reasm = MessageReassembler(_tout=30.0, _clock=clock)
+    stalled = packets(splitter, bytes(5000), 7)
+    for p in stalled[:-1]:
+        reasm.add(p)
+    clock.now = 31.0
+    if reasm.add(stalled[-1]) is not None or reasm.dropped != 1:
+        failures.append("stalled message not timed out")
+
+    # A reused message number (a different message) starts afresh.
+    first = packets(splitter, b"a" * 3000, 5)
+    second = packets(splitter, b"b" * 5000, 5)
+    reasm = MessageReassembler()
+    reasm.add(first[0])
+    outs = [reasm.add(p) for p in second]
+    if outs[-1] != b"b" * 5000:
+        failures.append("reused msg_num")
+
+    # A 2 MB config bundle.
+    bundle = bytes(rand.getrandbits(8) for i in range(2 << 20))
+    bpkts = packets(splitter, bundle, 11)
+    rand.shuffle(bpkts)
+    reasm = MessageReassembler(4 << 20)
+    t0 = time.perf_counter()
+    for p in bpkts:
+        out = reasm.add(p)
+    t1 = time.perf_counter()
+    print("2 MB bundle: %d packets in %.1f ms (%.0f MB/s)" % (len(bpkts), (t1 - t0) * 1e3, 2.0 / (t1 - t0)))
+    if out != bundle:
+        failures.append("bundle not intact")
+
+    for f in failures:
+        print("FAIL " + f)
+    print("PASSED" if not failures else "FAILED (%d)" % len(failures))
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,107 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# LB receive benchmark over loopback: a stand-in Server sends a batch of
+# downlink messages (split into NEPI packets, sent out of order, with a
+# SACK mixed in) and 'BotComm.receive()' collects them.  Reports the
+# wall time of the receive with the Server ending the batch explicitly,
+# with the Bot going by the idle gap alone, with no downlink at all, and
+# for the old loop (read until a 3 s socket timeout).  Checks that every
+# message is reassembled intact.  Exits non-zero on failure.
+#
+#   python recvbench.py [messages] [message_size]
+#
+import sys
+import time
+import socket
+import threading
+
+from tstenv import mkenv
+
+import botdefs
+from botcomm import BotComm, MessageSplitter, eob_marker
+from botsack import packSack
+
+msg_nums = iter(range(1, 1 << 16))
+
+
+def server(_sock, _peer, _msgs, _eob, _delay=0.05):
+    time.sleep(_delay)
+    splitter = MessageSplitter(1500)
+    for msg in _msgs:
+        packets = [bytes(p) for p in splitter.iterpackets(msg, next(msg_nums))]
+        for p in reversed(packets):
+            _sock.sendto(p, _peer)
+        _sock.sendto(packSack(1, 1, [0]), _peer)
+    if _eob:
+        _sock.sendto(eob_marker, _peer)
+
+
+def old_receive(_con):
+    # 'BotComm.receive()' before the rewrite, without its logging.
+    out = []
+    while True:
+        try:
+            out.append(_con.recv(4096))
+        except socket.timeout:
+            break
+    return out
+
+
+def run(_bc, _msgs, _eob, _old=False):
+    srv = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    srv.bind(("127.0.0.1", 0))
+    con = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    con.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+    con.settimeout(3)
+    con.connect(srv.getsockname())
+    _bc.con = con
+    del botdefs.msgs_incoming[:]
+    t = threading.Thread(target=server, args=(srv, con.getsockname(), _msgs, _eob))
+    t0 = time.perf_counter()
+    t.start()
+    if _old:
+        got = old_receive(con)
+    else:
+        _bc.receive(1, 1)
+        got = list(botdefs.msgs_incoming)
+    secs = time.perf_counter() - t0
+    t.join()
+    srv.close()
+    con.close()
+    return secs, got
+
+
+if __name__ == "__main__":
+    nmsgs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    failures = []
+    cfg, log, scratch = mkenv()
+    cfg.lb_ip.rx_framed = True
+    bc = BotComm(cfg, log, "ethernet", 1, None)
+    msgs = [bytes([i % 251 + 1]) * size for i in range(nmsgs)]
+
+    print("%d messages of %d bytes (%d packets each), idle gap %.2f s, first wait %.1f s"
+          % (nmsgs, size, MessageSplitter(1500).npackets(size), cfg.lb_ip.rx_idle_gap, cfg.lb_ip.tout))
+    for name, batch, eob in (
+        ("end of batch", msgs, True),
+        ("idle gap", msgs, False),
+        ("empty, end of batch", [], True),
+        ("empty, no reply", [], False),
+    ):
+        secs, got = run(bc, batch, eob)
+        print("%-22s %7.3f s  %d messages" % (name, secs, len(got)))
+        if sorted(got) != sorted(batch):
+            failures.append("%s: got %d of %d messages" % (name, len(got), len(batch)))
+    secs, got = run(bc, msgs, True, True)
+    print("%-22s %7.3f s  %d datagrams" % ("old 3 s timeout loop", secs, len(got)))
+
+    for f in failures:
+        print("FAIL " + f)
+    print("PASSED" if not failures else "FAILED (%d)" % len(failures))
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,152 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# UDP-over-TCP relay benchmark: a local TCP echo server stands in for the
+# tunnel (and the Server behind it), and datagrams go through the relay
+# to it and back.  Measures the round-trip time of single datagrams and
+# the throughput of a stream of them (at most 'window' in flight), for
+# the native relay ('botrelay') and, if it is installed, for the socat
+# relay the Bot has used so far.  Checks that every datagram comes back
+# intact through the native relay.  Exits non-zero on failure.
+#
+#   python relaybench.py [datagrams] [size]
+#
+import os
+import sys
+import time
+import shutil
+import socket
+import threading
+import subprocess
+
+from tstenv import mkenv
+
+from botrelay import UdpTcpRelay
+
+window = 32
+
+
+class EchoServer(threading.Thread):
+    def __init__(self):
+        threading.Thread.__init__(self, daemon=True)
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(64)
+        self.addr = self.sock.getsockname()
+        self.conns = 0
+
+    def run(self):
+        while True:
+            try:
+                conn = self.sock.accept()[0]
+            except OSError:
+                return
+            self.conns += 1
+            threading.Thread(target=self.echo, args=(conn,), daemon=True).start()
+
+    def echo(self, _conn):
+        with _conn:
+            while True:
+                data = _conn.recv(65536)
+                if not data:
+                    return
+                _conn.sendall(data)
+
+
+def free_udp_port():
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def measure(_addr, _count, _size):
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+    client.settimeout(2.0)
+    client.connect(_addr)
+
+    rtts = []
+    for i in range(200):
+        t0 = time.perf_counter()
+        client.send(b"ping%d" % i)
+        try:
+            client.recv(65536)
+        except socket.timeout:
+            continue
+        rtts.append(time.perf_counter() - t0)
+    rtts.sort()
+
+    sent = []
+    back = []
+    t0 = time.perf_counter()
+    for i in range(_count):
+        msg = i.to_bytes(4, "big") + bytes(_size - 4)
+        client.send(msg)
+        sent.append(msg)
+        while len(sent) - len(back) >= window:
+            try:
+                back.append(client.recv(65536))
+            except socket.timeout:
+                break
+    while len(back) < len(sent):
+        try:
+            back.append(client.recv(65536))
+        except socket.timeout:
+            break
+    secs = time.perf_counter() - t0
+    client.close()
+    median = rtts[len(rtts) // 2] * 1e6 if rtts else float("nan")
+    return median, len(back), _count / secs, back == sent
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 1400
+    failures = []
+    cfg, log, scratch = mkenv()
+    echo = EchoServer()
+    echo.start()
+
+    print("%d datagrams of %d bytes, %d in flight" % (count, size, window))
+    print("%-7s %10s %10s %12s %12s" % ("relay", "rtt (us)", "returned", "datagrams/s", "tcp conns"))
+
+    relay = UdpTcpRelay(cfg, log, 1, ("127.0.0.1", 0), echo.addr)
+    relay.start()
+    conns = echo.conns
+    rtt, returned, rate, intact = measure(relay.addr, count, size)
+    relay.stop()
+    print("%-7s %10.0f %10d %12.0f %12d" % ("native", rtt, returned, rate, echo.conns - conns))
+    print("        %d datagrams uplinked in %d TCP writes" % (relay.up, relay.writes))
+    if returned != count or not intact:
+        failures.append("native: %d of %d returned, intact %s" % (returned, count, intact))
+
+    socat = shutil.which("socat")
+    if socat is None:
+        print("socat    (not installed; skipped)")
+    else:
+        port = free_udp_port()
+        proc = subprocess.Popen(
+            [socat, "UDP4-RECVFROM:%d,fork,reuseaddr" % port, "TCP4:127.0.0.1:%d,nodelay" % echo.addr[1]],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        time.sleep(0.5)
+        conns = echo.conns
+        rtt, returned, rate, intact = measure(("127.0.0.1", port), count, size)
+        os.killpg(proc.pid, 15)
+        proc.wait()
+        print("%-7s %10.0f %10d %12.0f %12d" % ("socat", rtt, returned, rate, echo.conns - conns))
+
+    for f in failures:
+        print("FAIL " + f)
+    print("PASSED" if not failures else "FAILED (%d)" % len(failures))
+    sys.exit(1 if failures else 0)
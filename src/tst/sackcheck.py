@@ -0,0 +1,125 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Reliable mode check ('botsack'): sends messages of 1 byte to 1 MB
+# through 'SackSender' to the lossy stand-in Server ('sackserver.py') at
+# a few packet and SACK loss rates, and verifies that every message
+# arrives whole and intact, that only missing packets are resent, and
+# that a downlink message turning up mid-send is kept.  Then takes the
+# link down altogether and checks that the send gives up within its
+# rounds and that the outbound queue leaves the message queued and its
+# Data Record unsent (rec_state 1).  Exits non-zero on failure.
+#
+#   python sackcheck.py [messages]
+#
+import sys
+import time
+import socket
+
+from tstenv import mkenv
+
+from botdb import BotDB
+from botcomm import MessageSplitter, Pacer
+from botudp import UdpTx
+from botsack import SackSender
+from botqueue import OutboundQueue
+from sackserver import SackServer
+
+packet_size = 1500
+
+
+def run(_cfg, _log, _db, _nmsgs, _loss, _sack_loss, _incoming):
+    server = SackServer(_loss, _sack_loss)
+    server.start()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(3)
+    sock.connect(server.addr)
+    splitter = MessageSplitter(packet_size, 0, _db)
+    tx = UdpTx(sock, Pacer(0, 0))
+    sender = SackSender(_cfg, _log, 1, sock, tx, splitter)
+
+    sizes = [1, 100, 1400, 1500, 20000, 1 << 20]
+    msgs = []
+    for i in range(_nmsgs):
+        size = sizes[i % len(sizes)]
+        msgs.append((bytes([i & 0xFF]) + bytes(range(256)) * (size // 256 + 1))[:size])
+    npkts = sum(splitter.npackets(len(m)) for m in msgs)
+    sent = {}
+    fails = 0
+    t0 = time.perf_counter()
+    for i, msg in enumerate(msgs):
+        if i == 1:
+            # A downlink message lands while waiting for a SACK.
+            server.sock.sendto(b"\x08\x01downlink", sock.getsockname())
+        success = sender.send(1, msg, _incoming)
+        if success[0]:
+            sent[splitter.db.packet_msg_index] = msg
+        else:
+            fails += 1
+    t1 = time.perf_counter()
+    time.sleep(0.1)
+    server.stop()
+    sock.close()
+    intact = sum(1 for n, m in sent.items() if server.messages.get(n) == m)
+    return fails, intact, len(msgs), npkts, sender.resent, server.dropped, t1 - t0
+
+
+if __name__ == "__main__":
+    nmsgs = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    failures = []
+    cfg, log, scratch = mkenv()
+    db = BotDB(cfg, log, 1)
+    db.getconn(1)
+    cfg.lb_ip.sack_rounds = 16
+    cfg.lb_ip.sack_tout = 0.3
+
+    print("%6s %6s %8s %8s %8s %8s %8s" % ("loss", "sack", "msgs", "packets", "dropped", "resent", "secs"))
+    for loss, sack_loss in ((0.0, 0.0), (0.02, 0.0), (0.1, 0.1), (0.25, 0.2)):
+        incoming = []
+        fails, intact, n, npkts, resent, dropped, secs = run(cfg, log, db, nmsgs, loss, sack_loss, incoming)
+        print("%6.2f %6.2f %8d %8d %8d %8d %8.2f" % (loss, sack_loss, n, npkts, dropped, resent, secs))
+        if fails or intact != n:
+            failures.append("loss %.2f/%.2f: %d not acked, %d of %d intact" % (loss, sack_loss, fails, intact, n))
+        if loss == 0.0 and resent:
+            failures.append("resent %d packets with no loss" % resent)
+        if resent > 3 * dropped + nmsgs * cfg.lb_ip.sack_rounds:
+            failures.append("loss %.2f: resent %d for %d dropped" % (loss, resent, dropped))
+        if incoming != [b"\x08\x01downlink"]:
+            failures.append("downlink message not kept: " + str(incoming))
+
+    # The link is down: the send gives up, the record stays unsent.
+    cfg.lb_ip.sack_rounds = 2
+    cfg.lb_ip.sack_tout = 0.2
+    db.dbc.execute("INSERT INTO data (rec_state, sys_status_ref_id, timestamp, numerator, pipo) VALUES (1, 1, 0, 1.0, 0.0)")
+    db.dbc.commit()
+    rowid = db.dbc.execute("SELECT max(rowid) FROM data").fetchone()[0]
+    server = SackServer(1.0)
+    server.start()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.connect(server.addr)
+    splitter = MessageSplitter(packet_size, 0, db)
+    sender = SackSender(cfg, log, 1, sock, UdpTx(sock, Pacer(0, 0)), splitter)
+    outq = OutboundQueue(cfg, log, 1, db)
+    outq.put(1, bytes(3000), "data", rowid)
+    t0 = time.perf_counter()
+    success = outq.flush(1, lambda wire: sender.send(1, wire, []))
+    t1 = time.perf_counter()
+    server.stop()
+    sock.close()
+    state = db.dbc.execute("SELECT rec_state FROM data WHERE rowid = ?", (rowid,)).fetchone()[0]
+    print("dead link: %s after %.2f s, %d resent, rec_state %d, %d queued" % (success[1], t1 - t0, sender.resent, state, len(outq)))
+    if success[0] or success[1] != "SK101" or state != 1 or len(outq) != 1:
+        failures.append("dead link: " + str(success) + ", rec_state %d, %d queued" % (state, len(outq)))
+    if t1 - t0 > (cfg.lb_ip.sack_rounds + 1) * cfg.lb_ip.sack_tout + 1.0:
+        failures.append("dead link: gave up after %.2f s" % (t1 - t0))
+
+    db.close(1)
+    for f in failures:
+        print("FAIL " + f)
+    print("PASSED" if not failures else "FAILED (%d)" % len(failures))
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,111 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Lossy stand-in for the Server end of the LB UDP link in reliable mode
+# ('lb_ip.sack', see 'botsack'): reassembles NEPI packets per message
+# number and, once a message has been quiet for 'gap' seconds, answers
+# with its SACK.  Drops incoming packets, and outgoing SACKs, at random
+# with the given probabilities (seeded, so a run can be repeated).  Used
+# by 'sackcheck.py'; can also be run on its own and pointed at by a Bot
+# (or a tunnel) to watch a session:
+#
+#   python sackserver.py [port] [packet_loss] [sack_loss]
+#
+import sys
+import time
+import random
+import socket
+import threading
+
+import tstenv  # noqa: F401 (puts the bot modules on the path)
+
+from botcomm import nepi_pkt_header
+from botsack import packSack
+
+
+class SackServer(threading.Thread):
+    def __init__(self, _loss=0.0, _sack_loss=0.0, _gap=0.02, _port=0, _seed=1):
+        threading.Thread.__init__(self, daemon=True)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 << 20)
+        self.sock.bind(("127.0.0.1", _port))
+        self.sock.settimeout(_gap / 4)
+        self.addr = self.sock.getsockname()
+        self.loss = _loss
+        self.sack_loss = _sack_loss
+        self.gap = _gap
+        self.rand = random.Random(_seed)
+        self.parts = {}  # msg_num -> (total, {index: payload})
+        self.pending = {}  # msg_num -> (peer, time of the last packet)
+        self.messages = {}  # msg_num -> reassembled message
+        self.received = 0
+        self.dropped = 0
+        self.sacks = 0
+        self.running = True
+
+    def run(self):
+        while self.running:
+            try:
+                data, peer = self.sock.recvfrom(65536)
+            except socket.timeout:
+                data = None
+            if data is not None and len(data) >= nepi_pkt_header.size:
+                if self.rand.random() < self.loss:
+                    self.dropped += 1
+                else:
+                    self.packet(data, peer)
+            self.answer()
+        self.sock.close()
+
+    def packet(self, _data, _peer):
+        msg_num, total, index, length = nepi_pkt_header.unpack_from(_data)
+        self.received += 1
+        have = self.parts.get(msg_num)
+        if have is None or have[0] != total:
+            # A new message (or a reused number).
+            have = (total, {})
+            self.parts[msg_num] = have
+            self.messages.pop(msg_num, None)
+        have[1][index] = bytes(_data[nepi_pkt_header.size:nepi_pkt_header.size + length])
+        if len(have[1]) == total and msg_num not in self.messages:
+            self.messages[msg_num] = b"".join(have[1][i] for i in range(total))
+        self.pending[msg_num] = (_peer, time.monotonic())
+
+    def answer(self):
+        now = time.monotonic()
+        for msg_num, (peer, last) in list(self.pending.items()):
+            if now - last < self.gap:
+                continue
+            del self.pending[msg_num]
+            total, have = self.parts[msg_num]
+            if self.rand.random() < self.sack_loss:
+                continue
+            self.sock.sendto(packSack(msg_num, total, have), peer)
+            self.sacks += 1
+
+    def stop(self):
+        self.running = False
+        self.join()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    loss = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    sack_loss = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    server = SackServer(loss, sack_loss, _port=port)
+    server.start()
+    print("SACK stand-in on %s:%d, packet loss %.2f, SACK loss %.2f" % (server.addr + (loss, sack_loss)))
+    try:
+        while True:
+            time.sleep(5)
+            print(
+                "messages %d, packets %d, dropped %d, SACKs %d"
+                % (len(server.messages), server.received, server.dropped, server.sacks)
+            )
+    except KeyboardInterrupt:
+        server.stop()
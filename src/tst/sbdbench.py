@@ -0,0 +1,136 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Iridium SBD session benchmark against the pty fake modem
+# ('fakemodem.py', with an SBD session and a signal reading scaled down
+# to 'session' and 'session' / 3 seconds): a queue of small records goes
+# up, with MT messages waiting at the Gateway, and a mailbox check
+# follows, as in an LB Session.  Compares the old plan (one record per
+# MO buffer, AT+CSQ before every AT+SBDIX, one MT message per mailbox
+# check) with 'botsbd' (records packed into 340-byte MO payloads, the
+# signal reading cached, every queued MT message drained), and 'botsbd'
+# with 'fec_ratio' on (see 'botfec'), the Server losing one MO message of
+# each FEC block.  Reports the SBDIX sessions, messages per SBDIX, airtime
+# (SBDIX time) and wall time.  Checks that every record and MT message
+# gets through.  Exits non-zero on failure.
+#
+#   python sbdbench.py [records] [mt_messages] [session]
+#
+import sys
+import time
+import random
+import struct
+
+from tstenv import mkenv
+from fakemodem import FakeModem
+from batchbench import record, nuid_field, same
+
+import botdefs
+from botbatch import batchMsgs, unbatchMsg
+from botcomm import BotComm
+from botfec import FecSessionReassembler
+
+
+def old_plan(_at, _records):
+    # The old 'send()' per record and 'receive(1, 1)', on the AT engine.
+    def sbdix():
+        _at.command(b"AT+CSQ", 20)
+        req = _at.command(b"AT+SBDIX", 60)
+        fields = [int(f) for f in req.text().split(":")[1].split(",")]
+        if fields[2] == 1:
+            got.append(_at.command(b"AT+SBDRB", 20).data[2:-2])
+
+    got = []
+    for rec in _records:
+        _at.command(b"AT+SBDWB=%d" % len(rec), 20)
+        _at.command(rec + struct.pack(">H", sum(rec) & 0xFFFF), 20, False, True)
+        sbdix()
+    _at.command(b"AT+SBDD0", 20)
+    sbdix()
+    return got
+
+
+def server(_frames):
+    # The MO messages as the Server sees them, losing the first data
+    # message of every FEC block.
+    rx = FecSessionReassembler()
+    seen = set()
+    wires = []
+    for frame in _frames:
+        block_num, k, index, length = struct.unpack_from("!HIIH", frame)
+        if k == 0 and block_num not in seen:
+            seen.add(block_num)
+            continue
+        wires.extend(rx.add(frame))
+    return wires, rx.rebuilt
+
+
+def run(_cfg, _log, _session, _records, _mts, _new, _fec=0.0):
+    modem = FakeModem(0.005, _session, 4, _session / 3)
+    modem.mt.extend(_mts)
+    modem.start()
+    _cfg.lb_iridium.port = modem.name
+    _cfg.lb_iridium.fec_ratio = _fec
+    bc = BotComm(_cfg, _log, "iridium", 1, None)
+    bc.getconn(1)
+    del botdefs.msgs_incoming[:]
+    t0 = time.perf_counter()
+    if _new:
+        budget = bc.sfec.maxmsgsize if bc.sfec is not None else sbd_budget
+        wires = batchMsgs(_records, budget, nuid_field)
+        for wire in wires:
+            bc.send(1, wire, 5, None)
+        bc.endFec(1)
+        bc.receive(1, 1)
+        got = list(botdefs.msgs_incoming)
+    else:
+        got = old_plan(bc.at, _records)
+    secs = time.perf_counter() - t0
+    bc.close(1)
+    sbdix = modem.commands.count(b"AT+SBDIX")
+    csq = modem.commands.count(b"AT+CSQ")
+    wires, rebuilt = server(modem.mo) if _fec else (modem.mo, 0)
+    mo = [rec for wire in wires for rec in unbatchMsg(wire, nuid_field)]
+    return sbdix, csq, secs, mo, got, rebuilt
+
+
+if __name__ == "__main__":
+    nrecs = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    nmts = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    session = float(sys.argv[3]) if len(sys.argv) > 3 else 0.3
+    failures = []
+    cfg, log, scratch = mkenv()
+    rnd = random.Random(340)
+    nuid = bytes(rnd.getrandbits(8) for i in range(16))
+    records = [record(rnd, i, nuid, rnd.randint(30, 90)) for i in range(nrecs)]
+    mts = [b"mt%d" % i * 20 for i in range(nmts)]
+    sbd_budget = min(cfg.lb_iridium.max_msg_size, 340)
+
+    print("%d records (%d bytes), %d MT messages queued, %.2f s SBDIX, %.2f s CSQ"
+          % (nrecs, sum(len(r) for r in records), nmts, session, session / 3))
+    print("%-5s %6s %5s %10s %10s %10s %8s %8s %8s"
+          % ("plan", "sbdix", "csq", "msgs/sbdix", "airtime", "wall (s)", "mo recs", "mt", "rebuilt"))
+    for name, new, fec in (("old", False, 0.0), ("new", True, 0.0), ("fec", True, 0.25)):
+        sbdix, csq, secs, mo, got, rebuilt = run(cfg, log, session, records, mts, new, fec)
+        print("%-5s %6d %5d %10.2f %10.2f %10.2f %8d %8d %8d"
+              % (name, sbdix, csq, (len(mo) + len(got)) / sbdix, sbdix * session, secs, len(mo), len(got),
+                 rebuilt))
+        if fec:
+            # A rebuilt message comes in after the rest of its block.
+            intact = len(mo) == nrecs and all(any(same(a, b) for b in records) for a in mo)
+        else:
+            intact = len(mo) == nrecs and all(same(a, b) for a, b in zip(mo, records))
+        if new and (not intact or got != mts):
+            failures.append("%s: %d of %d records, MT %d of %d" % (name, len(mo), nrecs, len(got), nmts))
+        if fec and not rebuilt:
+            failures.append("fec: nothing rebuilt")
+
+    for f in failures:
+        print("FAIL " + f)
+    print("PASSED" if not failures else "FAILED (%d)" % len(failures))
+    sys.exit(1 if failures else 0)
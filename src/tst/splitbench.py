@@ -0,0 +1,101 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# MessageSplitter micro-benchmark: splits 1 KB to 10 MB messages into
+# 1500 byte UDP packets with the old 'splitmsg()' (slice copies, a format
+# string and 'struct.pack' per packet, the whole packet list at once)
+# and with the 'iterpackets()' generator ('memoryview' slices packed into
+# one reused buffer), and reports MB/s and the peak memory allocated
+# while splitting (tracemalloc).  Also checks that both give the same
+# packets.  Exits non-zero if they differ.
+#
+#   python splitbench.py [packet_size]
+#
+import sys
+import time
+import struct
+import tracemalloc
+
+import tstenv  # noqa: F401 (puts the bot modules on the path)
+
+from botcomm import MessageSplitter
+
+
+def old_splitmsg(_maxpktsize, _msg, _msg_num=10000):
+    # 'MessageSplitter.splitmsg()' before the rewrite (without tracing).
+    msg_len = len(_msg)
+    msg_total_pkts = int(msg_len / _maxpktsize + .9999)
+    packetlist = []
+    msg_index = 0
+    for i in [x for x in range(0, msg_len, _maxpktsize)]:
+        upper_bound = min(i + _maxpktsize, msg_len)
+        this_msg = _msg[i:upper_bound]
+        packetlist.append(
+            struct.pack(
+                f"!HIIH{upper_bound - i}s",
+                _msg_num,
+                msg_total_pkts,
+                msg_index,
+                len(this_msg),
+                this_msg,
+            )
+        )
+        msg_index += 1
+    return packetlist
+
+
+def sink_list(_packets):
+    n = 0
+    for p in _packets:
+        n += len(p)
+    return n
+
+
+def measure(_fn, _msg):
+    reps = max(1, (8 << 20) // len(_msg))
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for r in range(reps):
+        _fn(_msg)
+    t1 = time.perf_counter()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # Timed again without tracemalloc, which slows allocation down.
+    t2 = time.perf_counter()
+    for r in range(reps):
+        _fn(_msg)
+    t3 = time.perf_counter()
+    return len(_msg) * reps / (t3 - t2) / 1e6, peak
+
+
+if __name__ == "__main__":
+    packet_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1500
+    splitter = MessageSplitter(packet_size)
+    failures = 0
+    print("%d byte packets, %d byte payload" % (packet_size, splitter.maxpktsize))
+    print("%10s  %-22s %10s %14s" % ("message", "splitter", "MB/s", "peak alloc"))
+    for size in (1 << 10, 10 << 10, 100 << 10, 1 << 20, 10 << 20):
+        msg = bytes(range(256)) * (size // 256)
+        old = old_splitmsg(splitter.maxpktsize, msg)
+        new = [bytes(p) for p in splitter.iterpackets(msg)]
+        if old != new:
+            failures += 1
+            print("FAIL packets differ for a %d byte message" % size)
+        del old, new
+
+        runs = (
+            ("old splitmsg() list", lambda m: sink_list(old_splitmsg(splitter.maxpktsize, m))),
+            ("splitmsg() list", lambda m: sink_list(splitter.splitmsg(m))),
+            ("iterpackets()", lambda m: sink_list(splitter.iterpackets(m))),
+        )
+        for name, fn in runs:
+            rate, peak = measure(fn, msg)
+            print("%10d  %-22s %10.1f %12.1f KB" % (size, name, rate, peak / 1024.0))
+
+    print("PASSED" if not failures else "FAILED (%d)" % failures)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,135 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# HB ssh connection sharing check ('botssh') against the stand-in ssh
+# ('fakessh.py', a handshake of 'delay' seconds): runs the connections of
+# an HB Session as 'HbProc' makes them (server commands through
+# 'command()', rsyncs through an 'rsync -e' remote shell from 'rshell()')
+# with 'hb_ip.mux' off and on, and compares the handshakes and wall time.
+# Checks the report stats, that closing leaves no master or socket behind,
+# the fallback to a connection per command when the master fails, that
+# nothing runs once the HB phase is stopped but the log transfer after it
+# does, on an event of its own, and that closing waits for a command of
+# an HB phase left behind.  Exits non-zero on failure.
+#
+#   python sshcheck.py [delay]
+#
+import os
+import sys
+import time
+import threading
+
+from tstenv import mkenv
+import fakessh
+
+from botssh import SshMux
+
+# The connections of an HB Session: lock, mkdir, rsync do, move do, rsync
+# sw, clean sw, unlock, rsync log, move log.
+session = ["cmd", "cmd", "rsync", "cmd", "rsync", "cmd", "cmd", "rsync", "cmd"]
+
+
+def check(_name, _got, _want):
+    print("%-34s %s" % (_name, _got))
+    if _got != _want:
+        failures.append("%s: %s, expected %s" % (_name, _got, _want))
+
+
+def connections():
+    with open(sshlog) as f:
+        out = f.read().split()
+    open(sshlog, "w").close()
+    return out
+
+
+def run(_mux, _event=None):
+    cfg.hb_ip.mux = _mux
+    ssh = SshMux(cfg, log, 1, "nuid@hb.example", "/dev/null", _event)
+    t0 = time.perf_counter()
+    ssh.open(1)
+    rcs = []
+    for kind in session:
+        if kind == "cmd":
+            proc = ssh.run(ssh.command("echo ok"))
+        else:
+            proc = ssh.run(["sh", "-c", ssh.rshell() + " nuid@hb.example echo ok"], scratch)
+        rcs.append(proc.returncode)
+    secs = time.perf_counter() - t0
+    master = ssh.master
+    ctl_dir = ssh.ctl_dir
+    ssh.close(1)
+    gone = (master is None or master.poll() is not None) and (ctl_dir is None or not os.path.exists(ctl_dir))
+    return secs, rcs, ssh.stats(), gone
+
+
+if __name__ == "__main__":
+    delay = float(sys.argv[1]) if len(sys.argv) > 1 else 0.3
+    failures = []
+    cfg, log, scratch = mkenv()
+    sshlog = os.path.join(scratch, "fakessh.log")
+    fakessh.install(scratch, delay, sshlog)
+    open(sshlog, "w").close()
+
+    print("%d connections, %.2f s handshake" % (len(session), delay))
+    off, rcs, stats, gone = run(False)
+    print("%-34s %.2f s" % ("mux off", off))
+    check("mux off connections", connections(), ["handshake"] * len(session))
+    check("mux off stats", (stats["handshakes"], stats["handshakes_saved"]), (len(session), 0))
+
+    on, rcs, stats, gone = run(True)
+    print("%-34s %.2f s (%.2f s saved)" % ("mux on", on, off - on))
+    check("mux on commands", rcs, [0] * len(session))
+    check("mux on connections", connections(), ["master"] + ["mux"] * len(session))
+    check("mux on stats", (stats["mux"], stats["handshakes"], stats["handshakes_saved"]), (True, 1, len(session)))
+    if abs(stats["secs_saved"] - len(session) * delay) > len(session) * delay * 0.5:
+        failures.append("secs_saved %s for %d x %.2f s" % (stats["secs_saved"], len(session), delay))
+    if on > off * 0.5:
+        failures.append("mux on %.2f s, off %.2f s" % (on, off))
+    check("master and socket gone", gone, True)
+
+    os.environ["FAKESSH_FAIL"] = "1"
+    secs, rcs, stats, gone = run(True)
+    del os.environ["FAKESSH_FAIL"]
+    check("master fails: commands", rcs, [0] * len(session))
+    check("master fails: connections", connections(), ["master"] + ["handshake"] * len(session))
+    check("master fails: stats", (stats["mux"], stats["handshakes"]), (False, len(session) + 1))
+
+    stop = threading.Event()
+    stop.set()
+    secs, rcs, stats, gone = run(True, stop)
+    check("hb stopped: connections", connections(), [])
+    check("hb stopped: handshakes", stats["handshakes"], 0)
+
+    # The log transfer after an HB timeout ('HbProc.transfer_logs()').
+    cfg.hb_ip.mux = True
+    ssh = SshMux(cfg, log, 1, "nuid@hb.example", "/dev/null", stop)
+    ssh.event = threading.Event()
+    check("log transfer after timeout", ssh.run(ssh.command("echo ok")).returncode, 0)
+    connections()
+
+    # An HB phase left behind mid-command while Bot-Main closes.
+    stop = threading.Event()
+    ssh = SshMux(cfg, log, 1, "nuid@hb.example", "/dev/null", stop)
+    ssh.open(1)
+    out = {}
+    worker = threading.Thread(target=lambda: out.update(rc=ssh.run(ssh.command("sleep 30")).returncode))
+    worker.start()
+    time.sleep(delay + 0.5)
+    stop.set()
+    t0 = time.perf_counter()
+    ssh.close(1)
+    worker.join(5.0)
+    print("%-34s %.2f s" % ("close after left-behind command", time.perf_counter() - t0))
+    check("left behind: command stopped", (worker.is_alive(), out.get("rc", 0) < 0), (False, True))
+    check("left behind: master gone", ssh.master.poll() is not None and ssh.ctl_dir is None, True)
+    connections()
+
+    for f in failures:
+        print("FAIL " + f)
+    print("PASSED" if not failures else "FAILED (%d)" % len(failures))
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,96 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Top-K uplink selection check and benchmark: fills the 'data' table with
+# random Active Data Records and compares 'BotPIPO.selectTopK()' with the
+# ratings of the old approach (re-rate every record, then ORDER BY pipo
+# DESC LIMIT K), for a few numerator distributions and K values.  Exits
+# non-zero if the selected ratings differ.
+#
+#   python topkcheck.py [records]
+#
+import sys
+import time
+import random
+
+from tstenv import mkenv
+
+from botdb import BotDB, data_select_cols
+from botpipo import BotPIPO
+
+
+def fill(_db, _nrows, _levels, _now):
+    # '_levels' distinct numerators (0 = continuous), a few NULL ones.
+    rnd = random.Random(_nrows * 7 + _levels)
+    rows = []
+    for i in range(_nrows):
+        if _levels:
+            numerator = float(rnd.randrange(_levels)) / _levels
+        else:
+            numerator = rnd.uniform(0.0, 2.0)
+        if i % 997 == 0:
+            numerator = None
+        rows.append(
+            (rnd.choice((0, 1)), _now - rnd.uniform(0.0, 86400.0 * 30), numerator)
+        )
+    _db.dbc.executemany(
+        "INSERT INTO data (rec_state, timestamp, numerator, pipo) VALUES (?,?,?,0.0)",
+        rows,
+    )
+    _db.dbc.commit()
+
+
+def old_select(_db, _pipo, _k):
+    _pipo.rerate(1, False)
+    sql = (
+        "SELECT " + data_select_cols + " FROM data WHERE rec_state in (0,1)"
+        " ORDER BY pipo DESC LIMIT " + str(_k)
+    )
+    success, rows = _db.getResults(1, sql, False)
+    return rows
+
+
+if __name__ == "__main__":
+    nrows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    failures = 0
+    for levels in (8, 256, 0):
+        cfg, log, scratch = mkenv()
+        db = BotDB(cfg, log, 1)
+        db.getconn(1)
+        pipo = BotPIPO(cfg, log, 1, db)
+        pipo.initPIPO(1)
+        fill(db, nrows, levels, pipo.exec_age * 60.0)
+
+        for k in (1, 32, 200):
+            t0 = time.perf_counter()
+            success, new = pipo.selectTopK(1, k)
+            t1 = time.perf_counter()
+            old = old_select(db, pipo, k)
+            t2 = time.perf_counter()
+            want = [row[18] for row in old]
+            got = [row[18] for row in new]
+            bad = got != want
+            print(
+                "%-4s numerators=%-10s k=%-4d topk %8.2f ms  rerate+sort %8.2f ms"
+                % (
+                    "FAIL" if bad else "ok",
+                    levels or "continuous",
+                    k,
+                    (t1 - t0) * 1000.0,
+                    (t2 - t1) * 1000.0,
+                )
+            )
+            if bad:
+                print("     want: " + str(want[:8]))
+                print("     got:  " + str(got[:8]))
+            failures += bad
+
+        db.close(1)
+
+    print("PASSED" if not failures else "FAILED (%d)" % failures)
+    sys.exit(1 if failures else 0)
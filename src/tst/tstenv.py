@@ -0,0 +1,53 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Common set-up for the stand-alone test and benchmark scripts in this
+# directory.  The Bot resolves its config file relative to the working
+# directory (see 'botdefs.nepi_home'), so the scripts switch into the
+# 'src/bot' directory, load the real 'config.json' and then point the DB
+# and the Data directory at a scratch area so nothing real is touched.
+#
+import os
+import sys
+import tempfile
+
+bot_src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "bot"))
+sys.path.insert(0, bot_src_dir)
+os.chdir(bot_src_dir)
+
+from botcfg import BotCfg
+from botlog import BotLog
+
+
+def mkenv(_logging=-1, _scratch=None):
+    # Returns (cfg, log, scratch_dir) with logging quiet by default.
+    scratch = _scratch or tempfile.mkdtemp(prefix="nepibot-tst-")
+    cfg = BotCfg()
+    cfg.initcfg()
+    cfg.logging = _logging
+    cfg.debugging = _logging
+    cfg.tracking = _logging > -1
+    cfg.db_file = os.path.join(scratch, "nepibot.db")
+    cfg.payload_dir_path = os.path.join(scratch, "payloads")
+    cfg.lb_data_dir_path = os.path.join(scratch, "lb", "data")
+    cfg.bs_log_file = os.path.join(scratch, "botmainlog.txt")
+    os.makedirs(cfg.lb_data_dir_path, exist_ok=True)
+    log = BotLog(cfg, "BOT-MAIN", "tst")
+    return cfg, log, scratch
+
+
+class nepi_args(object):
+    # Stand-in for the parsed 'botmain' command line arguments.
+    def __init__(self, lb=False, hb=False):
+        self.lb = lb
+        self.hb = hb
+        self.tm = True
+        self.tr = False
+        self.ndp = False
+        self.lbto = 300
+        self.hbto = 300
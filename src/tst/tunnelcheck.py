@@ -0,0 +1,114 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# Persistent tunnel check ('bottunnel'), with stand-ins for ssh (a small
+# TCP listener that takes a moment to come up, as ssh does while it
+# logs in) and socat (an idle process): starts the tunnel and times the
+# readiness probe against the old fixed 4 s sleep, then "wakes up" again
+# with a new 'BotTunnel' and checks that the running tunnel is reused,
+# and that a dead process, a changed command line or a dead listener
+# gets it restarted.  Exits non-zero on failure.
+#
+#   python tunnelcheck.py
+#
+import os
+import sys
+import time
+import socket
+
+from tstenv import mkenv
+
+from bottunnel import BotTunnel, pidAlive
+
+# Listens on the port after '_delay' seconds and accepts forever.
+listener = (
+    "import socket, sys, time\n"
+    "time.sleep(float(sys.argv[2]))\n"
+    "s = socket.socket()\n"
+    "s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)\n"
+    "s.bind(('127.0.0.1', int(sys.argv[1])))\n"
+    "s.listen(5)\n"
+    "while True:\n"
+    "    s.accept()[0].close()\n"
+)
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def cmds(_port, _delay=0.5, _tag="a"):
+    return [
+        ("ssh", [sys.executable, "-c", listener, str(_port), str(_delay)]),
+        ("socat", [sys.executable, "-c", "import time; time.sleep(3600)", _tag]),
+    ]
+
+
+def wakeup(_cfg, _log, _pidfile, _port, _cmds, _tout=5.0):
+    tunnel = BotTunnel(_cfg, _log, 1, _pidfile, "127.0.0.1", _port)
+    t0 = time.perf_counter()
+    success = tunnel.open(1, _cmds, _tout)
+    return tunnel, success, time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    failures = []
+    cfg, log, scratch = mkenv()
+    pidfile = os.path.join(scratch, "bottunnel.pid")
+    port = free_port()
+
+    tunnel, success, secs = wakeup(cfg, log, pidfile, port, cmds(port))
+    print("start:        %-5s reused=%-5s %.3f s (was a fixed 4 s sleep)" % (success[0], tunnel.reused, secs))
+    if not success[0] or tunnel.reused or secs > 2.0:
+        failures.append("start: %s in %.3f s" % (success, secs))
+    first = tunnel.load()
+
+    tunnel, success, secs = wakeup(cfg, log, pidfile, port, cmds(port))
+    print("next wake-up: %-5s reused=%-5s %.3f s" % (success[0], tunnel.reused, secs))
+    if not success[0] or not tunnel.reused or tunnel.load() != first:
+        failures.append("not reused: " + str(success))
+
+    # socat died between wake-ups.
+    os.kill(first["socat"]["pid"], 9)
+    time.sleep(0.1)
+    tunnel, success, secs = wakeup(cfg, log, pidfile, port, cmds(port))
+    print("dead socat:   %-5s reused=%-5s %.3f s" % (success[0], tunnel.reused, secs))
+    if not success[0] or tunnel.reused or pidAlive(first["ssh"]["pid"], first["ssh"]["args"]):
+        failures.append("dead socat: " + str(success))
+
+    # The configuration changed.
+    second = tunnel.load()
+    tunnel, success, secs = wakeup(cfg, log, pidfile, port, cmds(port, _tag="b"))
+    print("changed cmd:  %-5s reused=%-5s %.3f s" % (success[0], tunnel.reused, secs))
+    if not success[0] or tunnel.reused or pidAlive(second["socat"]["pid"], second["socat"]["args"]):
+        failures.append("changed cmd: " + str(success))
+
+    # A tunnel that never comes up fails in '_tout', not after it.
+    tunnel.stop(1)
+    bad = [("ssh", [sys.executable, "-c", "import time; time.sleep(3600)"])]
+    tunnel, success, secs = wakeup(cfg, log, pidfile, port, bad, 1.0)
+    print("never ready:  %-5s %s %.3f s" % (success[0], success[1], secs))
+    if success[0] or success[1] != "TN102" or secs > 2.0 or os.path.exists(pidfile):
+        failures.append("never ready: %s in %.3f s" % (success, secs))
+
+    # ssh exits at once (say, the key was refused): no waiting at all.
+    quits = [("ssh", [sys.executable, "-c", "raise SystemExit(255)"])]
+    tunnel, success, secs = wakeup(cfg, log, pidfile, port, quits, 5.0)
+    print("ssh exits:    %-5s %s %.3f s" % (success[0], success[1], secs))
+    if success[0] or secs > 2.0:
+        failures.append("ssh exits: %s in %.3f s" % (success, secs))
+
+    tunnel.stop(1)
+    for f in failures:
+        print("FAIL " + f)
+    print("PASSED" if not failures else "FAILED (%d)" % len(failures))
+    sys.exit(1 if failures else 0)
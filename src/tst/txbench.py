@@ -0,0 +1,110 @@
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+# UDP transmit benchmark over loopback: sends the same messages through
+# each 'botudp.UdpTx' backend this platform has (sendmmsg, sendmsg,
+# sendall), unpaced, to a UDP sink in a separate process, and reports
+# packets/s, MB/s, system calls per packet and the share of packets the
+# sink got.  The sink also checks that every packet it got is one the
+# splitter would have built.  Exits non-zero on a mismatch or if a
+# backend's delivery falls below 90% (loopback shouldn't drop much with
+# a large receive buffer).
+#
+#   python txbench.py [message_kb] [messages]
+#
+import sys
+import time
+import socket
+import hashlib
+import multiprocessing
+
+import tstenv  # noqa: F401 (puts the bot modules on the path)
+
+from botcomm import MessageSplitter, Pacer
+from botudp import UdpTx, backends
+
+packet_size = 1472
+
+
+def sink(_ready, _results, _expect):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 32 << 20)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(0.5)
+    _ready.put(sock.getsockname())
+    while True:
+        count = 0
+        bad = 0
+        while True:
+            try:
+                data = sock.recv(65536)
+            except socket.timeout:
+                if count:
+                    break
+                continue
+            if data == b"quit":
+                sock.close()
+                return
+            count += 1
+            if hashlib.sha1(data).digest() not in _expect:
+                bad += 1
+        _results.put((count, bad))
+
+
+if __name__ == "__main__":
+    msg_kb = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    nmsgs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    splitter = MessageSplitter(packet_size)
+    msg = bytes(range(256)) * (msg_kb * 4)
+    expect = set(hashlib.sha1(bytes(p)).digest() for p in splitter.iterpackets(msg))
+    npkts = splitter.npackets(len(msg)) * nmsgs
+
+    ready = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=sink, args=(ready, results, expect), daemon=True)
+    proc.start()
+    addr = ready.get()
+
+    failures = 0
+    print("%d x %d KB messages, %d packets of %d bytes" % (nmsgs, msg_kb, npkts, packet_size))
+    print("%-9s %12s %10s %10s %10s" % ("backend", "packets/s", "MB/s", "calls/pkt", "delivered"))
+    for backend in backends():
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 << 20)
+        sock.settimeout(2.0)
+        sock.connect(addr)
+        tx = UdpTx(sock, Pacer(0, 0), backend, 32)
+        t0 = time.perf_counter()
+        for i in range(nmsgs):
+            tx.send(splitter, msg)
+        t1 = time.perf_counter()
+        got, bad = results.get()
+        sock.close()
+
+        delivered = float(got) / npkts
+        failed = bad or delivered < 0.9
+        failures += bool(failed)
+        print(
+            "%-9s %12.0f %10.1f %10.3f %9.1f%%%s"
+            % (
+                backend,
+                npkts / (t1 - t0),
+                len(msg) * nmsgs / (t1 - t0) / 1e6,
+                float(tx.syscalls) / npkts,
+                100.0 * delivered,
+                "  FAIL (%d bad packets)" % bad if failed else "",
+            )
+        )
+
+    quit = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    quit.sendto(b"quit", addr)
+    quit.close()
+    proc.join(5)
+
+    print("PASSED" if not failures else "FAILED (%d)" % failures)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2024 Numurus, LLC <https://www.numurus.com>.
+#
+# This file is part of nepi-engine
+# (see https://github.com/nepi-engine).
+#
+# License: 3-clause BSD, see https://opensource.org/licenses/BSD-3-Clause
+#
+
+"""Show how the uplink selection would change under alternative PIPO weights
+
+Loads the Active records ('rec_state' 0 or 1) of a nepi-bot 'data' table,
+rates them with the configured pipo_*_wt weights and with the weights given
+on the command line (both at the same wake-up time), and prints the top-K
+records the uplink would pick under each -- which records move, enter or
+drop out. The database is opened read-only; nothing is written.
+
+Example:
+    ./pipo_what_if.py /opt/nepi/nepi_link/nepi-bot/db/nepibot.db --trig 2.0 --time 0.25
+
+See the help menu (-h or --help) for usage.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from urllib.request import pathname2url
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "src", "bot"))
+from botpipo import rateColumns  # noqa: E402
+
+WEIGHTS = ("scor", "qual", "size", "trig", "time")
+
+parser = argparse.ArgumentParser(description='Show how the top-K uplink selection changes under alternative PIPO weights (read-only)')
+parser.add_argument('db', help='Path to the nepi-bot database file')
+parser.add_argument('-c', '--cfg', default=os.path.join(REPO_ROOT, 'cfg', 'bot', 'config.json'), help='Bot config.json holding the current pipo_*_wt weights')
+parser.add_argument('-l', '--link', default=None, help='Take the current weights from this link section (e.g. lb_iridium) instead of the top level')
+parser.add_argument('-k', '--top', type=int, default=32, help='Size of the uplink selection (default 32)')
+parser.add_argument('-a', '--at', type=float, default=None, help='Wake-up time to rate at, in epoch seconds (default now)')
+for w in WEIGHTS:
+    parser.add_argument('--' + w, type=float, default=None, help='Alternative pipo_' + w + '_wt (default: unchanged)')
+
+args = parser.parse_args()
+
+if not os.path.isfile(args.db):
+    print("No database at " + args.db + "... aborting")
+    sys.exit(1)
+
+with open(args.cfg, 'r') as f:
+    cfg_json = json.load(f)
+if args.link:
+    cfg_json = cfg_json.get(args.link, {})
+current = tuple(float(cfg_json.get('pipo_' + w + '_wt', 1.0 if w == 'time' else 0.5)) for w in WEIGHTS)
+proposed = tuple(c if getattr(args, w) is None else getattr(args, w) for w, c in zip(WEIGHTS, current))
+
+# Read-only URI; the bot may be running, so never take a write lock.
+conn = sqlite3.connect('file:' + pathname2url(os.path.abspath(args.db)) + '?mode=ro', uri=True)
+rows = conn.execute(
+    "SELECT rowid, type, instance, event_score, quality, type_score, trigger, timestamp, pipo"
+    " FROM data WHERE rec_state IN (0,1)"
+).fetchall()
+conn.close()
+
+if not rows:
+    print("No Active records in " + args.db)
+    sys.exit(0)
+
+rowid = np.array([r[0] for r in rows], dtype=np.int64)
+label = [str(r[1]) + "/" + str(r[2]) for r in rows]
+cols = np.array([r[3:] for r in rows], dtype=np.float64).T
+exec_age = float(np.floor((time.time() if args.at is None else args.at) / 60.0))
+
+
+def rank(_wts):
+    numerator, denominator, pipo = rateColumns(cols[0], cols[1], cols[2], cols[3], cols[4], _wts, exec_age)
+    # A zero denominator keeps the stored rating, as the bot's re-rate does.
+    pipo = np.where(denominator == 0.0, cols[5], pipo)
+    # NaN (NULL) ratings sort last, like they do in 'ORDER BY pipo DESC'.
+    order = np.lexsort((rowid, np.nan_to_num(-pipo, nan=np.inf)))
+    return pipo, order[:args.top]
+
+
+cur_pipo, cur_top = rank(current)
+new_pipo, new_top = rank(proposed)
+cur_rank = {int(i): n + 1 for n, i in enumerate(cur_top)}
+
+print("Active records:   " + str(len(rows)))
+print("Rated at (min):   " + str(int(exec_age)))
+print("Current weights:  " + ", ".join(w + "=" + str(v) for w, v in zip(WEIGHTS, current)))
+print("Proposed weights: " + ", ".join(w + "=" + str(v) for w, v in zip(WEIGHTS, proposed)))
+print("")
+print("%4s  %5s  %10s  %-16s  %12s  %12s" % ("rank", "was", "rowid", "type/instance", "pipo now", "pipo new"))
+for n, i in enumerate(new_top):
+    was = cur_rank.pop(int(i), None)
+    print("%4d  %5s  %10d  %-16s  %12.6g  %12.6g" % (n + 1, "new" if was is None else str(was), rowid[i], label[i][:16], cur_pipo[i], new_pipo[i]))
+
+print("")
+print(str(len(new_top) - (len(cur_top) - len(cur_rank))) + " record(s) enter the top " + str(args.top) + ", " + str(len(cur_rank)) + " drop out:")
+for i, was in sorted(cur_rank.items(), key=lambda x: x[1]):
+    print("%4s  %5d  %10d  %-16s  %12.6g  %12.6g" % ("-", was, rowid[i], label[i][:16], cur_pipo[i], new_pipo[i]))